@@ -1,53 +1,107 @@
+import time
+
 from django.utils import timezone
+from django.conf import settings
 from django.contrib.auth.models import User
 from datetime import timedelta
 from django.core.cache import cache
 
 class UserActivityTracker:
     """Track user online status using cache for better performance"""
-    
+
     ONLINE_THRESHOLD = 5  # minutes
     CACHE_TIMEOUT = 300   # 5 minutes in seconds
-    
+
+    # When this process last wrote each user's heartbeat (monotonic seconds).
+    # Keeps every request from writing to the cache; each worker writes at most
+    # once per PRESENCE_HEARTBEAT_INTERVAL per user.
+    _last_heartbeat = {}
+    MAX_TRACKED_HEARTBEATS = 10000
+
+    @staticmethod
+    def _cache_key(user_id):
+        return f"user_online_{user_id}"
+
     @classmethod
-    def mark_user_online(cls, user):
-        """Mark user as online"""
-        if user.is_authenticated:
-            cache_key = f"user_online_{user.id}"
-            cache.set(cache_key, timezone.now().isoformat(), cls.CACHE_TIMEOUT)
-    
+    def heartbeat_interval(cls):
+        return getattr(settings, 'PRESENCE_HEARTBEAT_INTERVAL', 60)
+
     @classmethod
-    def is_user_online(cls, user):
-        """Check if user is online"""
+    def mark_user_online(cls, user):
+        """Mark user as online, unless this process did so within the heartbeat interval"""
         if not user.is_authenticated:
             return False
-            
-        cache_key = f"user_online_{user.id}"
-        last_activity = cache.get(cache_key)
-        
+
+        now = time.monotonic()
+        last = cls._last_heartbeat.get(user.id)
+        if last is not None and now - last < cls.heartbeat_interval():
+            return False
+
+        cache.set(cls._cache_key(user.id), timezone.now().isoformat(), cls.CACHE_TIMEOUT)
+        if len(cls._last_heartbeat) >= cls.MAX_TRACKED_HEARTBEATS:
+            cls._last_heartbeat.clear()
+        cls._last_heartbeat[user.id] = now
+        return True
+
+    @classmethod
+    def _is_recent(cls, last_activity, cutoff_time):
         if not last_activity:
             return False
-            
+
         try:
             last_activity_time = timezone.datetime.fromisoformat(last_activity)
             if timezone.is_naive(last_activity_time):
                 last_activity_time = timezone.make_aware(last_activity_time)
-            
-            cutoff_time = timezone.now() - timedelta(minutes=cls.ONLINE_THRESHOLD)
+
             return last_activity_time > cutoff_time
         except (ValueError, TypeError):
             return False
-    
+
     @classmethod
-    def get_online_users(cls):
-        """Get list of online user IDs"""
-        online_users = []
-        # This is a simplified version - in production you might want to use Redis pattern matching
-        return online_users
-    
+    def _cutoff_time(cls):
+        return timezone.now() - timedelta(minutes=cls.ONLINE_THRESHOLD)
+
+    @classmethod
+    def is_user_online(cls, user):
+        """Check if user is online"""
+        if not user.is_authenticated:
+            return False
+
+        last_activity = cache.get(cls._cache_key(user.id))
+        return cls._is_recent(last_activity, cls._cutoff_time())
+
+    @classmethod
+    def online_user_ids(cls, user_ids):
+        """IDs among `user_ids` that are online, read with a single get_many"""
+        keys = {cls._cache_key(user_id): user_id for user_id in user_ids}
+        if not keys:
+            return set()
+
+        cutoff_time = cls._cutoff_time()
+        return {
+            keys[key]
+            for key, last_activity in cache.get_many(list(keys)).items()
+            if cls._is_recent(last_activity, cutoff_time)
+        }
+
+    @classmethod
+    def get_online_status(cls, user_ids):
+        """Map each of `user_ids` to whether that user is online"""
+        user_ids = list(user_ids)
+        online = cls.online_user_ids(user_ids)
+        return {user_id: user_id in online for user_id in user_ids}
+
+    @classmethod
+    def get_online_users(cls, queryset=None):
+        """Get list of online user IDs among active users (or `queryset`)"""
+        if queryset is None:
+            queryset = User.objects.filter(is_active=True)
+        user_ids = queryset.values_list('id', flat=True)
+        return sorted(cls.online_user_ids(user_ids))
+
     @classmethod
     def mark_user_offline(cls, user):
         """Explicitly mark user as offline"""
         if user.is_authenticated:
-            cache_key = f"user_online_{user.id}"
-            cache.delete(cache_key)
\ No newline at end of file
+            cls._last_heartbeat.pop(user.id, None)
+            cache.delete(cls._cache_key(user.id))
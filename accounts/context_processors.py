@@ -2,7 +2,7 @@
 Context processors for role-based access control in Triple G BuildHub
 Provides role information to all templates automatically.
 """
-from .utils import get_user_role, get_user_dashboard_url, get_navigation_context
+from .utils import get_navigation_context
 
 def role_context(request):
     """
@@ -26,7 +26,7 @@ def role_context(request):
     
     # Add additional template-specific context
     context.update({
-        'user_dashboard_url': get_user_dashboard_url(request.user),
+        'user_dashboard_url': context['dashboard_url'],
         'can_access_admin': context['is_admin'] or context['is_superadmin'],
         'can_access_site_manager': context['is_site_manager'] or context['is_superadmin'],
         'can_access_client': context['is_public_user'] or context['is_superadmin'],
@@ -7,6 +7,8 @@ from django.shortcuts import redirect
 from django.core.exceptions import PermissionDenied
 from django.urls import reverse
 from django.utils.deprecation import MiddlewareMixin
+from core.access_router import ACCESS_ROUTER
+from .roles import get_role_snapshot
 
 logger = logging.getLogger('security')
 
@@ -16,148 +18,71 @@ class RoleBasedAccessMiddleware(MiddlewareMixin):
     Routes users to appropriate interfaces and blocks unauthorized access.
     """
     
+    # Where each role is sent when it hits a blocked path. The blocked,
+    # exempt and login-required prefixes live in core.access_router.
+    REDIRECT_TO = {
+        'public': 'accounts:client_login',
+        'admin': 'portfolio:projectmanagement',
+        'site_manager': 'site_diary:dashboard',
+        'superadmin': '/admin/',
+        'anonymous': 'accounts:client_login',
+    }
+    
+    ERROR_MESSAGES = {
+        'public': "You don't have permission to access admin areas.",
+        'admin': "Admin users cannot access client areas. Use the admin interface.",
+        'site_manager': "Site managers cannot access admin or client areas.",
+        'anonymous': "Please log in to access this page."
+    }
+    
     def __init__(self, get_response):
         self.get_response = get_response
         super().__init__(get_response)
     
     def process_request(self, request):
         """Process each request to enforce access control"""
+        rule = ACCESS_ROUTER.lookup(request.path)
         
         # Skip middleware for certain paths
-        if self._should_skip_middleware(request):
+        if rule.role_check_exempt:
             return None
             
-        # Get user role information
+        # Get user role information, shared with the rest of the request
+        request.role = get_role_snapshot(request.user)
         user_role = self._get_user_role(request.user)
         current_path = request.path
         
         # Apply access control rules
-        return self._enforce_access_control(request, user_role, current_path)
+        return self._enforce_access_control(request, user_role, current_path, rule)
     
     def _should_skip_middleware(self, request):
         """Determine if middleware should be skipped for this request"""
-        skip_paths = [
-            '/static/', '/media/', '/favicon.ico',
-            '/accounts/client/login/', '/accounts/client/register/',
-            '/accounts/client/forgot-password/', '/accounts/client/reset-password/',
-            '/accounts/admin-auth/login/', '/accounts/admin-auth/register/',
-            '/accounts/admin-auth/forgot-password/', '/accounts/sitemanager/forgot-password/',
-            '/accounts/admin-auth/reset-password/', '/accounts/sitemanager/reset-password/',
-            '/accounts/client/verify-otp/', '/accounts/admin-auth/verify-otp/',
-            '/accounts/client/logout/', '/accounts/admin-auth/logout/',
-            '/admin/login/', '/admin/logout/',
-        ]
-        
-        return any(request.path.startswith(path) for path in skip_paths)
+        return ACCESS_ROUTER.lookup(request.path).role_check_exempt
     
     def _get_user_role(self, user):
         """Determine user role based on authentication and profile"""
-        if not user.is_authenticated:
-            return 'anonymous'
-        
-        # Super Admin (Django superuser)
-        if user.is_superuser:
-            return 'superadmin'
-        
-        # Check for AdminProfile first (prioritize admin over site manager)
-        if hasattr(user, 'adminprofile') and user.adminprofile.can_login():
-            admin_role = user.adminprofile.admin_role
-            
-            # Admin (admin, manager, supervisor, staff roles)
-            if admin_role in ['admin', 'manager', 'supervisor', 'staff']:
-                return 'admin'
-        
-        # Check for SiteManagerProfile second
-        if hasattr(user, 'sitemanagerprofile') and user.sitemanagerprofile.can_login():
-            return 'site_manager'
-        
-        # Regular authenticated user (public/client)
-        return 'public'
+        # Admin profiles take precedence over site manager profiles here
+        return get_role_snapshot(user).access_role
     
-    def _enforce_access_control(self, request, user_role, current_path):
+    def _enforce_access_control(self, request, user_role, current_path, rule=None):
         """Enforce access control rules based on user role and path"""
+        rule = rule or ACCESS_ROUTER.lookup(current_path)
         
-        # Define access patterns for each role
-        access_patterns = {
-            'public': {
-                'allowed': [
-                    '/', '/about/', '/contact/', '/project/',
-                    '/blog/', '/portfolio/',
-                    '/accounts/client/', '/usersettings/', '/user/',
-                ],
-                'blocked': [
-                    '/accounts/admin-auth/', '/adminside/', '/portfolio/projectmanagement/',
-                    '/blog/blogmanagement/', '/diary/adminside/',
-                ],
-                'redirect_to': 'accounts:client_login'
-            },
-            'admin': {
-                'allowed': [
-                    '/', '/about/', '/contact/', '/project/', '/blog/',
-                    '/accounts/admin-auth/', '/adminside/', '/portfolio/projectmanagement/',
-                    '/blog/blogmanagement/', '/diary/adminside/',
-                ],
-                'blocked': [
-                    '/accounts/client/', '/usersettings/', '/user/',
-                    '/diary/dashboard/', '/diary/newproject/', '/diary/createblog/',
-                ],
-                'redirect_to': 'portfolio:projectmanagement'
-            },
-            'site_manager': {
-                'allowed': [
-                    '/', '/about/', '/contact/', '/project/', '/blog/',
-                    '/diary/', '/chatbot/', '/site/',
-                ],
-                'blocked': [
-                    '/accounts/client/', '/usersettings/', '/user/',
-                    '/accounts/admin-auth/', '/portfolio/projectmanagement/',
-                    '/blog/blogmanagement/', '/diary/adminside/',
-                ],
-                'redirect_to': 'site_diary:dashboard'
-            },
-            'superadmin': {
-                'allowed': ['*'],  # Super admin can access everything
-                'blocked': [],
-                'redirect_to': '/admin/'
-            },
-            'anonymous': {
-                'allowed': [
-                    '/', '/about/', '/contact/', '/project/', '/blog/',
-                ],
-                'blocked': [
-                    '/accounts/client/', '/accounts/admin-auth/',
-                    '/usersettings/', '/user/', '/portfolio/projectmanagement/',
-                    '/blog/blogmanagement/', '/diary/', '/adminside/',
-                ],
-                'redirect_to': 'accounts:client_login'
-            }
-        }
-        
-        # Get access rules for current user role
-        rules = access_patterns.get(user_role, access_patterns['anonymous'])
+        # Unknown roles get the anonymous rules
+        rules_role = user_role if user_role in self.REDIRECT_TO else 'anonymous'
         
         # Check if path is blocked
-        if self._is_path_blocked(current_path, rules['blocked']):
-            return self._handle_blocked_access(request, user_role, current_path, rules['redirect_to'])
+        if rules_role in rule.blocked_roles:
+            return self._handle_blocked_access(
+                request, user_role, current_path, self.REDIRECT_TO[rules_role]
+            )
         
         # Check if path requires authentication but user is anonymous
-        if user_role == 'anonymous' and self._requires_authentication(current_path):
+        if user_role == 'anonymous' and rule.login_required:
             return redirect('accounts:client_login')
         
         return None
     
-    def _is_path_blocked(self, current_path, blocked_patterns):
-        """Check if current path matches any blocked patterns"""
-        return any(current_path.startswith(pattern) for pattern in blocked_patterns)
-    
-    def _requires_authentication(self, current_path):
-        """Check if path requires authentication"""
-        protected_patterns = [
-            '/usersettings/', '/user/', '/portfolio/projectmanagement/',
-            '/blog/blogmanagement/', '/diary/', '/adminside/',
-        ]
-        return any(current_path.startswith(pattern) for pattern in protected_patterns)
-    
     def _handle_blocked_access(self, request, user_role, attempted_path, redirect_to):
         """Handle blocked access attempts with appropriate messaging and logging"""
         
@@ -169,14 +94,6 @@ class RoleBasedAccessMiddleware(MiddlewareMixin):
                 f"attempted to access '{attempted_path}' from IP {client_ip}"
             )
         
-        # Set appropriate error message
-        error_messages = {
-            'public': "You don't have permission to access admin areas.",
-            'admin': "Admin users cannot access client areas. Use the admin interface.",
-            'site_manager': "Site managers cannot access admin or client areas.",
-            'anonymous': "Please log in to access this page."
-        }
-        
         if user_role == 'anonymous':
             try:
                 if redirect_to.startswith('/'):
@@ -186,7 +103,7 @@ class RoleBasedAccessMiddleware(MiddlewareMixin):
             except:
                 return redirect('accounts:client_login')
 
-        raise PermissionDenied(error_messages.get(user_role, "Access denied."))
+        raise PermissionDenied(self.ERROR_MESSAGES.get(user_role, "Access denied."))
     
     def _get_client_ip(self, request):
         """Get client IP address for logging"""
@@ -5,7 +5,7 @@ class OnlineStatusMiddleware(MiddlewareMixin):
     """Middleware to track user online status"""
     
     def process_request(self, request):
-        """Mark authenticated users as online on each request"""
+        """Refresh the presence heartbeat of authenticated users (throttled by the tracker)"""
         if request.user.is_authenticated:
             UserActivityTracker.mark_user_online(request.user)
         return None
\ No newline at end of file
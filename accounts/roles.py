@@ -0,0 +1,217 @@
+"""
+Role resolution for Triple G BuildHub.
+
+A RoleSnapshot holds everything the access checks need to know about a user:
+the flags on the user row plus the state of their admin, site manager and
+client profiles. The profile part is loaded with a single query, cached per
+user under a version that accounts/signals.py bumps whenever one of the
+user's profiles changes, and memoized on the user object, so the
+middleware, decorators and context processors of a request share one lookup.
+
+The version bump only reaches the cache of the process that made the change,
+so ROLE_SNAPSHOT_CACHE_TIMEOUT bounds how long other processes act on old
+profiles and is kept to seconds.
+"""
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+# Admin roles allowed into the admin interface by the middleware and blog decorators
+ADMIN_ROLES = ('admin', 'manager', 'supervisor', 'staff')
+# get_user_role() no longer treats supervisors as admins
+NAVIGATION_ADMIN_ROLES = ('admin', 'manager', 'staff')
+
+
+@dataclass(frozen=True)
+class ProfileState:
+    """The access-relevant fields of an AdminProfile or SiteManagerProfile"""
+    approval_status: str
+    account_locked_until: Optional[object] = None
+    admin_role: str = ''
+
+    @classmethod
+    def from_profile(cls, profile):
+        return cls(
+            approval_status=profile.approval_status,
+            account_locked_until=profile.account_locked_until,
+            admin_role=getattr(profile, 'admin_role', ''),
+        )
+
+    def is_approved(self):
+        return self.approval_status == 'approved'
+
+    def is_account_locked(self):
+        return bool(self.account_locked_until) and timezone.now() < self.account_locked_until
+
+
+@dataclass(frozen=True)
+class UserProfiles:
+    """The cached part of a snapshot: which profiles a user has and their state"""
+    admin: Optional[ProfileState] = None
+    site_manager: Optional[ProfileState] = None
+    has_client_profile: bool = False
+
+
+class RoleSnapshot:
+    """A user's role information, resolved once per request"""
+
+    def __init__(self, user, profiles=None):
+        # Flags on the user row are read live; only profiles are cached
+        self.user = user
+        profiles = profiles or UserProfiles()
+        self.admin = profiles.admin
+        self.site_manager = profiles.site_manager
+        self.has_client_profile = profiles.has_client_profile
+
+    @property
+    def is_authenticated(self):
+        return self.user.is_authenticated
+
+    @property
+    def is_superuser(self):
+        return self.user.is_superuser
+
+    @property
+    def is_active(self):
+        return self.user.is_active
+
+    def _can_login(self, profile):
+        # Mirrors AdminProfile.can_login() and SiteManagerProfile.can_login()
+        return (
+            profile is not None and
+            self.is_active and
+            profile.is_approved() and
+            not profile.is_account_locked()
+        )
+
+    @property
+    def admin_can_login(self):
+        return self._can_login(self.admin)
+
+    @property
+    def site_manager_can_login(self):
+        return self._can_login(self.site_manager)
+
+    @property
+    def role(self):
+        """Role used for navigation and the require_*_role decorators.
+
+        One of 'anonymous', 'public', 'admin', 'site_manager', 'superadmin'.
+        Site manager profiles take precedence over admin profiles.
+        """
+        if not self.is_authenticated:
+            return 'anonymous'
+        if self.is_superuser:
+            return 'superadmin'
+        if self.site_manager_can_login:
+            return 'site_manager'
+        if self.admin_can_login and self.admin.admin_role in NAVIGATION_ADMIN_ROLES:
+            return 'admin'
+        return 'public'
+
+    @property
+    def access_role(self):
+        """Role used for path-based access control.
+
+        Unlike `role`, admin profiles (supervisors included) take precedence
+        over site manager profiles.
+        """
+        if not self.is_authenticated:
+            return 'anonymous'
+        if self.is_superuser:
+            return 'superadmin'
+        if self.admin_can_login and self.admin.admin_role in ADMIN_ROLES:
+            return 'admin'
+        if self.site_manager_can_login:
+            return 'site_manager'
+        return 'public'
+
+    @property
+    def is_approved_admin(self):
+        """Approved admin profile with an admin interface role, locked or not"""
+        return self.admin is not None and self.admin.is_approved() and self.admin.admin_role in ADMIN_ROLES
+
+    @property
+    def is_approved_site_manager(self):
+        return self.site_manager is not None and self.site_manager.is_approved()
+
+    @property
+    def user_type(self):
+        """Profile kind shown on the 401 pages"""
+        if not self.is_authenticated:
+            return 'anonymous'
+        if self.site_manager is not None:
+            return 'site_manager'
+        if self.admin is not None:
+            return 'admin'
+        if self.has_client_profile:
+            return 'client'
+        return 'unknown'
+
+
+def _version_key(user_id):
+    return f"role_profiles_ns:{user_id}"
+
+
+def _new_version():
+    # Seeded from the clock so a counter lost to eviction never reuses a version
+    return time.time_ns() // 1000
+
+
+def get_profiles_version(user_id):
+    """Current profile version of a user"""
+    version_key = _version_key(user_id)
+    version = cache.get(version_key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(version_key, version, None):
+            version = cache.get(version_key, version)
+    return version
+
+
+def bump_profiles_version(user_id):
+    """Drop the user's cached profiles once the current transaction commits"""
+    def bump():
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:
+            cache.set(_version_key(user_id), _new_version(), None)
+    transaction.on_commit(bump)
+
+
+def load_profiles(user_id):
+    """Read all of a user's profiles with one query"""
+    user = User.objects.select_related('adminprofile', 'sitemanagerprofile', 'profile').get(pk=user_id)
+    return UserProfiles(
+        admin=ProfileState.from_profile(user.adminprofile) if hasattr(user, 'adminprofile') else None,
+        site_manager=ProfileState.from_profile(user.sitemanagerprofile) if hasattr(user, 'sitemanagerprofile') else None,
+        has_client_profile=hasattr(user, 'profile'),
+    )
+
+
+def get_role_snapshot(user):
+    """The user's RoleSnapshot, built at most once per user object"""
+    if not user.is_authenticated:
+        return RoleSnapshot(user)
+
+    snapshot = getattr(user, '_role_snapshot', None)
+    if snapshot is None:
+        key = f"role_profiles:{user.pk}:v{get_profiles_version(user.pk)}"
+        profiles = cache.get(key)
+        if profiles is None:
+            profiles = load_profiles(user.pk)
+            cache.set(key, profiles, settings.ROLE_SNAPSHOT_CACHE_TIMEOUT)
+        snapshot = RoleSnapshot(user, profiles)
+        user._role_snapshot = snapshot
+    return snapshot
+
+
+def forget_role_snapshot(user):
+    """Drop the snapshot memoized on a user object after its profiles change"""
+    user.__dict__.pop('_role_snapshot', None)
@@ -1,11 +1,12 @@
 """Signals keeping user-related profile data in sync."""
 
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save, post_migrate
+from django.db.models.signals import post_save, post_delete, post_migrate
 from django.dispatch import receiver
 from django.apps import apps
 
-from .models import AdminProfile, SuperAdminProfile, Profile
+from .models import AdminProfile, SiteManagerProfile, SuperAdminProfile, Profile
+from .roles import bump_profiles_version, forget_role_snapshot
 
 
 def _ensure_superuser_profile(user: User) -> None:
@@ -58,4 +59,14 @@ def run_backfill_after_migrations(sender, **kwargs) -> None:
             logger.warning(f"Failed to backfill superuser profiles: {e}")
 
 
-# ✅ REMOVED: No longer calling backfill_superuser_admin_profiles() at module import time
\ No newline at end of file
+# ✅ REMOVED: No longer calling backfill_superuser_admin_profiles() at module import time
+
+
+@receiver([post_save, post_delete], sender=AdminProfile)
+@receiver([post_save, post_delete], sender=SiteManagerProfile)
+@receiver([post_save, post_delete], sender=Profile)
+def role_profile_changed(sender, instance, **kwargs) -> None:
+    """Profile changes can change the user's role; drop their cached snapshot."""
+    bump_profiles_version(instance.user_id)
+    if sender._meta.get_field('user').is_cached(instance):
+        forget_role_snapshot(instance.user)
@@ -1,3 +1,52 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from unittest import mock
 
-# Create your tests here.
+from .activity_tracker import UserActivityTracker
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'presence-tests'}},
+    PRESENCE_HEARTBEAT_INTERVAL=60,
+)
+class UserActivityTrackerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        UserActivityTracker._last_heartbeat.clear()
+        self.alice = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        self.bob = User.objects.create_user('bob', 'bob@example.com', 'pw')
+        self.carol = User.objects.create_user('carol', 'carol@example.com', 'pw', is_active=False)
+
+    def test_heartbeat_is_throttled(self):
+        with mock.patch('accounts.activity_tracker.time.monotonic', return_value=1000.0):
+            self.assertTrue(UserActivityTracker.mark_user_online(self.alice))
+            with mock.patch.object(cache, 'set') as cache_set:
+                self.assertFalse(UserActivityTracker.mark_user_online(self.alice))
+            cache_set.assert_not_called()
+
+        with mock.patch('accounts.activity_tracker.time.monotonic', return_value=1061.0):
+            self.assertTrue(UserActivityTracker.mark_user_online(self.alice))
+
+    def test_mark_offline_resets_throttle(self):
+        UserActivityTracker.mark_user_online(self.alice)
+        UserActivityTracker.mark_user_offline(self.alice)
+        self.assertFalse(UserActivityTracker.is_user_online(self.alice))
+
+        self.assertTrue(UserActivityTracker.mark_user_online(self.alice))
+        self.assertTrue(UserActivityTracker.is_user_online(self.alice))
+
+    def test_bulk_status_uses_one_cache_read(self):
+        UserActivityTracker.mark_user_online(self.alice)
+        UserActivityTracker.mark_user_online(self.carol)
+
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            status = UserActivityTracker.get_online_status([self.alice.id, self.bob.id])
+        get_many.assert_called_once()
+
+        with self.assertNumQueries(1):
+            online = UserActivityTracker.get_online_users()
+
+        self.assertEqual(status, {self.alice.id: True, self.bob.id: False})
+        self.assertEqual(online, [self.alice.id])
+        self.assertEqual(UserActivityTracker.online_user_ids([]), set())
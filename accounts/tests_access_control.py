@@ -2,13 +2,17 @@
 Comprehensive test suite for role-based access control system
 Tests middleware, decorators, utils, and complete user journeys
 """
+import time
+
 import pytest
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.contrib.messages import get_messages
 from accounts.models import AdminProfile, Profile
-from accounts.utils import get_user_role, get_user_dashboard_url, can_access_path
+from accounts.roles import get_role_snapshot
+from accounts.utils import get_user_role, get_user_dashboard_url, can_access_path, get_navigation_context
 from accounts.middleware import RoleBasedAccessMiddleware
 from unittest.mock import Mock, patch
 
@@ -398,3 +402,53 @@ class EdgeCaseTests(RoleBasedAccessControlTests):
 
 if __name__ == '__main__':
     pytest.main([__file__])
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'role-tests'}},
+)
+class RoleSnapshotTests(RoleBasedAccessControlTests):
+    """Test the cached per-request role snapshot"""
+    
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+    
+    def test_profiles_loaded_once_and_cached(self):
+        user = User.objects.get(pk=self.admin_user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_role(user), 'admin')
+            self.assertTrue(get_navigation_context(user)['is_admin'])
+            self.assertEqual(get_role_snapshot(user).access_role, 'admin')
+        
+        # A new request's user object reuses the cached profiles
+        user = User.objects.get(pk=self.admin_user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_role(user), 'admin')
+    
+    def test_supervisor_roles_keep_their_precedence(self):
+        self.assertEqual(get_user_role(self.site_manager_user), 'public')
+        self.assertEqual(get_role_snapshot(self.site_manager_user).access_role, 'admin')
+        self.assertTrue(get_role_snapshot(self.site_manager_user).is_approved_admin)
+    
+    def test_profile_change_invalidates(self):
+        self.assertEqual(get_user_role(User.objects.get(pk=self.admin_user.pk)), 'admin')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin_profile.approval_status = 'suspended'
+            self.admin_profile.save()
+        self.assertEqual(get_user_role(User.objects.get(pk=self.admin_user.pk)), 'public')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin_profile.delete()
+        self.assertIsNone(get_role_snapshot(User.objects.get(pk=self.admin_user.pk)).admin)
+    
+    @override_settings(ROLE_SNAPSHOT_CACHE_TIMEOUT=5)
+    def test_change_from_another_process_seen_after_timeout(self):
+        """A suspension whose version bump reached another process's cache only"""
+        self.assertEqual(get_user_role(User.objects.get(pk=self.admin_user.pk)), 'admin')
+        type(self.admin_profile).objects.filter(pk=self.admin_profile.pk).update(approval_status='suspended')
+        
+        now = time.time()
+        with patch('django.core.cache.backends.locmem.time.time', return_value=now + 6):
+            self.assertEqual(get_user_role(User.objects.get(pk=self.admin_user.pk)), 'public')
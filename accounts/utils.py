@@ -8,6 +8,7 @@ from django.urls import reverse
 from django.contrib import messages
 from django.core.mail import send_mail, EmailMessage
 from django.conf import settings
+from .roles import get_role_snapshot
 
 logger = logging.getLogger('security')
 
@@ -181,30 +182,12 @@ def get_user_role(user):
     """
     Determine user role based on authentication and profile.
     
+    Resolved once per user object through the cached RoleSnapshot.
+    
     Returns:
         str: One of 'anonymous', 'public', 'admin', 'site_manager', 'superadmin'
     """
-    if not user.is_authenticated:
-        return 'anonymous'
-    
-    # Super Admin (Django superuser)
-    if user.is_superuser:
-        return 'superadmin'
-    
-    # Check for SiteManagerProfile first
-    if hasattr(user, 'sitemanagerprofile') and user.sitemanagerprofile.can_login():
-        return 'site_manager'
-    
-    # Check for AdminProfile
-    if hasattr(user, 'adminprofile') and user.adminprofile.can_login():
-        admin_role = user.adminprofile.admin_role
-        
-        # Admin (admin, manager, staff roles) - no longer includes site_manager
-        if admin_role in ['admin', 'manager', 'staff']:
-            return 'admin'
-    
-    # Regular authenticated user (public/client)
-    return 'public'
+    return get_role_snapshot(user).role
 
 def get_user_dashboard_url(user):
     """
@@ -440,10 +423,10 @@ def get_navigation_context(user):
     
     context = {
         'user_role': role,
-        'is_admin': is_admin_user(user),
-        'is_site_manager': is_site_manager(user),
-        'is_public_user': is_public_user(user),
-        'is_superadmin': is_superadmin(user),
+        'is_admin': role == 'admin',
+        'is_site_manager': role == 'site_manager',
+        'is_public_user': role == 'public',
+        'is_superadmin': role == 'superadmin',
         'dashboard_url': get_user_dashboard_url(user),
         'interface_template': get_user_interface_template(user)
     }
@@ -2,7 +2,7 @@ from functools import wraps
 from django.shortcuts import redirect
 from django.core.exceptions import PermissionDenied
 from django.contrib.auth.decorators import login_required
-from accounts.models import AdminProfile
+from accounts.roles import get_role_snapshot
 
 
 def require_admin_role(view_func):
@@ -17,20 +17,18 @@ def require_admin_role(view_func):
             return redirect('accounts:admin_login')
         
         # Check if user has admin profile
-        try:
-            admin_profile = AdminProfile.objects.get(user=request.user)
-            
-            # Check if admin account is approved
-            if admin_profile.approval_status != 'approved':
-                raise PermissionDenied('Your admin account is not approved or is suspended.')
-                
-            # Check if account is locked
-            if admin_profile.is_account_locked():
-                raise PermissionDenied('Your admin account is temporarily locked. Please try again later.')
-                
-        except AdminProfile.DoesNotExist:
+        admin_profile = get_role_snapshot(request.user).admin
+        if admin_profile is None:
             raise PermissionDenied('Access denied. Admin privileges required.')
         
+        # Check if admin account is approved
+        if admin_profile.approval_status != 'approved':
+            raise PermissionDenied('Your admin account is not approved or is suspended.')
+            
+        # Check if account is locked
+        if admin_profile.is_account_locked():
+            raise PermissionDenied('Your admin account is temporarily locked. Please try again later.')
+        
         # If all checks pass, call the original view
         return view_func(request, *args, **kwargs)
     
@@ -44,7 +42,7 @@ def require_superuser(view_func):
     @require_admin_role
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        admin_profile = AdminProfile.objects.get(user=request.user)
+        admin_profile = get_role_snapshot(request.user).admin
         
         # Check if user is superuser or has admin role
         if not (request.user.is_superuser or admin_profile.admin_role == 'admin'):
@@ -73,32 +71,30 @@ def ajax_require_admin_role(view_func):
             }, status=401)
         
         # Check if user has admin profile
-        try:
-            admin_profile = AdminProfile.objects.get(user=request.user)
-            
-            # Check if admin account is approved
-            if admin_profile.approval_status != 'approved':
-                return JsonResponse({
-                    'success': False, 
-                    'message': 'Admin account not approved.',
-                    'redirect': '/accounts/admin-auth/login/'
-                }, status=403)
-                
-            # Check if account is locked
-            if admin_profile.is_account_locked():
-                return JsonResponse({
-                    'success': False, 
-                    'message': 'Admin account is locked.',
-                    'redirect': '/accounts/admin-auth/login/'
-                }, status=403)
-                
-        except AdminProfile.DoesNotExist:
+        admin_profile = get_role_snapshot(request.user).admin
+        if admin_profile is None:
             return JsonResponse({
                 'success': False, 
                 'message': 'Admin privileges required.',
                 'redirect': '/accounts/admin-auth/login/'
             }, status=403)
         
+        # Check if admin account is approved
+        if admin_profile.approval_status != 'approved':
+            return JsonResponse({
+                'success': False, 
+                'message': 'Admin account not approved.',
+                'redirect': '/accounts/admin-auth/login/'
+            }, status=403)
+            
+        # Check if account is locked
+        if admin_profile.is_account_locked():
+            return JsonResponse({
+                'success': False, 
+                'message': 'Admin account is locked.',
+                'redirect': '/accounts/admin-auth/login/'
+            }, status=403)
+        
         # If all checks pass, call the original view
         return view_func(request, *args, **kwargs)
     
@@ -2,7 +2,7 @@ from django.shortcuts import redirect
 from django.contrib import messages
 from django.urls import reverse
 from django.utils.deprecation import MiddlewareMixin
-from accounts.models import AdminProfile
+from accounts.roles import get_role_snapshot
 
 
 class AdminAuthenticationMiddleware(MiddlewareMixin):
@@ -52,23 +52,21 @@ class AdminAuthenticationMiddleware(MiddlewareMixin):
             return redirect('accounts:admin_login')
         
         # Check if user has admin profile
-        try:
-            admin_profile = AdminProfile.objects.get(user=request.user)
-            
-            # Check if admin account is approved
-            if admin_profile.approval_status != 'approved':
-                messages.error(request, 'Your admin account is not approved or is suspended.')
-                return redirect('accounts:admin_login')
-            
-            # Check if account is locked
-            if hasattr(admin_profile, 'is_account_locked') and admin_profile.is_account_locked():
-                messages.error(request, 'Your admin account is temporarily locked. Please try again later.')
-                return redirect('accounts:admin_login')
-                
-        except AdminProfile.DoesNotExist:
+        admin_profile = get_role_snapshot(request.user).admin
+        if admin_profile is None:
             messages.error(request, 'Access denied. Admin privileges required.')
             return redirect('accounts:admin_login')
         
+        # Check if admin account is approved
+        if admin_profile.approval_status != 'approved':
+            messages.error(request, 'Your admin account is not approved or is suspended.')
+            return redirect('accounts:admin_login')
+        
+        # Check if account is locked
+        if admin_profile.is_account_locked():
+            messages.error(request, 'Your admin account is temporarily locked. Please try again later.')
+            return redirect('accounts:admin_login')
+        
         # If all checks pass, continue with the request
         return None
     
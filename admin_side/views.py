@@ -10,8 +10,9 @@ from django.utils import timezone
 from accounts.models import AdminProfile, SiteManagerProfile, Profile, SitePersonnelRole
 from django.contrib.auth.models import User
 from site_diary.models import Project
+from site_diary.services.snapshot_service import ProjectSnapshotService
 from blog.models import BlogPost
-from django.db.models import Count
+from django.db.models import Count, Q
 from django.contrib.sessions.models import Session
 from .decorators import require_admin_role, ajax_require_admin_role
 from accounts.activity_tracker import UserActivityTracker
@@ -89,7 +90,8 @@ def admin_home(request):
     # Calculate average progress for ongoing projects
     avg_progress = 0
     if ongoing_projects > 0:
-        total_progress = sum([p.get_progress_percentage() for p in ongoing_projects_qs])
+        snapshots = ProjectSnapshotService.get_snapshots(ongoing_projects_qs)
+        total_progress = sum(snapshot.get_progress_percentage() for snapshot in snapshots.values())
         avg_progress = int(total_progress / ongoing_projects)
     
     # Get dashboard statistics
@@ -355,10 +357,13 @@ def is_user_online(user):
 def admin_user_list(request):
     """Admin user management list view"""
     # Get all clients
-    clients = User.objects.filter(profile__isnull=False).select_related('profile')
+    clients = list(User.objects.filter(profile__isnull=False).select_related('profile'))
     
     # Get all site managers
-    site_managers = User.objects.filter(sitemanagerprofile__isnull=False).select_related('sitemanagerprofile')
+    site_managers = list(User.objects.filter(sitemanagerprofile__isnull=False).select_related('sitemanagerprofile'))
+    
+    # Online status for everyone listed, in one cache round trip
+    online_ids = UserActivityTracker.online_user_ids([user.id for user in clients + site_managers])
     
     users = []
     
@@ -374,7 +379,7 @@ def admin_user_list(request):
             'status_display': 'Active' if user.is_active else 'Suspended',
             'date_joined': user.date_joined,
             'profile_pic': user.profile.get_profile_image_url() if hasattr(user, 'profile') else None,
-            'is_online': is_user_online(user)
+            'is_online': user.id in online_ids
         })
     
     # Add site managers to users list
@@ -394,7 +399,7 @@ def admin_user_list(request):
             'status_display': status_display,
             'date_joined': user.date_joined,
             'profile_pic': profile.get_profile_image_url(),
-            'is_online': is_user_online(user)
+            'is_online': user.id in online_ids
         })
     
     # Sort by date joined (newest first)
@@ -402,7 +407,7 @@ def admin_user_list(request):
     
     context = {
         'users': users,
-        'total_clients': clients.count(),
+        'total_clients': len(clients),
         'active_site_managers': SiteManagerProfile.objects.filter(approval_status='approved').count(),
         'pending_site_managers': SiteManagerProfile.objects.filter(approval_status='pending').count(),
     }
@@ -546,17 +551,14 @@ def generate_employee_id(request):
 def get_users_online_status(request):
     """Get real-time online status for all users"""
     try:
-        clients = User.objects.filter(profile__isnull=False).values_list('id', flat=True)
-        site_managers = User.objects.filter(sitemanagerprofile__isnull=False).values_list('id', flat=True)
-        
-        online_status = {}
+        user_ids = User.objects.filter(
+            Q(profile__isnull=False) | Q(sitemanagerprofile__isnull=False)
+        ).values_list('id', flat=True).distinct()
         
-        for user_id in list(clients) + list(site_managers):
-            try:
-                user = User.objects.get(id=user_id)
-                online_status[str(user_id)] = UserActivityTracker.is_user_online(user)
-            except User.DoesNotExist:
-                continue
+        online_status = {
+            str(user_id): is_online
+            for user_id, is_online in UserActivityTracker.get_online_status(user_ids).items()
+        }
         
         return JsonResponse({
             'success': True,
@@ -2,7 +2,10 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
+from .cache_utils import BlogCacheManager
 from .models import BlogPost, Category, Tag, BlogImage
+from .post_counts import PostCountService
+from .related import RelatedPostService
 from .newsletter import NewsletterSubscriber, NewsletterCampaign, NewsletterAnalytics
 
 # Register your models here.
@@ -54,7 +57,7 @@ class CategoryAdmin(admin.ModelAdmin):
     color_preview.short_description = "Color"
     
     def post_count(self, obj):
-        count = obj.get_post_count()
+        count = obj.post_count
         if count > 0:
             url = reverse('admin:blog_blogpost_changelist') + f'?category__id__exact={obj.id}'
             return format_html('<a href="{}">{} posts</a>', url, count)
@@ -137,13 +140,22 @@ class BlogPostAdmin(admin.ModelAdmin):
         return f"{obj.reading_time} min read"
     reading_time.short_description = "Reading Time"
     
+    def _update_status(self, queryset, status):
+        # Bulk updates skip the model signals, so recount and invalidate here
+        post_ids = list(queryset.values_list('id', flat=True))
+        updated = BlogPost.objects.filter(id__in=post_ids).update(status=status)
+        PostCountService.recount_posts(post_ids)
+        RelatedPostService.mark_stale(post_ids)
+        BlogCacheManager.schedule_invalidation(*BlogCacheManager.INVALIDATES['post'])
+        return updated
+    
     def make_published(self, request, queryset):
-        updated = queryset.update(status='published')
+        updated = self._update_status(queryset, 'published')
         self.message_user(request, f'{updated} posts were successfully published.')
     make_published.short_description = "Mark selected posts as published"
     
     def make_draft(self, request, queryset):
-        updated = queryset.update(status='draft')
+        updated = self._update_status(queryset, 'draft')
         self.message_user(request, f'{updated} posts were moved to draft.')
     make_draft.short_description = "Mark selected posts as draft"
     
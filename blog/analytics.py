@@ -3,12 +3,22 @@ Blog Analytics System for Triple G Blog
 Tracks views, engagement, and provides insights
 """
 
-from django.db import models
+from django.conf import settings
+from django.db import connection, models, transaction
 from django.utils import timezone
-from django.db.models import Count, Avg, Sum, Q
+from django.db.models import Count, Sum, Q, Case, When, F, Value, Max, Min
+from django.db.models.functions import TruncDate
 from django.contrib.auth.models import User
-from datetime import datetime, timedelta
+from collections import Counter
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+import atexit
 import json
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
 
 
 class BlogAnalytics(models.Model):
@@ -34,7 +44,8 @@ class BlogAnalytics(models.Model):
     
     # Event details
     event_type = models.CharField(max_length=20, choices=EVENT_TYPES)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when the ingestor writes it
+    timestamp = models.DateTimeField(default=timezone.now)
     
     # User information
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
@@ -75,18 +86,318 @@ class BlogAnalytics(models.Model):
         return f"{self.get_event_type_display()} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
 
 
+class BlogAnalyticsDaily(models.Model):
+    """Blog analytics events pre-aggregated per day.
+    
+    Detail rows count the day's events per post, event type, device,
+    browser and dimension (the query of a search, the platform of a social
+    share), with sums and counts for averaging engagement. Distinct sessions
+    cannot be added up from those, so rows with is_total set carry them: one
+    per day without a post (all sessions, and single-event ones for the
+    bounce rate) and one per post viewed that day. AnalyticsRollup rebuilds
+    whole days from BlogAnalytics; see the rollup_blog_analytics command.
+    """
+    
+    date = models.DateField()
+    blog_post = models.ForeignKey('BlogPost', on_delete=models.CASCADE, null=True, blank=True)
+    event_type = models.CharField(max_length=20, blank=True)
+    device_type = models.CharField(max_length=10, blank=True)
+    browser = models.CharField(max_length=50, blank=True)
+    dimension = models.CharField(max_length=200, blank=True)
+    is_total = models.BooleanField(default=False)
+    
+    events = models.PositiveIntegerField(default=0)
+    sessions = models.PositiveIntegerField(default=0)
+    bounced_sessions = models.PositiveIntegerField(default=0)
+    time_on_page_sum = models.BigIntegerField(default=0)
+    time_on_page_count = models.PositiveIntegerField(default=0)
+    scroll_depth_sum = models.BigIntegerField(default=0)
+    scroll_depth_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Blog Analytics Daily Rollup'
+        verbose_name_plural = 'Blog Analytics Daily Rollups'
+        indexes = [
+            models.Index(fields=['date']),
+            models.Index(fields=['blog_post', 'date']),
+        ]
+    
+    def __str__(self):
+        label = 'total' if self.is_total else self.event_type
+        return f"{self.date:%Y-%m-%d} {label}: {self.events} event(s), {self.sessions} session(s)"
+
+
+class AnalyticsIngestor:
+    """Queue analytics events in memory and write them in batches.
+
+    Requests only build the BlogAnalytics row and put it on a bounded queue.
+    A background thread writes queued rows with bulk_create every
+    BLOG_ANALYTICS_FLUSH_INTERVAL seconds, or sooner once a full batch is
+    waiting. When the queue is full the event is dropped and counted rather
+    than making the request wait. With BLOG_ANALYTICS_IN_PROCESS off, events
+    are written immediately instead.
+    """
+    
+    _queue = None
+    _queue_lock = threading.Lock()
+    _worker = None
+    _wake_event = threading.Event()
+    dropped = 0
+    
+    @classmethod
+    def get_queue(cls):
+        if cls._queue is None:
+            with cls._queue_lock:
+                if cls._queue is None:
+                    cls._queue = queue.Queue(maxsize=settings.BLOG_ANALYTICS_QUEUE_SIZE)
+        return cls._queue
+    
+    @classmethod
+    def enqueue(cls, event):
+        """Queue an unsaved BlogAnalytics row. Returns False if it was dropped."""
+        if not settings.BLOG_ANALYTICS_IN_PROCESS:
+            event.save()
+            return True
+        
+        events = cls.get_queue()
+        try:
+            events.put_nowait(event)
+        except queue.Full:
+            with cls._queue_lock:
+                cls.dropped += 1
+                dropped = cls.dropped
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(f"Analytics queue is full; {dropped} event(s) dropped so far")
+            return False
+        
+        cls.start_worker()
+        if events.qsize() >= settings.BLOG_ANALYTICS_BATCH_SIZE:
+            cls._wake_event.set()
+        return True
+    
+    @classmethod
+    def flush(cls, limit=None):
+        """Write queued events in batches. Returns the number written."""
+        events = cls.get_queue()
+        batch_size = settings.BLOG_ANALYTICS_BATCH_SIZE
+        written = 0
+        while limit is None or written < limit:
+            batch = []
+            while len(batch) < batch_size:
+                try:
+                    batch.append(events.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                break
+            written += cls._write(batch)
+        return written
+    
+    @classmethod
+    def _write(cls, batch):
+        try:
+            with transaction.atomic():
+                BlogAnalytics.objects.bulk_create(batch)
+            return len(batch)
+        except Exception:
+            # One bad row (e.g. a post deleted since the event) must not
+            # lose the whole batch; retry row by row and drop the failures
+            logger.warning("Analytics batch insert failed; retrying events one by one", exc_info=True)
+        
+        written = 0
+        for event in batch:
+            try:
+                with transaction.atomic():
+                    event.save()
+                written += 1
+            except Exception as e:
+                logger.warning(f"Dropping analytics event {event.event_type}: {e}")
+        return written
+    
+    @classmethod
+    def start_worker(cls):
+        """Start the background writer for this process if it is not running"""
+        if cls._worker is not None and cls._worker.is_alive():
+            return
+        with cls._queue_lock:
+            if cls._worker is None or not cls._worker.is_alive():
+                cls._worker = threading.Thread(target=cls._run_worker, name='blog-analytics-writer', daemon=True)
+                cls._worker.start()
+                atexit.register(cls._flush_safely)
+    
+    @classmethod
+    def _flush_safely(cls):
+        try:
+            cls.flush()
+        except Exception:
+            logger.exception("Analytics flush failed")
+        finally:
+            # Don't hold a database connection open while idle
+            connection.close()
+    
+    @classmethod
+    def _run_worker(cls):
+        while True:
+            cls._wake_event.wait(settings.BLOG_ANALYTICS_FLUSH_INTERVAL)
+            cls._wake_event.clear()
+            cls._flush_safely()
+
+
+@lru_cache(maxsize=1024)
+def parse_user_agent(user_agent):
+    """(device_type, browser, os) for a user agent string, memoized"""
+    return (
+        AnalyticsManager.get_device_type(user_agent),
+        AnalyticsManager.get_browser(user_agent),
+        AnalyticsManager.get_os(user_agent),
+    )
+
+
+class AnalyticsRollup:
+    """Build BlogAnalyticsDaily rows and read them back for dashboards.
+    
+    Days up to yesterday are rolled up; the current, partial day (and any
+    day the rollup has not reached yet) is aggregated live from
+    BlogAnalytics with the same queries, so dashboards always see complete
+    data in a fixed number of queries.
+    """
+    
+    # The per-event detail kept as the rollup dimension
+    DIMENSION = Case(
+        When(event_type='search', then=F('search_query')),
+        When(event_type='social_share', then=F('social_platform')),
+        default=Value(''),
+        output_field=models.CharField(),
+    )
+    
+    @staticmethod
+    def _bounds(start, end):
+        """Aware datetimes spanning the local dates start..end"""
+        return (
+            timezone.make_aware(datetime.combine(start, time.min)),
+            timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+        )
+    
+    @classmethod
+    def aggregate(cls, start, end, blog_post=None):
+        """Unsaved BlogAnalyticsDaily rows for start..end, computed from raw events"""
+        start_time, end_time = cls._bounds(start, end)
+        events = BlogAnalytics.objects.filter(
+            timestamp__gte=start_time, timestamp__lt=end_time
+        ).annotate(date=TruncDate('timestamp'))
+        if blog_post is not None:
+            events = events.filter(blog_post=blog_post)
+        
+        rows = [
+            BlogAnalyticsDaily(
+                date=row['date'],
+                blog_post_id=row['blog_post'],
+                event_type=row['event_type'],
+                device_type=row['device_type'],
+                browser=row['browser'],
+                dimension=(row['dimension'] or '')[:200],
+                events=row['events'],
+                time_on_page_sum=row['time_on_page_sum'] or 0,
+                time_on_page_count=row['time_on_page_count'],
+                scroll_depth_sum=row['scroll_depth_sum'] or 0,
+                scroll_depth_count=row['scroll_depth_count'],
+            )
+            for row in events.values(
+                'date', 'blog_post', 'event_type', 'device_type', 'browser', dimension=cls.DIMENSION
+            ).annotate(
+                events=Count('id'),
+                time_on_page_sum=Sum('time_on_page'),
+                time_on_page_count=Count('time_on_page'),
+                scroll_depth_sum=Sum('scroll_depth'),
+                scroll_depth_count=Count('scroll_depth'),
+            ).order_by()
+        ]
+        
+        # Sessions that viewed each post
+        rows.extend(
+            BlogAnalyticsDaily(
+                date=row['date'], blog_post_id=row['blog_post'], event_type='post_view',
+                is_total=True, sessions=row['sessions'],
+            )
+            for row in events.filter(event_type='post_view', blog_post__isnull=False).values(
+                'date', 'blog_post'
+            ).annotate(sessions=Count('session_id', distinct=True)).order_by()
+        )
+        
+        if blog_post is None:
+            # Sessions per day, and those with a single event (bounces)
+            bounced = Counter(
+                row['date'] for row in events.values('date', 'session_id').annotate(
+                    event_count=Count('id')
+                ).filter(event_count=1).order_by()
+            )
+            rows.extend(
+                BlogAnalyticsDaily(
+                    date=row['date'], is_total=True, sessions=row['sessions'],
+                    bounced_sessions=bounced[row['date']],
+                )
+                for row in events.values('date').annotate(
+                    sessions=Count('session_id', distinct=True)
+                ).order_by()
+            )
+        return rows
+    
+    @classmethod
+    def rollup(cls, start=None, end=None):
+        """Rebuild the stored rows for start..end. Returns the number of days rolled up.
+        
+        Defaults to the last rolled-up day (events flushed late may still
+        have arrived for it) through yesterday. Days are always complete:
+        the current day is never stored.
+        """
+        yesterday = timezone.localdate() - timedelta(days=1)
+        end = min(end or yesterday, yesterday)
+        if start is None:
+            start = BlogAnalyticsDaily.objects.aggregate(latest=Max('date'))['latest']
+        if start is None:
+            first = BlogAnalytics.objects.aggregate(first=Min('timestamp'))['first']
+            if first is None:
+                return 0
+            start = timezone.localdate(first)
+        if start > end:
+            return 0
+        
+        rows = cls.aggregate(start, end)
+        with transaction.atomic():
+            BlogAnalyticsDaily.objects.filter(date__gte=start, date__lte=end).delete()
+            BlogAnalyticsDaily.objects.bulk_create(rows, batch_size=1000)
+        return (end - start).days + 1
+    
+    @classmethod
+    def rows(cls, start, end, blog_post=None):
+        """Rows for start..end: stored ones, plus live ones after the rollup's last day"""
+        stored = BlogAnalyticsDaily.objects.filter(date__gte=start, date__lte=end)
+        if blog_post is not None:
+            stored = stored.filter(blog_post=blog_post)
+        stored = list(stored.order_by())
+        
+        # Days with no events leave no rows, so aggregating live from the
+        # day after the last stored one also covers any days not rolled up yet
+        live_from = max((row.date for row in stored), default=start - timedelta(days=1)) + timedelta(days=1)
+        if live_from <= end:
+            stored.extend(cls.aggregate(live_from, end, blog_post))
+        return stored
+
+
 class AnalyticsManager:
     """Manager class for blog analytics operations"""
     
     @staticmethod
     def track_event(event_type, request, **kwargs):
-        """Track an analytics event"""
+        """Track an analytics event
+        
+        The event is queued for the background writer; returns the unsaved
+        BlogAnalytics row, or None if it could not be queued.
+        """
         try:
             # Extract device and browser info
             user_agent = request.META.get('HTTP_USER_AGENT', '')
-            device_type = AnalyticsManager.get_device_type(user_agent)
-            browser = AnalyticsManager.get_browser(user_agent)
-            os = AnalyticsManager.get_os(user_agent)
+            device_type, browser, os = parse_user_agent(user_agent)
             
             # Get session ID
             session_id = request.session.session_key or ''
@@ -97,10 +408,10 @@ class AnalyticsManager:
             # Get referrer
             referrer = request.META.get('HTTP_REFERER', '')
             
-            # Create analytics record
-            analytics = BlogAnalytics.objects.create(
+            # Build analytics record
+            analytics = BlogAnalytics(
                 event_type=event_type,
-                user=request.user if request.user.is_authenticated else None,
+                user_id=request.user.pk if request.user.is_authenticated else None,
                 session_id=session_id,
                 ip_address=ip_address,
                 user_agent=user_agent,
@@ -111,6 +422,8 @@ class AnalyticsManager:
                 **kwargs
             )
             
+            if not AnalyticsIngestor.enqueue(analytics):
+                return None
             return analytics
             
         except Exception as e:
@@ -171,100 +484,97 @@ class AnalyticsManager:
             ip = request.META.get('REMOTE_ADDR')
         return ip
     
+    @staticmethod
+    def _date_range(days):
+        """The last `days` local dates, ending today"""
+        end_date = timezone.localdate()
+        return end_date - timedelta(days=days - 1), end_date
+    
+    @staticmethod
+    def _daily_views(rows, start_date, days):
+        views = Counter()
+        for row in rows:
+            if not row.is_total and row.event_type == 'post_view':
+                views[row.date] += row.events
+        return [
+            {'date': date.strftime('%Y-%m-%d'), 'views': views[date]}
+            for date in (start_date + timedelta(days=i) for i in range(days))
+        ]
+    
+    @staticmethod
+    def _breakdown(rows, field, key, event_type=None, limit=None, skip_blank=False):
+        """Event counts per value of `field`, as [{key: value, 'count': n}] largest first"""
+        counts = Counter()
+        for row in rows:
+            if row.is_total or (event_type and row.event_type != event_type):
+                continue
+            value = getattr(row, field)
+            if skip_blank and not value:
+                continue
+            counts[value] += row.events
+        return [{key: value, 'count': count} for value, count in counts.most_common(limit)]
+    
+    @staticmethod
+    def _average(rows, metric):
+        total = sum(getattr(row, f'{metric}_sum') for row in rows if not row.is_total)
+        count = sum(getattr(row, f'{metric}_count') for row in rows if not row.is_total)
+        return total / count if count else 0
+    
     @staticmethod
     def get_dashboard_data(days=30):
-        """Get analytics dashboard data"""
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
+        """Get analytics dashboard data
         
-        # Base queryset
-        analytics = BlogAnalytics.objects.filter(
-            timestamp__gte=start_date,
-            timestamp__lte=end_date
-        )
+        Answered from the daily rollup, with today aggregated live; unique
+        visitors are distinct sessions per day, summed over the range.
+        """
+        from .models import BlogPost
+        
+        start_date, end_date = AnalyticsManager._date_range(days)
+        rows = AnalyticsRollup.rows(start_date, end_date)
+        
+        detail = [row for row in rows if not row.is_total]
+        day_totals = [row for row in rows if row.is_total and row.blog_post_id is None]
         
         # Total views
-        total_views = analytics.filter(event_type='post_view').count()
+        total_views = sum(row.events for row in detail if row.event_type == 'post_view')
         
         # Unique visitors (by session)
-        unique_visitors = analytics.values('session_id').distinct().count()
+        unique_visitors = sum(row.sessions for row in day_totals)
         
         # Popular posts
-        popular_posts = analytics.filter(
-            event_type='post_view',
-            blog_post__isnull=False
-        ).values(
-            'blog_post__title',
-            'blog_post__slug'
-        ).annotate(
-            views=Count('id')
-        ).order_by('-views')[:10]
-        
-        # Device breakdown
-        device_stats = analytics.values('device_type').annotate(
-            count=Count('id')
-        ).order_by('-count')
-        
-        # Browser breakdown
-        browser_stats = analytics.values('browser').annotate(
-            count=Count('id')
-        ).order_by('-count')[:5]
-        
-        # Daily views for chart
-        daily_views = []
-        for i in range(days):
-            date = start_date + timedelta(days=i)
-            views = analytics.filter(
-                event_type='post_view',
-                timestamp__date=date.date()
-            ).count()
-            daily_views.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'views': views
-            })
-        
-        # Top search queries
-        top_searches = analytics.filter(
-            event_type='search',
-            search_query__isnull=False
-        ).exclude(
-            search_query=''
-        ).values('search_query').annotate(
-            count=Count('id')
-        ).order_by('-count')[:10]
-        
-        # Social shares
-        social_shares = analytics.filter(
-            event_type='social_share'
-        ).values('social_platform').annotate(
-            count=Count('id')
-        ).order_by('-count')
-        
-        # Average time on page
-        avg_time_on_page = analytics.filter(
-            time_on_page__isnull=False
-        ).aggregate(
-            avg_time=Avg('time_on_page')
-        )['avg_time'] or 0
-        
-        # Bounce rate (sessions with only one page view)
-        total_sessions = analytics.values('session_id').distinct().count()
-        single_page_sessions = analytics.values('session_id').annotate(
-            page_count=Count('id')
-        ).filter(page_count=1).count()
+        post_views = Counter()
+        for row in detail:
+            if row.event_type == 'post_view' and row.blog_post_id:
+                post_views[row.blog_post_id] += row.events
+        top_posts = post_views.most_common(10)
+        titles = {
+            post['id']: post for post in
+            BlogPost.objects.filter(id__in=[post_id for post_id, _ in top_posts]).values('id', 'title', 'slug')
+        } if top_posts else {}
+        popular_posts = [
+            {'blog_post__title': titles[post_id]['title'], 'blog_post__slug': titles[post_id]['slug'], 'views': views}
+            for post_id, views in top_posts if post_id in titles
+        ]
         
+        # Bounce rate (sessions with only one event)
+        total_sessions = sum(row.sessions for row in day_totals)
+        single_page_sessions = sum(row.bounced_sessions for row in day_totals)
         bounce_rate = (single_page_sessions / total_sessions * 100) if total_sessions > 0 else 0
         
         return {
             'total_views': total_views,
             'unique_visitors': unique_visitors,
-            'popular_posts': list(popular_posts),
-            'device_stats': list(device_stats),
-            'browser_stats': list(browser_stats),
-            'daily_views': daily_views,
-            'top_searches': list(top_searches),
-            'social_shares': list(social_shares),
-            'avg_time_on_page': round(avg_time_on_page, 2),
+            'popular_posts': popular_posts,
+            'device_stats': AnalyticsManager._breakdown(detail, 'device_type', 'device_type'),
+            'browser_stats': AnalyticsManager._breakdown(detail, 'browser', 'browser', limit=5),
+            'daily_views': AnalyticsManager._daily_views(detail, start_date, days),
+            'top_searches': AnalyticsManager._breakdown(
+                detail, 'dimension', 'search_query', event_type='search', limit=10, skip_blank=True
+            ),
+            'social_shares': AnalyticsManager._breakdown(
+                detail, 'dimension', 'social_platform', event_type='social_share'
+            ),
+            'avg_time_on_page': round(AnalyticsManager._average(detail, 'time_on_page'), 2),
             'bounce_rate': round(bounce_rate, 2),
             'date_range': {
                 'start': start_date.strftime('%Y-%m-%d'),
@@ -275,57 +585,17 @@ class AnalyticsManager:
     @staticmethod
     def get_post_analytics(blog_post, days=30):
         """Get analytics for a specific blog post"""
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
-        
-        analytics = BlogAnalytics.objects.filter(
-            blog_post=blog_post,
-            timestamp__gte=start_date,
-            timestamp__lte=end_date
-        )
-        
-        # Total views
-        total_views = analytics.filter(event_type='post_view').count()
-        
-        # Unique visitors
-        unique_visitors = analytics.filter(
-            event_type='post_view'
-        ).values('session_id').distinct().count()
-        
-        # Daily views
-        daily_views = []
-        for i in range(days):
-            date = start_date + timedelta(days=i)
-            views = analytics.filter(
-                event_type='post_view',
-                timestamp__date=date.date()
-            ).count()
-            daily_views.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'views': views
-            })
-        
-        # Social shares
-        social_shares = analytics.filter(
-            event_type='social_share'
-        ).values('social_platform').annotate(
-            count=Count('id')
-        ).order_by('-count')
-        
-        # Average engagement
-        avg_time_on_page = analytics.filter(
-            time_on_page__isnull=False
-        ).aggregate(avg_time=Avg('time_on_page'))['avg_time'] or 0
-        
-        avg_scroll_depth = analytics.filter(
-            scroll_depth__isnull=False
-        ).aggregate(avg_scroll=Avg('scroll_depth'))['avg_scroll'] or 0
+        start_date, end_date = AnalyticsManager._date_range(days)
+        rows = AnalyticsRollup.rows(start_date, end_date, blog_post)
+        detail = [row for row in rows if not row.is_total]
         
         return {
-            'total_views': total_views,
-            'unique_visitors': unique_visitors,
-            'daily_views': daily_views,
-            'social_shares': list(social_shares),
-            'avg_time_on_page': round(avg_time_on_page, 2),
-            'avg_scroll_depth': round(avg_scroll_depth, 2),
+            'total_views': sum(row.events for row in detail if row.event_type == 'post_view'),
+            'unique_visitors': sum(row.sessions for row in rows if row.is_total),
+            'daily_views': AnalyticsManager._daily_views(detail, start_date, days),
+            'social_shares': AnalyticsManager._breakdown(
+                detail, 'dimension', 'social_platform', event_type='social_share'
+            ),
+            'avg_time_on_page': round(AnalyticsManager._average(detail, 'time_on_page'), 2),
+            'avg_scroll_depth': round(AnalyticsManager._average(detail, 'scroll_depth'), 2),
         }
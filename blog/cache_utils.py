@@ -5,17 +5,32 @@ Implements intelligent caching strategies for better performance
 
 from django.core.cache import cache
 from django.conf import settings
-from django.db.models import Count, Q
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 import hashlib
 import json
+import threading
+import time
+
+# Cache families touched in the current transaction, bumped once it commits
+_pending = threading.local()
 
 
 class BlogCacheManager:
-    """Manages caching for blog-related data"""
+    """Manages caching for blog-related data
+    
+    Every key includes the current version of its family (namespace), e.g.
+    'blog_list:v1718000000000001:ab12cd34'. Bumping a family's version makes
+    all of its keys unreachable at once, on any cache backend; the orphaned
+    entries simply expire. Model signals in blog/signals.py bump the affected
+    families when posts, categories or tags change.
+    """
     
-    # Cache timeouts (in seconds)
+    # Cache timeouts (in seconds). Version bumps only reach the cache of the
+    # process that made the change while CACHES is per-process, so these bound
+    # how long other processes serve stale content; keep them short until the
+    # cache is shared.
     CACHE_TIMEOUTS = {
         'blog_post': 3600,  # 1 hour
         'blog_list': 1800,  # 30 minutes
@@ -28,10 +43,85 @@ class BlogCacheManager:
         'analytics': 1800,  # 30 minutes
     }
     
+    # Cache families (key prefixes) with their own namespace version
+    FAMILIES = (
+        'blog_post', 'blog_list', 'categories', 'tags',
+        'popular_posts', 'recent_posts', 'featured_posts', 'search',
+    )
+    
+    # Families that go stale when each model changes
+    INVALIDATES = {
+        'post': FAMILIES,
+        'category': ('categories', 'blog_post', 'blog_list', 'search'),
+        'tag': ('tags', 'blog_post', 'blog_list', 'search'),
+    }
+    
+    @staticmethod
+    def _version_key(family):
+        return f"blog_ns:{family}"
+    
+    @staticmethod
+    def _new_version():
+        # Seeded from the clock, so a counter lost to eviction can never
+        # come back as a version that still has entries cached under it
+        return time.time_ns() // 1000
+    
+    @staticmethod
+    def get_namespace_version(family):
+        """Current version of a cache family"""
+        version_key = BlogCacheManager._version_key(family)
+        version = cache.get(version_key)
+        if version is None:
+            version = BlogCacheManager._new_version()
+            if not cache.add(version_key, version, None):
+                version = cache.get(version_key, version)
+        return version
+    
+    @staticmethod
+    def bump_namespace(*families):
+        """Invalidate every key of the given families (default: all)"""
+        for family in families or BlogCacheManager.FAMILIES:
+            version_key = BlogCacheManager._version_key(family)
+            try:
+                cache.incr(version_key)
+            except ValueError:
+                cache.set(version_key, BlogCacheManager._new_version(), None)
+    
+    @staticmethod
+    def schedule_invalidation(*families):
+        """Bump the families once the current transaction commits.
+        
+        Bumping earlier would let a concurrent request re-cache the old rows
+        under the new version. Families touched repeatedly in one transaction
+        are bumped once.
+        """
+        if not hasattr(_pending, 'families'):
+            _pending.families = set()
+        _pending.families.update(families)
+        transaction.on_commit(BlogCacheManager._flush_pending)
+    
+    @staticmethod
+    def _flush_pending():
+        families = getattr(_pending, 'families', None)
+        _pending.families = set()
+        if families:
+            BlogCacheManager.bump_namespace(*families)
+    
+    @staticmethod
+    def get_sidebar_version():
+        """Version for the sidebar template fragments ({% cache ... sidebar_version %}).
+        
+        Combines the category and tag namespace versions, which are bumped
+        whenever post counts, categories or tags change.
+        """
+        return '-'.join(
+            str(BlogCacheManager.get_namespace_version(family)) for family in ('categories', 'tags')
+        )
+    
     @staticmethod
     def get_cache_key(prefix, *args, **kwargs):
         """Generate a cache key"""
-        key_parts = [prefix]
+        key_parts = [prefix, f"v{BlogCacheManager.get_namespace_version(prefix)}"]
         key_parts.extend(str(arg) for arg in args)
         
         # Add kwargs to key
@@ -82,9 +172,7 @@ class BlogCacheManager:
         """Cache categories with post counts"""
         from .models import Category
         
-        categories = Category.objects.annotate(
-            post_count=Count('blog_posts', filter=Q(blog_posts__status='published'))
-        ).filter(post_count__gt=0).order_by('name')
+        categories = Category.objects.filter(post_count__gt=0).order_by('name')
         
         cache_key = BlogCacheManager.get_cache_key('categories')
         cache.set(
@@ -110,9 +198,7 @@ class BlogCacheManager:
         """Cache popular tags"""
         from .models import Tag
         
-        tags = Tag.objects.annotate(
-            post_count=Count('blog_posts', filter=Q(blog_posts__status='published'))
-        ).filter(post_count__gt=0).order_by('-post_count')[:20]
+        tags = Tag.objects.filter(usage_count__gt=0).order_by('-usage_count', 'name')[:20]
         
         cache_key = BlogCacheManager.get_cache_key('tags')
         cache.set(
@@ -238,26 +324,7 @@ class BlogCacheManager:
     @staticmethod
     def invalidate_blog_caches():
         """Invalidate all blog-related caches"""
-        cache_patterns = [
-            'blog_post:*',
-            'blog_list:*',
-            'categories',
-            'tags',
-            'popular_posts:*',
-            'recent_posts:*',
-            'featured_posts:*',
-            'search:*',
-        ]
-        
-        # Note: This is a simplified version
-        # In production, you might want to use cache versioning
-        # or a more sophisticated cache invalidation strategy
-        for pattern in cache_patterns:
-            try:
-                cache.delete_pattern(pattern)
-            except AttributeError:
-                # Fallback for cache backends that don't support delete_pattern
-                pass
+        BlogCacheManager.bump_namespace(*BlogCacheManager.FAMILIES)
     
     @staticmethod
     def warm_cache():
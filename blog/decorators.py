@@ -8,6 +8,7 @@ from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import HttpResponseForbidden
+from accounts.roles import ADMIN_ROLES, get_role_snapshot
 
 
 def require_site_manager_role(view_func):
@@ -21,17 +22,15 @@ def require_site_manager_role(view_func):
         if request.user.is_superuser:
             return view_func(request, *args, **kwargs)
         
+        role = get_role_snapshot(request.user)
+        
         # Check if user has site manager profile
-        if hasattr(request.user, 'sitemanagerprofile'):
-            site_manager = request.user.sitemanagerprofile
-            if site_manager.approval_status == 'approved' and site_manager.can_login():
-                return view_func(request, *args, **kwargs)
+        if role.site_manager_can_login:
+            return view_func(request, *args, **kwargs)
         
         # Check if user has admin profile (admins can also manage blogs)
-        if hasattr(request.user, 'adminprofile'):
-            admin_profile = request.user.adminprofile
-            if admin_profile.approval_status == 'approved' and admin_profile.can_login():
-                return view_func(request, *args, **kwargs)
+        if role.admin_can_login:
+            return view_func(request, *args, **kwargs)
         
         # User doesn't have permission
         messages.error(request, 'You do not have permission to access this page.')
@@ -52,14 +51,10 @@ def require_admin_role(view_func):
             return view_func(request, *args, **kwargs)
         
         # Check if user has admin profile with appropriate admin role
-        if hasattr(request.user, 'adminprofile'):
-            admin_profile = request.user.adminprofile
-            # Allow admin, manager, supervisor, and staff roles for blog management
-            allowed_roles = ['admin', 'manager', 'supervisor', 'staff']
-            if (admin_profile.approval_status == 'approved' and 
-                admin_profile.admin_role in allowed_roles and
-                admin_profile.can_login()):
-                return view_func(request, *args, **kwargs)
+        role = get_role_snapshot(request.user)
+        # Allow admin, manager, supervisor, and staff roles for blog management
+        if role.admin_can_login and role.admin.admin_role in ADMIN_ROLES:
+            return view_func(request, *args, **kwargs)
         
         # User doesn't have permission
         messages.error(request, 'You do not have permission to access this page.')
@@ -324,9 +324,7 @@ class Command(BaseCommand):
             )
 
             # Add tags
-            for tag_name in blog_info['tags']:
-                tag, created = Tag.objects.get_or_create(name=tag_name)
-                blog_post.tags.add(tag)
+            blog_post.tags.add(*Tag.resolve_names(blog_info['tags']))
 
             # Copy images
             blog_folder = f'd:\\tripleG\\blogs\\{blog_info["folder"]}'
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from blog.related import RelatedPostService
+
+class Command(BaseCommand):
+    help = 'Recompute related posts for posts changed since the last refresh (run it every few minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild every related-posts list (run it nightly)')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            lists = RelatedPostService.rebuild()
+        else:
+            lists = RelatedPostService.refresh_stale()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed related posts for {lists} post(s)'))
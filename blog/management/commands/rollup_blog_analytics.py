@@ -0,0 +1,20 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from blog.analytics import AnalyticsRollup
+
+class Command(BaseCommand):
+    help = 'Roll up blog analytics events into daily totals (run it hourly or nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to rebuild, as YYYY-MM-DD (default: the last rolled-up day)')
+        parser.add_argument('--until', help='Last day to rebuild, as YYYY-MM-DD (default and latest: yesterday)')
+
+    def handle(self, *args, **options):
+        try:
+            since = date.fromisoformat(options['since']) if options['since'] else None
+            until = date.fromisoformat(options['until']) if options['until'] else None
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+
+        days = AnalyticsRollup.rollup(since, until)
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {days} day(s) of blog analytics'))
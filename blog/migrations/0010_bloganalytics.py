@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_alter_blogimage_image_alter_blogpost_featured_image_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogAnalytics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('page_view', 'Page View'), ('post_view', 'Post View'), ('search', 'Search'), ('category_view', 'Category View'), ('tag_view', 'Tag View'), ('social_share', 'Social Share'), ('newsletter_signup', 'Newsletter Signup'), ('comment_post', 'Comment Posted')], max_length=20)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('session_id', models.CharField(blank=True, max_length=100)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('user_agent', models.TextField(blank=True)),
+                ('device_type', models.CharField(choices=[('desktop', 'Desktop'), ('mobile', 'Mobile'), ('tablet', 'Tablet'), ('unknown', 'Unknown')], default='unknown', max_length=10)),
+                ('browser', models.CharField(blank=True, max_length=50)),
+                ('os', models.CharField(blank=True, max_length=50)),
+                ('referrer', models.URLField(blank=True)),
+                ('search_query', models.CharField(blank=True, max_length=200)),
+                ('social_platform', models.CharField(blank=True, max_length=50)),
+                ('time_on_page', models.PositiveIntegerField(blank=True, null=True)),
+                ('scroll_depth', models.PositiveIntegerField(blank=True, null=True)),
+                ('blog_post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='blog.blogpost')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='blog.category')),
+                ('tag', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='blog.tag')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Blog Analytics',
+                'verbose_name_plural': 'Blog Analytics',
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['event_type', 'timestamp'], name='blog_blogan_event_t_edbe41_idx'), models.Index(fields=['blog_post', 'timestamp'], name='blog_blogan_blog_po_396547_idx'), models.Index(fields=['session_id'], name='blog_blogan_session_6a9172_idx')],
+            },
+        ),
+    ]
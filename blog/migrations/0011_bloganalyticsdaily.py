@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_bloganalytics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogAnalyticsDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('event_type', models.CharField(blank=True, max_length=20)),
+                ('device_type', models.CharField(blank=True, max_length=10)),
+                ('browser', models.CharField(blank=True, max_length=50)),
+                ('dimension', models.CharField(blank=True, max_length=200)),
+                ('is_total', models.BooleanField(default=False)),
+                ('events', models.PositiveIntegerField(default=0)),
+                ('sessions', models.PositiveIntegerField(default=0)),
+                ('bounced_sessions', models.PositiveIntegerField(default=0)),
+                ('time_on_page_sum', models.BigIntegerField(default=0)),
+                ('time_on_page_count', models.PositiveIntegerField(default=0)),
+                ('scroll_depth_sum', models.BigIntegerField(default=0)),
+                ('scroll_depth_count', models.PositiveIntegerField(default=0)),
+                ('blog_post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='blog.blogpost')),
+            ],
+            options={
+                'verbose_name': 'Blog Analytics Daily Rollup',
+                'verbose_name_plural': 'Blog Analytics Daily Rollups',
+                'indexes': [models.Index(fields=['date'], name='blog_blogan_date_a51dfd_idx'), models.Index(fields=['blog_post', 'date'], name='blog_blogan_blog_po_8bc67a_idx')],
+            },
+        ),
+    ]
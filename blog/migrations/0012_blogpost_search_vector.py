@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:10
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+INDEX_NAME = 'blog_blogpost_search_vector_gin'
+
+
+def create_search_index(apps, schema_editor):
+    """GIN-index and fill the search vectors; other databases use the basic search backend"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.search import SearchVector
+
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON blog_blogpost USING gin (search_vector)'
+    )
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    BlogPost.objects.update(search_vector=(
+        SearchVector('title', weight='A', config='english') +
+        SearchVector('excerpt', weight='B', config='english') +
+        SearchVector('content', weight='C', config='english')
+    ))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_bloganalyticsdaily'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:15
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_published_posts(apps, schema_editor):
+    """Fill the denormalized counts that PostCountService maintains from now on"""
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    Category = apps.get_model('blog', 'Category')
+    Tag = apps.get_model('blog', 'Tag')
+    Category.objects.update(post_count=Coalesce(Subquery(
+        BlogPost.objects.filter(category=OuterRef('pk'), status='published')
+        .order_by().values('category').annotate(count=Count('pk')).values('count')
+    ), Value(0)))
+    Tag.objects.update(usage_count=Coalesce(Subquery(
+        BlogPost.tags.through.objects.filter(tag=OuterRef('pk'), blogpost__status='published')
+        .order_by().values('tag').annotate(count=Count('pk')).values('count')
+    ), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_blogpost_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of published posts in this category'),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='usage_count',
+            field=models.IntegerField(default=0, help_text='Number of published posts with this tag'),
+        ),
+        migrations.RunPython(count_published_posts, migrations.RunPython.noop),
+    ]
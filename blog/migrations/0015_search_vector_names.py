@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:05
+
+from django.db import migrations
+
+
+def update_search_vectors(apps, schema_editor):
+    """Add the SEO fields and category and tag names to the stored search vectors"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.aggregates import StringAgg
+    from django.contrib.postgres.search import SearchVector
+    from django.db.models import OuterRef, Subquery
+
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    Category = apps.get_model('blog', 'Category')
+    category_name = Subquery(Category.objects.filter(pk=OuterRef('category_id')).values('name')[:1])
+    tag_names = Subquery(
+        BlogPost.tags.through.objects.filter(blogpost_id=OuterRef('pk'))
+        .order_by().values('blogpost_id')
+        .annotate(names=StringAgg('tag__name', delimiter=' ')).values('names')
+    )
+    BlogPost.objects.update(search_vector=(
+        SearchVector('title', weight='A', config='english') +
+        SearchVector('excerpt', weight='B', config='english') +
+        SearchVector('content', weight='C', config='english') +
+        SearchVector(
+            'seo_meta_title', 'seo_meta_description', category_name, tag_names,
+            weight='D', config='english',
+        )
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_relatedpost'),
+    ]
+
+    operations = [
+        migrations.RunPython(update_search_vectors, migrations.RunPython.noop),
+    ]
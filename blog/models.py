@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import User
 from django.utils.text import slugify
 from django.urls import reverse
@@ -16,6 +17,7 @@ class Category(models.Model):
     description = models.TextField(blank=True, help_text="Brief description of this category")
     color = models.CharField(max_length=7, default="#007bff", help_text="Hex color code for UI styling")
     icon = models.CharField(max_length=50, default="fas fa-folder", help_text="FontAwesome icon class")
+    post_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of published posts in this category")
     created_date = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -35,15 +37,15 @@ class Category(models.Model):
         return reverse('blog:category_list', kwargs={'slug': self.slug})
     
     def get_post_count(self):
-        """Get count of published posts - use annotation in queries for better performance"""
-        return self.blog_posts.filter(status='published').count()
+        """Get count of published posts (kept up to date by PostCountService)"""
+        return self.post_count
 
 
 class Tag(models.Model):
     """Tags for blog posts to enable flexible categorization"""
     name = models.CharField(max_length=50, unique=True)
     slug = models.SlugField(max_length=50, unique=True, blank=True)
-    usage_count = models.IntegerField(default=0, help_text="Number of times this tag has been used")
+    usage_count = models.IntegerField(default=0, help_text="Number of published posts with this tag")
     created_date = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -61,6 +63,33 @@ class Tag(models.Model):
     
     def get_absolute_url(self):
         return reverse('blog:tag_list', kwargs={'slug': self.slug})
+    
+    @classmethod
+    def resolve_names(cls, names):
+        """Get or create the tags for a list of names, in order, in at most three queries.
+        
+        Blank and repeated names are skipped. A new name whose slug is already
+        taken resolves to the tag that owns the slug.
+        """
+        names = list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+        if not names:
+            return []
+        
+        tags = {tag.name: tag for tag in cls.objects.filter(name__in=names)}
+        missing = {name: slugify(name) for name in names if name not in tags}
+        if missing:
+            # bulk_create skips save(), so fill in the slugs here
+            cls.objects.bulk_create(
+                [cls(name=name, slug=slug) for name, slug in missing.items()], ignore_conflicts=True
+            )
+            by_slug = {}
+            for tag in cls.objects.filter(models.Q(name__in=missing) | models.Q(slug__in=missing.values())):
+                tags.setdefault(tag.name, tag)
+                by_slug[tag.slug] = tag
+            for name, slug in missing.items():
+                if name not in tags and slug in by_slug:
+                    tags[name] = by_slug[slug]
+        return [tags[name] for name in names if name in tags]
 
 
 class BlogPost(models.Model):
@@ -125,6 +154,14 @@ class BlogPost(models.Model):
     # Analytics
     view_count = models.IntegerField(default=0)
     
+    # Weighted full-text search document (PostgreSQL only; GIN indexed by
+    # migration 0012 and kept current by a post_save signal)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+    
+    # Set when tags, text, category or status change; the RelatedPost
+    # lists involving this post are recomputed by the next refresh
+    related_posts_stale = models.BooleanField(default=True, editable=False)
+    
     # Soft delete
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
@@ -176,11 +213,6 @@ class BlogPost(models.Model):
             self.reading_time = self.calculate_reading_time()
         
         super().save(*args, **kwargs)
-        
-        # Update tag usage counts after saving
-        for tag in self.tags.all():
-            tag.usage_count = tag.blog_posts.filter(status='published').count()
-            tag.save()
     
     def calculate_reading_time(self):
         """Calculate estimated reading time based on word count"""
@@ -195,11 +227,6 @@ class BlogPost(models.Model):
         # Average reading speed: 200 words per minute
         reading_time = max(1, round(word_count / 200))
         return reading_time
-        
-        # Update tag usage counts
-        for tag in self.tags.all():
-            tag.usage_count = tag.blog_posts.filter(status='published').count()
-            tag.save()
     
     def __str__(self):
         return self.title
@@ -219,6 +246,20 @@ class BlogPost(models.Model):
         return minutes
         
     def get_related_posts(self, limit=3):
+        """Get related posts from the precomputed RelatedPost lists.
+        
+        Posts whose list has not been computed yet fall back to a live
+        category/tag match, and get their list computed in the background.
+        """
+        from .related import RelatedPostService
+        
+        related_posts = RelatedPostService.get_related(self, limit)
+        if related_posts or not self.related_posts_stale:
+            return related_posts
+        RelatedPostService.schedule_refresh()
+        return self.match_related_posts(limit)
+    
+    def match_related_posts(self, limit=3):
         """Get related posts based on category and tags"""
         from django.db.models import Q
         
@@ -421,3 +462,9 @@ class ContentImage(models.Model):
     
     def __str__(self):
         return f"Content image for {self.blog_post.title}"
+
+
+# Analytics and related-post models live in their own modules; import them so
+# they are registered and migrated
+from .analytics import BlogAnalytics, BlogAnalyticsDaily  # noqa: E402,F401
+from .related import RelatedPost  # noqa: E402,F401
@@ -0,0 +1,111 @@
+"""
+Denormalized published-post counts for blog categories and tags
+
+Category.post_count and Tag.usage_count hold how many published posts each
+category or tag has, so the public pages can list and order them without a
+GROUP BY over the posts. Category counts are recomputed inside the
+transaction that changes a post's status or category. Tag counts are
+collected per transaction and recomputed in one UPDATE once it commits, so
+saving a post doesn't hold locks on its (often shared) tags until the end of
+the transaction. See blog/signals.py for the triggers.
+"""
+
+import threading
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .cache_utils import BlogCacheManager
+
+# Tags touched in the current transaction, recounted once it commits
+_pending = threading.local()
+
+
+class PostCountService:
+    """Recompute the denormalized post counts of categories and tags"""
+
+    @staticmethod
+    def _published_count(queryset, group_by):
+        """Correlated subquery counting the published rows of queryset per group_by"""
+        return Coalesce(
+            Subquery(
+                queryset.order_by().values(group_by).annotate(count=Count('pk')).values('count')
+            ),
+            Value(0),
+        )
+
+    @staticmethod
+    def recount_categories(category_ids=None):
+        """Recount the given categories (default: all) with a single UPDATE"""
+        from .models import BlogPost, Category
+
+        categories = Category.objects.all()
+        if category_ids is not None:
+            category_ids = {pk for pk in category_ids if pk is not None}
+            if not category_ids:
+                return 0
+            categories = categories.filter(pk__in=category_ids)
+        return categories.update(post_count=PostCountService._published_count(
+            BlogPost.objects.filter(category=OuterRef('pk'), status='published'), 'category'
+        ))
+
+    @staticmethod
+    def recount_tags(tag_ids=None):
+        """Recount the given tags (default: all) with a single UPDATE"""
+        from .models import BlogPost, Tag
+
+        tags = Tag.objects.all()
+        if tag_ids is not None:
+            tag_ids = set(tag_ids)
+            if not tag_ids:
+                return 0
+            tags = tags.filter(pk__in=tag_ids)
+        return tags.update(usage_count=PostCountService._published_count(
+            BlogPost.tags.through.objects.filter(tag=OuterRef('pk'), blogpost__status='published'), 'tag'
+        ))
+
+    @staticmethod
+    def schedule_tag_recount(tag_ids):
+        """Recount the tags once the current transaction commits.
+
+        Tags touched repeatedly in one transaction are recounted once, together.
+        """
+        tag_ids = set(tag_ids)
+        if not tag_ids:
+            return
+        if not hasattr(_pending, 'tag_ids'):
+            _pending.tag_ids = set()
+        _pending.tag_ids.update(tag_ids)
+        transaction.on_commit(PostCountService._flush_pending)
+
+    @staticmethod
+    def _flush_pending():
+        tag_ids = getattr(_pending, 'tag_ids', None)
+        _pending.tag_ids = set()
+        if tag_ids:
+            PostCountService.recount_tags(tag_ids)
+            # Cached tag lists may have been rebuilt from the old counts since
+            # the commit bumped their versions
+            BlogCacheManager.bump_namespace(*BlogCacheManager.INVALIDATES['tag'])
+
+    @staticmethod
+    def recount_posts(post_ids):
+        """Recount the categories and tags of the given posts, e.g. after a bulk status update"""
+        from .models import BlogPost
+
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        PostCountService.recount_categories(
+            BlogPost.objects.filter(pk__in=post_ids).values_list('category_id', flat=True).distinct()
+        )
+        PostCountService.recount_tags(
+            BlogPost.tags.through.objects.filter(blogpost_id__in=post_ids).values_list('tag_id', flat=True)
+        )
+
+    @staticmethod
+    def recount_all():
+        """Recount every category and tag"""
+        PostCountService.recount_categories()
+        PostCountService.recount_tags()
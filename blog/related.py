@@ -0,0 +1,301 @@
+"""
+Related posts for the Triple G Blog
+
+Each published post's most similar posts are precomputed into RelatedPost
+rows, so the detail page reads them with one indexed query instead of a
+tag-overlap aggregate per view. Similarity combines tag overlap, a shared
+category and TF-IDF cosine similarity of titles and excerpts.
+
+Posts whose tags, text, category or status change are flagged
+related_posts_stale by the blog signals. Their lists, and the lists of
+posts they may enter or leave, are refreshed by
+`manage.py refresh_related_posts` or, with BLOG_RELATED_POSTS_IN_PROCESS,
+by a background thread after each commit. `refresh_related_posts --all`
+rebuilds every list, which also picks up the gradual drift of the IDF
+weights between incremental refreshes.
+"""
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Count, Min
+from collections import Counter, defaultdict
+import logging
+import math
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class RelatedPost(models.Model):
+    """A precomputed 'related post' entry, ranked per post"""
+
+    post = models.ForeignKey('blog.BlogPost', on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey('blog.BlogPost', on_delete=models.CASCADE, related_name='related_to_entries')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField(help_text="Position in the post's list, best first")
+
+    class Meta:
+        verbose_name = 'Related Post'
+        verbose_name_plural = 'Related Posts'
+        ordering = ['post', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'rank'], name='blog_relatedpost_post_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} -> {self.related_id} ({self.score:.3f})"
+
+
+# Words too common in titles and excerpts to say anything about similarity
+STOP_WORDS = frozenset('''
+    a about after all also an and any are as at be been before but by can could
+    do does for from has have how if in into is it its more most new no not of
+    on or our out over so than that the their them then there these they this
+    those through to up us was we were what when which while who why will with
+    without you your
+'''.split())
+
+
+class _Corpus:
+    """The published posts' similarity features, held in memory for one refresh"""
+
+    def __init__(self, posts, tags):
+        # posts: {id: (title, excerpt, category_id, published_date)}; tags: {id: set of tag ids}
+        self.posts = posts
+        self.tags = tags
+        self.vectors = {}
+        self.by_tag = defaultdict(set)
+        self.by_category = defaultdict(set)
+        self.by_term = defaultdict(set)
+
+        terms = {post_id: Counter(self.terms(title, excerpt)) for post_id, (title, excerpt, _, _) in posts.items()}
+        document_frequency = Counter(term for counts in terms.values() for term in counts)
+        size = len(posts)
+        for post_id, counts in terms.items():
+            # Smoothed IDF, so a term in every post still counts a little
+            vector = {
+                term: count * (math.log((1 + size) / (1 + document_frequency[term])) + 1)
+                for term, count in counts.items()
+            }
+            norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+            self.vectors[post_id] = {term: weight / norm for term, weight in vector.items()} if norm else {}
+            for term in vector:
+                self.by_term[term].add(post_id)
+        for post_id, (_, _, category_id, _) in posts.items():
+            if category_id is not None:
+                self.by_category[category_id].add(post_id)
+            for tag_id in tags.get(post_id, ()):
+                self.by_tag[tag_id].add(post_id)
+
+    @classmethod
+    def load(cls):
+        """Read the published posts and their tags (two queries)"""
+        from .models import BlogPost
+
+        posts = {
+            post_id: (title, excerpt, category_id, published_date)
+            for post_id, title, excerpt, category_id, published_date in
+            BlogPost.objects.filter(status='published').values_list(
+                'id', 'title', 'excerpt', 'category_id', 'published_date'
+            )
+        }
+        tags = defaultdict(set)
+        for post_id, tag_id in BlogPost.tags.through.objects.filter(
+            blogpost__status='published'
+        ).values_list('blogpost_id', 'tag_id'):
+            tags[post_id].add(tag_id)
+        return cls(posts, tags)
+
+    @staticmethod
+    def terms(title, excerpt):
+        from .search import AutocompleteIndex
+        words = AutocompleteIndex.normalize(f"{title} {excerpt}").split()
+        return [word for word in words if len(word) > 2 and word not in STOP_WORDS and not word.isdigit()]
+
+    def score(self, post_id, other_id):
+        """Similarity of two published posts, between 0 and 1"""
+        tags, other_tags = self.tags.get(post_id, set()), self.tags.get(other_id, set())
+        tag_overlap = len(tags & other_tags) / len(tags | other_tags) if tags and other_tags else 0.0
+
+        category_id = self.posts[post_id][2]
+        same_category = 1.0 if category_id is not None and category_id == self.posts[other_id][2] else 0.0
+
+        vector, other_vector = self.vectors[post_id], self.vectors[other_id]
+        if len(other_vector) < len(vector):
+            vector, other_vector = other_vector, vector
+        text = sum(weight * other_vector.get(term, 0.0) for term, weight in vector.items())
+
+        return (
+            RelatedPostService.TAG_WEIGHT * tag_overlap +
+            RelatedPostService.CATEGORY_WEIGHT * same_category +
+            RelatedPostService.TEXT_WEIGHT * text
+        )
+
+    def candidates(self, post_id):
+        """Posts sharing at least a tag, the category or a term with post_id"""
+        found = set()
+        for tag_id in self.tags.get(post_id, ()):
+            found |= self.by_tag[tag_id]
+        category_id = self.posts[post_id][2]
+        if category_id is not None:
+            found |= self.by_category[category_id]
+        for term in self.vectors[post_id]:
+            found |= self.by_term[term]
+        found.discard(post_id)
+        return found
+
+    def ranked(self, post_id, limit):
+        """The limit most similar posts as (score, related id), best first.
+
+        Ties go to the more recently published post, then the lower id, so the
+        ranking is deterministic.
+        """
+        scored = [(self.score(post_id, other_id), other_id) for other_id in self.candidates(post_id)]
+        scored = [entry for entry in scored if entry[0] >= RelatedPostService.MIN_SCORE]
+        scored.sort(key=lambda entry: (-entry[0], -self._timestamp(entry[1]), entry[1]))
+        return scored[:limit]
+
+    def _timestamp(self, post_id):
+        published_date = self.posts[post_id][3]
+        return published_date.timestamp() if published_date else 0.0
+
+
+class RelatedPostService:
+    """Compute, refresh and read the precomputed related posts"""
+
+    # Relative weights of the similarity signals; they add up to 1
+    TAG_WEIGHT = 0.5
+    CATEGORY_WEIGHT = 0.2
+    TEXT_WEIGHT = 0.3
+
+    # Posts kept per list, and the weakest similarity worth listing
+    LIST_SIZE = 10
+    MIN_SCORE = 0.05
+
+    _wake = threading.Event()
+    _worker = None
+    _worker_lock = threading.Lock()
+
+    @staticmethod
+    def get_related(post, limit=3):
+        """The post's related published posts, best first, in one query"""
+        from .models import BlogPost
+        return list(
+            BlogPost.objects.filter(related_to_entries__post=post, status='published')
+            .order_by('related_to_entries__rank')[:limit]
+        )
+
+    @staticmethod
+    def mark_stale(post_ids):
+        """Flag posts whose related lists need recomputing, and refresh them after commit"""
+        from .models import BlogPost
+
+        post_ids = set(post_ids)
+        if not post_ids:
+            return
+        BlogPost.objects.filter(id__in=post_ids).update(related_posts_stale=True)
+        transaction.on_commit(RelatedPostService.schedule_refresh)
+
+    @classmethod
+    def refresh(cls, post_ids=None):
+        """Recompute related lists; all of them, or those affected by changes to post_ids.
+
+        Besides the changed posts themselves, this recomputes the lists of
+        posts that currently include a changed post, or that a changed post
+        now scores high enough to enter. Returns the number of lists written.
+        """
+        corpus = _Corpus.load()
+        if post_ids is None:
+            targets = set(corpus.posts)
+            stale_lists = None
+        else:
+            changed = set(post_ids)
+            targets = cls._affected(corpus, changed)
+            # Lists of changed posts that are no longer published are dropped
+            stale_lists = targets | changed
+
+        rows = [
+            RelatedPost(post_id=post_id, related_id=related_id, score=score, rank=rank)
+            for post_id in sorted(targets)
+            for rank, (score, related_id) in enumerate(corpus.ranked(post_id, cls.LIST_SIZE), start=1)
+        ]
+        with transaction.atomic():
+            existing = RelatedPost.objects.all()
+            if stale_lists is not None:
+                existing = existing.filter(post_id__in=stale_lists)
+            existing.delete()
+            RelatedPost.objects.bulk_create(rows, batch_size=1000)
+        return len(targets)
+
+    @classmethod
+    def _affected(cls, corpus, changed):
+        """The published posts whose lists a change to the changed posts may alter"""
+        published = changed & set(corpus.posts)
+        affected = set(published)
+        affected.update(
+            RelatedPost.objects.filter(related_id__in=changed).values_list('post_id', flat=True)
+        )
+        affected &= set(corpus.posts)
+
+        # Posts the changed ones could newly enter: full lists only take
+        # posts that beat their weakest entry
+        lists = {
+            entry['post']: (entry['size'], entry['weakest'])
+            for entry in RelatedPost.objects.values('post').annotate(size=Count('id'), weakest=Min('score'))
+        }
+        for post_id in published:
+            for other_id in corpus.candidates(post_id) - affected:
+                size, weakest = lists.get(other_id, (0, 0.0))
+                score = corpus.score(other_id, post_id)
+                if score >= cls.MIN_SCORE and (size < cls.LIST_SIZE or score >= weakest):
+                    affected.add(other_id)
+        return affected
+
+    @classmethod
+    def refresh_stale(cls):
+        """Refresh the lists affected by posts flagged stale. Returns the number of lists written."""
+        from .models import BlogPost
+
+        stale = list(BlogPost.objects.filter(related_posts_stale=True).values_list('id', flat=True))
+        if not stale:
+            return 0
+        # Clear the flags first, so changes made during the refresh flag
+        # their posts again for the next one
+        BlogPost.objects.filter(id__in=stale).update(related_posts_stale=False)
+        try:
+            return cls.refresh(stale)
+        except Exception:
+            BlogPost.objects.filter(id__in=stale).update(related_posts_stale=True)
+            raise
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute every related list. Returns the number of lists written."""
+        from .models import BlogPost
+
+        BlogPost.objects.filter(related_posts_stale=True).update(related_posts_stale=False)
+        return cls.refresh()
+
+    @classmethod
+    def schedule_refresh(cls):
+        """Refresh stale posts in a background thread when BLOG_RELATED_POSTS_IN_PROCESS is on"""
+        if not settings.BLOG_RELATED_POSTS_IN_PROCESS:
+            return
+        cls._wake.set()
+        with cls._worker_lock:
+            if cls._worker is None or not cls._worker.is_alive():
+                cls._worker = threading.Thread(target=cls._run_worker, name='blog-related-posts', daemon=True)
+                cls._worker.start()
+
+    @classmethod
+    def _run_worker(cls):
+        while True:
+            cls._wake.wait()
+            cls._wake.clear()
+            try:
+                cls.refresh_stale()
+            except Exception:
+                logger.exception("Related posts refresh failed")
+            finally:
+                # Don't hold a database connection open while idle
+                connection.close()
@@ -3,13 +3,249 @@ Enhanced search system for the Triple G Blog
 Provides intelligent search with suggestions and filters
 """
 
-from django.db.models import Q, Count
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
-from django.utils.html import strip_tags
+from bisect import bisect_left
+from django.db import connection
+from django.db.models import Q, Count, F, Func, OuterRef, Subquery, Value
+from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank, SearchHeadline
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
 from django.core.paginator import Paginator
 from .models import BlogPost, Category, Tag
 from .cache_utils import BlogCacheManager
+import hashlib
+import html
+import json
 import re
+import threading
+import time
+import unicodedata
+
+# Backends mark highlighted words with these; render_snippet turns them into
+# <mark> tags after escaping the rest of the text
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_STOP = '\x03'
+
+
+def render_snippet(text):
+    """Escape a snippet and turn its highlight markers into <mark> tags"""
+    return mark_safe(
+        escape(text).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+    )
+
+
+class PostgresSearchBackend:
+    """Full-text search over BlogPost.search_vector (GIN indexed).
+    
+    The stored vector weighs the title (A) above the excerpt (B) and the
+    content (C), so SearchRank orders title matches first. The SEO fields and
+    the category and tag names are added at the lowest weight (D), so posts
+    are found by them without outranking text matches. Vectors are kept
+    current by the blog signals; update_vectors() backfills them.
+    """
+    
+    CONFIG = 'english'
+    
+    @classmethod
+    def vector(cls):
+        # Imported here: the postgres aggregates need psycopg, which the basic backend doesn't
+        from django.contrib.postgres.aggregates import StringAgg
+        
+        category_name = Subquery(Category.objects.filter(pk=OuterRef('category_id')).values('name')[:1])
+        tag_names = Subquery(
+            BlogPost.tags.through.objects.filter(blogpost_id=OuterRef('pk'))
+            .order_by().values('blogpost_id')
+            .annotate(names=StringAgg('tag__name', delimiter=' ')).values('names')
+        )
+        return (
+            SearchVector('title', weight='A', config=cls.CONFIG) +
+            SearchVector('excerpt', weight='B', config=cls.CONFIG) +
+            SearchVector('content', weight='C', config=cls.CONFIG) +
+            SearchVector(
+                'seo_meta_title', 'seo_meta_description', category_name, tag_names,
+                weight='D', config=cls.CONFIG,
+            )
+        )
+    
+    @classmethod
+    def update_vectors(cls, queryset=None):
+        """Recompute the stored search vectors of `queryset` (default: all posts)"""
+        if queryset is None:
+            queryset = BlogPost.objects.all()
+        return queryset.update(search_vector=cls.vector())
+    
+    @classmethod
+    def search_query(cls, query):
+        return SearchQuery(query, search_type='websearch', config=cls.CONFIG)
+    
+    def search(self, queryset, query):
+        search_query = self.search_query(query)
+        return queryset.annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).filter(search_vector=search_query).order_by('-rank', '-published_date')
+    
+    def snippets(self, posts, query):
+        """Highlighted content excerpts for `posts`, by post ID, in one query"""
+        # ts_headline works on text; drop the markup first
+        text = Func(F('content'), Value('<[^>]+>'), Value(' '), Value('g'), function='regexp_replace')
+        headlines = BlogPost.objects.filter(id__in=[post.id for post in posts]).annotate(
+            snippet=SearchHeadline(
+                text, self.search_query(query), config=self.CONFIG,
+                start_sel=HIGHLIGHT_START, stop_sel=HIGHLIGHT_STOP,
+                max_words=35, min_words=15, max_fragments=2,
+            )
+        ).values_list('id', 'snippet')
+        return {post_id: render_snippet(html.unescape(snippet)) for post_id, snippet in headlines}
+
+
+class BasicSearchBackend:
+    """Portable substring search, used on databases without full-text search (e.g. SQLite in tests)"""
+    
+    SNIPPET_WORDS = 30
+    
+    def search(self, queryset, query):
+        """Basic search implementation"""
+        search_terms = query.split()
+        
+        # Build Q objects for each term
+        q_objects = Q()
+        for term in search_terms:
+            q_objects |= (
+                Q(title__icontains=term) |
+                Q(content__icontains=term) |
+                Q(excerpt__icontains=term) |
+                Q(seo_meta_title__icontains=term) |
+                Q(seo_meta_description__icontains=term) |
+                Q(category__name__icontains=term) |
+                Q(tags__name__icontains=term)
+            )
+        
+        return queryset.filter(q_objects).distinct().order_by('-published_date')
+    
+    def snippets(self, posts, query):
+        """Highlighted content excerpts for `posts`, by post ID"""
+        terms = [re.escape(term) for term in query.split()]
+        if not terms:
+            return {}
+        pattern = re.compile('|'.join(terms), re.IGNORECASE)
+        return {post.id: render_snippet(self._snippet(post, pattern)) for post in posts}
+    
+    def _snippet(self, post, pattern):
+        words = html.unescape(strip_tags(post.content or '')).split()
+        first = next((i for i, word in enumerate(words) if pattern.search(word)), None)
+        if first is None:
+            return post.excerpt or ' '.join(words[:self.SNIPPET_WORDS])
+        
+        start = max(first - self.SNIPPET_WORDS // 3, 0)
+        window = ' '.join(words[start:start + self.SNIPPET_WORDS])
+        return pattern.sub(lambda match: f"{HIGHLIGHT_START}{match.group(0)}{HIGHLIGHT_STOP}", window)
+
+
+class AutocompleteIndex:
+    """Per-process prefix index of published post titles, categories and tags.
+    
+    Every word of every name is normalized (lowercase, accents removed) and
+    kept in one sorted list, so the names with a word starting with a prefix
+    are found by bisection. Entries are ranked by popularity: views for
+    posts, published post counts for categories and tags.
+    
+    The index is tagged with the 'search' cache family version, which the
+    blog signals bump whenever posts, categories or tags change; a process
+    rebuilds its index the next time it sees a new version. Bumps made by
+    other processes may not be seen, so an index is also rebuilt once it is
+    older than the search results cache timeout.
+    """
+    
+    TYPE_ORDER = ('post', 'category', 'tag')
+    
+    _lock = threading.Lock()
+    _current = None
+    
+    def __init__(self, entries, version=None):
+        # entries: (text, type, popularity); tokens: (word, entry index)
+        self.version = version
+        self.built_at = time.monotonic()
+        self.entries = entries
+        self.tokens = sorted(
+            (word, i)
+            for i, (text, _, _) in enumerate(entries)
+            for word in set(self.normalize(text).split())
+        )
+    
+    @staticmethod
+    def normalize(text):
+        text = unicodedata.normalize('NFKD', text or '')
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+        return re.sub(r'[^\w\s]', ' ', text.lower())
+    
+    @classmethod
+    def build(cls, version=None):
+        """Index the current published content (three queries)"""
+        entries = [
+            (title, 'post', views) for title, views in
+            BlogPost.objects.filter(status='published').values_list('title', 'view_count')
+        ]
+        for model, kind, count_field in ((Category, 'category', 'post_count'), (Tag, 'tag', 'usage_count')):
+            entries.extend(
+                (name, kind, count) for name, count in
+                model.objects.filter(**{f'{count_field}__gt': 0}).values_list('name', count_field)
+            )
+        return cls(entries, version)
+    
+    @classmethod
+    def get(cls):
+        """This process's index, rebuilt if blog content changed since it was built"""
+        version = BlogCacheManager.get_namespace_version('search')
+        index = cls._current
+        if cls._outdated(index, version):
+            with cls._lock:
+                index = cls._current
+                if cls._outdated(index, version):
+                    index = cls._current = cls.build(version)
+        return index
+    
+    @staticmethod
+    def _outdated(index, version):
+        return (
+            index is None or index.version != version or
+            time.monotonic() - index.built_at > BlogCacheManager.CACHE_TIMEOUTS['search_results']
+        )
+    
+    def _matching(self, word):
+        """Indexes of entries with a word starting with `word`"""
+        matches = set()
+        position = bisect_left(self.tokens, (word,))
+        while position < len(self.tokens) and self.tokens[position][0].startswith(word):
+            matches.add(self.tokens[position][1])
+            position += 1
+        return matches
+    
+    def lookup(self, query, limits):
+        """Names whose words start with every word of `query`, most popular first
+        
+        `limits` maps each entry type to its maximum number of results;
+        returns (text, type) pairs ordered by type, then popularity.
+        """
+        words = self.normalize(query).split()
+        if not words:
+            return []
+        
+        matches = None
+        # Narrow down with the longest (most selective) word first
+        for word in sorted(words, key=len, reverse=True):
+            matches = self._matching(word) if matches is None else matches & self._matching(word)
+            if not matches:
+                return []
+        
+        ranked = sorted(
+            (self.entries[i] for i in matches),
+            key=lambda entry: (self.TYPE_ORDER.index(entry[1]), -entry[2], entry[0]),
+        )
+        results, counts = [], dict.fromkeys(self.TYPE_ORDER, 0)
+        for text, kind, _ in ranked:
+            if counts[kind] < limits.get(kind, 0):
+                counts[kind] += 1
+                results.append((text, kind))
+        return results
 
 
 class BlogSearchEngine:
@@ -37,76 +273,81 @@ class BlogSearchEngine:
         query = query.strip()
         filters = filters or {}
         
-        # Check cache first
-        cache_key = f"{query}_{hash(str(filters))}_{page}_{per_page}"
-        cached_results = self.cache_manager.get_cached_search_results(cache_key)
-        if cached_results:
-            return cached_results
-        
-        # Build base queryset
-        queryset = BlogPost.objects.filter(status='published')
-        
-        # Apply search
-        if hasattr(BlogPost, 'search_vector'):
-            # Use PostgreSQL full-text search if available
-            search_query = SearchQuery(query)
-            queryset = queryset.annotate(
-                search=SearchVector('title', 'content', 'excerpt'),
-                rank=SearchRank('search', search_query)
-            ).filter(search=search_query).order_by('-rank', '-published_date')
-        else:
-            # Fallback to basic search
-            queryset = self._basic_search(queryset, query)
-        
-        # Apply filters
-        queryset = self._apply_filters(queryset, filters)
+        # The cached entry covers every page of this query and filter set
+        entry_key = self._entry_key(query, filters)
+        entry = self.cache_manager.get_cached_search_results(entry_key)
+        if entry is None:
+            entry = self._build_entry(query, filters)
+            self.cache_manager.cache_search_results(entry_key, entry)
         
-        # Get total count before pagination
-        total_count = queryset.count()
-        
-        # Paginate results
-        paginator = Paginator(queryset, per_page)
+        # Paginate the ranked IDs and load only this page's posts
+        paginator = Paginator(entry['ids'], per_page)
         page_obj = paginator.get_page(page)
+        page_ids = list(page_obj.object_list)
+        found = BlogPost.objects.filter(status='published').select_related(
+            'author', 'category'
+        ).in_bulk(page_ids)
+        posts = [found[post_id] for post_id in page_ids if post_id in found]
+        
+        # Highlight the matches of the posts on this page
+        snippets = self.get_backend().snippets(posts, query)
+        for post in posts:
+            post.search_snippet = snippets.get(post.id, '')
         
         # Prepare results
-        results = {
+        return {
             'query': query,
-            'results': list(page_obj.object_list),
-            'total_count': total_count,
+            'results': posts,
+            'total_count': entry['total_count'],
             'page': page,
             'per_page': per_page,
             'total_pages': paginator.num_pages,
             'has_next': page_obj.has_next(),
             'has_previous': page_obj.has_previous(),
-            'suggestions': self._get_search_suggestions(query),
+            'suggestions': entry['suggestions'],
             'filters_applied': filters,
-            'related_categories': self._get_related_categories(query),
-            'related_tags': self._get_related_tags(query),
+            'related_categories': entry['related_categories'],
+            'related_tags': entry['related_tags'],
         }
+    
+    @staticmethod
+    def _entry_key(query, filters):
+        """Deterministic key for a query and its filters, the same in every process"""
+        filters = {name: value for name, value in filters.items() if value}
+        return hashlib.md5(json.dumps([query, filters], sort_keys=True, default=str).encode()).hexdigest()
+    
+    def _build_entry(self, query, filters):
+        """Run the search once and keep only plain, picklable data.
         
-        # Cache results
-        self.cache_manager.cache_search_results(cache_key, results)
+        The entry holds the ranked IDs of every matching post, the total
+        count and the facet counts; pages are rehydrated from the IDs.
+        """
+        # Build base queryset
+        queryset = BlogPost.objects.filter(status='published')
         
-        return results
-    
-    def _basic_search(self, queryset, query):
-        """Basic search implementation"""
-        search_terms = query.split()
+        # Apply search
+        queryset = self.get_backend().search(queryset, query)
         
-        # Build Q objects for each term
-        q_objects = Q()
-        for term in search_terms:
-            q_objects |= (
-                Q(title__icontains=term) |
-                Q(content__icontains=term) |
-                Q(excerpt__icontains=term) |
-                Q(seo_meta_title__icontains=term) |
-                Q(seo_meta_description__icontains=term) |
-                Q(category__name__icontains=term) |
-                Q(tags__name__icontains=term)
-            )
+        # Apply filters
+        queryset = self._apply_filters(queryset, filters)
         
-        return queryset.filter(q_objects).distinct().order_by('-published_date')
+        # Joins (e.g. on tags) can repeat a post; keep its best rank
+        ids = list(dict.fromkeys(queryset.values_list('id', flat=True)))
+        
+        return {
+            'ids': ids,
+            'total_count': len(ids),
+            'suggestions': self._get_search_suggestions(query),
+            'related_categories': self._get_related_categories(ids),
+            'related_tags': self._get_related_tags(ids),
+        }
+    
+    @staticmethod
+    def get_backend():
+        """Full-text search on PostgreSQL, substring matching elsewhere"""
+        if connection.vendor == 'postgresql':
+            return PostgresSearchBackend()
+        return BasicSearchBackend()
     
     def _apply_filters(self, queryset, filters):
         """Apply search filters"""
@@ -153,51 +394,31 @@ class BlogSearchEngine:
     
     def _get_search_suggestions(self, query):
         """Get search suggestions based on query"""
-        suggestions = []
-        
-        # Get similar titles
-        similar_posts = BlogPost.objects.filter(
-            status='published',
-            title__icontains=query
-        ).values_list('title', flat=True)[:5]
-        
-        suggestions.extend(similar_posts)
-        
-        # Get related categories
-        related_categories = Category.objects.filter(
-            name__icontains=query
-        ).values_list('name', flat=True)[:3]
-        
-        suggestions.extend(related_categories)
-        
-        # Get related tags
-        related_tags = Tag.objects.filter(
-            name__icontains=query
-        ).values_list('name', flat=True)[:3]
-        
-        suggestions.extend(related_tags)
-        
-        return list(set(suggestions))[:8]  # Remove duplicates and limit
-    
-    def _get_related_categories(self, query):
-        """Get categories related to search query"""
-        return Category.objects.filter(
-            Q(name__icontains=query) |
-            Q(blog_posts__title__icontains=query) |
-            Q(blog_posts__content__icontains=query)
-        ).annotate(
-            post_count=Count('blog_posts', filter=Q(blog_posts__status='published'))
-        ).filter(post_count__gt=0).distinct()[:5]
-    
-    def _get_related_tags(self, query):
-        """Get tags related to search query"""
-        return Tag.objects.filter(
-            Q(name__icontains=query) |
-            Q(blog_posts__title__icontains=query) |
-            Q(blog_posts__content__icontains=query)
-        ).annotate(
-            post_count=Count('blog_posts', filter=Q(blog_posts__status='published'))
-        ).filter(post_count__gt=0).distinct()[:8]
+        matches = AutocompleteIndex.get().lookup(query, {'post': 5, 'category': 3, 'tag': 3})
+        suggestions = list(dict.fromkeys(text for text, _ in matches))
+        return suggestions[:8]  # Remove duplicates and limit
+    
+    def _get_related_categories(self, ids):
+        """Categories of the matched posts, most hits first, as dicts with their post counts"""
+        if not ids:
+            return []
+        return list(
+            Category.objects.filter(blog_posts__id__in=ids)
+            .annotate(hits=Count('blog_posts'))
+            .order_by('-hits', 'name')
+            .values('id', 'name', 'slug', 'post_count')[:5]
+        )
+    
+    def _get_related_tags(self, ids):
+        """Tags of the matched posts, most hits first, as dicts with their post counts"""
+        if not ids:
+            return []
+        return list(
+            Tag.objects.filter(blog_posts__id__in=ids)
+            .annotate(hits=Count('blog_posts'))
+            .order_by('-hits', 'name')
+            .values('id', 'name', 'slug', post_count=F('usage_count'))[:8]
+        )
     
     def _empty_results(self):
         """Return empty search results"""
@@ -217,35 +438,12 @@ class BlogSearchEngine:
         }
     
     def get_autocomplete_suggestions(self, query, limit=10):
-        """Get autocomplete suggestions for search input"""
+        """Get autocomplete suggestions for search input, from the in-memory index"""
         if not query or len(query) < 2:
             return []
         
-        suggestions = []
-        
-        # Blog post titles
-        post_titles = BlogPost.objects.filter(
-            status='published',
-            title__icontains=query
-        ).values_list('title', flat=True)[:limit//2]
-        
-        suggestions.extend([{'text': title, 'type': 'post'} for title in post_titles])
-        
-        # Categories
-        categories = Category.objects.filter(
-            name__icontains=query
-        ).values_list('name', flat=True)[:3]
-        
-        suggestions.extend([{'text': cat, 'type': 'category'} for cat in categories])
-        
-        # Tags
-        tags = Tag.objects.filter(
-            name__icontains=query
-        ).values_list('name', flat=True)[:3]
-        
-        suggestions.extend([{'text': tag, 'type': 'tag'} for tag in tags])
-        
-        return suggestions[:limit]
+        matches = AutocompleteIndex.get().lookup(query, {'post': limit // 2, 'category': 3, 'tag': 3})
+        return [{'text': text, 'type': kind} for text, kind in matches][:limit]
     
     def get_trending_searches(self, limit=10):
         """Get trending search queries"""
@@ -255,16 +453,12 @@ class BlogSearchEngine:
         trending = []
         
         # Popular categories
-        popular_categories = Category.objects.annotate(
-            post_count=Count('blog_posts', filter=Q(blog_posts__status='published'))
-        ).filter(post_count__gt=0).order_by('-post_count')[:limit//2]
+        popular_categories = Category.objects.filter(post_count__gt=0).order_by('-post_count')[:limit//2]
         
         trending.extend([{'text': cat.name, 'type': 'category'} for cat in popular_categories])
         
         # Popular tags
-        popular_tags = Tag.objects.annotate(
-            post_count=Count('blog_posts', filter=Q(blog_posts__status='published'))
-        ).filter(post_count__gt=0).order_by('-post_count')[:limit//2]
+        popular_tags = Tag.objects.filter(usage_count__gt=0).order_by('-usage_count')[:limit//2]
         
         trending.extend([{'text': tag.name, 'type': 'tag'} for tag in popular_tags])
         
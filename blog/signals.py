@@ -0,0 +1,193 @@
+"""Signals invalidating the blog caches, search data, post counts and related posts when posts, categories or tags change."""
+
+from django.db import connection
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .cache_utils import BlogCacheManager
+from .models import BlogPost, Category, Tag
+from .post_counts import PostCountService
+from .related import RelatedPost, RelatedPostService
+
+
+@receiver([post_save, post_delete], sender=BlogPost)
+def blog_post_changed(sender, instance: BlogPost, **kwargs) -> None:
+    BlogCacheManager.schedule_invalidation(*BlogCacheManager.INVALIDATES['post'])
+
+
+# Fields of the post that make up BlogPost.search_vector; the tag names are added by the tag signals
+SEARCH_FIELDS = {'title', 'excerpt', 'content', 'seo_meta_title', 'seo_meta_description', 'category'}
+
+
+def refresh_search_vectors(posts) -> None:
+    """Recompute the stored full-text vectors of a queryset or list of post ids (PostgreSQL only)."""
+    if connection.vendor != 'postgresql':
+        return
+    if not hasattr(posts, 'update'):
+        posts = list(posts)
+        if not posts:
+            return
+        posts = BlogPost.objects.filter(pk__in=posts)
+    from .search import PostgresSearchBackend
+    PostgresSearchBackend.update_vectors(posts)
+
+
+@receiver(post_save, sender=BlogPost)
+def blog_post_search_vector(sender, instance: BlogPost, update_fields=None, **kwargs) -> None:
+    """Recompute the stored full-text vector when searchable text may have changed."""
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return
+    refresh_search_vectors([instance.pk])
+
+
+# Fields that decide which category and tag counts a post contributes to
+COUNT_FIELDS = {'status', 'category'}
+
+# Fields that feed the related-post similarity, besides the tags
+RELATED_FIELDS = {'title', 'excerpt', 'category', 'status'}
+
+
+@receiver(pre_save, sender=BlogPost)
+def blog_post_snapshot(sender, instance: BlogPost, update_fields=None, **kwargs) -> None:
+    """Remember the stored values the counts and related posts depend on, to tell what the save changes."""
+    instance._snapshot = None
+    watched = COUNT_FIELDS | RELATED_FIELDS
+    if instance.pk is None or (update_fields is not None and not watched & set(update_fields)):
+        return
+    instance._snapshot = BlogPost.objects.filter(pk=instance.pk).values(
+        'status', 'category_id', 'title', 'excerpt'
+    ).first()
+
+
+@receiver(post_save, sender=BlogPost)
+def blog_post_counts(sender, instance: BlogPost, created: bool, update_fields=None, **kwargs) -> None:
+    """Recount categories (now) and tags (on commit) when a post's status or category changed."""
+    if update_fields is not None and not COUNT_FIELDS & set(update_fields):
+        return
+    old = getattr(instance, '_snapshot', None) or {'status': None, 'category_id': None}
+    status_changed = old['status'] != instance.status
+    if not (status_changed or old['category_id'] != instance.category_id):
+        return
+    if status_changed and 'published' in (old['status'], instance.status):
+        PostCountService.recount_categories({old['category_id'], instance.category_id})
+        if not created:
+            PostCountService.schedule_tag_recount(instance.tags.values_list('pk', flat=True))
+    elif instance.status == 'published':
+        PostCountService.recount_categories({old['category_id'], instance.category_id})
+
+
+@receiver(post_save, sender=BlogPost)
+def blog_post_related_stale(sender, instance: BlogPost, update_fields=None, **kwargs) -> None:
+    """Flag a published (or formerly published) post whose similarity inputs changed."""
+    if update_fields is not None and not RELATED_FIELDS & set(update_fields):
+        return
+    old = getattr(instance, '_snapshot', None) or {}
+    if 'published' not in (old.get('status'), instance.status):
+        return
+    if any(old.get(field) != getattr(instance, field) for field in ('status', 'category_id', 'title', 'excerpt')):
+        RelatedPostService.mark_stale([instance.pk])
+
+
+@receiver(pre_delete, sender=BlogPost)
+def blog_post_delete_snapshot(sender, instance: BlogPost, **kwargs) -> None:
+    """The tag links and related entries are gone by post_delete, so collect them first."""
+    if instance.status == 'published':
+        instance._count_tag_ids = list(instance.tags.values_list('pk', flat=True))
+        instance._listed_by_ids = list(RelatedPost.objects.filter(related=instance).values_list('post_id', flat=True))
+    else:
+        instance._count_tag_ids = instance._listed_by_ids = []
+
+
+@receiver(post_delete, sender=BlogPost)
+def blog_post_deleted_counts(sender, instance: BlogPost, **kwargs) -> None:
+    if instance.status != 'published':
+        return
+    PostCountService.recount_categories([instance.category_id])
+    PostCountService.schedule_tag_recount(getattr(instance, '_count_tag_ids', []))
+    # Lists that included the post are one short now
+    RelatedPostService.mark_stale(getattr(instance, '_listed_by_ids', []))
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance: Category, **kwargs) -> None:
+    BlogCacheManager.schedule_invalidation(*BlogCacheManager.INVALIDATES['category'])
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(sender, instance: Tag, **kwargs) -> None:
+    BlogCacheManager.schedule_invalidation(*BlogCacheManager.INVALIDATES['tag'])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+def count_saved(sender, instance, update_fields=None, **kwargs) -> None:
+    """A full save writes back the count loaded with the instance, which may be stale; recount it."""
+    count_field = 'post_count' if sender is Category else 'usage_count'
+    if update_fields is not None and count_field not in update_fields:
+        return
+    if sender is Category:
+        PostCountService.recount_categories([instance.pk])
+    else:
+        PostCountService.recount_tags([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def category_search_vectors(sender, instance: Category, created: bool, **kwargs) -> None:
+    """The category name is part of its posts' search vectors."""
+    if not created:
+        refresh_search_vectors(BlogPost.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=Tag)
+def tag_search_vectors(sender, instance: Tag, created: bool, **kwargs) -> None:
+    """The tag names are part of their posts' search vectors."""
+    if not created:
+        refresh_search_vectors(BlogPost.objects.filter(tags=instance))
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Tag)
+def search_term_deleting(sender, instance, **kwargs) -> None:
+    """Remember the posts of a category or tag; deleting it leaves no trace to find them by."""
+    if connection.vendor == 'postgresql':
+        instance._search_post_ids = list(instance.blog_posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def search_term_deleted(sender, instance, **kwargs) -> None:
+    refresh_search_vectors(getattr(instance, '_search_post_ids', []))
+
+
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def blog_post_tags_changed(sender, action: str, instance, reverse: bool, pk_set=None, **kwargs) -> None:
+    """Tagging changes the post, the tag counts and the related posts."""
+    if reverse:
+        # tag.blog_posts.add(...) and friends: only this tag's count can change
+        if action == 'pre_clear':
+            instance._cleared_post_ids = list(instance.blog_posts.values_list('pk', flat=True))
+        elif action == 'post_clear':
+            PostCountService.schedule_tag_recount([instance.pk])
+            RelatedPostService.mark_stale(getattr(instance, '_cleared_post_ids', []))
+        elif action in ('post_add', 'post_remove'):
+            PostCountService.schedule_tag_recount([instance.pk])
+            RelatedPostService.mark_stale(pk_set or [])
+    elif instance.status == 'published':
+        if action == 'pre_clear':
+            instance._count_tag_ids = list(instance.tags.values_list('pk', flat=True))
+        elif action == 'post_clear':
+            PostCountService.schedule_tag_recount(getattr(instance, '_count_tag_ids', []))
+            RelatedPostService.mark_stale([instance.pk])
+        elif action in ('post_add', 'post_remove'):
+            PostCountService.schedule_tag_recount(pk_set or [])
+            RelatedPostService.mark_stale([instance.pk])
+    
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        BlogCacheManager.schedule_invalidation(*BlogCacheManager.INVALIDATES['tag'])
+        # Tag names are part of the search vector
+        if not reverse:
+            refresh_search_vectors([instance.pk])
+        elif action == 'post_clear':
+            refresh_search_vectors(getattr(instance, '_cleared_post_ids', []))
+        else:
+            refresh_search_vectors(pk_set or [])
@@ -1,7 +1,17 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from .models import BlogPost, Category, Tag
+from .cache_utils import BlogCacheManager
+from .related import RelatedPost, RelatedPostService
+from .view_counter import BlogViewCounter
+from unittest import mock
+import time
+from io import StringIO
+from django.core.management import call_command
 from accounts.models import AdminProfile
 
 User = get_user_model()
@@ -281,3 +291,734 @@ class BlogStatusFilterTestCase(TestCase):
         blog_posts = list(response.context['blog_posts'])
         self.assertIn(self.posts['published'], blog_posts)
         self.assertNotIn(self.posts['draft'], blog_posts)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'blog-cache-tests'}})
+class BlogCacheInvalidationTestCase(TestCase):
+    """Namespace-versioned blog caches are invalidated by model changes"""
+    
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='cache_author', password='testpass123')
+        self.category = Category.objects.create(name='Cached Category')
+        self.post = BlogPost.objects.create(
+            title='Cached Post',
+            content='Cached content',
+            author=self.author,
+            category=self.category,
+            status='published'
+        )
+    
+    def test_bump_invalidates_whole_family_only(self):
+        BlogCacheManager.cache_blog_list(['page 1'], {'page': 1})
+        BlogCacheManager.cache_blog_list(['page 2'], {'page': 2})
+        BlogCacheManager.cache_search_results('concrete', {'total_count': 3})
+        
+        BlogCacheManager.bump_namespace('blog_list')
+        
+        self.assertIsNone(BlogCacheManager.get_cached_blog_list({'page': 1}))
+        self.assertIsNone(BlogCacheManager.get_cached_blog_list({'page': 2}))
+        self.assertEqual(BlogCacheManager.get_cached_search_results('concrete'), {'total_count': 3})
+    
+    def test_lost_version_counter_does_not_revive_old_entries(self):
+        BlogCacheManager.cache_search_results('steel', {'total_count': 1})
+        BlogCacheManager.bump_namespace('search')
+        cache.delete(BlogCacheManager._version_key('search'))
+        
+        self.assertIsNone(BlogCacheManager.get_cached_search_results('steel'))
+    
+    def test_post_save_invalidates_on_commit(self):
+        self.assertEqual([p.pk for p in BlogCacheManager.get_cached_recent_posts()], [self.post.pk])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            newer = BlogPost.objects.create(
+                title='Newer Post', content='More', author=self.author, status='published'
+            )
+        
+        self.assertEqual(
+            [p.pk for p in BlogCacheManager.get_cached_recent_posts()], [newer.pk, self.post.pk]
+        )
+    
+    def test_category_and_tag_changes_invalidate(self):
+        self.assertEqual([c.name for c in BlogCacheManager.get_cached_categories()], ['Cached Category'])
+        BlogCacheManager.cache_search_results('cached', {'total_count': 1})
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Renamed Category'
+            self.category.save()
+        self.assertEqual([c.name for c in BlogCacheManager.get_cached_categories()], ['Renamed Category'])
+        
+        tag = Tag.objects.create(name='Concrete')
+        BlogCacheManager.cache_search_results('cached', {'total_count': 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.tags.add(tag)
+        self.assertIsNone(BlogCacheManager.get_cached_search_results('cached'))
+        self.assertEqual([t.name for t in BlogCacheManager.get_cached_popular_tags()], ['Concrete'])
+
+
+@override_settings(BLOG_VIEW_FLUSH_IN_PROCESS=True)
+class BlogViewCounterTestCase(TestCase):
+    """Blog views are buffered and written in one batched update"""
+    
+    def setUp(self):
+        BlogViewCounter._pending.clear()
+        self.addCleanup(BlogViewCounter._pending.clear)
+        patcher = mock.patch.object(BlogViewCounter, 'start_worker')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        author = User.objects.create_user(username='view_author', password='testpass123')
+        self.post = BlogPost.objects.create(
+            title='Viewed Post', content='Content', author=author, status='published', view_count=5
+        )
+        self.other = BlogPost.objects.create(
+            title='Other Post', content='Content', author=author, status='published'
+        )
+    
+    def test_views_are_buffered_until_flush(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(BlogViewCounter.record_view(self.post.id), 1)
+            self.assertEqual(BlogViewCounter.record_view(self.post.id), 2)
+            BlogViewCounter.record_view(self.other.id)
+        
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 5)
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(BlogViewCounter.flush(), 2)
+        
+        self.post.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.post.view_count, self.other.view_count), (7, 1))
+        self.assertEqual(BlogViewCounter.pending_views(self.post.id), 0)
+        self.assertEqual(BlogViewCounter.flush(), 0)
+    
+    def test_detail_page_shows_stored_plus_pending_views(self):
+        BlogViewCounter.record_view(self.post.id)
+        
+        response = self.client.get(reverse('blog:blog_detail', args=[self.post.slug]))
+        
+        self.assertEqual(response.context['blog_post'].view_count, 7)
+        self.assertEqual(BlogViewCounter.pending_views(self.post.id), 2)
+    
+    def test_failed_flush_keeps_views(self):
+        BlogViewCounter.record_view(self.post.id)
+        
+        with mock.patch('django.db.models.query.QuerySet.update', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                BlogViewCounter.flush()
+        
+        self.assertEqual(BlogViewCounter.pending_views(self.post.id), 1)
+
+
+@override_settings(BLOG_ANALYTICS_IN_PROCESS=True, BLOG_ANALYTICS_BATCH_SIZE=2, BLOG_ANALYTICS_QUEUE_SIZE=3)
+class AnalyticsIngestorTestCase(TestCase):
+    """Analytics events are queued and written with bulk_create"""
+    
+    def setUp(self):
+        from .analytics import AnalyticsIngestor
+        AnalyticsIngestor._queue = None
+        AnalyticsIngestor.dropped = 0
+        self.addCleanup(setattr, AnalyticsIngestor, '_queue', None)
+        patcher = mock.patch.object(AnalyticsIngestor, 'start_worker')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.author = User.objects.create_user(username='analytics_author', password='testpass123')
+        self.post = BlogPost.objects.create(
+            title='Tracked Post', content='Content', author=self.author, status='published'
+        )
+    
+    def test_events_are_written_in_batches(self):
+        from .analytics import AnalyticsIngestor, AnalyticsManager, BlogAnalytics
+        request = mock.Mock(META={'HTTP_USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0) Chrome/120', 'REMOTE_ADDR': '10.0.0.1'})
+        request.session.session_key = 'abc'
+        request.user = self.author
+        
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                AnalyticsManager.track_event('post_view', request, blog_post=self.post)
+        self.assertEqual(BlogAnalytics.objects.count(), 0)
+        
+        # Two batches of at most BLOG_ANALYTICS_BATCH_SIZE rows
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(AnalyticsIngestor.flush(), 3)
+        self.assertEqual(sum(q['sql'].startswith('INSERT') for q in queries.captured_queries), 2)
+        
+        event = BlogAnalytics.objects.first()
+        self.assertEqual(BlogAnalytics.objects.count(), 3)
+        self.assertEqual((event.device_type, event.browser, event.os), ('desktop', 'Chrome', 'Windows'))
+        self.assertEqual((event.user, event.blog_post, event.session_id), (self.author, self.post, 'abc'))
+    
+    def test_full_queue_drops_and_counts(self):
+        from .analytics import AnalyticsIngestor, AnalyticsManager
+        request = mock.Mock(META={}, user=mock.Mock(is_authenticated=False))
+        request.session.session_key = None
+        
+        results = [AnalyticsManager.track_event('search', request, search_query=str(i)) for i in range(5)]
+        
+        self.assertEqual(sum(result is not None for result in results), 3)
+        self.assertEqual(AnalyticsIngestor.dropped, 2)
+    
+    def test_bad_row_does_not_lose_batch(self):
+        from .analytics import AnalyticsIngestor, BlogAnalytics
+        AnalyticsIngestor.enqueue(BlogAnalytics(event_type='post_view', blog_post_id=self.post.id))
+        AnalyticsIngestor.enqueue(BlogAnalytics(event_type='post_view', blog_post_id=self.post.id + 1000))
+        
+        with mock.patch.object(BlogAnalytics.objects, 'bulk_create', side_effect=RuntimeError), \
+                mock.patch.object(BlogAnalytics, 'save', autospec=True, side_effect=[None, RuntimeError]):
+            self.assertEqual(AnalyticsIngestor.flush(), 1)
+    
+    def test_user_agent_parsing_is_memoized(self):
+        from .analytics import AnalyticsManager, parse_user_agent
+        parse_user_agent.cache_clear()
+        
+        with mock.patch.object(AnalyticsManager, 'get_browser', wraps=AnalyticsManager.get_browser) as get_browser:
+            self.assertEqual(parse_user_agent('Mozilla/5.0 (iPad) Safari'), ('tablet', 'Safari', 'iOS'))
+            parse_user_agent('Mozilla/5.0 (iPad) Safari')
+        get_browser.assert_called_once()
+
+
+class AnalyticsRollupTestCase(TestCase):
+    """Dashboards read the daily rollup plus live events for the current day"""
+    
+    def setUp(self):
+        from .analytics import BlogAnalytics
+        from django.utils import timezone
+        from datetime import timedelta
+        
+        author = User.objects.create_user(username='rollup_author', password='testpass123')
+        self.post = BlogPost.objects.create(title='Rolled Post', content='Content', author=author, status='published')
+        self.now = timezone.now()
+        yesterday = self.now - timedelta(days=1)
+        
+        def event(when, event_type='post_view', session='s1', **kwargs):
+            BlogAnalytics.objects.create(
+                event_type=event_type, timestamp=when, session_id=session,
+                device_type='mobile', browser='Safari', **kwargs
+            )
+        
+        event(yesterday, blog_post=self.post, time_on_page=30)
+        event(yesterday, blog_post=self.post, time_on_page=60)
+        event(yesterday, 'search', session='s2', search_query='concrete')
+        event(yesterday, 'social_share', session='s3', blog_post=self.post, social_platform='facebook')
+        event(self.now, blog_post=self.post, session='s4')
+    
+    def assert_dashboard(self, data):
+        self.assertEqual(data['total_views'], 3)
+        self.assertEqual(data['unique_visitors'], 4)
+        self.assertEqual(data['popular_posts'], [{'blog_post__title': 'Rolled Post', 'blog_post__slug': self.post.slug, 'views': 3}])
+        self.assertEqual(data['device_stats'], [{'device_type': 'mobile', 'count': 5}])
+        self.assertEqual(data['top_searches'], [{'search_query': 'concrete', 'count': 1}])
+        self.assertEqual(data['social_shares'], [{'social_platform': 'facebook', 'count': 1}])
+        self.assertEqual(data['avg_time_on_page'], 45)
+        self.assertEqual(data['bounce_rate'], 75)
+        self.assertEqual([day['views'] for day in data['daily_views'][-2:]], [2, 1])
+    
+    def test_dashboard_matches_before_and_after_rollup(self):
+        from .analytics import AnalyticsManager, BlogAnalyticsDaily
+        
+        self.assert_dashboard(AnalyticsManager.get_dashboard_data(30))
+        
+        out = StringIO()
+        call_command('rollup_blog_analytics', stdout=out)
+        self.assertIn('Rolled up 1 day(s)', out.getvalue())
+        self.assertFalse(BlogAnalyticsDaily.objects.filter(date=self.now.date()).exists())
+        
+        # The query count no longer depends on the number of days
+        with self.assertNumQueries(6):
+            data = AnalyticsManager.get_dashboard_data(90)
+        self.assert_dashboard(data)
+    
+    def test_rollup_is_incremental_and_idempotent(self):
+        from .analytics import AnalyticsRollup, BlogAnalyticsDaily
+        
+        AnalyticsRollup.rollup()
+        rows = BlogAnalyticsDaily.objects.count()
+        # Re-rolls only the last stored day, replacing its rows
+        self.assertEqual(AnalyticsRollup.rollup(), 1)
+        self.assertEqual(BlogAnalyticsDaily.objects.count(), rows)
+    
+    def test_post_analytics(self):
+        from .analytics import AnalyticsManager, AnalyticsRollup
+        AnalyticsRollup.rollup()
+        
+        data = AnalyticsManager.get_post_analytics(self.post, 7)
+        
+        self.assertEqual(data['total_views'], 3)
+        self.assertEqual(data['unique_visitors'], 2)
+        self.assertEqual(data['social_shares'], [{'social_platform': 'facebook', 'count': 1}])
+        self.assertEqual(len(data['daily_views']), 7)
+
+
+class BlogSearchBackendTestCase(TestCase):
+    """Search picks a backend for the database and highlights matches"""
+    
+    def setUp(self):
+        author = User.objects.create_user(username='search_author', password='testpass123')
+        self.post = BlogPost.objects.create(
+            title='Pouring Concrete', excerpt='Slabs', author=author, status='published',
+            content='<p>Before pouring, check the concrete mix &amp; the rebar.</p>',
+        )
+    
+    def test_sqlite_uses_basic_backend(self):
+        from .search import BasicSearchBackend, BlogSearchEngine
+        self.assertIsInstance(BlogSearchEngine.get_backend(), BasicSearchBackend)
+    
+    def test_results_carry_escaped_highlighted_snippets(self):
+        from .search import BlogSearchEngine
+        
+        results = BlogSearchEngine().search('concrete')
+        
+        self.assertEqual(results['results'], [self.post])
+        self.assertEqual(
+            results['results'][0].search_snippet,
+            'Before pouring, check the <mark>concrete</mark> mix &amp; the rebar.'
+        )
+    
+    def test_snippet_without_content_match_uses_excerpt(self):
+        from .search import BasicSearchBackend
+        
+        snippets = BasicSearchBackend().snippets([self.post], 'slabs')
+        
+        self.assertEqual(snippets, {self.post.id: 'Slabs'})
+    
+    def test_tag_and_category_changes_refresh_search_vectors(self):
+        """Their names are in the stored vectors, so renames and tagging recompute them"""
+        from .search import PostgresSearchBackend
+        
+        category = Category.objects.create(name='Foundations')
+        tag = Tag.objects.create(name='Rebar')
+        refreshed = []
+        with mock.patch.object(connection, 'vendor', 'postgresql'), \
+                mock.patch.object(PostgresSearchBackend, 'update_vectors') as update_vectors:
+            update_vectors.side_effect = lambda posts: refreshed.append(list(posts.values_list('pk', flat=True)))
+            self.post.category = category
+            self.post.save(update_fields=['category'])
+            self.post.tags.add(tag)
+            category.name = 'Footings'
+            category.save()
+            tag.name = 'Reinforcement'
+            tag.save()
+            tag.delete()
+        
+        self.assertEqual(refreshed, [[self.post.pk]] * 5)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'blog-autocomplete-tests'}})
+class AutocompleteIndexTestCase(TestCase):
+    """Autocomplete is answered from a per-process prefix index"""
+    
+    def setUp(self):
+        from .search import AutocompleteIndex
+        cache.clear()
+        AutocompleteIndex._current = None
+        self.addCleanup(setattr, AutocompleteIndex, '_current', None)
+        self.author = User.objects.create_user(username='autocomplete_author', password='testpass123')
+        category = Category.objects.create(name='Concrete Works')
+        self.popular = BlogPost.objects.create(
+            title='Curing Concrete Slabs', content='Text', author=self.author, status='published',
+            category=category, view_count=50,
+        )
+        BlogPost.objects.create(title='Concrete Café Fitout', content='Text', author=self.author, status='published')
+        BlogPost.objects.create(title='Concrete Draft', content='Text', author=self.author, status='draft')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.popular.tags.add(Tag.objects.create(name='Concreting'))
+    
+    def test_prefix_matches_ranked_by_type_and_popularity(self):
+        from .search import BlogSearchEngine
+        
+        suggestions = BlogSearchEngine().get_autocomplete_suggestions('conc')
+        
+        self.assertEqual(suggestions, [
+            {'text': 'Curing Concrete Slabs', 'type': 'post'},
+            {'text': 'Concrete Café Fitout', 'type': 'post'},
+            {'text': 'Concrete Works', 'type': 'category'},
+            {'text': 'Concreting', 'type': 'tag'},
+        ])
+    
+    def test_every_word_must_match_and_accents_are_ignored(self):
+        from .search import BlogSearchEngine
+        engine = BlogSearchEngine()
+        
+        self.assertEqual(engine.get_autocomplete_suggestions('cafe conc'), [{'text': 'Concrete Café Fitout', 'type': 'post'}])
+        self.assertEqual(engine.get_autocomplete_suggestions('slabs cafe'), [])
+    
+    def test_lookups_skip_database_until_content_changes(self):
+        from .search import BlogSearchEngine
+        engine = BlogSearchEngine()
+        engine.get_autocomplete_suggestions('curing')
+        
+        with self.assertNumQueries(0):
+            engine.get_autocomplete_suggestions('curing')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.create(title='Curing Timber', content='Text', author=self.author, status='published')
+        
+        texts = [s['text'] for s in engine.get_autocomplete_suggestions('curing')]
+        self.assertEqual(texts, ['Curing Concrete Slabs', 'Curing Timber'])
+    
+    def test_index_rebuilt_when_old(self):
+        """Changes whose version bump reached another process only show up once the index ages out"""
+        from .search import BlogSearchEngine
+        engine = BlogSearchEngine()
+        engine.get_autocomplete_suggestions('curing')
+        BlogPost.objects.bulk_create([
+            BlogPost(title='Curing Timber', slug='curing-timber', content='Text', author=self.author, status='published')
+        ])
+        
+        later = time.monotonic() + BlogCacheManager.CACHE_TIMEOUTS['search_results'] + 1
+        with mock.patch('blog.search.time.monotonic', return_value=later):
+            texts = [s['text'] for s in engine.get_autocomplete_suggestions('curing')]
+        self.assertEqual(texts, ['Curing Concrete Slabs', 'Curing Timber'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'blog-search-cache-tests'}})
+class SearchResultCacheTestCase(TestCase):
+    """Search caches ranked IDs and rehydrates one page at a time"""
+    
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='search_cache_author', password='testpass123')
+        category = Category.objects.create(name='Steel')
+        self.posts = [
+            BlogPost.objects.create(
+                title=f'Steel Frame {i}', content='Steel beams', author=author, status='published', category=category
+            )
+            for i in range(3)
+        ]
+    
+    def test_cached_entry_is_plain_data_for_all_pages(self):
+        import pickle
+        from .search import BlogSearchEngine
+        engine = BlogSearchEngine()
+        
+        first = engine.search('steel', {'sort': 'date_desc', 'tags': []}, page=1, per_page=2)
+        entry = BlogCacheManager.get_cached_search_results(engine._entry_key('steel', {'sort': 'date_desc'}))
+        
+        self.assertEqual(entry['ids'], [post.id for post in reversed(self.posts)])
+        self.assertEqual(entry['total_count'], 3)
+        self.assertEqual(entry['related_categories'][0]['name'], 'Steel')
+        self.assertEqual(pickle.loads(pickle.dumps(entry)), entry)
+        self.assertEqual(first['results'], [self.posts[2], self.posts[1]])
+        self.assertTrue(first['has_next'])
+        
+        # Another page is one query for its posts
+        with self.assertNumQueries(1):
+            second = engine.search('steel', {'sort': 'date_desc'}, page=2, per_page=2)
+        self.assertEqual(second['results'], [self.posts[0]])
+        self.assertEqual(second['total_count'], 3)
+    
+    def test_facets_come_from_matched_posts(self):
+        """Related tags are ranked by hits among the results, without scanning post text again"""
+        from .search import BlogSearchEngine
+        
+        author = self.posts[0].author
+        other = BlogPost.objects.create(title='Timber Deck', content='Wood', author=author, status='published')
+        beams, frames, decks = (Tag.objects.create(name=name) for name in ('Beams', 'Frames', 'Decks'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts[0].tags.add(beams, frames)
+            self.posts[1].tags.add(beams)
+            other.tags.add(decks)
+        
+        with CaptureQueriesContext(connection) as queries:
+            entry = BlogSearchEngine()._build_entry('steel', {})
+        
+        self.assertEqual([tag['name'] for tag in entry['related_tags']], ['Beams', 'Frames'])
+        self.assertEqual(entry['related_tags'][0]['post_count'], 2)
+        self.assertEqual([category['name'] for category in entry['related_categories']], ['Steel'])
+        # The facets are the last two queries, keyed on the matched IDs
+        for query in queries[-2:]:
+            self.assertIn(' IN (', query['sql'])
+            self.assertNotIn('LIKE', query['sql'])
+    
+    def test_entry_key_is_deterministic(self):
+        from .search import BlogSearchEngine
+        
+        self.assertEqual(
+            BlogSearchEngine._entry_key('steel', {'tags': ['a'], 'sort': 'title', 'category': ''}),
+            BlogSearchEngine._entry_key('steel', {'sort': 'title', 'tags': ['a']}),
+        )
+
+
+class PostCountServiceTestCase(TestCase):
+    """Published-post counts on categories and tags follow post changes"""
+    
+    def setUp(self):
+        self.author = User.objects.create_user(username='count_author', password='testpass123')
+        self.steel = Category.objects.create(name='Steel')
+        self.timber = Category.objects.create(name='Timber')
+        self.beams = Tag.objects.create(name='Beams')
+        self.roofs = Tag.objects.create(name='Roofs')
+        self.post = BlogPost.objects.create(
+            title='Steel Beams', content='Content', author=self.author, category=self.steel, status='published'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.tags.add(self.beams, self.roofs)
+    
+    def assertCounts(self, steel, timber, beams, roofs):
+        self.assertEqual(
+            (
+                Category.objects.get(pk=self.steel.pk).post_count,
+                Category.objects.get(pk=self.timber.pk).post_count,
+                Tag.objects.get(pk=self.beams.pk).usage_count,
+                Tag.objects.get(pk=self.roofs.pk).usage_count,
+            ),
+            (steel, timber, beams, roofs),
+        )
+    
+    def test_publishing_and_unpublishing(self):
+        self.assertCounts(1, 0, 1, 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.status = 'draft'
+            self.post.save()
+        self.assertCounts(0, 0, 0, 0)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.status = 'published'
+            self.post.save()
+        self.assertCounts(1, 0, 1, 1)
+    
+    def test_drafts_are_not_counted(self):
+        draft = BlogPost.objects.create(title='Draft', content='Content', author=self.author, category=self.steel)
+        with self.captureOnCommitCallbacks(execute=True):
+            draft.tags.add(self.beams)
+        self.assertCounts(1, 0, 1, 1)
+    
+    def test_moving_category_and_retagging(self):
+        self.post.category = self.timber
+        self.post.save()
+        self.assertCounts(0, 1, 1, 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.tags.remove(self.roofs)
+        self.assertCounts(0, 1, 1, 0)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.tags.clear()
+        self.assertCounts(0, 1, 0, 0)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.roofs.blog_posts.add(self.post)
+        self.assertCounts(0, 1, 0, 1)
+    
+    def test_deleting_a_post(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.delete()
+        self.assertCounts(0, 0, 0, 0)
+    
+    def test_tag_recount_waits_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.post.tags.remove(self.roofs)
+            self.post.tags.add(self.roofs)
+            self.post.tags.remove(self.beams)
+        self.assertCounts(1, 0, 1, 1)
+        
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE "blog_tag"')]), 1)
+        self.assertCounts(1, 0, 0, 1)
+    
+    def test_unrelated_saves_skip_recount(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.post.title = 'Renamed'
+            self.post.save(update_fields=['title'])
+        self.assertFalse([q for q in queries if 'blog_tag' in q['sql'] or 'COALESCE' in q['sql']])
+    
+    def test_saving_a_stale_instance_keeps_the_count(self):
+        self.steel.name = 'Structural Steel'
+        self.steel.save()
+        self.beams.name = 'Steel Beams'
+        self.beams.save()
+        self.assertCounts(1, 0, 1, 1)
+    
+    def test_copies_and_deleted_rows_save_normally(self):
+        """Full saves keep Django's insert-or-update behaviour; the count is corrected afterwards"""
+        copy = Category.objects.get(pk=self.steel.pk)
+        copy.pk = None
+        copy.name, copy.slug = 'Steel Copy', 'steel-copy'
+        copy.save()
+        self.assertEqual(Category.objects.get(pk=copy.pk).post_count, 0)
+        
+        tag = Tag.objects.get(pk=self.beams.pk)
+        Tag.objects.filter(pk=tag.pk).delete()
+        tag.save()
+        self.assertEqual(Tag.objects.get(pk=tag.pk).usage_count, 0)
+    
+    def test_recount_all_repairs_drift(self):
+        Category.objects.update(post_count=7)
+        Tag.objects.update(usage_count=7)
+        
+        from .post_counts import PostCountService
+        PostCountService.recount_all()
+        self.assertCounts(1, 0, 1, 1)
+
+
+class TagResolveNamesTestCase(TestCase):
+    """Tag names are resolved to tags with set-based queries"""
+    
+    def setUp(self):
+        self.steel = Tag.objects.create(name='Steel')
+    
+    def test_reuses_existing_and_creates_missing_tags(self):
+        with self.assertNumQueries(3):
+            tags = Tag.resolve_names([' Steel', 'Concrete Mix', '', 'Steel', 'Timber '])
+        
+        self.assertEqual([tag.name for tag in tags], ['Steel', 'Concrete Mix', 'Timber'])
+        self.assertEqual(tags[0], self.steel)
+        self.assertEqual(Tag.objects.get(name='Concrete Mix').slug, 'concrete-mix')
+        self.assertEqual(Tag.objects.count(), 3)
+    
+    def test_existing_names_take_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(Tag.resolve_names(['Steel']), [self.steel])
+        self.assertEqual(Tag.resolve_names(['', '  ']), [])
+    
+    def test_slug_collision_resolves_to_existing_tag(self):
+        self.assertEqual(Tag.resolve_names(['steel']), [self.steel])
+        self.assertEqual(Tag.objects.count(), 1)
+    
+    def test_saving_post_with_many_tags_is_set_based(self):
+        author = User.objects.create_user(username='tag_author', password='testpass123')
+        post = BlogPost.objects.create(title='Tagged', content='Content', author=author, status='published')
+        names = [f'Tag {i}' for i in range(15)]
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                post.tags.set(Tag.resolve_names(names))
+                post.save()
+        
+        self.assertLess(len(queries), 15)
+        self.assertEqual(
+            sorted(Tag.objects.filter(name__in=names).values_list('usage_count', flat=True)), [1] * 15
+        )
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'blog-sidebar-tests'}})
+class BlogSidebarCacheTestCase(TestCase):
+    """Public pages list categories and tags without aggregating posts"""
+    
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='sidebar_author', password='testpass123')
+        self.category = Category.objects.create(name='Sidebar Category')
+        self.tag = Tag.objects.create(name='Sidebar Tag')
+        self.post = BlogPost.objects.create(
+            title='Sidebar Post', content='Content', author=self.author, category=self.category, status='published'
+        )
+        self.post.tags.add(self.tag)
+    
+    def test_sidebar_renders_from_versioned_fragment(self):
+        url = reverse('blog:blog_detail', kwargs={'slug': self.post.slug})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, 'Sidebar Category <span>(1)</span>', html=False)
+        self.assertFalse([q for q in queries if 'GROUP BY' in q['sql']])
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([q for q in queries if '"post_count" >' in q['sql'] or '"usage_count" >' in q['sql']])
+        
+        # A new published post bumps the sidebar version on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.create(
+                title='Another Post', content='Content', author=self.author, category=self.category, status='published'
+            )
+        self.assertContains(self.client.get(url), 'Sidebar Category <span>(2)</span>', html=False)
+
+
+class RelatedPostServiceTestCase(TestCase):
+    """Related posts are precomputed, ranked deterministically and refreshed incrementally"""
+    
+    def setUp(self):
+        self.author = User.objects.create_user(username='related_author', password='testpass123')
+        self.steel = Category.objects.create(name='Steel')
+        self.timber = Category.objects.create(name='Timber')
+        beams, welding, roofs = (Tag.objects.create(name=name) for name in ('Beams', 'Welding', 'Roofs'))
+        
+        self.post = self.create('Designing steel beams', self.steel, beams, welding)
+        self.same_tags = self.create('Welded beam connections', self.timber, beams, welding)
+        self.same_category = self.create('Choosing a steel supplier', self.steel)
+        self.similar_text = self.create('Designing timber beams', self.timber, roofs)
+        self.unrelated = self.create('Office party photos', None)
+        RelatedPostService.rebuild()
+    
+    def create(self, title, category, *tags):
+        post = BlogPost.objects.create(
+            title=title, excerpt=title, content='Content', author=self.author,
+            category=category, status='published',
+        )
+        post.tags.add(*tags)
+        return post
+    
+    def test_ranked_by_tags_then_category_then_text(self):
+        self.assertEqual(
+            self.post.get_related_posts(limit=5), [self.same_tags, self.same_category, self.similar_text]
+        )
+        self.assertEqual(BlogPost.objects.get(pk=self.unrelated.pk).get_related_posts(), [])
+    
+    def test_detail_reads_related_posts_with_one_query(self):
+        post = BlogPost.objects.get(pk=self.post.pk)
+        with self.assertNumQueries(1):
+            related = post.get_related_posts(limit=3)
+        self.assertEqual(len(related), 3)
+    
+    def test_ranking_is_deterministic(self):
+        before = list(RelatedPost.objects.values_list('post_id', 'related_id', 'rank', 'score'))
+        RelatedPostService.rebuild()
+        self.assertEqual(list(RelatedPost.objects.values_list('post_id', 'related_id', 'rank', 'score')), before)
+    
+    def test_changes_flag_posts_and_refresh_incrementally(self):
+        newcomer = BlogPost.objects.create(
+            title='Steel beams for roofs', excerpt='Steel beams', content='Content',
+            author=self.author, category=self.steel, status='draft',
+        )
+        self.assertFalse(BlogPost.objects.filter(related_posts_stale=True).exclude(pk=newcomer.pk).exists())
+        
+        newcomer.status = 'published'
+        newcomer.save()
+        self.same_category.status = 'draft'
+        self.same_category.save()
+        self.assertEqual(
+            set(BlogPost.objects.filter(related_posts_stale=True).values_list('pk', flat=True)),
+            {newcomer.pk, self.same_category.pk},
+        )
+        
+        RelatedPostService.refresh_stale()
+        
+        self.assertFalse(BlogPost.objects.filter(related_posts_stale=True).exists())
+        self.assertIn(newcomer, self.post.get_related_posts(limit=5))
+        self.assertNotIn(self.same_category, self.post.get_related_posts(limit=5))
+        self.assertFalse(RelatedPost.objects.filter(post=self.same_category).exists())
+        self.assertIn(self.post, newcomer.get_related_posts(limit=5))
+        
+        # An incremental refresh ends where a full rebuild does
+        incremental = list(RelatedPost.objects.order_by('post', 'rank').values_list('post', 'related', 'rank'))
+        RelatedPostService.rebuild()
+        self.assertEqual(
+            list(RelatedPost.objects.order_by('post', 'rank').values_list('post', 'related', 'rank')), incremental
+        )
+    
+    def test_retagging_flags_the_post(self):
+        BlogPost.objects.update(related_posts_stale=False)
+        self.unrelated.tags.add(Tag.objects.get(name='Beams'))
+        self.assertEqual(
+            list(BlogPost.objects.filter(related_posts_stale=True).values_list('pk', flat=True)), [self.unrelated.pk]
+        )
+        
+        RelatedPostService.refresh_stale()
+        self.assertIn(self.unrelated, self.post.get_related_posts(limit=5))
+    
+    def test_posts_without_a_list_yet_fall_back_to_live_matching(self):
+        RelatedPost.objects.all().delete()
+        BlogPost.objects.update(related_posts_stale=True)
+        post = BlogPost.objects.get(pk=self.post.pk)
+        
+        self.assertEqual(set(post.get_related_posts(limit=5)), {self.same_tags, self.same_category})
+    
+    def test_command_refreshes_stale_posts(self):
+        BlogPost.objects.filter(pk=self.post.pk).update(related_posts_stale=True)
+        out = StringIO()
+        call_command('refresh_related_posts', stdout=out)
+        self.assertIn('Refreshed related posts', out.getvalue())
+        self.assertFalse(BlogPost.objects.filter(related_posts_stale=True).exists())
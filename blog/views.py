@@ -4,15 +4,18 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.core.paginator import Paginator
-from django.db.models import Q, F, Count
+from django.db.models import Q
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.cache import cache_page
 from django.utils.decorators import method_decorator
 from django.utils import timezone
 from .models import BlogPost, Category, Tag, BlogImage, ContentImage
 
+from .cache_utils import BlogCacheManager
 from .decorators import require_site_manager_role, require_admin_role, allow_public_access
 from .seo import SEOManager
+from .view_counter import BlogViewCounter
+from core.services.image_derivative_service import ImageDerivativeService
 
 # Create your views here.
 
@@ -199,15 +202,8 @@ def createblog(request):
                 except Category.DoesNotExist:
                     pass
             
-            # Handle tags - clear existing tags first for edit operations
-            if edit_id:
-                blog_post.tags.clear()
-            
-            for tag_name in tag_names:
-                tag_name = tag_name.strip()
-                if tag_name:
-                    tag, created = Tag.objects.get_or_create(name=tag_name)
-                    blog_post.tags.add(tag)
+            # Handle tags - replaces any existing tags for edit operations
+            blog_post.tags.set(Tag.resolve_names(tag_names))
             # Handle featured image
             if 'featured_image' in request.FILES:
                 featured_image = request.FILES['featured_image']
@@ -385,13 +381,8 @@ def edit_blog_post(request, post_id):
             blog_post.save()
             
             # Update tags
-            blog_post.tags.clear()
             tag_names = request.POST.get('tags', '').split(',')
-            for tag_name in tag_names:
-                tag_name = tag_name.strip()
-                if tag_name:
-                    tag, created = Tag.objects.get_or_create(name=tag_name)
-                    blog_post.tags.add(tag)
+            blog_post.tags.set(Tag.resolve_names(tag_names))
             
             # Handle existing gallery image updates and deletions
             for key, value in request.POST.items():
@@ -678,14 +669,16 @@ def blog_list(request):
     ).order_by('-published_date')[:3]
     
     # Get categories with post counts
-    categories = Category.objects.annotate(
-        post_count=Count('blog_posts', filter=Q(blog_posts__status='published'))
-    ).filter(post_count__gt=0).order_by('name')
+    categories = Category.objects.filter(post_count__gt=0).order_by('name')
     
     # Get popular tags
-    popular_tags = Tag.objects.annotate(
-        post_count=Count('blog_posts', filter=Q(blog_posts__status='published'))
-    ).filter(post_count__gt=0).order_by('-post_count')[:20]
+    popular_tags = Tag.objects.filter(usage_count__gt=0).order_by('-usage_count', 'name')[:20]
+    
+    # Look up the resized copies of every post image on the page at once
+    featured_posts = list(featured_posts)
+    ImageDerivativeService.prefetch(
+        post.featured_image for post in [*page_obj.object_list, *featured_posts]
+    )
     
     context = {
         'page_obj': page_obj,
@@ -697,6 +690,7 @@ def blog_list(request):
         'featured_posts': featured_posts,
         'categories': categories,
         'popular_tags': popular_tags,
+        'sidebar_version': BlogCacheManager.get_sidebar_version(),
         'total_posts': paginator.count,
     }
     
@@ -713,9 +707,9 @@ def blog_detail(request, slug):
         status='published'
     )
     
-    # Increment view count (use F() to avoid race conditions)
-    BlogPost.objects.filter(id=blog_post.id).update(view_count=F('view_count') + 1)
-    blog_post.refresh_from_db()
+    # Count the view; it reaches the database with the next batched flush,
+    # so show the stored count plus the views still buffered
+    blog_post.view_count += BlogViewCounter.record_view(blog_post.id)
     
     # Generate SEO data
     seo_manager = SEOManager()
@@ -732,14 +726,10 @@ def blog_detail(request, slug):
     ).exclude(id=blog_post.id).order_by('-published_date')[:5]
     
     # Get categories for sidebar
-    categories = Category.objects.annotate(
-        post_count=Count('blog_posts', filter=Q(blog_posts__status='published'))
-    ).filter(post_count__gt=0).order_by('name')
+    categories = Category.objects.filter(post_count__gt=0).order_by('name')
     
     # Get popular tags
-    popular_tags = Tag.objects.annotate(
-        post_count=Count('blog_posts', filter=Q(blog_posts__status='published'))
-    ).filter(post_count__gt=0).order_by('-post_count')[:10]
+    popular_tags = Tag.objects.filter(usage_count__gt=0).order_by('-usage_count', 'name')[:10]
     
     # Get comments for this blog post
     from .comments import CommentManager
@@ -751,6 +741,7 @@ def blog_detail(request, slug):
         'recent_posts': recent_posts,
         'categories': categories,
         'popular_tags': popular_tags,
+        'sidebar_version': BlogCacheManager.get_sidebar_version(),
         'comments': comments,
         'meta_tags': meta_tags,
         'structured_data': structured_data,
@@ -800,15 +791,14 @@ def tag_list(request, slug):
     page_obj = paginator.get_page(page_number)
     
     # Get popular tags
-    popular_tags = Tag.objects.annotate(
-        post_count=Count('blog_posts', filter=Q(blog_posts__status='published'))
-    ).filter(post_count__gt=0).order_by('-post_count')[:20]
+    popular_tags = Tag.objects.filter(usage_count__gt=0).order_by('-usage_count', 'name')[:20]
     
     context = {
         'tag': tag,
         'page_obj': page_obj,
         'posts': page_obj.object_list,
         'popular_tags': popular_tags,
+        'sidebar_version': BlogCacheManager.get_sidebar_version(),
     }
     
     return render(request, 'bloguser/tag_list.html', context)
@@ -993,9 +983,7 @@ def search_posts(request):
         'search_results': results,
         'query': query,
         'categories': Category.objects.all(),
-        'popular_tags': Tag.objects.annotate(
-            post_count=Count('blog_posts', filter=Q(blog_posts__status='published'))
-        ).filter(post_count__gt=0).order_by('-post_count')[:20],
+        'popular_tags': Tag.objects.filter(usage_count__gt=0).order_by('-usage_count', 'name')[:20],
     }
     
     return render(request, 'bloguser/search_results.html', context)
@@ -194,6 +194,14 @@ SUPABASE_BUCKET = os.getenv('SUPABASE_BUCKET', 'project-images')
 SUPABASE_PORTFOLIO_BUCKET = 'portfolio_project_images'
 SUPABASE_BLOG_BUCKET = 'blog_images'
 
+# HTTP client used by the Supabase storage backends (config/supabase_storage.py)
+SUPABASE_STORAGE_POOL_SIZE = int(os.getenv('SUPABASE_STORAGE_POOL_SIZE', '10'))
+SUPABASE_STORAGE_CONNECT_TIMEOUT = float(os.getenv('SUPABASE_STORAGE_CONNECT_TIMEOUT', '5'))
+# Per socket read, not for the whole upload
+SUPABASE_STORAGE_READ_TIMEOUT = float(os.getenv('SUPABASE_STORAGE_READ_TIMEOUT', '60'))
+SUPABASE_STORAGE_RETRIES = int(os.getenv('SUPABASE_STORAGE_RETRIES', '3'))
+SUPABASE_STORAGE_RETRY_BACKOFF = float(os.getenv('SUPABASE_STORAGE_RETRY_BACKOFF', '0.5'))
+
 # Media files configuration
 if SUPABASE_URL and SUPABASE_KEY:
     # Use Supabase storage for media files
@@ -204,6 +212,66 @@ else:
     MEDIA_URL = '/media/'
     MEDIA_ROOT = BASE_DIR / 'media'
 
+# Resized WebP/JPEG copies of uploaded images, see core/services/image_derivative_service.py
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 1024, 1600)
+IMAGE_DERIVATIVE_QUALITY = int(os.getenv('IMAGE_DERIVATIVE_QUALITY', '80'))
+# Generate derivatives in a background thread after uploads, and for older
+# images the first time they are shown. When off, run generate_image_derivatives
+IMAGE_DERIVATIVE_IN_PROCESS = os.getenv('IMAGE_DERIVATIVE_IN_PROCESS', 'True').lower() == 'true'
+
+# Diary photos are spooled here and pushed to storage in the background.
+# The spool is local disk, so the uploader must run on the same machine
+DIARY_PHOTO_SPOOL_DIR = os.getenv('DIARY_PHOTO_SPOOL_DIR', str(BASE_DIR / 'media' / 'diary_photo_spool'))
+DIARY_PHOTO_UPLOAD_MAX_ATTEMPTS = int(os.getenv('DIARY_PHOTO_UPLOAD_MAX_ATTEMPTS', '6'))
+# Run the upload worker as a thread inside each web process, next to its
+# spool. Only the tests turn it off
+DIARY_PHOTO_UPLOAD_IN_PROCESS = os.getenv('DIARY_PHOTO_UPLOAD_IN_PROCESS', 'True').lower() == 'true'
+
+# Rows fetched per database round trip when streaming diary CSV exports
+DIARY_EXPORT_CHUNK_SIZE = int(os.getenv('DIARY_EXPORT_CHUNK_SIZE', '2000'))
+
+# Server-side diary PDFs: how long rendered entries stay cached, how many
+# worker processes render multi-entry PDFs, and the most entries per PDF
+DIARY_PDF_CACHE_TIMEOUT = int(os.getenv('DIARY_PDF_CACHE_TIMEOUT', str(60 * 60 * 24 * 7)))
+DIARY_PDF_WORKERS = int(os.getenv('DIARY_PDF_WORKERS', '2'))
+DIARY_PDF_MAX_ENTRIES = int(os.getenv('DIARY_PDF_MAX_ENTRIES', '200'))
+
+# How long a user's accessible project IDs stay cached. Signals invalidate the
+# set on assignment and project changes, but only in the process that made the
+# change while CACHES is per-process; this bounds how long other workers keep
+# a revoked assignment. Keep it to seconds until the cache is shared
+PROJECT_SCOPE_CACHE_TIMEOUT = int(os.getenv('PROJECT_SCOPE_CACHE_TIMEOUT', '5'))
+
+# How long a user's resolved profiles stay cached for role checks. Profile
+# changes bump a per-user version, but with the per-process cache above only
+# the process that saved the change sees the bump; this is how long the other
+# workers may keep granting a suspended or denied account. Keep it to seconds
+# until CACHES points at a shared backend
+ROLE_SNAPSHOT_CACHE_TIMEOUT = int(os.getenv('ROLE_SNAPSHOT_CACHE_TIMEOUT', '5'))
+
+# Minimum seconds between presence heartbeats per user and worker. Must stay
+# well under the 5 minute online threshold used by accounts.activity_tracker
+PRESENCE_HEARTBEAT_INTERVAL = int(os.getenv('PRESENCE_HEARTBEAT_INTERVAL', '60'))
+
+# Blog post views are buffered per process and written in one batched UPDATE
+# every BLOG_VIEW_FLUSH_INTERVAL seconds by a background thread. With the
+# thread disabled, every view is written through immediately
+BLOG_VIEW_FLUSH_IN_PROCESS = os.getenv('BLOG_VIEW_FLUSH_IN_PROCESS', 'True').lower() == 'true'
+BLOG_VIEW_FLUSH_INTERVAL = int(os.getenv('BLOG_VIEW_FLUSH_INTERVAL', '10'))
+
+# Blog analytics events are queued in memory and written with bulk_create by a
+# background thread. When the queue is full, events are dropped (and counted)
+# rather than slowing requests down. With the thread disabled, each event is
+# written immediately
+BLOG_ANALYTICS_IN_PROCESS = os.getenv('BLOG_ANALYTICS_IN_PROCESS', 'True').lower() == 'true'
+BLOG_ANALYTICS_FLUSH_INTERVAL = int(os.getenv('BLOG_ANALYTICS_FLUSH_INTERVAL', '5'))
+BLOG_ANALYTICS_BATCH_SIZE = int(os.getenv('BLOG_ANALYTICS_BATCH_SIZE', '500'))
+BLOG_ANALYTICS_QUEUE_SIZE = int(os.getenv('BLOG_ANALYTICS_QUEUE_SIZE', '10000'))
+
+# Related post lists are refreshed by a background thread after posts change;
+# disable when `manage.py refresh_related_posts` runs from a scheduler instead
+BLOG_RELATED_POSTS_IN_PROCESS = os.getenv('BLOG_RELATED_POSTS_IN_PROCESS', 'True').lower() == 'true'
+
 # Login/logout URLs
 LOGIN_URL = '/accounts/sitemanager/login/'
 LOGIN_REDIRECT_URL = '/admin-panel/'
@@ -220,8 +288,15 @@ CSRF_COOKIE_SECURE = not DEBUG
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Weather API Configuration
-WEATHER_API_KEY = os.getenv('WEATHER_API_KEY', 'your_openweathermap_api_key_here')
+# Required for weather lookups; without it they fail with 503 instead of being cached
+WEATHER_API_KEY = os.getenv('WEATHER_API_KEY', '')
 WEATHER_API_URL = 'https://api.openweathermap.org/data/2.5/weather'
+WEATHER_API_TIMEOUT = 5
+# Callable doing the upstream lookup, see site_diary/services/weather_service.py
+WEATHER_FETCHER = 'site_diary.services.weather_service.fetch_openweathermap'
+# Seconds a reading is fresh, then how long it may still be served while refreshing
+WEATHER_CACHE_TTL = int(os.getenv('WEATHER_CACHE_TTL', '600'))
+WEATHER_CACHE_STALE = int(os.getenv('WEATHER_CACHE_STALE', '3600'))
 
 # Authentication backends
 AUTHENTICATION_BACKENDS = [
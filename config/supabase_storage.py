@@ -1,10 +1,51 @@
 import os
+import tempfile
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
 from django.core.files.storage import Storage
-from django.core.files.base import ContentFile
+from django.core.files.base import ContentFile, File
 from django.utils.deconstruct import deconstructible
 from urllib.parse import urljoin
 
+# One keep-alive connection pool per process, shared by every storage instance
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide requests session used to talk to Supabase.
+
+    The session is rebuilt after a fork (gunicorn --preload) so workers never
+    share sockets with their parent.
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                retries = Retry(
+                    total=settings.SUPABASE_STORAGE_RETRIES,
+                    backoff_factor=settings.SUPABASE_STORAGE_RETRY_BACKOFF,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    # Uploads are only retried when the connection could not be made
+                    allowed_methods=frozenset({'GET', 'HEAD', 'DELETE'}),
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=settings.SUPABASE_STORAGE_POOL_SIZE,
+                    pool_maxsize=settings.SUPABASE_STORAGE_POOL_SIZE,
+                    max_retries=retries,
+                )
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session, _session_pid = session, os.getpid()
+    return _session
+
+
 @deconstructible
 class SupabaseStorage(Storage):
     def __init__(self):
@@ -12,42 +53,82 @@ class SupabaseStorage(Storage):
         self.supabase_key = os.getenv('SUPABASE_SERVICE_KEY', os.getenv('SUPABASE_KEY'))
         self.bucket_name = os.getenv('SUPABASE_BUCKET', 'project-images')
         self.base_url = f"{self.supabase_url}/storage/v1/object/public/{self.bucket_name}/"
-        
+
+    @property
+    def timeout(self):
+        return (settings.SUPABASE_STORAGE_CONNECT_TIMEOUT, settings.SUPABASE_STORAGE_READ_TIMEOUT)
+
+    def _object_url(self, name):
+        return f"{self.supabase_url}/storage/v1/object/{self.bucket_name}/{name}"
+
+    def _request(self, method, name, **kwargs):
+        headers = {'Authorization': f'Bearer {self.supabase_key}'}
+        headers.update(kwargs.pop('headers', {}))
+        return get_session().request(
+            method, self._object_url(name), headers=headers, timeout=self.timeout, **kwargs
+        )
+
     def _save(self, name, content):
         # Convert Windows backslashes to forward slashes for Supabase
         name = name.replace('\\', '/')
-        
-        url = f"{self.supabase_url}/storage/v1/object/{self.bucket_name}/{name}"
+
         headers = {
-            'Authorization': f'Bearer {self.supabase_key}',
-            'Content-Type': content.content_type if hasattr(content, 'content_type') else 'application/octet-stream'
+            'Content-Type': content.content_type if hasattr(content, 'content_type') else 'application/octet-stream',
         }
-        
-        response = requests.post(url, headers=headers, data=content.read())
-        
+
+        # Stream the file object in blocks instead of reading it into memory
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        response = self._request('POST', name, headers=headers, data=_FileBody(content))
+
         if response.status_code in [200, 201]:
             return name
         else:
             raise Exception(f"Failed to upload to Supabase: {response.text}")
-    
+
+    def _open(self, name, mode='rb'):
+        response = self._request('GET', name, stream=True)
+        if response.status_code != 200:
+            raise FileNotFoundError(f"Failed to download {name} from Supabase: {response.status_code}")
+        # Spill to disk past a few MB rather than buffering the whole object
+        spool = tempfile.SpooledTemporaryFile(max_size=5 * 1024 * 1024)
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            spool.write(chunk)
+        spool.seek(0)
+        return File(spool, name=name)
+
     def url(self, name):
         # Convert Windows backslashes to forward slashes
         name = name.replace('\\', '/')
         return urljoin(self.base_url, name)
-    
+
     def exists(self, name):
-        url = f"{self.supabase_url}/storage/v1/object/{self.bucket_name}/{name}"
-        headers = {'Authorization': f'Bearer {self.supabase_key}'}
-        response = requests.head(url, headers=headers)
+        response = self._request('HEAD', name)
         return response.status_code == 200
-    
+
     def delete(self, name):
-        url = f"{self.supabase_url}/storage/v1/object/{self.bucket_name}/{name}"
-        headers = {'Authorization': f'Bearer {self.supabase_key}'}
-        requests.delete(url, headers=headers)
-    
+        self._request('DELETE', name)
+
     def size(self, name):
-        url = f"{self.supabase_url}/storage/v1/object/{self.bucket_name}/{name}"
-        headers = {'Authorization': f'Bearer {self.supabase_key}'}
-        response = requests.head(url, headers=headers)
+        response = self._request('HEAD', name)
         return int(response.headers.get('Content-Length', 0))
+
+
+class _FileBody:
+    """Wrap a Django File so requests streams it with read().
+
+    File also defines __iter__ (by line) and __len__, which would make
+    requests iterate it line by line instead of in fixed-size blocks.
+    """
+
+    def __init__(self, file):
+        self.file = file
+
+    def read(self, size=-1):
+        return self.file.read(size)
+
+    def tell(self):
+        return self.file.tell()
+
+    def seek(self, offset, whence=0):
+        return self.file.seek(offset, whence)
@@ -0,0 +1,184 @@
+"""
+Path rules for the security middlewares, compiled into one prefix trie.
+
+The areas, exemptions and per-role blocked prefixes used by
+UnauthorizedAccessMiddleware and RoleBasedAccessMiddleware are declared
+here once. At import they are compiled into a character trie whose nodes
+carry the merged PathRule of every prefix ending there, so a single walk
+over request.path answers which area it is in, which roles are blocked,
+whether it needs a login and which 401 template applies.
+"""
+from dataclasses import dataclass, field
+
+# Areas protected by UnauthorizedAccessMiddleware, with their 401 templates
+AREA_PREFIXES = {
+    'admin': (
+        '/admin-panel/',                  # Admin side URLs
+        '/adminside/',                    # Direct admin URLs
+        '/portfolio/projectmanagement/',  # Portfolio management dashboard
+        '/blog/blogmanagement/',          # Blog admin dashboard
+        '/diary/adminside/',              # Diary admin routes
+        '/admin/',                        # Django admin
+    ),
+    'site_manager': (
+        '/diary/',                        # Site diary URLs
+    ),
+}
+ERROR_TEMPLATES = {
+    'admin': 'page error/401_2.html',     # Admin-specific error page
+    'site_manager': 'page error/401.html',  # Client-focused error page
+}
+
+# Django admin authentication endpoints (allowed for everyone), matched exactly
+ADMIN_LOGIN_PATHS = ('/admin/login', '/admin/login/', '/admin/logout', '/admin/logout/')
+
+# Paths RoleBasedAccessMiddleware does not check at all
+ROLE_CHECK_EXEMPT_PREFIXES = (
+    '/static/', '/media/', '/favicon.ico',
+    '/accounts/client/login/', '/accounts/client/register/',
+    '/accounts/client/forgot-password/', '/accounts/client/reset-password/',
+    '/accounts/admin-auth/login/', '/accounts/admin-auth/register/',
+    '/accounts/admin-auth/forgot-password/', '/accounts/sitemanager/forgot-password/',
+    '/accounts/admin-auth/reset-password/', '/accounts/sitemanager/reset-password/',
+    '/accounts/client/verify-otp/', '/accounts/admin-auth/verify-otp/',
+    '/accounts/client/logout/', '/accounts/admin-auth/logout/',
+    '/admin/login/', '/admin/logout/',
+)
+
+# Paths anonymous users are sent to log in for
+LOGIN_REQUIRED_PREFIXES = (
+    '/usersettings/', '/user/', '/portfolio/projectmanagement/',
+    '/blog/blogmanagement/', '/diary/', '/adminside/',
+)
+
+# Prefixes each role may not open
+BLOCKED_PREFIXES = {
+    'public': (
+        '/accounts/admin-auth/', '/adminside/', '/portfolio/projectmanagement/',
+        '/blog/blogmanagement/', '/diary/adminside/',
+    ),
+    'admin': (
+        '/accounts/client/', '/usersettings/', '/user/',
+        '/diary/dashboard/', '/diary/newproject/', '/diary/createblog/',
+    ),
+    'site_manager': (
+        '/accounts/client/', '/usersettings/', '/user/',
+        '/accounts/admin-auth/', '/portfolio/projectmanagement/',
+        '/blog/blogmanagement/', '/diary/adminside/',
+    ),
+    'superadmin': (),  # Super admin can access everything
+    'anonymous': (
+        '/accounts/client/', '/accounts/admin-auth/',
+        '/usersettings/', '/user/', '/portfolio/projectmanagement/',
+        '/blog/blogmanagement/', '/diary/', '/adminside/',
+    ),
+}
+
+
+@dataclass(frozen=True)
+class PathRule:
+    """Everything the security middlewares need to know about a path"""
+    area: str = None
+    admin_login: bool = False
+    role_check_exempt: bool = False
+    login_required: bool = False
+    blocked_roles: frozenset = field(default_factory=frozenset)
+
+    @property
+    def error_template(self):
+        """401 template for the area, or None outside protected areas"""
+        return ERROR_TEMPLATES.get(self.area)
+
+    def merge(self, other):
+        """Combine with a rule for a longer prefix of the same path.
+
+        Flags and blocked roles accumulate, since every matching prefix
+        applies; the longer prefix decides the area.
+        """
+        return PathRule(
+            area=other.area or self.area,
+            admin_login=self.admin_login or other.admin_login,
+            role_check_exempt=self.role_check_exempt or other.role_check_exempt,
+            login_required=self.login_required or other.login_required,
+            blocked_roles=self.blocked_roles | other.blocked_roles,
+        )
+
+
+class _Node:
+    __slots__ = ('children', 'prefix_rule', 'exact_rule')
+
+    def __init__(self):
+        self.children = {}
+        self.prefix_rule = None
+        self.exact_rule = None
+
+
+class PrefixRouter:
+    """Character trie mapping path prefixes (and exact paths) to PathRules.
+
+    Rules are added with add() and then compile() folds each node's rule
+    together with those of the shorter prefixes above it, so lookup() only
+    has to remember the deepest rule seen on its walk.
+    """
+
+    DEFAULT = PathRule()
+
+    def __init__(self):
+        self._root = _Node()
+        self._compiled = False
+
+    def add(self, path, rule, exact=False):
+        node = self._root
+        for char in path:
+            node = node.children.setdefault(char, _Node())
+        attr = 'exact_rule' if exact else 'prefix_rule'
+        current = getattr(node, attr)
+        setattr(node, attr, current.merge(rule) if current else rule)
+        self._compiled = False
+
+    def compile(self):
+        stack = [(self._root, self.DEFAULT)]
+        while stack:
+            node, inherited = stack.pop()
+            if node.prefix_rule is not None:
+                node.prefix_rule = inherited = inherited.merge(node.prefix_rule)
+            if node.exact_rule is not None:
+                node.exact_rule = inherited.merge(node.exact_rule)
+            stack.extend((child, inherited) for child in node.children.values())
+        self._compiled = True
+        return self
+
+    def lookup(self, path):
+        """The merged rule of every prefix of `path`, plus an exact rule if any"""
+        if not self._compiled:
+            self.compile()
+        node = self._root
+        rule = node.prefix_rule or self.DEFAULT
+        for char in path:
+            node = node.children.get(char)
+            if node is None:
+                return rule
+            if node.prefix_rule is not None:
+                rule = node.prefix_rule
+        return node.exact_rule or rule
+
+
+def build_access_router():
+    """Compile the rules declared above into a PrefixRouter"""
+    router = PrefixRouter()
+    for area, prefixes in AREA_PREFIXES.items():
+        for prefix in prefixes:
+            router.add(prefix, PathRule(area=area))
+    for path in ADMIN_LOGIN_PATHS:
+        router.add(path, PathRule(admin_login=True), exact=True)
+    for prefix in ROLE_CHECK_EXEMPT_PREFIXES:
+        router.add(prefix, PathRule(role_check_exempt=True))
+    for prefix in LOGIN_REQUIRED_PREFIXES:
+        router.add(prefix, PathRule(login_required=True))
+    for role, prefixes in BLOCKED_PREFIXES.items():
+        for prefix in prefixes:
+            router.add(prefix, PathRule(blocked_roles=frozenset([role])))
+    return router.compile()
+
+
+ACCESS_ROUTER = build_access_router()
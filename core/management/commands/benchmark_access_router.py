@@ -0,0 +1,81 @@
+import re
+import timeit
+
+from django.core.management.base import BaseCommand
+from core.access_router import (
+    ACCESS_ROUTER, AREA_PREFIXES, BLOCKED_PREFIXES,
+    LOGIN_REQUIRED_PREFIXES, ROLE_CHECK_EXEMPT_PREFIXES,
+)
+
+SAMPLE_PATHS = [
+    '/',
+    '/blog/some-post/',
+    '/portfolio/project/12/',
+    '/static/css/site.css',
+    '/accounts/client/login/',
+    '/admin/login/',
+    '/admin/auth/user/',
+    '/adminside/dashboard/',
+    '/blog/blogmanagement/posts/',
+    '/diary/dashboard/',
+    '/diary/adminside/reviewer/',
+    '/usersettings/profile/',
+]
+
+
+def legacy_lookup(path, user_role):
+    """Per-request path work as the middlewares did it before the router"""
+    admin_only = [r'^' + prefix for prefix in AREA_PREFIXES['admin']]
+    admin_login = [r'^/admin/login/?$', r'^/admin/logout/?$']
+    site_manager = [r'^' + prefix for prefix in AREA_PREFIXES['site_manager']]
+
+    # UnauthorizedAccessMiddleware: intercept check, then template lookup
+    if not any(re.match(p, path) for p in admin_login):
+        for patterns in (admin_only, site_manager, admin_only, site_manager):
+            if any(re.match(p, path) for p in patterns):
+                break
+
+    # RoleBasedAccessMiddleware: skip list, rebuilt rule dict, blocked and login scans
+    if any(path.startswith(p) for p in list(ROLE_CHECK_EXEMPT_PREFIXES)):
+        return
+    access_patterns = {role: {'blocked': list(prefixes)} for role, prefixes in BLOCKED_PREFIXES.items()}
+    rules = access_patterns.get(user_role, access_patterns['anonymous'])
+    if any(path.startswith(p) for p in rules['blocked']):
+        return
+    any(path.startswith(p) for p in list(LOGIN_REQUIRED_PREFIXES))
+
+
+def router_lookup(path, user_role):
+    """Per-request path work with the compiled router"""
+    rule = ACCESS_ROUTER.lookup(path)
+    if rule.role_check_exempt:
+        return
+    if user_role in rule.blocked_roles:
+        return
+    rule.login_required
+
+
+class Command(BaseCommand):
+    help = 'Time the per-request path checks of the access middlewares, regex/startswith vs prefix router'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=2000, help='Passes over the sample paths (default: 2000)')
+        parser.add_argument('--role', default='site_manager', help='Role to check blocked paths for')
+
+    def handle(self, *args, **options):
+        number, role = options['number'], options['role']
+        requests = number * len(SAMPLE_PATHS)
+
+        results = {}
+        for name, func in (('regex/startswith', legacy_lookup), ('prefix router', router_lookup)):
+            # Best of three runs to keep scheduler noise out
+            elapsed = min(timeit.repeat(
+                lambda: [func(path, role) for path in SAMPLE_PATHS], number=number, repeat=3,
+            ))
+            results[name] = elapsed / requests * 1e6
+            self.stdout.write(f"{name:>18}: {results[name]:.2f} us/request")
+
+        speedup = results['regex/startswith'] / results['prefix router']
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(SAMPLE_PATHS)} paths x {number} passes; router is {speedup:.1f}x faster"
+        ))
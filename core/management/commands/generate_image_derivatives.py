@@ -0,0 +1,34 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from core.models import ImageDerivative
+from core.services.image_derivative_service import DERIVATIVE_FIELDS, ImageDerivativeService
+
+class Command(BaseCommand):
+    help = 'Create resized WebP/JPEG copies for uploaded images that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fields', nargs='*', help='Only these fields, as app_label.Model.field (default: all)')
+
+    def handle(self, *args, **options):
+        fields = options['fields'] or DERIVATIVE_FIELDS
+        for path in fields:
+            app_label, model_name, field_name = path.split('.')
+            model = apps.get_model(app_label, model_name)
+            done = {}
+
+            created = 0
+            for instance in model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True}).iterator():
+                fieldfile = getattr(instance, field_name)
+                # Diary photos still waiting in the upload spool are resized once uploaded
+                if not getattr(instance, 'is_uploaded', True):
+                    continue
+                storage_key = ImageDerivativeService.storage_key(fieldfile.storage)
+                if storage_key not in done:
+                    done[storage_key] = set(
+                        ImageDerivative.objects.filter(storage_key=storage_key).values_list('source_name', flat=True)
+                    )
+                if fieldfile.name in done[storage_key]:
+                    continue
+                if ImageDerivativeService.generate_safely(fieldfile):
+                    created += 1
+            self.stdout.write(self.style.SUCCESS(f'{path}: resized {created} image(s)'))
@@ -3,6 +3,8 @@ from django.http import HttpResponse
 from django.urls import reverse
 import re
 
+from .access_router import ACCESS_ROUTER
+
 class UnauthorizedAccessMiddleware:
     """
     Middleware to catch unauthorized access attempts to admin/site manager areas
@@ -12,26 +14,8 @@ class UnauthorizedAccessMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
         
-        # Define admin-only URL patterns (show 401_2.html)
-        self.admin_only_patterns = [
-            r'^/admin-panel/',                  # Admin side URLs
-            r'^/adminside/',                    # Direct admin URLs
-            r'^/portfolio/projectmanagement/',  # Portfolio management dashboard
-            r'^/blog/blogmanagement/',          # Blog admin dashboard
-            r'^/diary/adminside/',              # Diary admin routes
-            r'^/admin/',                        # Django admin
-        ]
-
-        # Django admin authentication endpoints (allowed for everyone)
-        self.admin_login_patterns = [
-            r'^/admin/login/?$',
-            r'^/admin/logout/?$',
-        ]
-        
-        # Define site manager/diary URL patterns (show 401.html)
-        self.site_manager_patterns = [
-            r'^/diary/',        # Site diary URLs  
-        ]
+        # Admin-only areas (401_2.html), site manager areas (401.html) and the
+        # Django admin login/logout exemptions are declared in core.access_router
         
         # Define login pages that should not show modals when accessed after unauthorized attempts
         self.login_pages = [
@@ -41,10 +25,13 @@ class UnauthorizedAccessMiddleware:
         ]
     
     def __call__(self, request):
+        # One trie lookup answers every path question for this request
+        rule = ACCESS_ROUTER.lookup(request.path)
+        
         # Pre-check for protected URLs before processing
-        if self._should_intercept_request(request):
+        if self._should_intercept_request(request, rule):
             context = self._get_error_context(request)
-            error_template = self._get_error_template_by_path(request.path)
+            error_template = self._get_error_template_by_path(request.path, rule)
             if error_template:
                 # Clear any existing messages to prevent modal conflicts
                 self._clear_messages(request)
@@ -55,7 +42,7 @@ class UnauthorizedAccessMiddleware:
         response = self.get_response(request)
         
         # Post-check for unauthorized responses
-        error_template = self._get_error_template(request, response)
+        error_template = self._get_error_template(request, response, rule)
         if error_template:
             context = self._get_error_context(request)
             # Clear any existing messages to prevent modal conflicts
@@ -64,7 +51,7 @@ class UnauthorizedAccessMiddleware:
             
         return response
     
-    def _get_error_template(self, request, response):
+    def _get_error_template(self, request, response, rule=None):
         """
         Determine which error template to show based on the request path and user type.
         Returns the template path or None if no error handling needed.
@@ -72,106 +59,61 @@ class UnauthorizedAccessMiddleware:
         # Check if the response is a 401 or 403 status
         if response.status_code not in [401, 403]:
             return None
-            
-        path = request.path
-        
-        # Check if trying to access admin-only areas
-        for pattern in self.admin_only_patterns:
-            if re.match(pattern, path):
-                return 'page error/401_2.html'  # Admin-specific error page
         
-        # Check if trying to access site manager areas
-        for pattern in self.site_manager_patterns:
-            if re.match(pattern, path):
-                return 'page error/401.html'   # Client-focused error page
-                
-        return None
+        # Admin-only areas get 401_2.html, site manager areas 401.html
+        rule = rule or ACCESS_ROUTER.lookup(request.path)
+        return rule.error_template
     
-    def _should_intercept_request(self, request):
+    def _should_intercept_request(self, request, rule=None):
         """
         Check if this request should be intercepted before processing.
         Returns True if user is trying to access protected areas without proper permissions.
         """
+        rule = rule or ACCESS_ROUTER.lookup(request.path)
+        
         if not hasattr(request, 'user') or not request.user.is_authenticated:
-            path = request.path
-            if self._matches_patterns(path, self.admin_login_patterns):
-                return False
-            # Allow anonymous users to reach Django admin login pages
-            if self._matches_patterns(path, self.admin_only_patterns):
+            # Allow anonymous users to reach Django admin and its login pages
+            if rule.admin_login or rule.area == 'admin':
                 return False
             # Block anonymous access to site manager areas
-            return self._matches_patterns(path, self.site_manager_patterns)
+            return rule.area == 'site_manager'
         
         # Allow superusers to reach Django admin without interception
         if request.user.is_superuser:
             return False
 
+        # Check admin-only areas (excluding login/logout)
+        if rule.admin_login or rule.area is None:
+            return False
+
         # Check if authenticated user has proper permissions
         try:
-            from accounts.models import Profile, AdminProfile, SiteManagerProfile
-            
-            path = request.path
+            from accounts.roles import get_role_snapshot
             
-            # Check admin-only areas (excluding login/logout)
-            if self._matches_patterns(path, self.admin_login_patterns):
-                return False
-
-            for pattern in self.admin_only_patterns:
-                if re.match(pattern, path):
-                    # Only admins can access these areas
-                    return not AdminProfile.objects.filter(
-                        user=request.user,
-                        approval_status='approved',
-                        admin_role__in=['admin', 'manager', 'supervisor', 'staff']
-                    ).exists()
+            role = get_role_snapshot(request.user)
+            if rule.area == 'admin':
+                # Only admins can access these areas
+                return not role.is_approved_admin
             
-            # Check site manager areas
-            for pattern in self.site_manager_patterns:
-                if re.match(pattern, path):
-                    # Site managers or admins can access these areas
-                    has_site_manager = SiteManagerProfile.objects.filter(
-                        user=request.user, 
-                        approval_status='approved'
-                    ).exists()
-                    has_admin = AdminProfile.objects.filter(
-                        user=request.user, 
-                        approval_status='approved',
-                        admin_role__in=['admin', 'manager', 'supervisor', 'staff']
-                    ).exists()
-                    return not (has_site_manager or has_admin)
+            # Site managers or admins can access site manager areas
+            return not (role.is_approved_site_manager or role.is_approved_admin)
                     
         except Exception:
             # If there's an error checking permissions, intercept for safety
-            return self._is_protected_path(request.path)
-        
-        return False
+            return True
     
-    def _is_protected_path(self, path):
-        """Check if the path matches any protected patterns."""
-        all_patterns = self.admin_only_patterns + self.site_manager_patterns
-        return self._matches_patterns(path, all_patterns)
-
     def _matches_patterns(self, path, patterns):
         """Return True if the path matches any regex in patterns."""
         return any(re.match(pattern, path) for pattern in patterns)
     
-    def _get_error_template_by_path(self, path):
+    def _get_error_template_by_path(self, path, rule=None):
         """Get error template based on path only."""
+        rule = rule or ACCESS_ROUTER.lookup(path)
+        
         # Skip admin login/logout pages
-        if self._matches_patterns(path, self.admin_login_patterns):
+        if rule.admin_login:
             return None
-
-        # Check admin-only areas
-        for pattern in self.admin_only_patterns:
-            if re.match(pattern, path):
-                return 'page error/401_2.html'
-        
-        # Check site manager areas
-        for pattern in self.site_manager_patterns:
-            if re.match(pattern, path):
-                return 'page error/401.html'
-        
-        return None
+        return rule.error_template
     
     def _is_login_page_with_error_context(self, request):
         """
@@ -223,19 +165,8 @@ class UnauthorizedAccessMiddleware:
         if hasattr(request, 'user') and request.user.is_authenticated:
             # Try to determine user type based on their profile
             try:
-                from accounts.models import Profile, AdminProfile, SiteManagerProfile
-                
-                # Check if user has site manager profile
-                if SiteManagerProfile.objects.filter(user=request.user).exists():
-                    context['user_type'] = 'site_manager'
-                # Check if user has admin profile
-                elif AdminProfile.objects.filter(user=request.user).exists():
-                    context['user_type'] = 'admin'
-                # Check if user has client profile
-                elif Profile.objects.filter(user=request.user).exists():
-                    context['user_type'] = 'client'
-                else:
-                    context['user_type'] = 'unknown'
+                from accounts.roles import get_role_snapshot
+                context['user_type'] = get_role_snapshot(request.user).user_type
                     
             except Exception:
                 context['user_type'] = 'unknown'
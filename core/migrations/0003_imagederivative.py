@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:32
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0002_delete_contactmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('storage_key', models.CharField(max_length=255)),
+                ('source_name', models.CharField(max_length=255)),
+                ('name', models.CharField(help_text='Storage name of the derivative', max_length=255)),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('jpeg', 'JPEG'), ('png', 'PNG')], max_length=10)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['width'],
+                'indexes': [models.Index(fields=['source_name'], name='core_imaged_source__22bb92_idx')],
+                'unique_together': {('storage_key', 'source_name', 'format', 'width')},
+            },
+        ),
+    ]
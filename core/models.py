@@ -2,3 +2,32 @@ from django.db import models
 from django.utils import timezone
 
 # ContactMessage model removed - using chatbot.ContactMessage instead
+
+
+class ImageDerivative(models.Model):
+    """A resized copy of an uploaded image, stored next to the original"""
+    FORMAT_CHOICES = [
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+        ('png', 'PNG'),
+    ]
+    
+    # Storage backends are identified by bucket (or location), so the same
+    # file name in two buckets never shares derivatives
+    storage_key = models.CharField(max_length=255)
+    source_name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, help_text="Storage name of the derivative")
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['width']
+        unique_together = ['storage_key', 'source_name', 'format', 'width']
+        indexes = [
+            models.Index(fields=['source_name']),
+        ]
+    
+    def __str__(self):
+        return f"{self.source_name} ({self.width}w {self.format})"
@@ -0,0 +1,330 @@
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from io import BytesIO
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection
+from PIL import Image, ImageOps
+from ..models import ImageDerivative
+
+logger = logging.getLogger(__name__)
+
+# Uploaded image fields that get resized derivatives, as app_label.Model.field
+DERIVATIVE_FIELDS = (
+    'site_diary.DiaryPhoto.photo',
+    'blog.BlogPost.featured_image',
+    'blog.BlogImage.image',
+    'blog.ContentImage.image',
+    'portfolio.Project.hero_image',
+    'portfolio.ProjectImage.image',
+    'accounts.Profile.profile_pic',
+    'accounts.AdminProfile.profile_pic',
+    'accounts.SiteManagerProfile.profile_pic',
+    'accounts.SuperAdminProfile.profile_pic',
+)
+
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg', 'png': 'image/png'}
+FILE_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg', 'png': 'png'}
+
+
+class ImageDerivativeService:
+    """Generate, record and look up resized WebP/JPEG copies of uploaded images.
+
+    Derivatives are written to the original's storage next to it
+    (photo.jpg -> photo.640w.webp, photo.640w.jpg) and recorded as
+    ImageDerivative rows. A background thread creates them after an image is
+    uploaded, or the first time a page asks for an image without any, so
+    requests never wait for the resizing and storage uploads. Images that
+    could not be resized are not queued again for FAILURE_TIMEOUT.
+    """
+
+    CACHE_TIMEOUT = 60 * 60 * 24
+    # How long "no derivatives yet" is cached, and how long a failed image is left alone
+    MISSING_TIMEOUT = 60
+    FAILURE_TIMEOUT = 60 * 60 * 24
+    # Images waiting for the worker; when full, uploads are left to the next page view
+    QUEUE_SIZE = 100
+
+    _queue = queue.Queue(maxsize=QUEUE_SIZE)
+    _queued = set()
+    _worker = None
+    _worker_lock = threading.Lock()
+
+    @staticmethod
+    def storage_key(storage):
+        return getattr(storage, 'bucket_name', None) or getattr(storage, 'location', '') or type(storage).__name__
+
+    @classmethod
+    def _cache_key(cls, storage_key, name):
+        return f"image_derivatives:{storage_key}:{name}"
+
+    @classmethod
+    def _failed_key(cls, storage_key, name):
+        return f"image_derivatives_failed:{storage_key}:{name}"
+
+    @staticmethod
+    def derivative_name(source_name, width, fmt):
+        root = os.path.splitext(source_name)[0]
+        return f"{root}.{width}w.{FILE_EXTENSIONS[fmt]}"
+
+    @staticmethod
+    def _fallback_format(image):
+        """PNG for images with transparency, JPEG for everything else"""
+        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+            return 'png'
+        return 'jpeg'
+
+    @classmethod
+    def generate(cls, fieldfile, content=None):
+        """Create the missing derivatives for an image field file.
+
+        `content` is the original file when it is already at hand (an upload in
+        progress); otherwise the original is read back from storage. Returns the
+        list of ImageDerivative rows for the image.
+        """
+        storage = fieldfile.storage
+        source_name = fieldfile.name
+        storage_key = cls.storage_key(storage)
+        existing = {
+            (derivative.format, derivative.width): derivative
+            for derivative in ImageDerivative.objects.filter(storage_key=storage_key, source_name=source_name)
+        }
+
+        close = content is None
+        if content is None:
+            content = storage.open(source_name, 'rb')
+        try:
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            image = Image.open(content)
+            # Let the JPEG decoder downscale while decoding instead of
+            # inflating a full phone-camera frame. EXIF orientations 5-8 are
+            # rotated 90 degrees, so the stored height becomes the width.
+            max_width = max(settings.IMAGE_DERIVATIVE_WIDTHS)
+            rotated = image.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+            image.draft('RGB', (1, max_width) if rotated else (max_width, 1))
+            image = ImageOps.exif_transpose(image)
+            fallback = cls._fallback_format(image)
+
+            created = []
+            # Never enlarge; a narrow image gets one copy at its own width
+            for width in sorted({min(width, image.width) for width in settings.IMAGE_DERIVATIVE_WIDTHS}):
+                height = max(round(image.height * width / image.width), 1)
+                resized = None
+                for fmt in ('webp', fallback):
+                    if (fmt, width) in existing:
+                        continue
+                    if resized is None:
+                        resized = image.resize((width, height), Image.LANCZOS)
+                    created.append(cls._store(storage, source_name, storage_key, resized, width, height, fmt))
+        finally:
+            if close:
+                content.close()
+
+        ImageDerivative.objects.bulk_create(created, ignore_conflicts=True)
+        derivatives = list(ImageDerivative.objects.filter(storage_key=storage_key, source_name=source_name))
+        cache.set(cls._cache_key(storage_key, source_name), derivatives, cls.CACHE_TIMEOUT)
+        cache.delete(cls._failed_key(storage_key, source_name))
+        return derivatives
+
+    @classmethod
+    def _store(cls, storage, source_name, storage_key, image, width, height, fmt):
+        if fmt == 'jpeg' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        elif fmt == 'webp' and image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if cls._fallback_format(image) == 'png' else 'RGB')
+
+        buffer = BytesIO()
+        options = {'quality': settings.IMAGE_DERIVATIVE_QUALITY} if fmt != 'png' else {'optimize': True}
+        image.save(buffer, format=fmt.upper(), **options)
+        content = ContentFile(buffer.getvalue())
+        content.content_type = CONTENT_TYPES[fmt]
+
+        name = storage.save(cls.derivative_name(source_name, width, fmt), content)
+        return ImageDerivative(
+            storage_key=storage_key, source_name=source_name, name=name,
+            format=fmt, width=width, height=height,
+        )
+
+    @classmethod
+    def generate_safely(cls, fieldfile, content=None):
+        """generate(), logging instead of raising; derivatives are never required.
+
+        A failure is remembered for FAILURE_TIMEOUT so pages showing the image
+        don't queue it again on every view.
+        """
+        try:
+            return cls.generate(fieldfile, content)
+        except Exception as e:
+            logger.warning(f"Could not create derivatives for {fieldfile.name}: {e}")
+            cache.set(cls._failed_key(cls.storage_key(fieldfile.storage), fieldfile.name), True, cls.FAILURE_TIMEOUT)
+            return []
+
+    @classmethod
+    def get_derivatives(cls, fieldfile):
+        """Return the recorded derivatives of an image, smallest first"""
+        if not fieldfile:
+            return []
+        storage_key = cls.storage_key(fieldfile.storage)
+        cache_key = cls._cache_key(storage_key, fieldfile.name)
+        derivatives = cache.get(cache_key)
+        if derivatives is None:
+            derivatives = list(ImageDerivative.objects.filter(storage_key=storage_key, source_name=fieldfile.name))
+            # A missing set may be generated any moment; generate() replaces the entry
+            cache.set(cache_key, derivatives, cls.CACHE_TIMEOUT if derivatives else cls.MISSING_TIMEOUT)
+        return derivatives
+
+    @classmethod
+    def prefetch(cls, fieldfiles):
+        """Warm the derivative cache for many images with a single query"""
+        keys = {}
+        for fieldfile in fieldfiles:
+            if fieldfile:
+                storage_key = cls.storage_key(fieldfile.storage)
+                keys[cls._cache_key(storage_key, fieldfile.name)] = (storage_key, fieldfile.name)
+        missing = set(keys) - set(cache.get_many(list(keys)))
+        if not missing:
+            return
+
+        found = {}
+        for derivative in ImageDerivative.objects.filter(
+            source_name__in={keys[key][1] for key in missing}
+        ):
+            cache_key = cls._cache_key(derivative.storage_key, derivative.source_name)
+            if cache_key in missing:
+                found.setdefault(cache_key, []).append(derivative)
+        cache.set_many(found, cls.CACHE_TIMEOUT)
+        cache.set_many(dict.fromkeys(missing - set(found), []), cls.MISSING_TIMEOUT)
+
+    @staticmethod
+    def versioned_url(url, version=None):
+        """Append a cache-busting version to an image URL"""
+        if version in (None, ''):
+            return url
+        return f"{url}{'&' if '?' in url else '?'}v={version}"
+
+    @classmethod
+    def srcset(cls, fieldfile, fmt, derivatives=None, version=None):
+        """Build a srcset attribute value for one format"""
+        if derivatives is None:
+            derivatives = cls.get_derivatives(fieldfile)
+        storage = fieldfile.storage
+        return ', '.join(
+            f"{cls.versioned_url(storage.url(derivative.name), version)} {derivative.width}w"
+            for derivative in derivatives
+            if derivative.format == fmt
+        )
+
+    @classmethod
+    def schedule(cls, fieldfile, content=None):
+        """Generate derivatives for an image in the background.
+
+        `content` is the original when it is at hand (a fresh upload); it is
+        copied to a temporary file, as the upload is gone once the request
+        ends. Images that recently failed are skipped, and so is everything
+        while the queue is full; pages showing the image queue it again later.
+        Without IMAGE_DERIVATIVE_IN_PROCESS nothing is queued and
+        `manage.py generate_image_derivatives` creates them instead.
+        """
+        if not settings.IMAGE_DERIVATIVE_IN_PROCESS or not fieldfile:
+            return
+        key = (cls.storage_key(fieldfile.storage), fieldfile.name)
+        if cache.get(cls._failed_key(*key)):
+            return
+        with cls._worker_lock:
+            if key in cls._queued:
+                return
+            cls._queued.add(key)
+
+        spool_path = cls._spool(content) if content is not None else None
+        try:
+            cls._queue.put_nowait((key, fieldfile.storage, fieldfile.name, spool_path))
+        except queue.Full:
+            logger.info(f"Derivative queue full, leaving {fieldfile.name} for later")
+            cls._discard(key, spool_path)
+            return
+        cls._start_worker()
+
+    @staticmethod
+    def _spool(content):
+        """Copy an upload to a temporary file; None to read the original back from storage instead"""
+        try:
+            content.seek(0)
+            with tempfile.NamedTemporaryFile(prefix='derivative-', delete=False) as spool:
+                shutil.copyfileobj(content, spool)
+            return spool.name
+        except Exception as e:
+            logger.warning(f"Could not spool upload for derivatives: {e}")
+            return None
+
+    @classmethod
+    def _discard(cls, key, spool_path):
+        if spool_path:
+            try:
+                os.remove(spool_path)
+            except OSError:
+                pass
+        with cls._worker_lock:
+            cls._queued.discard(key)
+
+    @classmethod
+    def _start_worker(cls):
+        with cls._worker_lock:
+            if cls._worker is None or not cls._worker.is_alive():
+                cls._worker = threading.Thread(target=cls._run_worker, name='image-derivatives', daemon=True)
+                cls._worker.start()
+
+    @classmethod
+    def _process(cls, item):
+        key, storage, name, spool_path = item
+        content = None
+        try:
+            if spool_path:
+                try:
+                    content = open(spool_path, 'rb')
+                except OSError:
+                    pass  # Read the original back from storage
+            cls.generate_safely(_StoredImage(storage, name), content)
+        finally:
+            if content is not None:
+                content.close()
+            cls._discard(key, spool_path)
+
+    @classmethod
+    def process_queue(cls):
+        """Work off the queue in the calling thread; returns the number of images processed"""
+        processed = 0
+        while True:
+            try:
+                item = cls._queue.get_nowait()
+            except queue.Empty:
+                return processed
+            cls._process(item)
+            processed += 1
+
+    @classmethod
+    def _run_worker(cls):
+        while True:
+            item = cls._queue.get()
+            try:
+                cls._process(item)
+            finally:
+                # Don't hold a database connection open while idle
+                if cls._queue.empty():
+                    connection.close()
+
+
+class _StoredImage:
+    """The parts of a FieldFile that generate() uses, without a model instance"""
+
+    def __init__(self, storage, name):
+        self.storage = storage
+        self.name = name
+
+    def __bool__(self):
+        return bool(self.name)
@@ -0,0 +1,39 @@
+"""Signals queueing image derivatives when an image field receives an upload."""
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save
+
+from .services.image_derivative_service import DERIVATIVE_FIELDS, ImageDerivativeService
+
+# model class -> names of its image fields that get derivatives
+IMAGE_FIELDS = {}
+
+
+def image_saving(sender, instance, **kwargs) -> None:
+    """Remember uploads made with this save; the field replaces them with a name."""
+    instance._derivative_uploads = {
+        field_name: fieldfile.file
+        for field_name in IMAGE_FIELDS[sender]
+        if (fieldfile := getattr(instance, field_name)) and not fieldfile._committed
+    }
+
+
+def image_saved(sender, instance, **kwargs) -> None:
+    """Queue the uploaded images for resizing, handing over the copy still in memory (or temp file)."""
+    uploads = instance.__dict__.pop('_derivative_uploads', None) or {}
+    for field_name, upload in uploads.items():
+        fieldfile = getattr(instance, field_name)
+        transaction.on_commit(
+            lambda fieldfile=fieldfile, upload=upload: ImageDerivativeService.schedule(fieldfile, upload)
+        )
+
+
+for path in DERIVATIVE_FIELDS:
+    app_label, model_name, field_name = path.split('.')
+    model = apps.get_model(app_label, model_name)
+    if model not in IMAGE_FIELDS:
+        IMAGE_FIELDS[model] = []
+        pre_save.connect(image_saving, sender=model, dispatch_uid=f'derivatives_{app_label}_{model_name}_saving')
+        post_save.connect(image_saved, sender=model, dispatch_uid=f'derivatives_{app_label}_{model_name}_saved')
+    IMAGE_FIELDS[model].append(field_name)
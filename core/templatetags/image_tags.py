@@ -0,0 +1,44 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+from core.services.image_derivative_service import ImageDerivativeService
+
+register = template.Library()
+
+
+@register.simple_tag
+def srcset(image, fmt='webp', version=None):
+    """srcset value listing the resized copies of an image in one format"""
+    if not image:
+        return ''
+    return ImageDerivativeService.srcset(image, fmt, version=version)
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw', version=None, **attrs):
+    """
+    Render an uploaded image as a <picture> with WebP and JPEG/PNG srcsets.
+    Extra keyword arguments become attributes of the <img> tag; `version` is
+    appended to every URL as ?v= to bust caches. Images without derivatives
+    yet render as a plain <img> and are queued for resizing.
+    """
+    attrs = {'alt': alt, 'loading': 'lazy', 'decoding': 'async', **attrs}
+    derivatives = ImageDerivativeService.get_derivatives(image)
+    if not derivatives:
+        ImageDerivativeService.schedule(image)
+        return format_html(
+            '<img src="{}"{}>', ImageDerivativeService.versioned_url(image.url, version), flatatt(attrs)
+        )
+
+    fallback = [d for d in derivatives if d.format != 'webp'] or derivatives
+    largest = fallback[-1]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        ImageDerivativeService.srcset(image, 'webp', derivatives, version),
+        sizes,
+        ImageDerivativeService.versioned_url(image.storage.url(largest.name), version),
+        ImageDerivativeService.srcset(image, largest.format, derivatives, version),
+        sizes,
+        flatatt(attrs),
+    )
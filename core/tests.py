@@ -1,3 +1,212 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from datetime import date
+from io import BytesIO, StringIO
+from unittest import mock
+from PIL import Image
+import os
+import queue
+import shutil
+import tempfile
 
-# Create your tests here.
+from portfolio.models import Category, Project, ProjectImage
+from .models import ImageDerivative
+from .services.image_derivative_service import ImageDerivativeService
+
+
+def make_image(width, height, fmt='JPEG', mode='RGB'):
+    buffer = BytesIO()
+    Image.new(mode, (width, height), 'red' if mode == 'RGB' else (255, 0, 0, 128)).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+@override_settings(IMAGE_DERIVATIVE_WIDTHS=(320, 640, 1024), IMAGE_DERIVATIVE_IN_PROCESS=False)
+class ImageDerivativeServiceTestCase(TestCase):
+    """Test cases for resized image derivatives"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.storage = FileSystemStorage(location=self.tmpdir, base_url='/media/')
+        patcher = mock.patch.object(ProjectImage._meta.get_field('image'), 'storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.project = Project.objects.create(
+            title='Derivative Project',
+            description='Test description',
+            category=Category.objects.create(name='Derivatives'),
+            year=2024,
+            location='Test Location',
+            size='100 m²',
+            duration='6 Months',
+            completion_date=date(2024, 12, 31),
+            lead_architect='Test Architect',
+        )
+
+    def upload(self, content, name='site.jpg', process=True):
+        """Upload an image; the queued resizing runs here instead of in the worker thread"""
+        with override_settings(IMAGE_DERIVATIVE_IN_PROCESS=True), \
+                mock.patch.object(ImageDerivativeService, '_start_worker'):
+            with self.captureOnCommitCallbacks(execute=True):
+                image = ProjectImage.objects.create(
+                    project=self.project, alt_text='Site',
+                    image=SimpleUploadedFile(name, content, content_type='image/jpeg'),
+                )
+        if process:
+            ImageDerivativeService.process_queue()
+        return image
+
+    def test_upload_only_queues_derivatives(self):
+        """The request never waits for resizing; a processed image can be queued again"""
+        image = self.upload(make_image(800, 400), process=False)
+        self.assertFalse(ImageDerivative.objects.filter(source_name=image.image.name).exists())
+
+        self.assertEqual(ImageDerivativeService.process_queue(), 1)
+        self.assertEqual(ImageDerivative.objects.filter(source_name=image.image.name).count(), 6)
+        self.assertEqual(ImageDerivativeService._queued, set())
+
+    def test_full_queue_leaves_upload_for_later(self):
+        """Uploads wait on disk, not in memory, and a full queue turns them away"""
+        with mock.patch.object(ImageDerivativeService, '_queue', queue.Queue(maxsize=1)):
+            first = self.upload(make_image(400, 200), process=False)
+            second = self.upload(make_image(400, 200), name='second.jpg', process=False)
+            self.assertEqual(
+                ImageDerivativeService._queued,
+                {(ImageDerivativeService.storage_key(self.storage), first.image.name)},
+            )
+            spool_path = ImageDerivativeService._queue.queue[0][3]
+            self.assertTrue(os.path.exists(spool_path))
+
+            self.assertEqual(ImageDerivativeService.process_queue(), 1)
+        self.assertFalse(os.path.exists(spool_path))
+        self.assertTrue(ImageDerivative.objects.filter(source_name=first.image.name).exists())
+        self.assertFalse(ImageDerivative.objects.filter(source_name=second.image.name).exists())
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'derivative-tests'}})
+    def test_failed_image_not_queued_on_every_view(self):
+        cache.clear()
+        broken = self.upload(b'not an image', name='broken.jpg')
+        template = Template('{% load image_tags %}{% responsive_image image alt="Broken" %}')
+
+        with override_settings(IMAGE_DERIVATIVE_IN_PROCESS=True), \
+                mock.patch.object(ImageDerivativeService, '_start_worker'):
+            template.render(Context({'image': broken.image}))
+            with self.assertNumQueries(0):
+                html = template.render(Context({'image': broken.image}))
+        self.assertIn('broken', html)
+        self.assertTrue(ImageDerivativeService._queue.empty())
+        self.assertEqual(ImageDerivativeService._queued, set())
+
+    def test_upload_creates_derivatives_next_to_original(self):
+        """Each configured width gets a WebP and a JPEG copy; nothing is enlarged"""
+        image = self.upload(make_image(800, 400))
+
+        derivatives = ImageDerivative.objects.filter(source_name=image.image.name)
+        self.assertEqual(
+            sorted((d.format, d.width, d.height) for d in derivatives),
+            [('jpeg', 320, 160), ('jpeg', 640, 320), ('jpeg', 800, 400),
+             ('webp', 320, 160), ('webp', 640, 320), ('webp', 800, 400)],
+        )
+        root = image.image.name.rsplit('.', 1)[0]
+        self.assertIn(f'{root}.320w.webp', {d.name for d in derivatives})
+        for derivative in derivatives:
+            self.assertTrue(self.storage.exists(derivative.name))
+            with Image.open(self.storage.path(derivative.name)) as stored:
+                self.assertEqual(stored.size, (derivative.width, derivative.height))
+
+    def test_transparent_images_fall_back_to_png(self):
+        image = self.upload(make_image(300, 300, fmt='PNG', mode='RGBA'), name='logo.png')
+
+        self.assertEqual(
+            set(ImageDerivative.objects.filter(source_name=image.image.name).values_list('format', flat=True)),
+            {'webp', 'png'},
+        )
+
+    def test_generate_is_idempotent_and_skips_non_images(self):
+        image = self.upload(make_image(700, 350))
+        count = ImageDerivative.objects.count()
+
+        ImageDerivativeService.generate(image.image)
+        self.assertEqual(ImageDerivative.objects.count(), count)
+
+        broken = self.upload(b'not an image', name='broken.jpg')
+        self.assertFalse(ImageDerivative.objects.filter(source_name=broken.image.name).exists())
+
+    def test_responsive_image_tag(self):
+        image = self.upload(make_image(700, 350))
+        template = Template('{% load image_tags %}{% responsive_image image alt="Site" sizes="50vw" %}')
+
+        html = template.render(Context({'image': image.image}))
+
+        self.assertIn('<picture><source type="image/webp"', html)
+        self.assertIn('.320w.webp 320w', html)
+        self.assertIn('.640w.jpg 640w', html)
+        self.assertIn('sizes="50vw"', html)
+        self.assertIn('alt="Site"', html)
+
+        template = Template('{% load image_tags %}{% responsive_image image alt="Site" version=1700000000 %}')
+        html = template.render(Context({'image': image.image}))
+        self.assertIn('.320w.webp?v=1700000000 320w', html)
+        self.assertIn('.640w.jpg?v=1700000000 640w', html)
+
+    def test_tag_without_derivatives_renders_original(self):
+        image = ProjectImage.objects.create(project=self.project, alt_text='Old', image='projects/gallery/old.jpg')
+        template = Template('{% load image_tags %}{% responsive_image image alt="Old" %}')
+
+        with mock.patch.object(ImageDerivativeService, 'schedule') as schedule:
+            html = template.render(Context({'image': image.image}))
+
+        self.assertEqual(html, '<img src="/media/projects/gallery/old.jpg" alt="Old" decoding="async" loading="lazy">')
+        schedule.assert_called_once()
+
+    def test_management_command_backfills(self):
+        self.storage.save('projects/gallery/legacy.jpg', BytesIO(make_image(500, 250)))
+        ProjectImage.objects.create(project=self.project, alt_text='Legacy', image='projects/gallery/legacy.jpg')
+
+        out = StringIO()
+        call_command('generate_image_derivatives', 'portfolio.ProjectImage.image', stdout=out)
+
+        self.assertIn('resized 1 image(s)', out.getvalue())
+        self.assertEqual(ImageDerivative.objects.filter(source_name='projects/gallery/legacy.jpg').count(), 4)
+
+
+class AccessRouterTestCase(TestCase):
+    def test_longest_prefix_decides_area(self):
+        from .access_router import ACCESS_ROUTER
+
+        self.assertEqual(ACCESS_ROUTER.lookup('/diary/adminside/entries/').area, 'admin')
+        self.assertEqual(ACCESS_ROUTER.lookup('/diary/dashboard/').area, 'site_manager')
+        self.assertEqual(ACCESS_ROUTER.lookup('/diary/adminside/').error_template, 'page error/401_2.html')
+        self.assertEqual(ACCESS_ROUTER.lookup('/diary/').error_template, 'page error/401.html')
+        self.assertIsNone(ACCESS_ROUTER.lookup('/blog/post/').area)
+        self.assertIsNone(ACCESS_ROUTER.lookup('/diar').error_template)
+
+    def test_admin_login_matches_exactly(self):
+        from .access_router import ACCESS_ROUTER
+
+        self.assertTrue(ACCESS_ROUTER.lookup('/admin/login').admin_login)
+        self.assertTrue(ACCESS_ROUTER.lookup('/admin/logout/').admin_login)
+        self.assertFalse(ACCESS_ROUTER.lookup('/admin/login/extra/').admin_login)
+        self.assertEqual(ACCESS_ROUTER.lookup('/admin/login/').area, 'admin')
+
+    def test_role_rules_accumulate_along_path(self):
+        from .access_router import ACCESS_ROUTER
+
+        rule = ACCESS_ROUTER.lookup('/diary/adminside/reviewer/')
+        self.assertTrue(rule.login_required)
+        self.assertEqual(rule.blocked_roles, {'public', 'site_manager', 'anonymous'})
+        self.assertEqual(ACCESS_ROUTER.lookup('/diary/dashboard/').blocked_roles, {'admin', 'anonymous'})
+        self.assertTrue(ACCESS_ROUTER.lookup('/static/css/site.css').role_check_exempt)
+        self.assertFalse(ACCESS_ROUTER.lookup('/').login_required)
+
+    def test_benchmark_command_reports_timings(self):
+        out = StringIO()
+        call_command('benchmark_access_router', '--number', '5', stdout=out)
+
+        self.assertIn('us/request', out.getvalue())
+        self.assertIn('prefix router', out.getvalue())
@@ -10,6 +10,7 @@ from accounts.forms import ProfileUpdateForm
 from accounts.decorators import allow_public_access, require_public_role
 from portfolio.models import Project, Category
 from site_diary.models import Project as SiteDiaryProject
+from site_diary.services.latest_entry_service import LatestEntryService
 from chatbot.models import ChatbotMessage
 
 @allow_public_access
@@ -145,7 +146,9 @@ def clientdashboard(request):
         'user_full_name': current_user.get_full_name() or current_user.username,
         'user_email': current_user.email,
         'profile_role': profile.role.title() if profile.role else 'Client',
-        'client_projects': client_projects,
+        'client_projects': LatestEntryService.attach_latest_entries(
+            client_projects.select_related('project_manager'), include_drafts=True
+        ),
         'total_projects': total_projects,
         'active_projects': active_projects,
         'completed_projects': completed_projects,
@@ -181,28 +184,11 @@ def client_project_detail(request, project_id):
     # Get diary entries for this project
     diary_entries = project.diary_entries.filter(draft=False).order_by('-entry_date')[:10]
     
-    # Calculate budget used from all diary entries
+    # Calculate budget used from all diary entries (materials, labor, equipment,
+    # subcontractors and delay cost impacts)
     from decimal import Decimal
-    budget_used = Decimal('0')
-    all_entries = project.diary_entries.filter(draft=False)
-    
-    for entry in all_entries:
-        # Sum material costs
-        for material in entry.material_entries.all():
-            budget_used += material.total_cost
-        # Sum labor costs
-        for labor in entry.labor_entries.all():
-            budget_used += labor.total_cost
-        # Sum equipment costs
-        for equipment in entry.equipment_entries.all():
-            budget_used += equipment.total_rental_cost
-        # Sum subcontractor costs
-        for subcontractor in entry.subcontractor_entries.all():
-            budget_used += subcontractor.daily_cost
-        # Sum delay cost impacts
-        for delay in entry.delay_entries.all():
-            if delay.cost_impact:
-                budget_used += delay.cost_impact
+    from site_diary.services.cost_service import ProjectCostService
+    budget_used = ProjectCostService.get_project_cost(project, include_drafts=False)['total_cost']
     
     budget_remaining = project.budget - budget_used if project.budget else Decimal('0')
     budget_percentage = (budget_used / project.budget * 100) if project.budget and project.budget > 0 else 0
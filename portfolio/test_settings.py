@@ -64,3 +64,17 @@ if 'debug_toolbar' in INSTALLED_APPS:
 
 # Test-specific settings
 TEST_RUNNER = 'django.test.runner.DiscoverRunner'
+
+# Diary photo uploads are processed explicitly in tests
+DIARY_PHOTO_SPOOL_DIR = '/tmp/test_media/diary_photo_spool'
+DIARY_PHOTO_UPLOAD_IN_PROCESS = False
+
+# Image derivatives are only generated explicitly in tests
+IMAGE_DERIVATIVE_IN_PROCESS = False
+
+# Blog views and analytics events are written through in tests
+BLOG_VIEW_FLUSH_IN_PROCESS = False
+BLOG_ANALYTICS_IN_PROCESS = False
+
+# Related post lists are only refreshed explicitly in tests
+BLOG_RELATED_POSTS_IN_PROCESS = False
@@ -1,14 +1,20 @@
-from django.test import TestCase, Client, TransactionTestCase
+from django.test import TestCase, SimpleTestCase, Client, TransactionTestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.base import File
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from django.db import IntegrityError
 from datetime import date, datetime
 from unittest.mock import patch, MagicMock
 from accounts.models import AdminProfile
+from config import supabase_storage
+from .storage import PortfolioSupabaseStorage
 from .models import Category, Project, ProjectImage, ProjectStat, ProjectTimeline
 import json
+import io
 import tempfile
+import threading
 import os
 
 
@@ -571,3 +577,89 @@ class PortfolioIntegrationTest(TransactionTestCase):
         self.assertContains(response, 'Office Building')
         self.assertContains(response, 'Shopping Mall')
         self.assertNotContains(response, 'Residential Villa')
+
+
+class _FakeSupabaseHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, *args):
+        pass
+    
+    def _reply(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_POST(self):
+        self.server.clients.add(self.client_address)
+        length = int(self.headers['Content-Length'])
+        self.server.objects[self.path] = self.rfile.read(length)
+        self._reply(200)
+    
+    def do_HEAD(self):
+        self.server.clients.add(self.client_address)
+        body = self.server.objects.get(self.path)
+        self.send_response(404 if body is None else 200)
+        self.send_header('Content-Length', str(len(body or b'')))
+        self.end_headers()
+    
+    def do_DELETE(self):
+        self.server.clients.add(self.client_address)
+        self.server.objects.pop(self.path, None)
+        self._reply(200)
+
+
+@override_settings(SUPABASE_STORAGE_RETRIES=0)
+class SupabaseStorageClientTest(SimpleTestCase):
+    """The storage backends share one pooled session and stream uploads"""
+    
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeSupabaseHandler)
+        self.server.objects = {}
+        self.server.clients = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        
+        # Start every test with a fresh pool
+        patcher = patch.object(supabase_storage, '_session', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.storage = PortfolioSupabaseStorage()
+        self.storage.supabase_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+    
+    def test_upload_streams_file_in_blocks(self):
+        payload = os.urandom(300 * 1024)
+        reads = []
+        
+        class TrackingFile(io.BytesIO):
+            def read(self, size=-1):
+                reads.append(size)
+                return super().read(size)
+        
+        name = self.storage._save('projects\\videos\\video.mp4', File(TrackingFile(payload), name='video.mp4'))
+        
+        self.assertEqual(name, 'projects/videos/video.mp4')
+        path = f'/storage/v1/object/{self.storage.bucket_name}/projects/videos/video.mp4'
+        self.assertEqual(self.server.objects[path], payload)
+        # Never read whole
+        self.assertTrue(reads)
+        self.assertTrue(all(0 < size < len(payload) for size in reads))
+    
+    def test_requests_reuse_pooled_connection(self):
+        self.storage._save('a.jpg', SimpleUploadedFile('a.jpg', b'aaa', content_type='image/jpeg'))
+        self.assertTrue(self.storage.exists('a.jpg'))
+        self.assertEqual(self.storage.size('a.jpg'), 3)
+        self.storage.delete('a.jpg')
+        self.assertFalse(self.storage.exists('a.jpg'))
+        
+        # Other backends go through the same session
+        self.assertIs(supabase_storage.get_session(), supabase_storage.get_session())
+        self.assertEqual(len(self.server.clients), 1)
+    
+    def test_failed_upload_raises(self):
+        self.storage.supabase_url = 'http://127.0.0.1:1'
+        with self.assertRaises(Exception):
+            self.storage._save('a.jpg', SimpleUploadedFile('a.jpg', b'aaa'))
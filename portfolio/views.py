@@ -9,6 +9,7 @@ from django.db import transaction
 import json
 from .models import Project, Category, ProjectImage, ProjectStat, ProjectTimeline
 from .seo import PortfolioSEOManager
+from core.services.image_derivative_service import ImageDerivativeService
 from accounts.decorators import require_admin_role, allow_public_access
 
 # Create your views here.
@@ -140,6 +141,12 @@ def project_list(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
+    # Look up the card images' resized copies for the whole page at once
+    ImageDerivativeService.prefetch(
+        project.hero_image or (project.images.all()[0].image if project.images.all() else None)
+        for project in page_obj
+    )
+    
     # Get filter options for the template
     categories = Category.objects.all().order_by('name')
     years = Project.objects.values_list('year', flat=True).distinct().order_by('-year')
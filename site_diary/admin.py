@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     Project, DiaryEntry, LaborEntry, MaterialEntry, 
-    EquipmentEntry, DelayEntry, VisitorEntry, DiaryPhoto, SubcontractorCompany, Milestone, WorkerType
+    EquipmentEntry, DelayEntry, VisitorEntry, DiaryPhoto, SubcontractorCompany, Milestone, WorkerType,
+    ProjectCostSnapshot, ProjectWeather, ProjectMonthlyStat
 )
 
 @admin.register(Project)
@@ -145,3 +146,27 @@ class DiaryPhotoAdmin(admin.ModelAdmin):
     list_filter = ['uploaded_at']
     search_fields = ['caption', 'location', 'diary_entry__project__name']
     ordering = ['-uploaded_at']
+
+@admin.register(ProjectCostSnapshot)
+class ProjectCostSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['project', 'entry_count', 'revision_count', 'latest_progress', 'latest_entry_date', 'updated_at']
+    search_fields = ['project__name']
+    readonly_fields = [field.name for field in ProjectCostSnapshot._meta.fields]
+    ordering = ['-updated_at']
+
+@admin.register(ProjectWeather)
+class ProjectWeatherAdmin(admin.ModelAdmin):
+    list_display = ['project', 'observed_at', 'condition', 'temperature', 'humidity', 'wind_speed']
+    list_filter = ['condition']
+    search_fields = ['project__name', 'location']
+    date_hierarchy = 'observed_at'
+    ordering = ['-observed_at']
+
+@admin.register(ProjectMonthlyStat)
+class ProjectMonthlyStatAdmin(admin.ModelAdmin):
+    list_display = ['project', 'month', 'metric', 'dimension', 'draft', 'value']
+    list_filter = ['draft', 'metric']
+    search_fields = ['project__name', 'metric', 'dimension']
+    readonly_fields = [field.name for field in ProjectMonthlyStat._meta.fields]
+    date_hierarchy = 'month'
+    ordering = ['-month', 'project', 'metric']
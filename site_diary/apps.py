@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SiteDiaryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'site_diary'
+
+    def ready(self):
+        import site_diary.signals
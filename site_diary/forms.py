@@ -6,6 +6,7 @@ from .models import (
     Project, DiaryEntry, LaborEntry, MaterialEntry, 
     EquipmentEntry, DelayEntry, VisitorEntry, DiaryPhoto, SubcontractorCompany, Milestone
 )
+from .services.project_scope_service import ProjectScopeService
 
 class ProjectForm(forms.ModelForm):
     class Meta:
@@ -67,20 +68,7 @@ class DiaryEntryForm(forms.ModelForm):
         
         if user:
             # Filter projects to show user's projects including ProjectAssignment assignments
-            from admin_side.models import ProjectAssignment
-            from django.db.models import Q
-            
-            # Get projects through assignments or direct assignment
-            assigned_project_ids = ProjectAssignment.objects.filter(
-                user=user, is_active=True
-            ).values_list('project_id', flat=True)
-            
-            self.fields['project'].queryset = Project.objects.filter(
-                Q(id__in=assigned_project_ids) | 
-                Q(project_manager=user) | 
-                Q(architect=user),
-                status__in=['planning', 'active', 'on_hold', 'completed']
-            )
+            self.fields['project'].queryset = ProjectScopeService.user_projects(user)
         
         # Set up milestone field with active milestones
         self.fields['milestone'].queryset = Milestone.objects.filter(is_active=True).order_by('order', 'name')
@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from site_diary.services.photo_upload_service import PhotoUploadService
+
+class Command(BaseCommand):
+    help = (
+        'Push spooled diary photos to storage, retrying failed uploads with backoff. '
+        'Run it on the web machine that holds the spool, e.g. to drain it after a restart'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the pending queue and exit')
+        parser.add_argument('--retry-failed', action='store_true', help='Requeue uploads that exhausted their retries')
+        parser.add_argument('--interval', type=int, default=PhotoUploadService.POLL_INTERVAL, help='Seconds between polls')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            requeued = PhotoUploadService.retry_failed()
+            self.stdout.write(f'Requeued {requeued} failed upload(s)')
+
+        while True:
+            uploaded, failed = PhotoUploadService.process_pending()
+            if uploaded or failed:
+                self.stdout.write(f'Uploaded {uploaded} photo(s), {failed} failed')
+                continue
+            if options['once']:
+                self.stdout.write(self.style.SUCCESS('Photo upload queue is drained'))
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from site_diary.models import Project
+from site_diary.services.monthly_stats_service import MonthlyStatsService
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly report statistics from diary entries, or check them for drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_ids', nargs='*', type=int, help='Only these projects (default: all)')
+        parser.add_argument('--check', action='store_true', help='Report drift without rewriting statistics')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all()
+        if options['project_ids']:
+            projects = projects.filter(pk__in=options['project_ids'])
+
+        if options['check']:
+            drift = MonthlyStatsService.find_drift(projects)
+            for project_id, month, metric, dimension, stored, expected in drift:
+                label = f'{metric}[{dimension}]' if dimension else metric
+                self.stdout.write(
+                    self.style.WARNING(f'Project {project_id} {month:%Y-%m}: {label} is {stored}, expected {expected}')
+                )
+            if drift:
+                drifted = len({(project_id, month) for project_id, month, *_ in drift})
+                raise CommandError(f'{drifted} project month(s) out of date')
+            self.stdout.write(self.style.SUCCESS('All monthly statistics are up to date'))
+            return
+
+        stored = MonthlyStatsService.rebuild(projects)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {stored} monthly statistic(s) for {projects.count()} project(s)'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from site_diary.models import Project
+from site_diary.services.snapshot_service import ProjectSnapshotService
+
+class Command(BaseCommand):
+    help = 'Rebuild project cost snapshots from diary entries, or check them for drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_ids', nargs='*', type=int, help='Only these projects (default: all)')
+        parser.add_argument('--check', action='store_true', help='Report drift without rewriting snapshots')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all()
+        if options['project_ids']:
+            projects = projects.filter(pk__in=options['project_ids'])
+
+        drift = ProjectSnapshotService.find_drift(projects)
+        for project_id, field, stored, expected in drift:
+            self.stdout.write(
+                self.style.WARNING(f'Project {project_id}: {field} is {stored}, expected {expected}')
+            )
+
+        if options['check']:
+            if drift:
+                drifted = len({project_id for project_id, *_ in drift})
+                raise CommandError(f'{drifted} project snapshot(s) out of date')
+            self.stdout.write(self.style.SUCCESS('All project snapshots are up to date'))
+            return
+
+        rebuilt = ProjectSnapshotService.refresh(projects.values_list('pk', flat=True))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(rebuilt)} project snapshot(s)'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_diary', '0015_diaryentry_supervisor_signature_alter_project_image_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectCostSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('labor_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('material_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('equipment_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('subcontractor_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('delay_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('delay_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('delay_count', models.PositiveIntegerField(default=0)),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('draft_count', models.PositiveIntegerField(default=0)),
+                ('revision_count', models.PositiveIntegerField(default=0, help_text='Finalized entries marked as needing revision')),
+                ('latest_entry_date', models.DateField(blank=True, null=True)),
+                ('latest_progress', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('latest_milestone', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='site_diary.milestone')),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cost_snapshot', to='site_diary.project')),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_diary', '0016_projectcostsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diaryphoto',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='diaryphoto',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='diaryphoto',
+            name='spool_path',
+            field=models.CharField(blank=True, help_text='Local copy waiting to be pushed to storage', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='diaryphoto',
+            name='upload_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='diaryphoto',
+            name='upload_status',
+            field=models.CharField(choices=[('pending', 'Pending Upload'), ('complete', 'Uploaded'), ('failed', 'Upload Failed')], default='complete', max_length=10),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_diary', '0017_diaryphoto_upload_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectWeather',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(help_text='Normalized location the weather was looked up for', max_length=100)),
+                ('observed_at', models.DateTimeField(help_text='When the weather service returned this reading')),
+                ('temperature', models.IntegerField(help_text='Temperature in Celsius')),
+                ('temperature_high', models.IntegerField(help_text='Temperature in Celsius')),
+                ('temperature_low', models.IntegerField(help_text='Temperature in Celsius')),
+                ('humidity', models.IntegerField(help_text='Humidity percentage')),
+                ('wind_speed', models.IntegerField(help_text='Wind speed in km/h')),
+                ('condition', models.CharField(max_length=50)),
+                ('description', models.CharField(max_length=100)),
+                ('icon', models.CharField(blank=True, max_length=10)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weather_history', to='site_diary.project')),
+            ],
+            options={
+                'ordering': ['-observed_at'],
+                'unique_together': {('project', 'observed_at')},
+            },
+        ),
+    ]
@@ -0,0 +1,151 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:47
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+# A frozen copy of the metrics in MonthlyStatsService as they stood when this
+# migration was written, so later changes to the service can't alter it.
+# `manage.py rebuild_monthly_stats` recomputes the facts with the live code.
+MONEY = DecimalField(max_digits=18, decimal_places=2)
+ZERO = Decimal('0')
+OVERTIME_RATE_MULTIPLIER = Decimal('1.5')
+FACT_PRECISION = Decimal('0.0001')
+
+
+def metric_groups():
+    labor_cost = ExpressionWrapper(
+        Coalesce(F('hourly_rate'), Value(ZERO)) * F('workers_count') * (
+            F('hours_worked') + F('overtime_hours') * Value(OVERTIME_RATE_MULTIPLIER)
+        ),
+        output_field=MONEY,
+    )
+    material_cost = ExpressionWrapper(Coalesce(F('unit_cost'), Value(ZERO)) * F('quantity_delivered'), output_field=MONEY)
+    equipment_cost = ExpressionWrapper(
+        Coalesce(F('rental_cost_per_hour'), Value(ZERO)) * F('hours_operated'), output_field=MONEY
+    )
+    return {
+        'entry': ('DiaryEntry', None, None, {
+            'count': Count('id'),
+            'approved': Count('id', filter=Q(status='complete')),
+            'needs_revision': Count('id', filter=Q(status='needs_revision')),
+            'safety_incidents': Count('id', filter=~Q(safety_incidents='')),
+            'quality_issues': Count('id', filter=~Q(quality_issues='')),
+            'photos': Count('id', filter=Q(photos_taken=True)),
+            'progress_sum': Sum('progress_percentage'),
+            'progress_count': Count('progress_percentage'),
+            'progress_max': Max('progress_percentage'),
+            'progress_min': Min('progress_percentage'),
+            'temperature_high_sum': Sum('temperature_high'),
+            'temperature_high_count': Count('temperature_high'),
+        }),
+        'weather': ('DiaryEntry', 'weather_condition', Q(weather_condition=''), {
+            'count': Count('id'),
+            'temperature_high_sum': Sum('temperature_high'),
+            'temperature_high_count': Count('temperature_high'),
+            'temperature_low_sum': Sum('temperature_low'),
+            'temperature_low_count': Count('temperature_low'),
+            'humidity_sum': Sum('humidity'),
+            'humidity_count': Count('humidity'),
+            'wind_speed_sum': Sum('wind_speed'),
+            'wind_speed_count': Count('wind_speed'),
+        }),
+        'delay': ('DelayEntry', 'category', None, {
+            'count': Count('id'),
+            'hours': Sum('duration_hours'),
+            'cost_impact_sum': Sum('cost_impact'),
+            'cost_impact_count': Count('cost_impact'),
+        }),
+        'labor': ('LaborEntry', 'labor_type', None, {
+            'count': Count('id'),
+            'workers': Sum('workers_count'),
+            'hours': Sum('hours_worked'),
+            'overtime': Sum('overtime_hours'),
+            'hourly_rate_sum': Sum('hourly_rate'),
+            'hourly_rate_count': Count('hourly_rate'),
+            'cost': Sum(labor_cost),
+        }),
+        'material': ('MaterialEntry', 'material_name', None, {
+            'count': Count('id'),
+            'delivered': Sum('quantity_delivered'),
+            'used': Sum('quantity_used'),
+            'unit_cost_sum': Sum('unit_cost'),
+            'unit_cost_count': Count('unit_cost'),
+            'cost': Sum(material_cost),
+        }),
+        'equipment': ('EquipmentEntry', 'equipment_type', None, {
+            'count': Count('id'),
+            'hours': Sum('hours_operated'),
+            'fuel': Sum('fuel_consumption'),
+            'rental_rate_sum': Sum('rental_cost_per_hour'),
+            'rental_rate_count': Count('rental_cost_per_hour'),
+            'days': Count('diary_entry__entry_date', distinct=True),
+            'breakdowns': Count('id', filter=Q(status='breakdown')),
+            'cost': Sum(equipment_cost),
+        }),
+        'subcontractor': ('SubcontractorEntry', None, None, {
+            'count': Count('id'),
+            'cost': Sum('daily_cost'),
+        }),
+        'visitor': ('VisitorEntry', None, None, {
+            'count': Count('id'),
+        }),
+    }
+
+
+def build_monthly_stats(apps, schema_editor):
+    """Compute the facts for existing diary data; the reports read nothing else"""
+    ProjectMonthlyStat = apps.get_model('site_diary', 'ProjectMonthlyStat')
+    for group, (model_name, dimension, exclude, aggregates) in metric_groups().items():
+        prefix = '' if model_name == 'DiaryEntry' else 'diary_entry__'
+        rows = apps.get_model('site_diary', model_name).objects.all()
+        if exclude is not None:
+            rows = rows.exclude(exclude)
+        keys = {
+            'fact_project': F(f'{prefix}project_id'),
+            'fact_month': TruncMonth(f'{prefix}entry_date'),
+            'fact_draft': F(f'{prefix}draft'),
+        }
+        if dimension:
+            keys['fact_dimension'] = F(dimension)
+
+        facts = []
+        for row in rows.order_by().values(**keys).annotate(**aggregates).iterator():
+            for name in aggregates:
+                if row[name] is not None:
+                    facts.append(ProjectMonthlyStat(
+                        project_id=row['fact_project'], month=row['fact_month'], draft=row['fact_draft'],
+                        metric=f'{group}.{name}', dimension=row.get('fact_dimension') or '',
+                        value=Decimal(str(row[name])).quantize(FACT_PRECISION),
+                    ))
+        ProjectMonthlyStat.objects.bulk_create(facts, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_diary', '0018_projectweather'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectMonthlyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('draft', models.BooleanField(default=False)),
+                ('metric', models.CharField(max_length=40)),
+                ('dimension', models.CharField(blank=True, max_length=100)),
+                ('value', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_stats', to='site_diary.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project', 'month'], name='site_diary__project_1a49c6_idx')],
+                'unique_together': {('project', 'month', 'draft', 'metric', 'dimension')},
+            },
+        ),
+        migrations.RunPython(build_monthly_stats, migrations.RunPython.noop),
+    ]
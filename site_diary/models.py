@@ -18,6 +18,17 @@ class Project(models.Model):
         ('rejected', 'Rejected'),
     ]
     
+    # Progress reported for projects without any diary entries
+    STATUS_PROGRESS = {
+        'pending_approval': 0,
+        'planning': 0,
+        'active': 0,
+        'on_hold': 0,
+        'completed': 100,
+        'cancelled': 0,
+        'rejected': 0,
+    }
+    
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True, max_length=2000)
     client_name = models.CharField(max_length=100)
@@ -59,25 +70,24 @@ class Project(models.Model):
                 raise ValidationError('Actual end date cannot be before start date.')
     
     def get_progress_percentage(self):
-        """Get the latest progress percentage from diary entries"""
+        """Get the latest progress percentage from submitted diary entries.
+
+        Uses `latest_entry` when LatestEntryService has attached it, so lists of
+        projects don't run one query each. Drafts are ignored, as in the cost
+        snapshot.
+        """
         try:
-            latest_entry = self.diary_entries.order_by('-entry_date').first()
+            if 'latest_entry' in self.__dict__:
+                latest_entry = self.latest_entry
+            else:
+                latest_entry = self.diary_entries.filter(draft=False).order_by('-entry_date', '-created_at').first()
             if latest_entry and latest_entry.progress_percentage is not None:
                 return int(latest_entry.progress_percentage)
         except (ValueError, TypeError, AttributeError):
             pass
         
         # Fallback to status-based progress
-        status_progress = {
-            'pending_approval': 0,
-            'planning': 0,
-            'active': 0,
-            'on_hold': 0,
-            'completed': 100,
-            'cancelled': 0,
-            'rejected': 0,
-        }
-        return status_progress.get(self.status, 0)
+        return self.STATUS_PROGRESS.get(self.status, 0)
 
 class DiaryEntry(models.Model):
     WEATHER_CONDITIONS = [
@@ -157,6 +167,9 @@ class LaborEntry(models.Model):
         ('specialist', 'Specialist'),
     ]
     
+    # Overtime hours are paid at 1.5x the regular hourly rate
+    OVERTIME_RATE_MULTIPLIER = Decimal('1.5')
+    
     diary_entry = models.ForeignKey(DiaryEntry, on_delete=models.CASCADE, related_name='labor_entries')
     labor_type = models.CharField(max_length=20, choices=LABOR_TYPES)
     trade_description = models.CharField(max_length=100, help_text="e.g., Carpenter, Electrician, Plumber")
@@ -171,7 +184,7 @@ class LaborEntry(models.Model):
     def total_cost(self):
         if self.hourly_rate:
             regular_cost = self.hours_worked * self.hourly_rate * self.workers_count
-            overtime_cost = self.overtime_hours * (self.hourly_rate * Decimal('1.5')) * self.workers_count
+            overtime_cost = self.overtime_hours * (self.hourly_rate * self.OVERTIME_RATE_MULTIPLIER) * self.workers_count
             return regular_cost + overtime_cost
         return 0
     
@@ -376,12 +389,25 @@ class SubcontractorEntry(models.Model):
         return f"{self.company_name} - {self.diary_entry.entry_date}"
 
 class DiaryPhoto(models.Model):
+    UPLOAD_STATUS = [
+        ('pending', 'Pending Upload'),
+        ('complete', 'Uploaded'),
+        ('failed', 'Upload Failed'),
+    ]
+    
     diary_entry = models.ForeignKey(DiaryEntry, on_delete=models.CASCADE, related_name='photos')
     photo = models.ImageField(upload_to='diary_photos/%Y/%m/%d/', storage=None)  # Will be set in __init__
     caption = models.CharField(max_length=200, blank=True)
     location = models.CharField(max_length=100, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
+    # Background upload state, see site_diary/services/photo_upload_service.py
+    upload_status = models.CharField(max_length=10, choices=UPLOAD_STATUS, default='complete')
+    spool_path = models.CharField(max_length=500, blank=True, help_text="Local copy waiting to be pushed to storage")
+    upload_attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         from .storage import DiaryPhotoStorage
@@ -389,3 +415,101 @@ class DiaryPhoto(models.Model):
     
     def __str__(self):
         return f"Photo for {self.diary_entry} - {self.caption}"
+    
+    @property
+    def is_uploaded(self):
+        return self.upload_status == 'complete'
+
+class ProjectCostSnapshot(models.Model):
+    """Denormalized running totals for a project's finalized (non-draft) diary entries.
+
+    Kept current by the signal handlers in site_diary/signals.py and rebuilt or
+    checked for drift with the rebuild_project_snapshots management command.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, related_name='cost_snapshot')
+    
+    labor_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    material_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    equipment_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    subcontractor_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    delay_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    delay_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    delay_count = models.PositiveIntegerField(default=0)
+    
+    entry_count = models.PositiveIntegerField(default=0)
+    draft_count = models.PositiveIntegerField(default=0)
+    revision_count = models.PositiveIntegerField(default=0, help_text="Finalized entries marked as needing revision")
+    
+    latest_entry_date = models.DateField(null=True, blank=True)
+    latest_progress = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    latest_milestone = models.ForeignKey('Milestone', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Cost snapshot for {self.project.name}"
+    
+    @property
+    def resource_cost(self):
+        return self.labor_cost + self.material_cost + self.equipment_cost
+    
+    @property
+    def total_cost(self):
+        return self.resource_cost + self.subcontractor_cost + self.delay_cost
+    
+    def get_progress_percentage(self):
+        """Same contract as Project.get_progress_percentage, without touching diary entries"""
+        if self.latest_progress is not None:
+            return int(self.latest_progress)
+        return Project.STATUS_PROGRESS.get(self.project.status, 0)
+
+
+class ProjectWeather(models.Model):
+    """Weather observed at a project's site, recorded whenever the diary weather lookup runs.
+
+    Lets diary forms prefill the weather fields from the latest observation
+    without calling the weather API.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='weather_history')
+    location = models.CharField(max_length=100, help_text="Normalized location the weather was looked up for")
+    observed_at = models.DateTimeField(help_text="When the weather service returned this reading")
+    
+    temperature = models.IntegerField(help_text="Temperature in Celsius")
+    temperature_high = models.IntegerField(help_text="Temperature in Celsius")
+    temperature_low = models.IntegerField(help_text="Temperature in Celsius")
+    humidity = models.IntegerField(help_text="Humidity percentage")
+    wind_speed = models.IntegerField(help_text="Wind speed in km/h")
+    condition = models.CharField(max_length=50)
+    description = models.CharField(max_length=100)
+    icon = models.CharField(max_length=10, blank=True)
+    
+    class Meta:
+        ordering = ['-observed_at']
+        unique_together = ['project', 'observed_at']
+    
+    def __str__(self):
+        return f"Weather for {self.project.name} at {self.observed_at:%Y-%m-%d %H:%M}"
+
+
+class ProjectMonthlyStat(models.Model):
+    """One precomputed report metric for a project and calendar month.
+
+    Facts are keyed by metric (e.g. 'labor.hours') and an optional dimension
+    (labor type, material name, delay category, ...), and kept separately for
+    draft and finalized entries. MonthlyStatsService rebuilds the months a diary
+    change touches; rebuild_monthly_stats recomputes them from scratch.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='monthly_stats')
+    month = models.DateField(help_text="First day of the month")
+    draft = models.BooleanField(default=False)
+    metric = models.CharField(max_length=40)
+    dimension = models.CharField(max_length=100, blank=True)
+    value = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    
+    class Meta:
+        unique_together = ['project', 'month', 'draft', 'metric', 'dimension']
+        indexes = [models.Index(fields=['project', 'month'])]
+    
+    def __str__(self):
+        label = f"{self.metric}[{self.dimension}]" if self.dimension else self.metric
+        return f"{self.project.name} {self.month:%Y-%m} {label} = {self.value}"
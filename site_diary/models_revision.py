@@ -157,19 +157,13 @@ class ProjectBudgetSummary(models.Model):
     
     def update_summary(self):
         """Recalculate budget summary from actual data"""
-        from .models import LaborEntry, MaterialEntry, EquipmentEntry
+        from .services.cost_service import ProjectCostService
         
-        # Get all diary entries for this project
-        project_entries = DiaryEntry.objects.filter(project=self.project)
-        
-        # Calculate actual costs
-        labor_entries = LaborEntry.objects.filter(diary_entry__in=project_entries)
-        material_entries = MaterialEntry.objects.filter(diary_entry__in=project_entries)
-        equipment_entries = EquipmentEntry.objects.filter(diary_entry__in=project_entries)
-        
-        self.labor_costs = sum(labor.total_cost for labor in labor_entries)
-        self.material_costs = sum(material.total_cost for material in material_entries)
-        self.equipment_costs = sum(equipment.total_rental_cost for equipment in equipment_entries)
+        # Calculate actual costs from all diary entries for this project
+        costs = ProjectCostService.get_project_cost(self.project)
+        self.labor_costs = costs['labor_cost']
+        self.material_costs = costs['material_cost']
+        self.equipment_costs = costs['equipment_cost']
         
         # Calculate revision adjustments
         adjustments = BudgetAdjustment.objects.filter(project=self.project)
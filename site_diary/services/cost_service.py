@@ -0,0 +1,135 @@
+from decimal import Decimal
+from django.db.models import (
+    Count, DecimalField, ExpressionWrapper, F, IntegerField, OuterRef, QuerySet, Subquery, Sum, Value
+)
+from django.db.models.functions import Coalesce
+from ..models import (
+    Project, LaborEntry, MaterialEntry, EquipmentEntry, SubcontractorEntry, DelayEntry
+)
+
+MONEY_FIELD = DecimalField(max_digits=18, decimal_places=2)
+ZERO = Decimal('0')
+
+# SQL equivalents of LaborEntry.total_cost, MaterialEntry.total_cost and
+# EquipmentEntry.total_rental_cost. A missing rate or unit cost counts as zero.
+LABOR_COST_EXPRESSION = ExpressionWrapper(
+    Coalesce(F('hourly_rate'), Value(ZERO)) * F('workers_count') * (
+        F('hours_worked') + F('overtime_hours') * Value(LaborEntry.OVERTIME_RATE_MULTIPLIER)
+    ),
+    output_field=MONEY_FIELD
+)
+MATERIAL_COST_EXPRESSION = ExpressionWrapper(
+    Coalesce(F('unit_cost'), Value(ZERO)) * F('quantity_delivered'),
+    output_field=MONEY_FIELD
+)
+EQUIPMENT_COST_EXPRESSION = ExpressionWrapper(
+    Coalesce(F('rental_cost_per_hour'), Value(ZERO)) * F('hours_operated'),
+    output_field=MONEY_FIELD
+)
+
+
+class ProjectCostService:
+    """Database-side cost rollups for site diary projects.
+
+    Every figure is computed in SQL, so the cost of a page no longer grows with
+    the number of labor, material and equipment rows behind a project.
+    """
+
+    COST_FIELDS = (
+        'labor_cost', 'material_cost', 'equipment_cost',
+        'subcontractor_cost', 'delay_cost',
+    )
+
+    @staticmethod
+    def _entry_filter(include_drafts=True, start_date=None, end_date=None):
+        """Translate diary entry filters to lookups usable on child rows"""
+        lookups = {}
+        if not include_drafts:
+            lookups['diary_entry__draft'] = False
+        if start_date:
+            lookups['diary_entry__entry_date__gte'] = start_date
+        if end_date:
+            lookups['diary_entry__entry_date__lte'] = end_date
+        return lookups
+
+    @staticmethod
+    def _project_subquery(model, aggregate, lookups, output_field=MONEY_FIELD):
+        """Correlated per-project aggregate over one child table"""
+        rows = model.objects.filter(
+            diary_entry__project=OuterRef('pk'), **lookups
+        ).order_by().values('diary_entry__project').annotate(
+            total=aggregate
+        ).values('total')[:1]
+        return Coalesce(Subquery(rows, output_field=output_field), Value(0), output_field=output_field)
+
+    @classmethod
+    def annotate_costs(cls, projects, include_drafts=True, start_date=None, end_date=None):
+        """Annotate a Project queryset with per-category cost totals.
+
+        Each category is a correlated subquery rather than a join, so child rows
+        from different tables never multiply each other.
+        """
+        lookups = cls._entry_filter(include_drafts, start_date, end_date)
+        return projects.annotate(
+            labor_cost=cls._project_subquery(LaborEntry, Sum(LABOR_COST_EXPRESSION), lookups),
+            material_cost=cls._project_subquery(MaterialEntry, Sum(MATERIAL_COST_EXPRESSION), lookups),
+            equipment_cost=cls._project_subquery(EquipmentEntry, Sum(EQUIPMENT_COST_EXPRESSION), lookups),
+            subcontractor_cost=cls._project_subquery(SubcontractorEntry, Sum('daily_cost'), lookups),
+            delay_cost=cls._project_subquery(DelayEntry, Sum('cost_impact'), lookups),
+            delay_hours=cls._project_subquery(DelayEntry, Sum('duration_hours'), lookups),
+            delay_count=cls._project_subquery(
+                DelayEntry, Count('id'), lookups, output_field=IntegerField()
+            ),
+        )
+
+    @classmethod
+    def get_project_costs(cls, projects, include_drafts=True, start_date=None, end_date=None):
+        """Return cost totals for many projects in a single query.
+
+        `projects` may be a queryset, a list of Project instances or a list of ids.
+        The result maps project id to a dict of Decimal totals; `resource_cost`
+        is labor + material + equipment and `total_cost` adds subcontractors and
+        delay cost impacts on top.
+        """
+        if isinstance(projects, QuerySet):
+            project_ids = projects.order_by().values('pk')
+        else:
+            project_ids = [getattr(project, 'pk', project) for project in projects]
+
+        rows = cls.annotate_costs(
+            Project.objects.filter(pk__in=project_ids).order_by(),
+            include_drafts=include_drafts,
+            start_date=start_date,
+            end_date=end_date,
+        ).values('pk', *cls.COST_FIELDS, 'delay_hours', 'delay_count')
+
+        costs = {}
+        for row in rows:
+            project_id = row.pop('pk')
+            costs[project_id] = cls._with_totals(row)
+        return costs
+
+    @classmethod
+    def get_project_cost(cls, project, **filters):
+        """Cost totals for a single project"""
+        costs = cls.get_project_costs([project], **filters)
+        return costs.get(getattr(project, 'pk', project), cls.empty_costs())
+
+    @classmethod
+    def empty_costs(cls):
+        return cls._with_totals({field: ZERO for field in cls.COST_FIELDS} | {'delay_hours': ZERO, 'delay_count': 0})
+
+    @classmethod
+    def sum_costs(cls, costs):
+        """Combine the per-project dicts returned by get_project_costs"""
+        total = cls.empty_costs()
+        for project_costs in costs.values():
+            for key, value in project_costs.items():
+                total[key] += value
+        return total
+
+    @staticmethod
+    def _with_totals(row):
+        row['resource_cost'] = row['labor_cost'] + row['material_cost'] + row['equipment_cost']
+        row['total_cost'] = row['resource_cost'] + row['subcontractor_cost'] + row['delay_cost']
+        return row
@@ -0,0 +1,226 @@
+import json
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from ..models import (
+    LaborEntry, MaterialEntry, EquipmentEntry, DelayEntry, SubcontractorEntry, WorkerType
+)
+from .snapshot_service import ProjectSnapshotService
+from .monthly_stats_service import MonthlyStatsService
+
+
+def _decimal(value):
+    """Parse a JSON number (or numeric string) from the diary form"""
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValidationError(f'"{value}" is not a valid number')
+
+
+class DiaryWriteService:
+    """Persist the child rows of a diary entry from the diary form payload.
+
+    The whole payload is parsed and validated before anything is written.
+    Each section is then diffed against the rows already stored for the entry
+    and applied with at most one bulk_update, one bulk_create and one delete,
+    instead of deleting everything and inserting line by line.
+    """
+
+    # section name -> (model, POST key holding the JSON list)
+    JSON_SECTIONS = {
+        'materials': (MaterialEntry, 'materials_json'),
+        'equipment': (EquipmentEntry, 'equipment_json'),
+        'delays': (DelayEntry, 'delays_json'),
+        'overtime': (LaborEntry, 'overtime_json'),
+        'subcontractors': (SubcontractorEntry, 'subcontractor_json'),
+    }
+
+    @staticmethod
+    def _material_values(data):
+        quantity = _decimal(data['quantity'])
+        cost = _decimal(data['cost'])
+        return {
+            'material_name': data['name'],
+            'quantity_delivered': quantity,
+            'unit': data['unit'],
+            'unit_cost': cost / quantity if quantity > 0 else 0,
+            'supplier': data.get('supplier') or '',
+            'delivery_time': data.get('delivery_time') or None,
+        }
+
+    @staticmethod
+    def _equipment_values(data):
+        hours = _decimal(data['hours'])
+        cost = _decimal(data['cost'])
+        return {
+            'equipment_name': data['name'],
+            'equipment_type': data['name'],
+            'hours_operated': hours,
+            'rental_cost_per_hour': cost / hours if hours > 0 else 0,
+            'operator_name': data.get('operator') or '',
+            'fuel_consumption': data.get('fuel') or 0,
+        }
+
+    @staticmethod
+    def _delay_values(data):
+        return {
+            'category': data['type'],
+            'description': data['description'],
+            'start_time': data.get('start_time') or None,
+            'end_time': data.get('end_time') or None,
+            'duration_hours': data.get('duration') or 0,
+            'impact_level': data['impact'],
+            'mitigation_actions': data.get('solution') or '',
+            'affected_activities': 'General work activities',
+        }
+
+    @staticmethod
+    def _overtime_values(data):
+        return {
+            'labor_type': 'overtime',
+            'trade_description': f"{data['personnel']} {data['role']} personnel",
+            'workers_count': data['personnel'],
+            'hours_worked': data['hours'],
+            'overtime_hours': data['hours'],
+            'hourly_rate': data['rate'],
+        }
+
+    @staticmethod
+    def _subcontractor_values(data):
+        return {
+            'company_name': data['name'],
+            'work_description': data['work'],
+            'daily_cost': data.get('cost') or 0,
+        }
+
+    @staticmethod
+    def _clean_values(model, values):
+        """Convert raw values to what the model fields store, so diffs compare like with like"""
+        cleaned = {}
+        for name, value in values.items():
+            field = model._meta.get_field(name)
+            value = field.to_python(value)
+            if value is None and not field.null:
+                raise ValidationError(f'{field.verbose_name} is required')
+            if isinstance(field, models.DecimalField) and value is not None:
+                value = value.quantize(Decimal(1).scaleb(-field.decimal_places))
+            cleaned[name] = value
+        return cleaned
+
+    @classmethod
+    def parse_payload(cls, data):
+        """Validate the diary form payload in one pass.
+
+        Returns {section: [field values, ...]} for every section present in
+        `data` (request.POST); absent JSON sections are left untouched when the
+        payload is applied. Raises ValidationError listing every problem found.
+        """
+        builders = {
+            'materials': cls._material_values,
+            'equipment': cls._equipment_values,
+            'delays': cls._delay_values,
+            'overtime': cls._overtime_values,
+            'subcontractors': cls._subcontractor_values,
+        }
+        payload = {}
+        errors = []
+
+        # Daily labor is entered per worker type and always replaces the stored rows
+        payload['labor'] = []
+        for worker_type in WorkerType.objects.filter(is_active=True):
+            worker_slug = worker_type.name.lower().replace(' ', '-')
+            worker_count = data.get(f"{worker_slug}Count", 0)
+            worker_rate = data.get(f"{worker_slug}Rate", 0)
+            try:
+                if int(worker_count or 0) > 0:
+                    payload['labor'].append(cls._clean_values(LaborEntry, {
+                        'labor_type': worker_slug,
+                        'trade_description': worker_type.name,
+                        'workers_count': worker_count,
+                        'hours_worked': 8,
+                        'overtime_hours': 0,
+                        'hourly_rate': worker_rate or worker_type.default_daily_rate or 0,
+                    }))
+            except (ValueError, ValidationError):
+                errors.append(f'{worker_type.name}: invalid worker count or rate')
+
+        for section, (model, key) in cls.JSON_SECTIONS.items():
+            raw = data.get(key)
+            if not raw:
+                continue
+            try:
+                rows = json.loads(raw)
+            except ValueError:
+                errors.append(f'{section.title()}: malformed data')
+                continue
+            if not isinstance(rows, list):
+                errors.append(f'{section.title()}: malformed data')
+                continue
+
+            payload[section] = []
+            for index, row in enumerate(rows, start=1):
+                try:
+                    payload[section].append(cls._clean_values(model, builders[section](row)))
+                except KeyError as e:
+                    errors.append(f'{section.title()} #{index}: missing {e.args[0]}')
+                except ValidationError as e:
+                    errors.append(f'{section.title()} #{index}: {"; ".join(e.messages)}')
+                except (TypeError, AttributeError):
+                    errors.append(f'{section.title()} #{index}: malformed data')
+
+        if errors:
+            raise ValidationError(errors)
+        return payload
+
+    @staticmethod
+    def _sync_rows(entry, model, existing, desired):
+        """Make `existing` rows match `desired` values with bulk statements"""
+        to_update = []
+        changed_fields = set()
+        for instance, values in zip(existing, desired):
+            changed = [name for name, value in values.items() if getattr(instance, name) != value]
+            if changed:
+                for name in changed:
+                    setattr(instance, name, values[name])
+                to_update.append(instance)
+                changed_fields.update(changed)
+
+        stale_ids = [instance.pk for instance in existing[len(desired):]]
+        to_create = [model(diary_entry=entry, **values) for values in desired[len(existing):]]
+
+        if stale_ids:
+            model.objects.filter(pk__in=stale_ids).delete()
+        if to_update:
+            model.objects.bulk_update(to_update, sorted(changed_fields))
+        if to_create:
+            model.objects.bulk_create(to_create)
+        return {'created': len(to_create), 'updated': len(to_update), 'deleted': len(stale_ids)}
+
+    @classmethod
+    def apply_payload(cls, entry, payload):
+        """Write a parsed payload for a saved diary entry inside one transaction.
+
+        Returns {section: {'created': n, 'updated': n, 'deleted': n}}.
+        """
+        results = {}
+        with transaction.atomic():
+            if 'labor' in payload or 'overtime' in payload:
+                labor_rows = list(entry.labor_entries.order_by('id'))
+                existing = {
+                    'labor': [row for row in labor_rows if row.labor_type != 'overtime'],
+                    'overtime': [row for row in labor_rows if row.labor_type == 'overtime'],
+                }
+                for section in ('labor', 'overtime'):
+                    if section in payload:
+                        results[section] = cls._sync_rows(entry, LaborEntry, existing[section], payload[section])
+
+            for section, (model, _key) in cls.JSON_SECTIONS.items():
+                if section == 'overtime' or section not in payload:
+                    continue
+                existing = list(model.objects.filter(diary_entry=entry).order_by('id'))
+                results[section] = cls._sync_rows(entry, model, existing, payload[section])
+
+            # bulk_create and bulk_update bypass the model signals
+            ProjectSnapshotService.schedule_refresh(entry.project_id)
+            MonthlyStatsService.schedule_refresh(entry.project_id, entry.entry_date)
+        return results
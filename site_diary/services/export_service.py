@@ -0,0 +1,242 @@
+import csv
+import io
+from datetime import date, datetime
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from ..models import (
+    DiaryEntry, LaborEntry, MaterialEntry, EquipmentEntry, DelayEntry, SubcontractorEntry
+)
+from .cost_service import LABOR_COST_EXPRESSION, MATERIAL_COST_EXPRESSION, EQUIPMENT_COST_EXPRESSION
+from .monthly_stats_service import MonthlyStatsService, MonthlyStats
+
+# Columns shared by every line item export, relative to the child row
+ENTRY_COLUMNS = (
+    ('Entry ID', 'diary_entry_id'),
+    ('Project', 'diary_entry__project__name'),
+    ('Entry date', 'diary_entry__entry_date'),
+)
+
+# dataset: (model, columns). A column is (header, field path or expression).
+DATASETS = {
+    'entries': (DiaryEntry, (
+        ('Entry ID', 'id'),
+        ('Project', 'project__name'),
+        ('Entry date', 'entry_date'),
+        ('Status', 'status'),
+        ('Created by', 'created_by__username'),
+        ('Milestone', 'milestone__name'),
+        ('Progress %', 'progress_percentage'),
+        ('Weather', 'weather_condition'),
+        ('Temperature high', 'temperature_high'),
+        ('Temperature low', 'temperature_low'),
+        ('Humidity', 'humidity'),
+        ('Wind speed', 'wind_speed'),
+        ('Work description', 'work_description'),
+        ('Quality issues', 'quality_issues'),
+        ('Safety incidents', 'safety_incidents'),
+        ('General notes', 'general_notes'),
+        ('Photos taken', 'photos_taken'),
+        ('Created at', 'created_at'),
+    )),
+    'labor': (LaborEntry, ENTRY_COLUMNS + (
+        ('Labor type', 'labor_type'),
+        ('Trade', 'trade_description'),
+        ('Workers', 'workers_count'),
+        ('Hours worked', 'hours_worked'),
+        ('Overtime hours', 'overtime_hours'),
+        ('Hourly rate', 'hourly_rate'),
+        ('Cost', LABOR_COST_EXPRESSION),
+        ('Work area', 'work_area'),
+    )),
+    'materials': (MaterialEntry, ENTRY_COLUMNS + (
+        ('Material', 'material_name'),
+        ('Quantity delivered', 'quantity_delivered'),
+        ('Quantity used', 'quantity_used'),
+        ('Unit', 'unit'),
+        ('Unit cost', 'unit_cost'),
+        ('Cost', MATERIAL_COST_EXPRESSION),
+        ('Supplier', 'supplier'),
+    )),
+    'equipment': (EquipmentEntry, ENTRY_COLUMNS + (
+        ('Equipment', 'equipment_name'),
+        ('Type', 'equipment_type'),
+        ('Operator', 'operator_name'),
+        ('Hours operated', 'hours_operated'),
+        ('Fuel (L)', 'fuel_consumption'),
+        ('Status', 'status'),
+        ('Rental rate', 'rental_cost_per_hour'),
+        ('Cost', EQUIPMENT_COST_EXPRESSION),
+    )),
+    'delays': (DelayEntry, ENTRY_COLUMNS + (
+        ('Category', 'category'),
+        ('Description', 'description'),
+        ('Start', 'start_time'),
+        ('End', 'end_time'),
+        ('Duration hours', 'duration_hours'),
+        ('Impact', 'impact_level'),
+        ('Affected activities', 'affected_activities'),
+        ('Responsible party', 'responsible_party'),
+        ('Cost impact', 'cost_impact'),
+    )),
+    'subcontractors': (SubcontractorEntry, ENTRY_COLUMNS + (
+        ('Company', 'company_name'),
+        ('Work description', 'work_description'),
+        ('Daily cost', 'daily_cost'),
+    )),
+}
+
+COST_COLUMNS = (
+    'Project', 'Month', 'Entries', 'Labor cost', 'Material cost', 'Equipment cost',
+    'Subcontractor cost', 'Delay cost', 'Delay hours', 'Total cost',
+)
+
+# Spreadsheet apps treat cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Echo:
+    """File-like object whose write() hands the line straight back"""
+
+    def write(self, value):
+        return value
+
+
+class DiaryExportService:
+    """Stream diary data as CSV without holding the result set in memory.
+
+    Rows are read with QuerySet.iterator() in chunks of DIARY_EXPORT_CHUNK_SIZE
+    and written out as they arrive, so an export of every entry in a year
+    costs the same memory as an export of ten.
+    """
+
+    DATASETS = tuple(DATASETS) + ('costs',)
+    BUFFER_SIZE = 64 * 1024
+
+    @staticmethod
+    def _parse_date(value):
+        try:
+            return parse_date(value) if value else None
+        except ValueError:
+            return None
+
+    @classmethod
+    def filter_entries(cls, projects, params):
+        """Finalized diary entries of `projects` matching the export filters.
+
+        Understands the history filters (project id, start_date, end_date,
+        weather_condition, created_by) and those of the admin diary reviewer
+        (project name, date_from, date_to, status, architect, search).
+        """
+        entries = DiaryEntry.objects.filter(project__in=projects, draft=False)
+
+        project = params.get('project')
+        if project:
+            entries = entries.filter(project_id=int(project)) if project.isdigit() else entries.filter(project__name__icontains=project)
+        start_date = cls._parse_date(params.get('start_date') or params.get('date_from'))
+        if start_date:
+            entries = entries.filter(entry_date__gte=start_date)
+        end_date = cls._parse_date(params.get('end_date') or params.get('date_to'))
+        if end_date:
+            entries = entries.filter(entry_date__lte=end_date)
+        if params.get('status') in ('complete', 'needs_revision'):
+            entries = entries.filter(status=params['status'])
+        if params.get('weather_condition'):
+            entries = entries.filter(weather_condition=params['weather_condition'])
+        if params.get('created_by', '').isdigit():
+            entries = entries.filter(created_by_id=int(params['created_by']))
+        if params.get('architect'):
+            entries = entries.filter(created_by__username=params['architect'])
+        if params.get('search'):
+            search = params['search']
+            entries = entries.filter(
+                Q(project__name__icontains=search) |
+                Q(created_by__username__icontains=search) |
+                Q(project__location__icontains=search)
+            )
+        return entries
+
+    @classmethod
+    def rows(cls, dataset, projects, params):
+        """Yield the header and then one list of cell values per row"""
+        if dataset == 'costs':
+            yield from cls._cost_rows(projects, params)
+            return
+
+        model, columns = DATASETS[dataset]
+        entries = cls.filter_entries(projects, params)
+        if model is DiaryEntry:
+            queryset = entries.order_by('entry_date', 'id')
+        else:
+            queryset = model.objects.filter(diary_entry__in=entries.values('pk')).order_by('diary_entry__entry_date', 'id')
+
+        fields = []
+        for index, (_header, column) in enumerate(columns):
+            if isinstance(column, str):
+                fields.append(column)
+            else:
+                fields.append(f'export_{index}')
+                queryset = queryset.annotate(**{f'export_{index}': column})
+
+        yield [header for header, _column in columns]
+        for row in queryset.values_list(*fields).iterator(chunk_size=settings.DIARY_EXPORT_CHUNK_SIZE):
+            yield row
+
+    @classmethod
+    def _cost_rows(cls, projects, params):
+        """Cost rollups per project and month, read from the monthly statistics"""
+        project = params.get('project')
+        if project:
+            projects = projects.filter(pk=int(project)) if project.isdigit() else projects.filter(name__icontains=project)
+        stats = MonthlyStatsService.collect(
+            projects,
+            start_date=cls._parse_date(params.get('start_date') or params.get('date_from')),
+            end_date=cls._parse_date(params.get('end_date') or params.get('date_to')),
+            include_drafts=False,
+        )
+        names = dict(projects.values_list('pk', 'name'))
+        rollup = stats.rollup('project_id', 'month')
+
+        yield list(COST_COLUMNS)
+        for (project_id, month), metrics in sorted(
+            rollup.items(), key=lambda item: (names.get(item[0][0], ''), item[0][1])
+        ):
+            costs = MonthlyStats.costs(metrics)
+            yield [
+                names.get(project_id, project_id), month.strftime('%Y-%m'), metrics.get('entry.count', 0),
+                costs['labor_cost'], costs['material_cost'], costs['equipment_cost'],
+                costs['subcontractor_cost'], costs['delay_cost'], costs['delay_hours'], costs['total_cost'],
+            ]
+
+    @staticmethod
+    def _cell(value):
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return 'Yes' if value else 'No'
+        if isinstance(value, datetime):
+            return timezone.localtime(value).strftime('%Y-%m-%d %H:%M') if timezone.is_aware(value) else value.strftime('%Y-%m-%d %H:%M')
+        if isinstance(value, date):
+            return value.isoformat()
+        if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+            return "'" + value
+        return value
+
+    @classmethod
+    def stream_csv(cls, rows):
+        """Encode rows as CSV, yielding the output in blocks of about BUFFER_SIZE"""
+        writer = csv.writer(_Echo())
+        # A byte order mark makes Excel read the file as UTF-8
+        buffer = io.StringIO()
+        buffer.write('\ufeff')
+        for row in rows:
+            buffer.write(writer.writerow([cls._cell(value) for value in row]))
+            if buffer.tell() >= cls.BUFFER_SIZE:
+                yield buffer.getvalue()
+                buffer = io.StringIO()
+        yield buffer.getvalue()
+
+    @staticmethod
+    def filename(dataset):
+        return f"diary-{dataset}-{timezone.localdate():%Y%m%d}.csv"
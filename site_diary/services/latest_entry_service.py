@@ -0,0 +1,48 @@
+from django.db.models import F, QuerySet, Window
+from django.db.models.functions import RowNumber
+from ..models import DiaryEntry
+
+
+class LatestEntryService:
+    """Resolve the latest diary entry for many projects at once"""
+
+    @staticmethod
+    def get_latest_entries(projects, include_drafts=False):
+        """Return {project_id: DiaryEntry} using a single windowed query.
+
+        Entries are ranked per project by entry date (then creation time) and
+        only the first of each partition is fetched, with its milestone.
+        Projects without entries are absent from the result.
+        """
+        if isinstance(projects, QuerySet):
+            project_ids = projects.order_by().values('pk')
+        else:
+            project_ids = [getattr(project, 'pk', project) for project in projects]
+            if not project_ids:
+                return {}
+
+        entries = DiaryEntry.objects.filter(project_id__in=project_ids)
+        if not include_drafts:
+            entries = entries.filter(draft=False)
+
+        entries = entries.annotate(
+            recency=Window(
+                RowNumber(),
+                partition_by=F('project_id'),
+                order_by=[F('entry_date').desc(), F('created_at').desc()],
+            )
+        ).filter(recency=1).select_related('milestone').order_by()
+        return {entry.project_id: entry for entry in entries}
+
+    @classmethod
+    def attach_latest_entries(cls, projects, include_drafts=False):
+        """Set `latest_entry` (or None) on every project instance.
+
+        Project.get_progress_percentage() uses the attached entry instead of
+        querying. Returns the projects as a list.
+        """
+        projects = list(projects)
+        latest_entries = cls.get_latest_entries(projects, include_drafts=include_drafts)
+        for project in projects:
+            project.latest_entry = latest_entries.get(project.pk)
+        return projects
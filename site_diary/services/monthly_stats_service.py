@@ -0,0 +1,448 @@
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, QuerySet, Sum
+from django.db.models.functions import TruncMonth
+from django.utils.dateparse import parse_date
+from ..models import (
+    DiaryEntry, LaborEntry, MaterialEntry, EquipmentEntry, DelayEntry, SubcontractorEntry,
+    VisitorEntry, ProjectMonthlyStat
+)
+from .cost_service import (
+    ProjectCostService, LABOR_COST_EXPRESSION, MATERIAL_COST_EXPRESSION, EQUIPMENT_COST_EXPRESSION, ZERO
+)
+
+# (project id, month) pairs and entry ids touched in the current transaction
+_pending = threading.local()
+
+FACT_PRECISION = Decimal('0.0001')
+# Every summed column is stored with two decimal places; so are reported figures
+REPORT_PRECISION = Decimal('0.01')
+
+# Metrics stored per project, month and draft flag. Each group aggregates one
+# table, optionally split by a dimension column. Averages are stored as a
+# _sum/_count pair so they can be combined across months; metrics ending in
+# _max or _min are combined with MAX/MIN instead of SUM.
+METRIC_GROUPS = {
+    'entry': {
+        'model': DiaryEntry,
+        'aggregates': {
+            'count': Count('id'),
+            'approved': Count('id', filter=Q(status='complete')),
+            'needs_revision': Count('id', filter=Q(status='needs_revision')),
+            'safety_incidents': Count('id', filter=~Q(safety_incidents='')),
+            'quality_issues': Count('id', filter=~Q(quality_issues='')),
+            'photos': Count('id', filter=Q(photos_taken=True)),
+            'progress_sum': Sum('progress_percentage'),
+            'progress_count': Count('progress_percentage'),
+            'progress_max': Max('progress_percentage'),
+            'progress_min': Min('progress_percentage'),
+            'temperature_high_sum': Sum('temperature_high'),
+            'temperature_high_count': Count('temperature_high'),
+        },
+    },
+    'weather': {
+        'model': DiaryEntry,
+        'dimension': 'weather_condition',
+        'exclude': Q(weather_condition=''),
+        'aggregates': {
+            'count': Count('id'),
+            'temperature_high_sum': Sum('temperature_high'),
+            'temperature_high_count': Count('temperature_high'),
+            'temperature_low_sum': Sum('temperature_low'),
+            'temperature_low_count': Count('temperature_low'),
+            'humidity_sum': Sum('humidity'),
+            'humidity_count': Count('humidity'),
+            'wind_speed_sum': Sum('wind_speed'),
+            'wind_speed_count': Count('wind_speed'),
+        },
+    },
+    'delay': {
+        'model': DelayEntry,
+        'dimension': 'category',
+        'aggregates': {
+            'count': Count('id'),
+            'hours': Sum('duration_hours'),
+            'cost_impact_sum': Sum('cost_impact'),
+            'cost_impact_count': Count('cost_impact'),
+        },
+    },
+    'labor': {
+        'model': LaborEntry,
+        'dimension': 'labor_type',
+        'aggregates': {
+            'count': Count('id'),
+            'workers': Sum('workers_count'),
+            'hours': Sum('hours_worked'),
+            'overtime': Sum('overtime_hours'),
+            'hourly_rate_sum': Sum('hourly_rate'),
+            'hourly_rate_count': Count('hourly_rate'),
+            'cost': Sum(LABOR_COST_EXPRESSION),
+        },
+    },
+    'material': {
+        'model': MaterialEntry,
+        'dimension': 'material_name',
+        'aggregates': {
+            'count': Count('id'),
+            'delivered': Sum('quantity_delivered'),
+            'used': Sum('quantity_used'),
+            'unit_cost_sum': Sum('unit_cost'),
+            'unit_cost_count': Count('unit_cost'),
+            'cost': Sum(MATERIAL_COST_EXPRESSION),
+        },
+    },
+    'equipment': {
+        'model': EquipmentEntry,
+        'dimension': 'equipment_type',
+        'aggregates': {
+            'count': Count('id'),
+            'hours': Sum('hours_operated'),
+            'fuel': Sum('fuel_consumption'),
+            'rental_rate_sum': Sum('rental_cost_per_hour'),
+            'rental_rate_count': Count('rental_cost_per_hour'),
+            'days': Count('diary_entry__entry_date', distinct=True),
+            'breakdowns': Count('id', filter=Q(status='breakdown')),
+            'cost': Sum(EQUIPMENT_COST_EXPRESSION),
+        },
+    },
+    'subcontractor': {
+        'model': SubcontractorEntry,
+        'aggregates': {
+            'count': Count('id'),
+            'cost': Sum('daily_cost'),
+        },
+    },
+    'visitor': {
+        'model': VisitorEntry,
+        'aggregates': {
+            'count': Count('id'),
+        },
+    },
+}
+
+# Metrics that count rows (or workers) and are reported as ints
+INTEGER_METRICS = {
+    f'{group}.{name}'
+    for group, spec in METRIC_GROUPS.items()
+    for name, aggregate in spec['aggregates'].items()
+    if isinstance(aggregate, Count)
+} | {'labor.workers'}
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def month_end(day):
+    return next_month(day) - timedelta(days=1)
+
+
+class MonthlyStatsService:
+    """Maintain and read the ProjectMonthlyStat fact table behind the diary reports.
+
+    Whenever diary data changes, the facts for the affected project months are
+    recomputed once the transaction commits. Reports then combine a few
+    hundred fact rows per project-year instead of scanning every diary entry,
+    labor, material and equipment row in the selected period.
+    """
+
+    @staticmethod
+    def _periods_filter(prefix, periods):
+        condition = Q()
+        for start, end in periods:
+            condition |= Q(**{f'{prefix}entry_date__range': (start, end)})
+        return condition
+
+    @classmethod
+    def compute(cls, projects, periods=None):
+        """Compute facts straight from the diary tables.
+
+        `periods` is a list of (start_date, end_date) ranges; without it the
+        whole history is computed. Returns
+        {(project_id, month, draft, metric, dimension): Decimal}.
+        """
+        facts = {}
+        for group, spec in METRIC_GROUPS.items():
+            model = spec['model']
+            prefix = '' if model is DiaryEntry else 'diary_entry__'
+            rows = model.objects.filter(**{f'{prefix}project__in': projects})
+            if periods is not None:
+                rows = rows.filter(cls._periods_filter(prefix, periods))
+            if 'exclude' in spec:
+                rows = rows.exclude(spec['exclude'])
+
+            keys = {
+                'fact_project': F(f'{prefix}project_id'),
+                'fact_month': TruncMonth(f'{prefix}entry_date'),
+                'fact_draft': F(f'{prefix}draft'),
+            }
+            if 'dimension' in spec:
+                keys['fact_dimension'] = F(spec['dimension'])
+
+            for row in rows.order_by().values(**keys).annotate(**spec['aggregates']):
+                key = (row['fact_project'], row['fact_month'], row['fact_draft'])
+                dimension = row.get('fact_dimension') or ''
+                for name in spec['aggregates']:
+                    if row[name] is not None:
+                        value = Decimal(str(row[name])).quantize(FACT_PRECISION)
+                        facts[key + (f'{group}.{name}', dimension)] = value
+        return facts
+
+    @classmethod
+    def refresh(cls, project_months):
+        """Recompute the facts for an iterable of (project_id, month) pairs"""
+        months_by_project = defaultdict(set)
+        for project_id, month in project_months:
+            months_by_project[project_id].add(month_start(month))
+
+        with transaction.atomic():
+            for project_id, months in months_by_project.items():
+                facts = cls.compute([project_id], [(month, month_end(month)) for month in months])
+                ProjectMonthlyStat.objects.filter(project_id=project_id, month__in=months).delete()
+                cls._store(facts)
+
+    @classmethod
+    def rebuild(cls, projects):
+        """Recompute every month of the given projects; returns the number of facts stored"""
+        stored = 0
+        for project_id in projects.values_list('pk', flat=True):
+            with transaction.atomic():
+                facts = cls.compute([project_id])
+                ProjectMonthlyStat.objects.filter(project_id=project_id).delete()
+                stored += cls._store(facts)
+        return stored
+
+    @staticmethod
+    def _store(facts):
+        ProjectMonthlyStat.objects.bulk_create(
+            [
+                ProjectMonthlyStat(
+                    project_id=project_id, month=month, draft=draft,
+                    metric=metric, dimension=dimension, value=value,
+                )
+                for (project_id, month, draft, metric, dimension), value in facts.items()
+            ],
+            batch_size=500,
+        )
+        return len(facts)
+
+    @classmethod
+    def find_drift(cls, projects):
+        """Compare stored facts with freshly computed ones.
+
+        Returns a list of (project_id, month, metric, dimension, stored, expected)
+        tuples for every fact that is missing, outdated or left over.
+        """
+        expected = cls.compute(projects)
+        stored = {
+            (fact.project_id, fact.month, fact.draft, fact.metric, fact.dimension): fact.value
+            for fact in ProjectMonthlyStat.objects.filter(project__in=projects)
+        }
+        drift = []
+        for key in sorted(set(expected) | set(stored), key=str):
+            if expected.get(key) != stored.get(key):
+                project_id, month, _draft, metric, dimension = key
+                drift.append((project_id, month, metric, dimension, stored.get(key), expected.get(key)))
+        return drift
+
+    @classmethod
+    def schedule_refresh(cls, project_id, entry_date):
+        """Recompute a project month once the current transaction commits"""
+        # Unsaved instances may still hold a string or datetime
+        entry_date = DiaryEntry._meta.get_field('entry_date').to_python(entry_date)
+        if not hasattr(_pending, 'project_months'):
+            _pending.project_months = set()
+        _pending.project_months.add((project_id, month_start(entry_date)))
+        transaction.on_commit(cls._flush_pending)
+
+    @classmethod
+    def schedule_entry_refresh(cls, entry_id):
+        """Like schedule_refresh, for callers that only know the diary entry"""
+        if not hasattr(_pending, 'entry_ids'):
+            _pending.entry_ids = set()
+        _pending.entry_ids.add(entry_id)
+        transaction.on_commit(cls._flush_pending)
+
+    @classmethod
+    def _flush_pending(cls):
+        project_months = getattr(_pending, 'project_months', None) or set()
+        entry_ids = getattr(_pending, 'entry_ids', None)
+        _pending.project_months = set()
+        _pending.entry_ids = set()
+        if entry_ids:
+            project_months |= set(
+                DiaryEntry.objects.filter(pk__in=entry_ids).values_list('project_id', 'entry_date')
+            )
+        if project_months:
+            cls.refresh(project_months)
+
+    @staticmethod
+    def _parse_date(value):
+        if isinstance(value, str):
+            try:
+                return parse_date(value)
+            except ValueError:
+                return None
+        return value
+
+    @classmethod
+    def collect(cls, projects, start_date=None, end_date=None, include_drafts=True):
+        """Report metrics for projects between two dates (inclusive, either optional).
+
+        Whole months are read from the fact table; the partial months at either
+        end of the range are computed from the diary tables, so at most two
+        months of raw rows are scanned however long the range is.
+        """
+        start_date = cls._parse_date(start_date)
+        end_date = cls._parse_date(end_date)
+        if isinstance(projects, QuerySet):
+            projects = projects.order_by().values('pk')
+
+        stats = ProjectMonthlyStat.objects.filter(project__in=projects)
+        if not include_drafts:
+            stats = stats.filter(draft=False)
+        if start_date and end_date and start_date > end_date:
+            return MonthlyStats(stats.none(), {})
+
+        # First and last months the range covers completely
+        first_month = start_date if start_date is None or start_date.day == 1 else next_month(start_date)
+        last_month = end_date
+        if end_date is not None:
+            last_month = month_start(end_date if end_date == month_end(end_date) else month_start(end_date) - timedelta(days=1))
+
+        partial = []
+        if first_month and last_month and first_month > last_month:
+            # The range doesn't cover any month completely
+            stats = stats.none()
+            partial.append((start_date, end_date))
+        else:
+            if first_month:
+                stats = stats.filter(month__gte=first_month)
+                if start_date != first_month:
+                    partial.append((start_date, first_month - timedelta(days=1)))
+            if last_month:
+                stats = stats.filter(month__lte=last_month)
+                if end_date != month_end(last_month):
+                    partial.append((next_month(last_month), end_date))
+
+        live_facts = cls.compute(projects, partial) if partial else {}
+        if not include_drafts:
+            live_facts = {key: value for key, value in live_facts.items() if not key[2]}
+        return MonthlyStats(stats, live_facts)
+
+
+class MonthlyStats:
+    """Facts selected by MonthlyStatsService.collect, ready to be rolled up"""
+
+    KEY_POSITIONS = {'project_id': 0, 'month': 1, 'dimension': 4}
+
+    def __init__(self, facts, live_facts):
+        self.facts = facts
+        self.live_facts = live_facts
+
+    @staticmethod
+    def _combine(metric, totals):
+        if metric.endswith('_max'):
+            value = totals['high']
+        elif metric.endswith('_min'):
+            value = totals['low']
+        elif metric in INTEGER_METRICS:
+            return int(totals['total'])
+        else:
+            value = totals['total']
+        return value.quantize(REPORT_PRECISION)
+
+    @staticmethod
+    def _with_averages(metrics):
+        for name in [name for name in metrics if name.endswith('_sum')]:
+            base = name[:-len('_sum')]
+            count = metrics.get(f'{base}_count')
+            if count is not None:
+                metrics[f'avg_{base}'] = (metrics[name] / count).quantize(REPORT_PRECISION) if count else None
+        return metrics
+
+    def rollup(self, *keys, group=None):
+        """Combine facts grouped by any of 'project_id', 'month' and 'dimension'.
+
+        Returns {key: {metric: value}}, where key is a tuple of the requested
+        values, or the value itself for a single key. With a group, only its
+        metrics are returned, without the 'group.' prefix and with avg_<name>
+        values derived from each _sum/_count pair.
+        """
+        facts = self.facts
+        if group:
+            facts = facts.filter(metric__startswith=f'{group}.')
+        totals = defaultdict(dict)
+        rows = facts.order_by().values(*keys, 'metric').annotate(
+            total=Sum('value'), high=Max('value'), low=Min('value')
+        )
+        for row in rows:
+            totals[tuple(row[key] for key in keys)][row['metric']] = {
+                'total': row['total'], 'high': row['high'], 'low': row['low'],
+            }
+
+        for fact_key, value in self.live_facts.items():
+            metric = fact_key[3]
+            if group and not metric.startswith(f'{group}.'):
+                continue
+            metrics = totals[tuple(fact_key[self.KEY_POSITIONS[key]] for key in keys)]
+            current = metrics.get(metric)
+            if current is None:
+                metrics[metric] = {'total': value, 'high': value, 'low': value}
+            else:
+                metrics[metric] = {
+                    'total': current['total'] + value,
+                    'high': max(current['high'], value),
+                    'low': min(current['low'], value),
+                }
+
+        result = {}
+        for key, metrics in totals.items():
+            combined = {}
+            for metric, values in metrics.items():
+                name = metric[len(group) + 1:] if group else metric
+                combined[name] = self._combine(metric, values)
+            result[key[0] if len(keys) == 1 else key] = self._with_averages(combined) if group else combined
+        return result
+
+    def totals(self, group):
+        """Metrics of one group combined over every project, month and dimension"""
+        return self.rollup(group=group).get((), {})
+
+    def breakdown(self, group, label, order_by=None, limit=None):
+        """Per-dimension rows for a group, e.g. labor hours by labor type.
+
+        Each row has the dimension under `label` plus the group's metrics.
+        """
+        rows = [
+            {label: dimension, **metrics}
+            for dimension, metrics in self.rollup('dimension', group=group).items()
+        ]
+        if order_by:
+            rows.sort(key=lambda row: row.get(order_by) or ZERO, reverse=True)
+        return rows[:limit] if limit else rows
+
+    def project_costs(self, project_ids):
+        """Costs per project in the shape ProjectCostService.get_project_costs returns"""
+        metrics = self.rollup('project_id')
+        return {project_id: self.costs(metrics.get(project_id, {})) for project_id in project_ids}
+
+    @staticmethod
+    def costs(metrics):
+        """Cost totals from one set of rolled-up metrics (see rollup without a group)"""
+        return ProjectCostService._with_totals({
+            'labor_cost': metrics.get('labor.cost', ZERO),
+            'material_cost': metrics.get('material.cost', ZERO),
+            'equipment_cost': metrics.get('equipment.cost', ZERO),
+            'subcontractor_cost': metrics.get('subcontractor.cost', ZERO),
+            'delay_cost': metrics.get('delay.cost_impact_sum', ZERO),
+            'delay_hours': metrics.get('delay.hours', ZERO),
+            'delay_count': metrics.get('delay.count', 0),
+        })
@@ -0,0 +1,87 @@
+"""Lay out a diary entry document as PDF with reportlab.
+
+This module deliberately imports nothing from Django, so process pool
+workers can import it without setting Django up. A document is a plain dict
+built by DiaryPdfService.document():
+
+    {
+        'title': str,
+        'subtitle': str,
+        'details': [(label, value), ...],
+        'sections': [
+            {'heading': str, 'text': str},
+            {'heading': str, 'columns': [str, ...], 'rows': [[str, ...], ...]},
+        ],
+    }
+"""
+
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+BRAND_COLOR = colors.HexColor('#1f3a5f')
+GRID_COLOR = colors.HexColor('#c8ced6')
+HEADER_FILL = colors.HexColor('#eef1f5')
+
+
+def _paragraph(text, style):
+    # Paragraph parses a small XML dialect; keep user text literal
+    return Paragraph(escape(str(text)).replace('\n', '<br/>'), style)
+
+
+def render_document(document):
+    """Render one document dict to PDF bytes"""
+    styles = getSampleStyleSheet()
+    body = styles['BodyText']
+    small = styles['BodyText'].clone('Cell', fontSize=8, leading=10)
+    heading = styles['Heading3'].clone('Section', textColor=BRAND_COLOR, spaceBefore=8, spaceAfter=4)
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4, title=document['title'],
+        leftMargin=15 * mm, rightMargin=15 * mm, topMargin=15 * mm, bottomMargin=15 * mm,
+    )
+
+    story = [
+        _paragraph(document['title'], styles['Title']),
+        _paragraph(document.get('subtitle', ''), styles['Heading4']),
+    ]
+    details = [
+        [_paragraph(label, small), _paragraph(value, small)]
+        for label, value in document.get('details', [])
+    ]
+    if details:
+        table = Table(details, colWidths=[45 * mm, doc.width - 45 * mm])
+        table.setStyle(TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.5, GRID_COLOR),
+            ('BACKGROUND', (0, 0), (0, -1), HEADER_FILL),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]))
+        story.append(table)
+
+    for section in document.get('sections', []):
+        story.append(_paragraph(section['heading'], heading))
+        if 'columns' in section:
+            if not section['rows']:
+                story.append(_paragraph('None recorded', body))
+                continue
+            rows = [[_paragraph(column, small) for column in section['columns']]]
+            rows += [[_paragraph(value, small) for value in row] for row in section['rows']]
+            table = Table(rows, repeatRows=1)
+            table.setStyle(TableStyle([
+                ('GRID', (0, 0), (-1, -1), 0.5, GRID_COLOR),
+                ('BACKGROUND', (0, 0), (-1, 0), HEADER_FILL),
+                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ]))
+            story.append(table)
+        else:
+            story.append(_paragraph(section.get('text') or 'None recorded', body))
+        story.append(Spacer(1, 2 * mm))
+
+    doc.build(story)
+    return buffer.getvalue()
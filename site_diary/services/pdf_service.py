@@ -0,0 +1,175 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.cache import cache
+from pypdf import PdfWriter
+from .pdf_layout import render_document
+
+# Pool of PDF rendering processes, created on first use in each process
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return this process's pool of PDF rendering workers.
+
+    Workers are spawned rather than forked so they never inherit the web
+    process's threads or database connections; they only import pdf_layout.
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ProcessPoolExecutor(
+                    max_workers=settings.DIARY_PDF_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def _text(value, suffix=''):
+    if value is None or value == '':
+        return '-'
+    return f"{value}{suffix}"
+
+
+class DiaryPdfService:
+    """Render diary entries to PDF on the server, caching the result.
+
+    A rendered entry is cached under a key built from the entry's updated_at
+    and a hash of everything printed, child rows included, so any edit yields
+    a new key and repeat downloads of an unchanged entry skip rendering.
+    """
+
+    CACHE_PREFIX = 'diary_pdf'
+    # Bump when the layout changes so cached PDFs are not reused
+    LAYOUT_VERSION = 1
+
+    PREFETCH = (
+        'labor_entries', 'material_entries', 'equipment_entries',
+        'delay_entries', 'visitor_entries', 'subcontractor_entries',
+    )
+
+    @classmethod
+    def prepare(cls, entries):
+        """Load everything document() needs for a queryset of entries"""
+        return entries.select_related(
+            'project', 'project__project_manager', 'created_by', 'milestone'
+        ).prefetch_related(*cls.PREFETCH)
+
+    @staticmethod
+    def document(entry):
+        """Describe a diary entry as a plain dict that pdf_layout can render"""
+        project = entry.project
+        manager = project.project_manager
+        details = [
+            ('Project', project.name),
+            ('Client', project.client_name),
+            ('Location', project.location),
+            ('Project manager', (manager.get_full_name() or manager.username) if manager else '-'),
+            ('Prepared by', entry.created_by.get_full_name() or entry.created_by.username),
+            ('Status', entry.get_status_display()),
+            ('Milestone', entry.milestone.name if entry.milestone else '-'),
+            ('Progress', _text(entry.progress_percentage, '%')),
+            ('Weather', entry.get_weather_condition_display() or '-'),
+            ('Temperature', f"{_text(entry.temperature_low)} / {_text(entry.temperature_high)} °C"),
+            ('Humidity', _text(entry.humidity, '%')),
+            ('Wind speed', _text(entry.wind_speed, ' km/h')),
+        ]
+
+        def table(heading, columns, rows):
+            return {'heading': heading, 'columns': columns, 'rows': [[_text(value) for value in row] for row in rows]}
+
+        sections = [
+            {'heading': 'Work performed', 'text': entry.work_description},
+            table('Labor', ['Type', 'Trade', 'Workers', 'Hours', 'Overtime', 'Rate'], [
+                (row.get_labor_type_display(), row.trade_description, row.workers_count,
+                 row.hours_worked, row.overtime_hours, row.hourly_rate)
+                for row in entry.labor_entries.all()
+            ]),
+            table('Materials', ['Material', 'Delivered', 'Used', 'Unit', 'Unit cost', 'Supplier'], [
+                (row.material_name, row.quantity_delivered, row.quantity_used,
+                 row.get_unit_display(), row.unit_cost, row.supplier)
+                for row in entry.material_entries.all()
+            ]),
+            table('Equipment', ['Equipment', 'Type', 'Operator', 'Hours', 'Fuel (L)', 'Status'], [
+                (row.equipment_name, row.equipment_type, row.operator_name,
+                 row.hours_operated, row.fuel_consumption, row.get_status_display())
+                for row in entry.equipment_entries.all()
+            ]),
+            table('Delays', ['Category', 'Description', 'Hours', 'Impact', 'Cost impact'], [
+                (row.get_category_display(), row.description, row.duration_hours,
+                 row.get_impact_level_display(), row.cost_impact)
+                for row in entry.delay_entries.all()
+            ]),
+            table('Visitors', ['Name', 'Company', 'Type', 'Arrival', 'Purpose'], [
+                (row.visitor_name, row.company, row.get_visitor_type_display(),
+                 row.arrival_time.strftime('%H:%M'), row.purpose_of_visit)
+                for row in entry.visitor_entries.all()
+            ]),
+            table('Subcontractors', ['Company', 'Work', 'Daily cost'], [
+                (row.company_name, row.work_description, row.daily_cost)
+                for row in entry.subcontractor_entries.all()
+            ]),
+            {'heading': 'Quality issues', 'text': entry.quality_issues},
+            {'heading': 'Safety incidents', 'text': entry.safety_incidents},
+            {'heading': 'General notes', 'text': entry.general_notes},
+        ]
+        return {
+            'title': 'Site Diary Entry',
+            'subtitle': f"{project.name} - {entry.entry_date:%B %d, %Y}",
+            'details': details,
+            'sections': sections,
+        }
+
+    @classmethod
+    def cache_key(cls, entry, document):
+        digest = hashlib.sha1(repr(document).encode()).hexdigest()
+        return f"{cls.CACHE_PREFIX}:v{cls.LAYOUT_VERSION}:{entry.pk}:{entry.updated_at.timestamp()}:{digest}"
+
+    @classmethod
+    def get_pdf(cls, entry):
+        """PDF bytes for one entry, from the cache when it hasn't changed"""
+        document = cls.document(entry)
+        key = cls.cache_key(entry, document)
+        pdf = cache.get(key)
+        if pdf is None:
+            pdf = render_document(document)
+            cache.set(key, pdf, settings.DIARY_PDF_CACHE_TIMEOUT)
+        return pdf
+
+    @classmethod
+    def get_combined_pdf(cls, entries):
+        """One PDF with every entry of a queryset, rendered in parallel.
+
+        Cached entries are reused; the rest are rendered by the process pool
+        (or inline when only one is missing) and cached individually before
+        the pages are concatenated in entry order.
+        """
+        documents = {}
+        for entry in cls.prepare(entries):
+            document = cls.document(entry)
+            documents[cls.cache_key(entry, document)] = document
+
+        pdfs = cache.get_many(list(documents))
+        missing = [key for key in documents if key not in pdfs]
+        if len(missing) > 1 and settings.DIARY_PDF_WORKERS > 1:
+            rendered = get_pool().map(render_document, [documents[key] for key in missing])
+        else:
+            rendered = map(render_document, [documents[key] for key in missing])
+        fresh = dict(zip(missing, rendered))
+        cache.set_many(fresh, settings.DIARY_PDF_CACHE_TIMEOUT)
+        pdfs.update(fresh)
+
+        writer = PdfWriter()
+        for key in documents:
+            writer.append(BytesIO(pdfs[key]))
+        output = BytesIO()
+        writer.write(output)
+        return output.getvalue()
@@ -0,0 +1,162 @@
+import logging
+import os
+import threading
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from core.services.image_derivative_service import ImageDerivativeService
+from ..models import DiaryPhoto
+
+logger = logging.getLogger(__name__)
+
+
+class PhotoUploadService:
+    """Spool diary photos locally and push them to storage in the background.
+
+    The request only copies the upload to DIARY_PHOTO_SPOOL_DIR and records a
+    pending DiaryPhoto. A thread in the web process uploads pending rows,
+    retrying failures with exponential backoff. The spool is on local disk,
+    so uploads must run on the machine that spooled them; a worker in another
+    container would find no files and fail every row.
+    """
+
+    BASE_BACKOFF = timedelta(seconds=30)
+    MAX_BACKOFF = timedelta(hours=1)
+    # How long a claimed row is reserved for the worker that claimed it
+    LEASE = timedelta(minutes=10)
+    POLL_INTERVAL = 30
+
+    _worker = None
+    _worker_lock = threading.Lock()
+    _wake_event = threading.Event()
+
+    @classmethod
+    def enqueue(cls, diary_entry, uploaded_file, caption=''):
+        """Spool an uploaded file and create its pending DiaryPhoto row"""
+        os.makedirs(settings.DIARY_PHOTO_SPOOL_DIR, exist_ok=True)
+        spool_path = os.path.join(
+            settings.DIARY_PHOTO_SPOOL_DIR,
+            f"{uuid.uuid4().hex}{os.path.splitext(uploaded_file.name)[1].lower()}"
+        )
+        with open(spool_path, 'wb') as spool:
+            for chunk in uploaded_file.chunks():
+                spool.write(chunk)
+
+        photo = DiaryPhoto(
+            diary_entry=diary_entry,
+            caption=caption,
+            upload_status='pending',
+            spool_path=spool_path,
+        )
+        # Reserve the final storage name now; assigning a string does not upload anything
+        photo.photo = photo._meta.get_field('photo').generate_filename(photo, uploaded_file.name)
+        photo.save()
+
+        transaction.on_commit(cls.wake)
+        return photo
+
+    @classmethod
+    def backoff(cls, attempts):
+        return min(cls.BASE_BACKOFF * (2 ** max(attempts - 1, 0)), cls.MAX_BACKOFF)
+
+    @classmethod
+    def _claim(cls, photo, now):
+        """Reserve a pending row so concurrent workers never upload it twice"""
+        return DiaryPhoto.objects.filter(
+            Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now),
+            pk=photo.pk, upload_status='pending',
+        ).update(next_attempt_at=now + cls.LEASE, upload_attempts=F('upload_attempts') + 1) == 1
+
+    @classmethod
+    def upload(cls, photo):
+        """Push one claimed photo to storage and record the outcome"""
+        photo.refresh_from_db()
+        try:
+            with open(photo.spool_path, 'rb') as spool:
+                stored_name = photo.photo.storage.save(photo.photo.name, File(spool, name=photo.photo.name))
+        except FileNotFoundError:
+            # The spool did not survive (e.g. a redeploy wiped local disk); retrying cannot help
+            DiaryPhoto.objects.filter(pk=photo.pk).update(
+                upload_status='failed', last_error='Spooled file is missing'
+            )
+            logger.error(f"Diary photo {photo.pk} lost its spooled file {photo.spool_path}")
+            return False
+        except Exception as e:
+            failed = photo.upload_attempts >= settings.DIARY_PHOTO_UPLOAD_MAX_ATTEMPTS
+            DiaryPhoto.objects.filter(pk=photo.pk).update(
+                upload_status='failed' if failed else 'pending',
+                next_attempt_at=timezone.now() + cls.backoff(photo.upload_attempts),
+                last_error=str(e)[:1000],
+            )
+            logger.warning(f"Upload of diary photo {photo.pk} failed (attempt {photo.upload_attempts}): {e}")
+            return False
+
+        DiaryPhoto.objects.filter(pk=photo.pk).update(
+            photo=stored_name, upload_status='complete', spool_path='',
+            next_attempt_at=None, last_error='',
+        )
+        # Resize from the local copy while we still have it
+        photo.photo.name = stored_name
+        with open(photo.spool_path, 'rb') as spool:
+            ImageDerivativeService.generate_safely(photo.photo, File(spool, name=stored_name))
+        try:
+            os.remove(photo.spool_path)
+        except OSError:
+            pass
+        return True
+
+    @classmethod
+    def process_pending(cls, limit=50):
+        """Upload pending photos that are due. Returns (uploaded, failed) counts."""
+        now = timezone.now()
+        due = DiaryPhoto.objects.filter(
+            Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now),
+            upload_status='pending',
+        ).order_by('uploaded_at')[:limit]
+
+        uploaded = failed = 0
+        for photo in due:
+            if not cls._claim(photo, now):
+                continue
+            if cls.upload(photo):
+                uploaded += 1
+            else:
+                failed += 1
+        return uploaded, failed
+
+    @classmethod
+    def retry_failed(cls):
+        """Put failed uploads back in the queue"""
+        return DiaryPhoto.objects.filter(upload_status='failed').exclude(spool_path='').update(
+            upload_status='pending', upload_attempts=0, next_attempt_at=None
+        )
+
+    @classmethod
+    def wake(cls):
+        """Start the in-process worker if enabled, and have it look for work now"""
+        if not settings.DIARY_PHOTO_UPLOAD_IN_PROCESS:
+            return
+        with cls._worker_lock:
+            if cls._worker is None or not cls._worker.is_alive():
+                cls._worker = threading.Thread(target=cls._run_worker, name='diary-photo-uploader', daemon=True)
+                cls._worker.start()
+        cls._wake_event.set()
+
+    @classmethod
+    def _run_worker(cls):
+        while True:
+            cls._wake_event.clear()
+            try:
+                while sum(cls.process_pending()):
+                    pass
+            except Exception:
+                logger.exception("Diary photo upload worker error")
+            finally:
+                # Don't hold a database connection open while idle
+                connection.close()
+            # Sleep until new work arrives or retries come due
+            cls._wake_event.wait(cls.POLL_INTERVAL)
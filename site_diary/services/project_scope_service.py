@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from admin_side.models import ProjectAssignment
+from ..models import Project
+
+# Statuses site managers work with; 'pending_approval' and 'rejected' are excluded
+ACTIVE_STATUSES = ('planning', 'active', 'on_hold', 'completed')
+
+
+class ProjectScopeService:
+    """Which projects a user may see on the site manager pages.
+
+    A user's scope is every project they manage, design or hold an active
+    ProjectAssignment on. The ID set is computed with one query and cached per
+    user; signals drop the cached set when an assignment or a project's
+    manager or architect changes, so access checks are set lookups. The drop
+    only reaches the current process's cache, so PROJECT_SCOPE_CACHE_TIMEOUT
+    bounds how long other processes use an outdated scope.
+    """
+
+    CACHE_PREFIX = 'project_scope'
+
+    @classmethod
+    def _cache_key(cls, user_id):
+        return f"{cls.CACHE_PREFIX}:{user_id}"
+
+    @staticmethod
+    def compute(user_id):
+        """Fresh ID set of the projects a user is attached to, any status"""
+        assigned = ProjectAssignment.objects.filter(user_id=user_id, is_active=True).values('project_id')
+        return frozenset(
+            Project.objects.filter(
+                Q(id__in=assigned) | Q(project_manager_id=user_id) | Q(architect_id=user_id)
+            ).values_list('id', flat=True)
+        )
+
+    @classmethod
+    def project_ids(cls, user):
+        """Cached ID set of the projects a user is attached to, any status"""
+        key = cls._cache_key(user.pk)
+        project_ids = cache.get(key)
+        if project_ids is None:
+            project_ids = cls.compute(user.pk)
+            cache.set(key, project_ids, settings.PROJECT_SCOPE_CACHE_TIMEOUT)
+        return project_ids
+
+    @classmethod
+    def user_projects(cls, user, statuses=ACTIVE_STATUSES):
+        """The user's own projects with one of `statuses` (None for any)"""
+        projects = Project.objects.filter(id__in=cls.project_ids(user))
+        return projects.filter(status__in=statuses) if statuses is not None else projects
+
+    @classmethod
+    def visible_projects(cls, user, statuses=ACTIVE_STATUSES):
+        """Like user_projects, but staff see every project"""
+        if user.is_staff:
+            projects = Project.objects.all()
+            return projects.filter(status__in=statuses) if statuses is not None else projects
+        return cls.user_projects(user, statuses)
+
+    @classmethod
+    def can_access(cls, user, project_id):
+        """Whether the user may open a project, whatever its status"""
+        return user.is_staff or project_id in cls.project_ids(user)
+
+    @classmethod
+    def invalidate(cls, *user_ids):
+        """Forget the cached scopes of these users once the transaction commits"""
+        keys = [cls._cache_key(user_id) for user_id in set(user_ids) if user_id is not None]
+        if keys:
+            transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,7 +1,8 @@
 from django.db.models import Sum, Q
 from django.utils import timezone
 from decimal import Decimal
-from ..models import Project, DiaryEntry, LaborEntry, MaterialEntry, EquipmentEntry
+from ..models import Project
+from .snapshot_service import ProjectSnapshotService
 
 class RevisionImpactService:
     """Service to handle revision impacts on project budgets and dashboard updates"""
@@ -54,21 +55,19 @@ class RevisionImpactService:
         """Get enhanced budget data for dashboard including revision impacts"""
         
         dashboard_data = []
+        snapshots = ProjectSnapshotService.get_snapshots(projects)
         
         for project in projects:
             # Calculate existing costs
-            project_entries = DiaryEntry.objects.filter(project=project)
-            labor_entries = LaborEntry.objects.filter(diary_entry__in=project_entries)
-            material_entries = MaterialEntry.objects.filter(diary_entry__in=project_entries)
-            equipment_entries = EquipmentEntry.objects.filter(diary_entry__in=project_entries)
+            snapshot = snapshots[project.id]
             
-            labor_costs = sum(labor.total_cost for labor in labor_entries)
-            material_costs = sum(material.total_cost for material in material_entries)
-            equipment_costs = sum(equipment.total_rental_cost for equipment in equipment_entries)
-            total_spent = labor_costs + material_costs + equipment_costs
+            labor_costs = snapshot.labor_cost
+            material_costs = snapshot.material_cost
+            equipment_costs = snapshot.equipment_cost
+            total_spent = snapshot.resource_cost
             
             # Calculate revision impacts (mock data for now)
-            revision_count = project_entries.filter(status='needs_revision').count()
+            revision_count = snapshot.revision_count
             estimated_revision_cost = revision_count * 5000  # Estimated $5000 per revision
             
             # Calculate adjusted budget
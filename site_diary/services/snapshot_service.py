@@ -0,0 +1,163 @@
+import threading
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from ..models import Project, DiaryEntry, ProjectCostSnapshot
+from .cost_service import ProjectCostService
+
+# Project ids touched in the current transaction, flushed once it commits
+_pending = threading.local()
+
+
+class ProjectSnapshotService:
+    """Maintain ProjectCostSnapshot rows.
+
+    A snapshot is recomputed for one project at a time whenever that project's
+    diary data changes, so pages that only need running totals read a single
+    row per project instead of scanning the whole diary history.
+    """
+
+    SNAPSHOT_FIELDS = (
+        'labor_cost', 'material_cost', 'equipment_cost', 'subcontractor_cost',
+        'delay_cost', 'delay_hours', 'delay_count', 'entry_count', 'draft_count',
+        'revision_count', 'latest_entry_date', 'latest_progress', 'latest_milestone_id',
+    )
+
+    @staticmethod
+    def _entry_count(**lookups):
+        rows = DiaryEntry.objects.filter(
+            project=OuterRef('pk'), **lookups
+        ).order_by().values('project').annotate(total=Count('id')).values('total')[:1]
+        return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+    @staticmethod
+    def _latest_entry(field):
+        rows = DiaryEntry.objects.filter(
+            project=OuterRef('pk'), draft=False
+        ).order_by('-entry_date', '-created_at').values(field)[:1]
+        return Subquery(rows)
+
+    @classmethod
+    def compute(cls, projects):
+        """Compute fresh snapshot values from the diary tables.
+
+        Returns a dict mapping project id to snapshot field values.
+        """
+        queryset = ProjectCostService.annotate_costs(
+            projects.order_by(), include_drafts=False
+        ).annotate(
+            entry_count=cls._entry_count(draft=False),
+            draft_count=cls._entry_count(draft=True),
+            revision_count=cls._entry_count(draft=False, status='needs_revision'),
+            latest_entry_date=cls._latest_entry('entry_date'),
+            latest_progress=cls._latest_entry('progress_percentage'),
+            latest_milestone_id=cls._latest_entry('milestone'),
+        )
+        return {
+            row.pop('pk'): cls._normalize(row)
+            for row in queryset.values('pk', *cls.SNAPSHOT_FIELDS)
+        }
+
+    @staticmethod
+    def _normalize(row):
+        """Round aggregates to the precision the snapshot columns store"""
+        for field, value in row.items():
+            model_field = ProjectCostSnapshot._meta.get_field(field)
+            if isinstance(value, Decimal) and getattr(model_field, 'decimal_places', None) is not None:
+                row[field] = value.quantize(Decimal(1).scaleb(-model_field.decimal_places))
+        return row
+
+    @classmethod
+    def refresh(cls, project_ids):
+        """Recompute and store snapshots for the given project ids"""
+        values = cls.compute(Project.objects.filter(pk__in=project_ids))
+        with transaction.atomic():
+            for project_id, fields in values.items():
+                ProjectCostSnapshot.objects.update_or_create(project_id=project_id, defaults=fields)
+        return values
+
+    @classmethod
+    def get_snapshots(cls, projects):
+        """Return {project_id: ProjectCostSnapshot}, building any that are missing"""
+        if not hasattr(projects, 'values_list'):
+            projects = Project.objects.filter(pk__in=[getattr(p, 'pk', p) for p in projects])
+        snapshots = {
+            snapshot.project_id: snapshot
+            for snapshot in ProjectCostSnapshot.objects.filter(
+                project__in=projects.order_by().values('pk')
+            ).select_related('project', 'latest_milestone')
+        }
+        missing = set(projects.values_list('pk', flat=True)) - set(snapshots)
+        if missing:
+            cls.refresh(missing)
+            snapshots.update(
+                (snapshot.project_id, snapshot)
+                for snapshot in ProjectCostSnapshot.objects.filter(
+                    project_id__in=missing
+                ).select_related('project', 'latest_milestone')
+            )
+        return snapshots
+
+    @classmethod
+    def schedule_refresh(cls, project_id):
+        """Refresh a project's snapshot once the current transaction commits.
+
+        Saving an entry with many child rows touches the same project over and
+        over; the ids are collected and each project is recomputed only once.
+        """
+        if not hasattr(_pending, 'project_ids'):
+            _pending.project_ids = set()
+        _pending.project_ids.add(project_id)
+        transaction.on_commit(cls._flush_pending)
+
+    @classmethod
+    def schedule_entry_refresh(cls, entry_id):
+        """Like schedule_refresh, for callers that only know the diary entry.
+
+        The entry ids are resolved to projects in one query when flushing.
+        """
+        if not hasattr(_pending, 'entry_ids'):
+            _pending.entry_ids = set()
+        _pending.entry_ids.add(entry_id)
+        transaction.on_commit(cls._flush_pending)
+
+    @classmethod
+    def _flush_pending(cls):
+        project_ids = getattr(_pending, 'project_ids', None) or set()
+        entry_ids = getattr(_pending, 'entry_ids', None)
+        _pending.project_ids = set()
+        _pending.entry_ids = set()
+        if entry_ids:
+            project_ids |= set(
+                DiaryEntry.objects.filter(pk__in=entry_ids).values_list('project_id', flat=True)
+            )
+        if project_ids:
+            cls.refresh(project_ids)
+
+    @classmethod
+    def find_drift(cls, projects=None):
+        """Compare stored snapshots with freshly computed values.
+
+        Returns a list of (project_id, field, stored, expected) tuples. Projects
+        without a snapshot are reported with the field 'snapshot'.
+        """
+        if projects is None:
+            projects = Project.objects.all()
+        expected = cls.compute(projects)
+        stored = {
+            snapshot.project_id: snapshot
+            for snapshot in ProjectCostSnapshot.objects.filter(project_id__in=list(expected))
+        }
+
+        drift = []
+        for project_id, fields in expected.items():
+            snapshot = stored.get(project_id)
+            if snapshot is None:
+                drift.append((project_id, 'snapshot', None, 'missing'))
+                continue
+            for field, value in fields.items():
+                current = getattr(snapshot, field)
+                if current != value:
+                    drift.append((project_id, field, current, value))
+        return drift
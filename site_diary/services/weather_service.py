@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from ..models import ProjectWeather
+
+logger = logging.getLogger(__name__)
+
+
+class WeatherNotFound(Exception):
+    """The weather service does not know the location"""
+
+
+class WeatherUnavailable(Exception):
+    """The weather service could not be reached and nothing usable is cached"""
+
+
+# The value config/settings.py used to ship as WEATHER_API_KEY
+PLACEHOLDER_API_KEY = 'your_openweathermap_api_key_here'
+
+
+def fetch_openweathermap(location):
+    """Default WEATHER_FETCHER: current conditions from OpenWeatherMap.
+
+    Fetchers take a location string and return the normalized weather dict,
+    raising WeatherNotFound for unknown locations (only those are cached) and
+    WeatherUnavailable for anything else the API rejects. Network errors
+    propagate.
+    """
+    api_key = settings.WEATHER_API_KEY
+    if not api_key or api_key == PLACEHOLDER_API_KEY:
+        logger.error("WEATHER_API_KEY is not configured; weather lookups cannot work")
+        raise WeatherUnavailable("WEATHER_API_KEY is not configured")
+
+    response = requests.get(
+        settings.WEATHER_API_URL,
+        params={'q': location, 'appid': api_key, 'units': 'metric'},
+        timeout=settings.WEATHER_API_TIMEOUT,
+    )
+    if response.status_code == 404:
+        raise WeatherNotFound(f"Weather API does not know {location}")
+    if response.status_code != 200:
+        # Bad key (401), rate limit (429) or server errors: not the location's fault
+        logger.warning(f"Weather API returned {response.status_code} for {location}")
+        raise WeatherUnavailable(f"Weather API returned {response.status_code}")
+
+    data = response.json()
+    return {
+        'temperature': round(float(data['main']['temp'])),
+        'temperature_high': round(float(data['main']['temp_max'])),
+        'temperature_low': round(float(data['main']['temp_min'])),
+        'humidity': int(data['main']['humidity']),
+        'wind_speed': round(float(data['wind']['speed']) * 3.6),  # Convert m/s to km/h
+        'description': data['weather'][0]['description'],
+        'condition': data['weather'][0]['main'],
+        'icon': data['weather'][0]['icon'],
+    }
+
+
+class _Flight:
+    """One upstream lookup that concurrent callers for the same location wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+class WeatherService:
+    """Cached, coalesced weather lookups for the diary.
+
+    Readings are cached per normalized location. Within WEATHER_CACHE_TTL
+    they are served as-is; for WEATHER_CACHE_STALE seconds after that they are
+    still served while a background refresh runs. Concurrent lookups of the
+    same location in a process share one upstream call.
+    """
+
+    _flights = {}
+    _flights_lock = threading.Lock()
+
+    @staticmethod
+    def normalize_location(location):
+        location = ' '.join(location.casefold().split())
+        return re.sub(r'\s*,\s*', ', ', location).strip(', ')
+
+    @staticmethod
+    def _cache_key(location_key):
+        return f"weather:{hashlib.sha1(location_key.encode()).hexdigest()}"
+
+    @classmethod
+    def get_weather(cls, location, project=None):
+        """Return the weather for a location, from cache when possible.
+
+        The result has the fetcher's fields plus `fetched_at` (a datetime) and
+        `stale`. With a project, the reading is also stored in its weather
+        history. Raises WeatherNotFound or WeatherUnavailable.
+        """
+        location_key = cls.normalize_location(location)
+        entry = cache.get(cls._cache_key(location_key))
+        age = time.time() - entry['fetched_at'] if entry else None
+
+        if entry is None or age >= settings.WEATHER_CACHE_TTL + settings.WEATHER_CACHE_STALE:
+            entry = cls._fetch(location_key, location)
+            stale = False
+        else:
+            stale = age >= settings.WEATHER_CACHE_TTL
+            if stale:
+                cls._refresh_in_background(location_key, location)
+
+        if entry.get('missing'):
+            raise WeatherNotFound(location)
+
+        weather = dict(entry['weather'])
+        weather['fetched_at'] = datetime.fromtimestamp(entry['fetched_at'], tz=dt_timezone.utc)
+        weather['stale'] = stale
+        if project is not None:
+            cls.record(project, location_key, weather)
+        return weather
+
+    @classmethod
+    def _fetch(cls, location_key, location):
+        """Call the fetcher, letting only one caller per location do so at a time"""
+        with cls._flights_lock:
+            flight = cls._flights.get(location_key)
+            leader = flight is None
+            if leader:
+                flight = cls._flights[location_key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(settings.WEATHER_API_TIMEOUT * 2):
+                raise WeatherUnavailable(f"Timed out waiting for weather for {location}")
+            if flight.error is not None:
+                raise flight.error
+            return flight.entry
+
+        try:
+            fetcher = import_string(settings.WEATHER_FETCHER)
+            try:
+                entry = {'weather': fetcher(location), 'fetched_at': time.time()}
+            except WeatherNotFound:
+                # Remember unknown locations too, so retries don't hit the API
+                entry = {'missing': True, 'fetched_at': time.time()}
+            except requests.RequestException as e:
+                raise WeatherUnavailable(str(e)) from e
+            cache.set(
+                cls._cache_key(location_key), entry,
+                settings.WEATHER_CACHE_TTL + settings.WEATHER_CACHE_STALE
+            )
+            flight.entry = entry
+            return entry
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with cls._flights_lock:
+                del cls._flights[location_key]
+            flight.done.set()
+
+    @classmethod
+    def _refresh_in_background(cls, location_key, location):
+        with cls._flights_lock:
+            if location_key in cls._flights:
+                return
+
+        def refresh():
+            try:
+                cls._fetch(location_key, location)
+            except Exception as e:
+                logger.warning(f"Background weather refresh for {location} failed: {e}")
+
+        threading.Thread(target=refresh, name='weather-refresh', daemon=True).start()
+
+    @staticmethod
+    def record(project, location_key, weather):
+        """Store a reading in the project's weather history (once per reading)"""
+        fields = ('temperature', 'temperature_high', 'temperature_low', 'humidity',
+                  'wind_speed', 'condition', 'description', 'icon')
+        ProjectWeather.objects.get_or_create(
+            project=project,
+            observed_at=weather['fetched_at'],
+            defaults={'location': location_key[:100], **{field: weather[field] for field in fields}},
+        )
+
+    @staticmethod
+    def latest_for_projects(projects, max_age=None):
+        """Return {project_id: ProjectWeather} with each project's latest reading"""
+        readings = ProjectWeather.objects.filter(project__in=projects)
+        if max_age is not None:
+            readings = readings.filter(observed_at__gte=timezone.now() - max_age)
+        readings = readings.annotate(
+            recency=Window(RowNumber(), partition_by=F('project_id'), order_by=F('observed_at').desc())
+        ).filter(recency=1).order_by()
+        return {reading.project_id: reading for reading in readings}
+
+    @classmethod
+    def recent_readings(cls, projects):
+        """Latest readings still recent enough to prefill a diary form"""
+        return cls.latest_for_projects(
+            projects, max_age=timedelta(seconds=settings.WEATHER_CACHE_TTL + settings.WEATHER_CACHE_STALE)
+        )
@@ -0,0 +1,82 @@
+"""Signals keeping ProjectCostSnapshot and ProjectMonthlyStat rows in step with diary data,
+and cached project scopes in step with project membership."""
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from admin_side.models import ProjectAssignment
+from .models import (
+    Project, DiaryEntry, LaborEntry, MaterialEntry, EquipmentEntry, DelayEntry, SubcontractorEntry, VisitorEntry
+)
+from .services.snapshot_service import ProjectSnapshotService
+from .services.monthly_stats_service import MonthlyStatsService
+from .services.project_scope_service import ProjectScopeService
+
+DIARY_CHILD_MODELS = (LaborEntry, MaterialEntry, EquipmentEntry, DelayEntry, SubcontractorEntry)
+# Visitors only feed the monthly report statistics, not the cost snapshot
+STATS_CHILD_MODELS = DIARY_CHILD_MODELS + (VisitorEntry,)
+
+
+@receiver(pre_save, sender=DiaryEntry)
+def diary_entry_moving(sender, instance: DiaryEntry, raw=False, **kwargs) -> None:
+    """An entry moved to another date or project leaves its old month (and project) behind."""
+    if raw or instance.pk is None:
+        return
+    previous = DiaryEntry.objects.filter(pk=instance.pk).values_list('project_id', 'entry_date').first()
+    if previous and previous != (instance.project_id, instance.entry_date):
+        MonthlyStatsService.schedule_refresh(*previous)
+        if previous[0] != instance.project_id:
+            ProjectSnapshotService.schedule_refresh(previous[0])
+
+
+@receiver([post_save, post_delete], sender=DiaryEntry)
+def diary_entry_changed(sender, instance: DiaryEntry, **kwargs) -> None:
+    """Progress, milestone, draft and revision state all live on the entry."""
+    ProjectSnapshotService.schedule_refresh(instance.project_id)
+    MonthlyStatsService.schedule_refresh(instance.project_id, instance.entry_date)
+
+
+def diary_child_changed(sender, instance, **kwargs) -> None:
+    """A labor, material, equipment, delay, subcontractor or visitor row changed."""
+    in_snapshot = sender in DIARY_CHILD_MODELS
+    if sender._meta.get_field('diary_entry').is_cached(instance):
+        entry = instance.diary_entry
+        if in_snapshot:
+            ProjectSnapshotService.schedule_refresh(entry.project_id)
+        MonthlyStatsService.schedule_refresh(entry.project_id, entry.entry_date)
+    else:
+        # Bulk deletes load rows without their entry; resolve projects once at commit
+        if in_snapshot:
+            ProjectSnapshotService.schedule_entry_refresh(instance.diary_entry_id)
+        MonthlyStatsService.schedule_entry_refresh(instance.diary_entry_id)
+
+
+for model in STATS_CHILD_MODELS:
+    post_save.connect(diary_child_changed, sender=model, dispatch_uid=f'snapshot_{model.__name__}_saved')
+    post_delete.connect(diary_child_changed, sender=model, dispatch_uid=f'snapshot_{model.__name__}_deleted')
+
+
+@receiver(pre_save, sender=Project)
+def project_members_changing(sender, instance: Project, raw=False, **kwargs) -> None:
+    """A new manager or architect moves the project between users' scopes."""
+    if raw or instance.pk is None:
+        return
+    previous = Project.objects.filter(pk=instance.pk).values_list('project_manager_id', 'architect_id').first()
+    if previous and previous != (instance.project_manager_id, instance.architect_id):
+        ProjectScopeService.invalidate(*previous, instance.project_manager_id, instance.architect_id)
+
+
+@receiver(post_save, sender=Project)
+def project_created(sender, instance: Project, created=False, raw=False, **kwargs) -> None:
+    if created:
+        ProjectScopeService.invalidate(instance.project_manager_id, instance.architect_id)
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance: Project, **kwargs) -> None:
+    ProjectScopeService.invalidate(instance.project_manager_id, instance.architect_id)
+
+
+@receiver([post_save, post_delete], sender=ProjectAssignment)
+def project_assignment_changed(sender, instance: ProjectAssignment, **kwargs) -> None:
+    ProjectScopeService.invalidate(instance.user_id)
@@ -1,13 +1,42 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
+from django.urls import reverse
 from django.utils import timezone
 from datetime import date, timedelta
 from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+import csv
+import json
+import os
+from pypdf import PdfReader
+import requests
+import shutil
+import tempfile
+import threading
+import time
 
 from .models import (
     Project, DiaryEntry, LaborEntry, MaterialEntry, 
-    EquipmentEntry, DelayEntry, VisitorEntry, DiaryPhoto
+    EquipmentEntry, DelayEntry, VisitorEntry, DiaryPhoto, SubcontractorEntry,
+    Milestone, ProjectCostSnapshot, WorkerType, ProjectWeather, ProjectMonthlyStat
 )
+from .services.cost_service import ProjectCostService
+from .services.snapshot_service import ProjectSnapshotService
+from .services.latest_entry_service import LatestEntryService
+from .services.diary_service import DiaryWriteService
+from .services.photo_upload_service import PhotoUploadService
+from .services.weather_service import WeatherService, WeatherNotFound, WeatherUnavailable
+from .services.monthly_stats_service import MonthlyStatsService
+from .services.export_service import DiaryExportService
+from .services import pdf_service
+from .services.pdf_service import DiaryPdfService
+from .services.project_scope_service import ProjectScopeService
 from .utils import (
     get_user_projects, get_project_statistics, 
     validate_diary_entry_data, generate_diary_report
@@ -324,3 +353,1123 @@ class UtilsTestCase(TestCase):
         self.assertEqual(len(entries), 2)
         # Should be ordered by entry_date (ascending)
         self.assertTrue(entries[0].entry_date <= entries[1].entry_date)
+
+
+class ProjectCostServiceTestCase(TestCase):
+    """Test cases for the database-side cost rollups"""
+    
+    def setUp(self):
+        self.manager = User.objects.create_user(username='cost_pm', password='testpass123')
+        self.project = Project.objects.create(
+            name='Cost Project',
+            client_name='Cost Client',
+            project_manager=self.manager,
+            location='Cost Location',
+            start_date=date.today() - timedelta(days=30),
+            expected_end_date=date.today() + timedelta(days=300),
+            budget=Decimal('1000000.00'),
+            status='active'
+        )
+        self.empty_project = Project.objects.create(
+            name='Empty Project',
+            client_name='Cost Client',
+            project_manager=self.manager,
+            location='Cost Location',
+            start_date=date.today(),
+            expected_end_date=date.today() + timedelta(days=100),
+            budget=Decimal('5000.00'),
+            status='planning'
+        )
+        self.entry = DiaryEntry.objects.create(
+            project=self.project,
+            entry_date=date.today() - timedelta(days=1),
+            created_by=self.manager,
+            work_description='Foundation work'
+        )
+        self.draft = DiaryEntry.objects.create(
+            project=self.project,
+            entry_date=date.today(),
+            created_by=self.manager,
+            work_description='Draft work',
+            draft=True
+        )
+        LaborEntry.objects.create(
+            diary_entry=self.entry, labor_type='skilled', trade_description='Masons',
+            workers_count=5, hours_worked=Decimal('8.0'), hourly_rate=Decimal('25.00'),
+            overtime_hours=Decimal('2.0')
+        )
+        LaborEntry.objects.create(
+            diary_entry=self.entry, labor_type='unskilled', trade_description='Helpers',
+            workers_count=3, hours_worked=Decimal('8.0'), hourly_rate=None
+        )
+        MaterialEntry.objects.create(
+            diary_entry=self.entry, material_name='Cement', quantity_delivered=Decimal('10.0'),
+            unit='bags', unit_cost=Decimal('100.00')
+        )
+        EquipmentEntry.objects.create(
+            diary_entry=self.entry, equipment_name='Mixer', equipment_type='Mixer',
+            hours_operated=Decimal('6.0'), rental_cost_per_hour=Decimal('50.00')
+        )
+        DelayEntry.objects.create(
+            diary_entry=self.entry, category='weather', description='Rain',
+            duration_hours=Decimal('2.5'), impact_level='medium',
+            affected_activities='Concrete pour', cost_impact=Decimal('300.00')
+        )
+        SubcontractorEntry.objects.create(
+            diary_entry=self.entry, company_name='Sparks Inc', work_description='Wiring',
+            daily_cost=Decimal('700.00')
+        )
+        MaterialEntry.objects.create(
+            diary_entry=self.draft, material_name='Sand', quantity_delivered=Decimal('4.0'),
+            unit='m3', unit_cost=Decimal('25.00')
+        )
+    
+    def test_costs_match_model_properties(self):
+        """SQL totals agree with the per-row Python properties"""
+        costs = ProjectCostService.get_project_costs([self.project])[self.project.id]
+        expected_labor = sum(labor.total_cost for labor in LaborEntry.objects.all())
+        
+        self.assertEqual(costs['labor_cost'], expected_labor)
+        self.assertEqual(costs['labor_cost'], Decimal('1375.00'))
+        self.assertEqual(costs['material_cost'], Decimal('1100.00'))
+        self.assertEqual(costs['equipment_cost'], Decimal('300.00'))
+        self.assertEqual(costs['subcontractor_cost'], Decimal('700.00'))
+        self.assertEqual(costs['delay_cost'], Decimal('300.00'))
+        self.assertEqual(costs['delay_hours'], Decimal('2.5'))
+        self.assertEqual(costs['delay_count'], 1)
+        self.assertEqual(costs['resource_cost'], Decimal('2775.00'))
+        self.assertEqual(costs['total_cost'], Decimal('3775.00'))
+    
+    def test_exclude_drafts_and_date_range(self):
+        """Entry filters are applied to every category"""
+        costs = ProjectCostService.get_project_cost(self.project, include_drafts=False)
+        self.assertEqual(costs['material_cost'], Decimal('1000.00'))
+        
+        costs = ProjectCostService.get_project_cost(self.project, start_date=date.today())
+        self.assertEqual(costs['material_cost'], Decimal('100.00'))
+        self.assertEqual(costs['labor_cost'], Decimal('0'))
+    
+    def test_many_projects_single_query(self):
+        """Totals for several projects come back from one query, with zeros for empty projects"""
+        with self.assertNumQueries(1):
+            costs = ProjectCostService.get_project_costs(Project.objects.all())
+        
+        self.assertEqual(set(costs), {self.project.id, self.empty_project.id})
+        self.assertEqual(costs[self.empty_project.id]['total_cost'], Decimal('0'))
+        self.assertEqual(
+            ProjectCostService.sum_costs(costs)['total_cost'],
+            costs[self.project.id]['total_cost']
+        )
+
+
+class ProjectSnapshotServiceTestCase(TestCase):
+    """Test cases for the incrementally maintained project snapshots"""
+    
+    def setUp(self):
+        self.manager = User.objects.create_user(username='snapshot_pm', password='testpass123')
+        self.milestone = Milestone.objects.create(name='Foundation Work', order=3)
+        self.project = Project.objects.create(
+            name='Snapshot Project',
+            client_name='Snapshot Client',
+            project_manager=self.manager,
+            location='Snapshot Location',
+            start_date=date.today() - timedelta(days=30),
+            expected_end_date=date.today() + timedelta(days=300),
+            budget=Decimal('100000.00'),
+            status='active'
+        )
+    
+    def create_entry(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            entry = DiaryEntry.objects.create(
+                project=self.project,
+                created_by=self.manager,
+                work_description='Site work',
+                **kwargs
+            )
+        return entry
+    
+    def test_child_rows_update_snapshot(self):
+        """Creating and deleting child rows keeps the running totals current"""
+        entry = self.create_entry(
+            entry_date=date.today(), progress_percentage=Decimal('40.00'), milestone=self.milestone
+        )
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for _ in range(3):
+                MaterialEntry.objects.create(
+                    diary_entry=entry, material_name='Cement', quantity_delivered=Decimal('10.0'),
+                    unit='bags', unit_cost=Decimal('100.00')
+                )
+            delay = DelayEntry.objects.create(
+                diary_entry=entry, category='weather', description='Rain',
+                duration_hours=Decimal('2.0'), impact_level='low',
+                affected_activities='Pouring', cost_impact=Decimal('50.00')
+            )
+        # Every write registers a callback, but only the first one recomputes
+        self.assertEqual(callbacks.count(ProjectSnapshotService._flush_pending), 4)
+        
+        snapshot = ProjectCostSnapshot.objects.get(project=self.project)
+        self.assertEqual(snapshot.material_cost, Decimal('3000.00'))
+        self.assertEqual(snapshot.delay_count, 1)
+        self.assertEqual(snapshot.total_cost, Decimal('3050.00'))
+        self.assertEqual(snapshot.entry_count, 1)
+        self.assertEqual(snapshot.latest_progress, Decimal('40.00'))
+        self.assertEqual(snapshot.latest_milestone, self.milestone)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            delay.delete()
+        snapshot.refresh_from_db()
+        self.assertEqual(snapshot.delay_count, 0)
+        self.assertEqual(snapshot.delay_cost, Decimal('0'))
+    
+    def test_drafts_and_revisions(self):
+        """Drafts are counted separately and never affect spend or progress"""
+        self.create_entry(entry_date=date.today() - timedelta(days=1), progress_percentage=Decimal('20.00'))
+        draft = self.create_entry(entry_date=date.today(), progress_percentage=Decimal('90.00'), draft=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            MaterialEntry.objects.create(
+                diary_entry=draft, material_name='Sand', quantity_delivered=Decimal('4.0'),
+                unit='m3', unit_cost=Decimal('25.00')
+            )
+        
+        snapshot = ProjectCostSnapshot.objects.get(project=self.project)
+        self.assertEqual(snapshot.draft_count, 1)
+        self.assertEqual(snapshot.material_cost, Decimal('0'))
+        self.assertEqual(snapshot.get_progress_percentage(), 20)
+        
+        draft.draft = False
+        draft.status = 'needs_revision'
+        with self.captureOnCommitCallbacks(execute=True):
+            draft.save()
+        snapshot.refresh_from_db()
+        self.assertEqual(snapshot.entry_count, 2)
+        self.assertEqual(snapshot.revision_count, 1)
+        self.assertEqual(snapshot.material_cost, Decimal('100.00'))
+        self.assertEqual(snapshot.get_progress_percentage(), 90)
+    
+    def test_progress_fallback_ignores_drafts(self):
+        """Without LatestEntryService, the project reads progress like the snapshot does"""
+        self.create_entry(entry_date=date.today() - timedelta(days=1), progress_percentage=Decimal('20.00'))
+        self.create_entry(entry_date=date.today(), progress_percentage=Decimal('90.00'), draft=True)
+        
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual(project.get_progress_percentage(), 20)
+        self.assertEqual(
+            project.get_progress_percentage(),
+            ProjectSnapshotService.get_snapshots([project])[project.pk].get_progress_percentage()
+        )
+    
+    def test_moved_entry_refreshes_old_project(self):
+        """Reassigning an entry takes its costs and progress away from the old project"""
+        other = Project.objects.create(
+            name='Other Project',
+            client_name='Snapshot Client',
+            project_manager=self.manager,
+            location='Snapshot Location',
+            start_date=date.today() - timedelta(days=30),
+            expected_end_date=date.today() + timedelta(days=300),
+            budget=Decimal('1000.00'),
+            status='planning'
+        )
+        entry = self.create_entry(entry_date=date.today(), progress_percentage=Decimal('40.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            MaterialEntry.objects.create(
+                diary_entry=entry, material_name='Cement', quantity_delivered=Decimal('10.0'),
+                unit='bags', unit_cost=Decimal('100.00')
+            )
+        
+        entry.project = other
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.save()
+        
+        old = ProjectCostSnapshot.objects.get(project=self.project)
+        self.assertEqual(old.entry_count, 0)
+        self.assertEqual(old.material_cost, Decimal('0'))
+        self.assertIsNone(old.latest_progress)
+        new = ProjectCostSnapshot.objects.get(project=other)
+        self.assertEqual(new.material_cost, Decimal('1000.00'))
+        self.assertEqual(new.get_progress_percentage(), 40)
+    
+    def test_get_snapshots_builds_missing_rows(self):
+        """Projects without a snapshot get one on first read"""
+        completed = Project.objects.create(
+            name='Done Project',
+            client_name='Snapshot Client',
+            project_manager=self.manager,
+            location='Snapshot Location',
+            start_date=date.today() - timedelta(days=30),
+            expected_end_date=date.today(),
+            budget=Decimal('1000.00'),
+            status='completed'
+        )
+        snapshots = ProjectSnapshotService.get_snapshots(Project.objects.all())
+        
+        self.assertEqual(set(snapshots), {self.project.id, completed.id})
+        self.assertEqual(snapshots[completed.id].get_progress_percentage(), 100)
+        self.assertEqual(snapshots[self.project.id].get_progress_percentage(), 0)
+        
+        # Once built, reads no longer depend on the amount of diary history
+        with self.assertNumQueries(2):
+            ProjectSnapshotService.get_snapshots(Project.objects.all())
+    
+    def test_rebuild_command_detects_and_repairs_drift(self):
+        """Writes that bypass signals are caught by the rebuild command"""
+        entry = self.create_entry(entry_date=date.today())
+        with self.captureOnCommitCallbacks(execute=True):
+            material = MaterialEntry.objects.create(
+                diary_entry=entry, material_name='Cement', quantity_delivered=Decimal('10.0'),
+                unit='bags', unit_cost=Decimal('100.00')
+            )
+        call_command('rebuild_project_snapshots', '--check', stdout=StringIO())
+        
+        MaterialEntry.objects.filter(pk=material.pk).update(unit_cost=Decimal('200.00'))
+        with self.assertRaises(CommandError):
+            call_command('rebuild_project_snapshots', '--check', stdout=StringIO())
+        
+        call_command('rebuild_project_snapshots', stdout=StringIO())
+        self.assertEqual(ProjectCostSnapshot.objects.get(project=self.project).material_cost, Decimal('2000.00'))
+        self.assertEqual(ProjectSnapshotService.find_drift(), [])
+
+
+class LatestEntryServiceTestCase(TestCase):
+    """Test cases for the batched latest diary entry resolver"""
+    
+    def setUp(self):
+        self.manager = User.objects.create_user(username='latest_pm', password='testpass123')
+        self.milestone = Milestone.objects.create(name='Structural Framework', order=4)
+        self.projects = []
+        for index in range(3):
+            project = Project.objects.create(
+                name=f'Latest Project {index}',
+                client_name='Latest Client',
+                project_manager=self.manager,
+                location='Latest Location',
+                start_date=date.today() - timedelta(days=30),
+                expected_end_date=date.today() + timedelta(days=300),
+                budget=Decimal('10000.00'),
+                status='active'
+            )
+            self.projects.append(project)
+            for days_ago, progress in ((3, 10), (2, 20)):
+                DiaryEntry.objects.create(
+                    project=project,
+                    entry_date=date.today() - timedelta(days=days_ago),
+                    created_by=self.manager,
+                    work_description='Site work',
+                    progress_percentage=Decimal(progress + index),
+                    milestone=self.milestone
+                )
+        # The newest entry of the first project is only a draft
+        DiaryEntry.objects.create(
+            project=self.projects[0],
+            entry_date=date.today(),
+            created_by=self.manager,
+            work_description='Draft work',
+            progress_percentage=Decimal('99.00'),
+            draft=True
+        )
+        self.empty_project = Project.objects.create(
+            name='No Entries',
+            client_name='Latest Client',
+            project_manager=self.manager,
+            location='Latest Location',
+            start_date=date.today(),
+            expected_end_date=date.today() + timedelta(days=30),
+            budget=Decimal('100.00'),
+            status='completed'
+        )
+    
+    def test_latest_entries_single_query(self):
+        """One query resolves every project's latest finalized entry and milestone"""
+        with self.assertNumQueries(1):
+            latest = LatestEntryService.get_latest_entries(Project.objects.all())
+            milestone_names = {entry.milestone.name for entry in latest.values()}
+        
+        self.assertEqual(set(latest), {project.id for project in self.projects})
+        self.assertEqual(latest[self.projects[0].id].progress_percentage, Decimal('20.00'))
+        self.assertEqual(latest[self.projects[2].id].progress_percentage, Decimal('22.00'))
+        self.assertEqual(milestone_names, {'Structural Framework'})
+    
+    def test_include_drafts(self):
+        """Drafts are only considered when asked for"""
+        latest = LatestEntryService.get_latest_entries(self.projects, include_drafts=True)
+        self.assertEqual(latest[self.projects[0].id].progress_percentage, Decimal('99.00'))
+    
+    def test_attached_entries_used_for_progress(self):
+        """get_progress_percentage reads the attached entry instead of querying"""
+        projects = LatestEntryService.attach_latest_entries(Project.objects.all())
+        
+        with self.assertNumQueries(0):
+            progress = {project.id: project.get_progress_percentage() for project in projects}
+        
+        self.assertEqual(progress[self.projects[1].id], 21)
+        self.assertEqual(progress[self.empty_project.id], 100)
+
+
+class DiaryWriteServiceTestCase(TestCase):
+    """Test cases for the bulk diary child row writer"""
+    
+    def setUp(self):
+        self.manager = User.objects.create_user(username='writer_pm', password='testpass123')
+        self.project = Project.objects.create(
+            name='Writer Project',
+            client_name='Writer Client',
+            project_manager=self.manager,
+            location='Writer Location',
+            start_date=date.today() - timedelta(days=30),
+            expected_end_date=date.today() + timedelta(days=300),
+            budget=Decimal('100000.00'),
+            status='active'
+        )
+        self.entry = DiaryEntry.objects.create(
+            project=self.project,
+            entry_date=date.today(),
+            created_by=self.manager,
+            work_description='Site work'
+        )
+        WorkerType.objects.create(name='Skilled Labor', default_daily_rate=Decimal('800.00'))
+        self.post = {
+            'skilled-laborCount': '4',
+            'skilled-laborRate': '',
+            'materials_json': json.dumps([
+                {'name': 'Cement', 'quantity': 10, 'unit': 'bags', 'cost': 2500},
+                {'name': 'Sand', 'quantity': 2, 'unit': 'm3', 'cost': 3000, 'delivery_time': '08:30'},
+            ]),
+            'overtime_json': json.dumps([{'personnel': 2, 'role': 'mason', 'hours': 3, 'rate': 150}]),
+            'subcontractor_json': json.dumps([{'name': 'Sparks Inc', 'work': 'Wiring', 'cost': 1200}]),
+        }
+    
+    def apply(self, post):
+        return DiaryWriteService.apply_payload(self.entry, DiaryWriteService.parse_payload(post))
+    
+    def test_payload_written(self):
+        """Every section in the payload is stored on the entry"""
+        self.apply(self.post)
+        
+        labor = self.entry.labor_entries.get(labor_type='skilled-labor')
+        self.assertEqual(labor.workers_count, 4)
+        self.assertEqual(labor.hourly_rate, Decimal('800.00'))
+        self.assertEqual(self.entry.labor_entries.filter(labor_type='overtime').count(), 1)
+        self.assertEqual(
+            list(self.entry.material_entries.order_by('id').values_list('material_name', 'unit_cost')),
+            [('Cement', Decimal('250.00')), ('Sand', Decimal('1500.00'))]
+        )
+        self.assertEqual(self.entry.subcontractor_entries.get().daily_cost, Decimal('1200.00'))
+    
+    def test_resubmitting_same_payload_writes_nothing(self):
+        """Unchanged rows are left alone; only the read queries run"""
+        self.apply(self.post)
+        payload = DiaryWriteService.parse_payload(self.post)
+        
+        # One read for labor (daily and overtime), one each for materials and
+        # subcontractors, plus the savepoint pair of the atomic block
+        with self.assertNumQueries(5):
+            results = DiaryWriteService.apply_payload(self.entry, payload)
+        
+        for counts in results.values():
+            self.assertEqual(counts, {'created': 0, 'updated': 0, 'deleted': 0})
+    
+    def test_diff_updates_creates_and_deletes(self):
+        """Changed rows are updated in place and surplus rows removed"""
+        self.apply(self.post)
+        cement_id = self.entry.material_entries.get(material_name='Cement').id
+        
+        post = dict(self.post)
+        post['materials_json'] = json.dumps([{'name': 'Cement', 'quantity': 20, 'unit': 'bags', 'cost': 5000}])
+        post['subcontractor_json'] = json.dumps([
+            {'name': 'Sparks Inc', 'work': 'Wiring', 'cost': 1200},
+            {'name': 'Pipe Co', 'work': 'Plumbing', 'cost': 900},
+        ])
+        post['skilled-laborCount'] = '0'
+        results = self.apply(post)
+        
+        self.assertEqual(results['materials'], {'created': 0, 'updated': 1, 'deleted': 1})
+        self.assertEqual(results['subcontractors'], {'created': 1, 'updated': 0, 'deleted': 0})
+        self.assertEqual(results['labor'], {'created': 0, 'updated': 0, 'deleted': 1})
+        self.assertEqual(self.entry.material_entries.get().id, cement_id)
+        self.assertEqual(self.entry.material_entries.get().quantity_delivered, Decimal('20.00'))
+        # Overtime is only replaced when overtime data is sent
+        self.assertEqual(self.entry.labor_entries.filter(labor_type='overtime').count(), 1)
+    
+    def test_invalid_payload_reports_every_error(self):
+        """Validation happens before any write and lists all problems"""
+        post = dict(self.post)
+        post['materials_json'] = json.dumps([{'name': 'Cement', 'quantity': 'ten', 'unit': 'bags', 'cost': 1}])
+        post['subcontractor_json'] = json.dumps([{'name': 'Sparks Inc'}])
+        post['delays_json'] = '{not json'
+        
+        with self.assertRaises(ValidationError) as raised:
+            DiaryWriteService.parse_payload(post)
+        
+        self.assertEqual(len(raised.exception.messages), 3)
+        self.assertFalse(MaterialEntry.objects.exists())
+
+
+class PhotoUploadServiceTestCase(TestCase):
+    """Test cases for the spooled background photo uploads"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.storage = FileSystemStorage(location=os.path.join(self.tmpdir, 'storage'))
+        patcher = mock.patch('site_diary.storage.DiaryPhotoStorage', return_value=self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings_override = override_settings(
+            DIARY_PHOTO_SPOOL_DIR=os.path.join(self.tmpdir, 'spool'),
+            DIARY_PHOTO_UPLOAD_IN_PROCESS=False,
+            DIARY_PHOTO_UPLOAD_MAX_ATTEMPTS=2,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        self.manager = User.objects.create_user(username='photo_pm', password='testpass123')
+        self.project = Project.objects.create(
+            name='Photo Project',
+            client_name='Photo Client',
+            project_manager=self.manager,
+            location='Photo Location',
+            start_date=date.today() - timedelta(days=30),
+            expected_end_date=date.today() + timedelta(days=300),
+            budget=Decimal('100000.00'),
+            status='active'
+        )
+        self.entry = DiaryEntry.objects.create(
+            project=self.project,
+            entry_date=date.today(),
+            created_by=self.manager,
+            work_description='Site work'
+        )
+    
+    def enqueue(self):
+        upload = SimpleUploadedFile('Site.JPG', b'jpeg-bytes', content_type='image/jpeg')
+        return PhotoUploadService.enqueue(self.entry, upload, caption='Foundation')
+    
+    def test_enqueue_spools_without_uploading(self):
+        """The request only writes a local spool file and a pending row"""
+        photo = self.enqueue()
+        
+        self.assertEqual(photo.upload_status, 'pending')
+        self.assertFalse(photo.is_uploaded)
+        self.assertTrue(photo.spool_path.endswith('.jpg'))
+        with open(photo.spool_path, 'rb') as spool:
+            self.assertEqual(spool.read(), b'jpeg-bytes')
+        self.assertTrue(photo.photo.name.startswith('diary_photos/'))
+        self.assertFalse(self.storage.exists(photo.photo.name))
+    
+    def test_process_pending_uploads(self):
+        """The worker pushes the spooled file to storage and cleans up"""
+        photo = self.enqueue()
+        spool_path = photo.spool_path
+        
+        self.assertEqual(PhotoUploadService.process_pending(), (1, 0))
+        
+        photo.refresh_from_db()
+        self.assertEqual(photo.upload_status, 'complete')
+        self.assertEqual(photo.spool_path, '')
+        self.assertEqual(photo.upload_attempts, 1)
+        self.assertTrue(self.storage.exists(photo.photo.name))
+        self.assertFalse(os.path.exists(spool_path))
+        # Nothing left to do
+        self.assertEqual(PhotoUploadService.process_pending(), (0, 0))
+    
+    def test_failed_upload_backs_off_then_fails(self):
+        """Storage errors are retried later, and given up on after the max attempts"""
+        photo = self.enqueue()
+        
+        with mock.patch.object(self.storage, 'save', side_effect=OSError('storage offline')):
+            self.assertEqual(PhotoUploadService.process_pending(), (0, 1))
+            photo.refresh_from_db()
+            self.assertEqual(photo.upload_status, 'pending')
+            self.assertEqual(photo.last_error, 'storage offline')
+            self.assertGreater(photo.next_attempt_at, timezone.now() + timedelta(seconds=20))
+            
+            # Not due yet
+            self.assertEqual(PhotoUploadService.process_pending(), (0, 0))
+            
+            DiaryPhoto.objects.filter(pk=photo.pk).update(next_attempt_at=timezone.now())
+            self.assertEqual(PhotoUploadService.process_pending(), (0, 1))
+            photo.refresh_from_db()
+            self.assertEqual(photo.upload_status, 'failed')
+            self.assertEqual(photo.upload_attempts, 2)
+        
+        # Requeued failures upload normally once storage is back
+        self.assertEqual(PhotoUploadService.retry_failed(), 1)
+        self.assertEqual(PhotoUploadService.process_pending(), (1, 0))
+        photo.refresh_from_db()
+        self.assertTrue(photo.is_uploaded)
+    
+    def test_history_shows_placeholder_until_uploaded(self):
+        """Pending and failed photos have no stored file, so they are not linked"""
+        from django.template.loader import render_to_string
+        photo = self.enqueue()
+        entry = DiaryEntry.objects.prefetch_related('photos').get(pk=self.entry.pk)
+        
+        html = render_to_string('site_diary/history.html', {'page_obj': [entry]})
+        self.assertIn('Uploading...', html)
+        self.assertNotIn(photo.photo.name, html)
+        
+        DiaryPhoto.objects.filter(pk=photo.pk).update(upload_status='failed')
+        entry = DiaryEntry.objects.prefetch_related('photos').get(pk=self.entry.pk)
+        self.assertIn('Upload failed', render_to_string('site_diary/history.html', {'page_obj': [entry]}))
+        
+        PhotoUploadService.retry_failed()
+        PhotoUploadService.process_pending()
+        entry = DiaryEntry.objects.prefetch_related('photos').get(pk=self.entry.pk)
+        html = render_to_string('site_diary/history.html', {'page_obj': [entry]})
+        self.assertNotIn('Uploading...', html)
+        self.assertIn(DiaryPhoto.objects.get(pk=photo.pk).photo.url, html)
+    
+    def test_backoff_is_exponential_and_capped(self):
+        self.assertEqual(PhotoUploadService.backoff(1), timedelta(seconds=30))
+        self.assertEqual(PhotoUploadService.backoff(3), timedelta(seconds=120))
+        self.assertEqual(PhotoUploadService.backoff(20), PhotoUploadService.MAX_BACKOFF)
+
+
+class StubWeatherFetcher:
+    """Local stand-in for the weather API, configured per test"""
+    calls = []
+    gate = None
+    error = None
+    
+    @classmethod
+    def fetch(cls, location):
+        cls.calls.append(location)
+        if cls.gate is not None:
+            cls.gate.wait(5)
+        if cls.error is not None:
+            raise cls.error
+        return {
+            'temperature': 30, 'temperature_high': 33, 'temperature_low': 25,
+            'humidity': 70, 'wind_speed': 14, 'description': 'scattered clouds',
+            'condition': 'Clouds', 'icon': '03d',
+        }
+
+
+def stub_weather_fetcher(location):
+    return StubWeatherFetcher.fetch(location)
+
+
+@override_settings(
+    WEATHER_FETCHER='site_diary.tests.stub_weather_fetcher',
+    WEATHER_CACHE_TTL=600,
+    WEATHER_CACHE_STALE=3600,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'weather-tests'}},
+)
+class WeatherServiceTestCase(TestCase):
+    """Test cases for cached and coalesced weather lookups"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        StubWeatherFetcher.calls = []
+        StubWeatherFetcher.gate = None
+        StubWeatherFetcher.error = None
+    
+    def test_readings_cached_per_normalized_location(self):
+        first = WeatherService.get_weather('Quezon City,Philippines')
+        second = WeatherService.get_weather('  quezon city ,  PHILIPPINES ')
+        
+        self.assertEqual(StubWeatherFetcher.calls, ['Quezon City,Philippines'])
+        self.assertEqual(first['temperature'], 30)
+        self.assertEqual(second['fetched_at'], first['fetched_at'])
+        self.assertFalse(second['stale'])
+    
+    def test_stale_reading_served_while_refreshing(self):
+        WeatherService.get_weather('Manila')
+        
+        with override_settings(WEATHER_CACHE_TTL=0):
+            with mock.patch.object(WeatherService, '_refresh_in_background') as refresh:
+                weather = WeatherService.get_weather('Manila')
+        
+        self.assertTrue(weather['stale'])
+        refresh.assert_called_once_with('manila', 'Manila')
+        self.assertEqual(len(StubWeatherFetcher.calls), 1)
+    
+    def test_expired_reading_fetched_again(self):
+        WeatherService.get_weather('Manila')
+        with override_settings(WEATHER_CACHE_TTL=0, WEATHER_CACHE_STALE=0):
+            WeatherService.get_weather('Manila')
+        self.assertEqual(len(StubWeatherFetcher.calls), 2)
+    
+    def test_concurrent_lookups_share_one_call(self):
+        StubWeatherFetcher.gate = threading.Event()
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(WeatherService.get_weather('Cebu')))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        # Hold the upstream call until every thread has asked for the reading
+        for _ in range(100):
+            if StubWeatherFetcher.calls:
+                break
+            time.sleep(0.01)
+        time.sleep(0.1)
+        StubWeatherFetcher.gate.set()
+        for thread in threads:
+            thread.join(5)
+        
+        self.assertEqual(StubWeatherFetcher.calls, ['Cebu'])
+        self.assertEqual(len(results), 5)
+    
+    def test_unknown_location_cached_as_missing(self):
+        StubWeatherFetcher.error = WeatherNotFound('Atlantis')
+        for _ in range(2):
+            with self.assertRaises(WeatherNotFound):
+                WeatherService.get_weather('Atlantis')
+        self.assertEqual(len(StubWeatherFetcher.calls), 1)
+    
+    def test_network_errors_not_cached(self):
+        StubWeatherFetcher.error = requests.ConnectionError('offline')
+        with self.assertRaises(WeatherUnavailable):
+            WeatherService.get_weather('Davao')
+        
+        StubWeatherFetcher.error = None
+        self.assertEqual(WeatherService.get_weather('Davao')['temperature'], 30)
+        self.assertEqual(len(StubWeatherFetcher.calls), 2)
+    
+    @override_settings(
+        WEATHER_FETCHER='site_diary.services.weather_service.fetch_openweathermap', WEATHER_API_KEY='test-key'
+    )
+    def test_only_404_is_cached_as_missing(self):
+        """Bad keys, rate limits and server errors are retried, not remembered as unknown"""
+        for status in (401, 429, 503):
+            with mock.patch('site_diary.services.weather_service.requests.get') as get:
+                get.return_value = mock.Mock(status_code=status)
+                for _ in range(2):
+                    with self.assertRaises(WeatherUnavailable):
+                        WeatherService.get_weather('Iloilo')
+                self.assertEqual(get.call_count, 2)
+        
+        with mock.patch('site_diary.services.weather_service.requests.get') as get:
+            get.return_value = mock.Mock(status_code=404)
+            for _ in range(2):
+                with self.assertRaises(WeatherNotFound):
+                    WeatherService.get_weather('Atlantis')
+            self.assertEqual(get.call_count, 1)
+    
+    @override_settings(
+        WEATHER_FETCHER='site_diary.services.weather_service.fetch_openweathermap',
+        WEATHER_API_KEY='your_openweathermap_api_key_here',
+    )
+    def test_placeholder_key_fails_loudly(self):
+        with mock.patch('site_diary.services.weather_service.requests.get') as get:
+            with self.assertLogs('site_diary.services.weather_service', 'ERROR'):
+                with self.assertRaises(WeatherUnavailable):
+                    WeatherService.get_weather('Iloilo')
+        get.assert_not_called()
+    
+    def test_readings_recorded_in_project_history(self):
+        manager = User.objects.create_user(username='weather_pm', password='testpass123')
+        project = Project.objects.create(
+            name='Weather Project',
+            client_name='Weather Client',
+            project_manager=manager,
+            location='Baguio',
+            start_date=date.today(),
+            expected_end_date=date.today() + timedelta(days=90),
+            budget=Decimal('100000.00'),
+            status='active'
+        )
+        
+        WeatherService.get_weather('Baguio', project=project)
+        WeatherService.get_weather('baguio', project=project)
+        
+        self.assertEqual(ProjectWeather.objects.filter(project=project).count(), 1)
+        latest = WeatherService.latest_for_projects(Project.objects.all(), max_age=timedelta(hours=1))
+        self.assertEqual(latest[project.id].humidity, 70)
+        self.assertEqual(latest[project.id].location, 'baguio')
+
+
+class MonthlyStatsServiceTestCase(TestCase):
+    """Test cases for the monthly report statistics table"""
+    
+    def setUp(self):
+        self.manager = User.objects.create_user(username='monthly_pm', password='testpass123')
+        self.project = Project.objects.create(
+            name='Monthly Project',
+            client_name='Monthly Client',
+            project_manager=self.manager,
+            location='Monthly Location',
+            start_date=date(2024, 1, 1),
+            expected_end_date=date(2024, 12, 31),
+            budget=Decimal('100000.00'),
+            status='active'
+        )
+    
+    def create_entry(self, entry_date, progress, hours, **kwargs):
+        """An entry with one labor, delay and visitor row, saved like the diary form does"""
+        with self.captureOnCommitCallbacks(execute=True):
+            entry = DiaryEntry.objects.create(
+                project=self.project, created_by=self.manager, entry_date=entry_date,
+                work_description='Site work', progress_percentage=Decimal(progress),
+                weather_condition='sunny', temperature_high=30, **kwargs
+            )
+            LaborEntry.objects.create(
+                diary_entry=entry, labor_type='skilled', trade_description='Masons',
+                workers_count=2, hours_worked=Decimal(hours), hourly_rate=Decimal('10.00')
+            )
+            DelayEntry.objects.create(
+                diary_entry=entry, category='weather', description='Rain',
+                duration_hours=Decimal('1.5'), impact_level='low',
+                affected_activities='Pouring', cost_impact=Decimal('20.00')
+            )
+            VisitorEntry.objects.create(
+                diary_entry=entry, visitor_name='Inspector', visitor_type='inspector',
+                arrival_time='09:00', purpose_of_visit='Inspection'
+            )
+        return entry
+    
+    def fact(self, month, metric, dimension=''):
+        return ProjectMonthlyStat.objects.get(
+            project=self.project, month=month, draft=False, metric=metric, dimension=dimension
+        ).value
+    
+    def test_signals_maintain_touched_months(self):
+        """Saving diary data recomputes only the months it falls in"""
+        january = self.create_entry(date(2024, 1, 10), '10.00', '8.00')
+        self.create_entry(date(2024, 2, 5), '20.00', '6.00')
+        
+        self.assertEqual(self.fact(date(2024, 1, 1), 'entry.count'), 1)
+        self.assertEqual(self.fact(date(2024, 1, 1), 'labor.hours', 'skilled'), Decimal('8.00'))
+        self.assertEqual(self.fact(date(2024, 1, 1), 'labor.cost', 'skilled'), Decimal('160.00'))
+        self.assertEqual(self.fact(date(2024, 2, 1), 'delay.hours', 'weather'), Decimal('1.50'))
+        self.assertEqual(self.fact(date(2024, 2, 1), 'weather.count', 'sunny'), 1)
+        
+        # Moving an entry rebuilds both its old and its new month
+        with self.captureOnCommitCallbacks(execute=True):
+            january.entry_date = date(2024, 3, 15)
+            january.save()
+        self.assertFalse(ProjectMonthlyStat.objects.filter(month=date(2024, 1, 1)).exists())
+        self.assertEqual(self.fact(date(2024, 3, 1), 'visitor.count'), 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            january.labor_entries.all().delete()
+        self.assertFalse(ProjectMonthlyStat.objects.filter(month=date(2024, 3, 1), metric='labor.hours').exists())
+        self.assertEqual(MonthlyStatsService.find_drift(Project.objects.all()), [])
+    
+    def test_collect_combines_table_and_partial_months(self):
+        """Whole months come from the table, the edges of the range from the diary"""
+        for entry_date, progress, hours in [
+            (date(2024, 1, 10), '10.00', '8.00'),
+            (date(2024, 1, 25), '20.00', '4.00'),
+            (date(2024, 2, 15), '40.00', '6.00'),
+            (date(2024, 3, 5), '60.00', '2.00'),
+            (date(2024, 3, 20), '70.00', '5.00'),
+        ]:
+            self.create_entry(entry_date, progress, hours)
+        
+        stats = MonthlyStatsService.collect(Project.objects.all(), start_date='2024-01-20', end_date='2024-03-10')
+        totals = stats.rollup('project_id', group='entry')[self.project.id]
+        self.assertEqual(totals['count'], 3)
+        self.assertEqual(totals['avg_progress'], Decimal('40'))
+        self.assertEqual(totals['progress_max'], Decimal('60.00'))
+        self.assertEqual(totals['progress_min'], Decimal('20.00'))
+        
+        labor = stats.breakdown('labor', 'labor_type', order_by='hours')
+        self.assertEqual(labor, [{
+            'labor_type': 'skilled', 'count': 3, 'workers': 6, 'hours': Decimal('12.00'),
+            'overtime': Decimal('0'), 'hourly_rate_sum': Decimal('30.00'), 'hourly_rate_count': 3,
+            'avg_hourly_rate': Decimal('10'), 'cost': Decimal('240.00'),
+        }])
+        
+        costs = stats.project_costs([self.project.id])[self.project.id]
+        expected = ProjectCostService.get_project_cost(self.project, start_date='2024-01-20', end_date='2024-03-10')
+        self.assertEqual(costs, expected)
+        
+        monthly = stats.rollup('month', group='entry')
+        self.assertEqual(sorted(monthly), [date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)])
+        
+        # A range inside one month never reads the table
+        stats = MonthlyStatsService.collect(Project.objects.all(), start_date='2024-03-01', end_date='2024-03-10')
+        self.assertFalse(stats.facts.exists())
+        self.assertEqual(stats.totals('entry')['count'], 1)
+    
+    def test_drafts_can_be_left_out(self):
+        self.create_entry(date(2024, 1, 10), '10.00', '8.00')
+        self.create_entry(date(2024, 1, 11), '15.00', '8.00', draft=True)
+        
+        self.assertEqual(MonthlyStatsService.collect([self.project]).totals('entry')['count'], 2)
+        finalized = MonthlyStatsService.collect([self.project], include_drafts=False)
+        self.assertEqual(finalized.totals('entry')['count'], 1)
+        self.assertEqual(finalized.totals('delay')['hours'], Decimal('1.50'))
+    
+    def test_management_command_rebuilds_and_checks(self):
+        self.create_entry(date(2024, 1, 10), '10.00', '8.00')
+        ProjectMonthlyStat.objects.filter(metric='labor.hours').update(value=Decimal('99'))
+        ProjectMonthlyStat.objects.filter(metric='visitor.count').delete()
+        
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_monthly_stats', '--check', stdout=out)
+        self.assertIn('labor.hours[skilled] is 99.0000, expected 8.0000', out.getvalue())
+        
+        call_command('rebuild_monthly_stats', stdout=StringIO())
+        call_command('rebuild_monthly_stats', '--check', stdout=StringIO())
+        self.assertEqual(self.fact(date(2024, 1, 1), 'visitor.count'), 1)
+
+
+class DiaryExportServiceTestCase(TestCase):
+    """Test cases for the streaming CSV exports"""
+    
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='export_admin', password='testpass123')
+        self.project = Project.objects.create(
+            name='Export Project',
+            client_name='Export Client',
+            project_manager=self.admin,
+            location='Export Location',
+            start_date=date(2024, 1, 1),
+            expected_end_date=date(2024, 12, 31),
+            budget=Decimal('100000.00'),
+            status='active'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            for day in range(1, 6):
+                entry = DiaryEntry.objects.create(
+                    project=self.project, created_by=self.admin, entry_date=date(2024, 1, day),
+                    work_description='=HYPERLINK("http://example.com")' if day == 1 else 'Site work',
+                    progress_percentage=Decimal(day * 10),
+                )
+                LaborEntry.objects.create(
+                    diary_entry=entry, labor_type='skilled', trade_description='Masons',
+                    workers_count=2, hours_worked=Decimal('8.00'), hourly_rate=Decimal('10.00')
+                )
+            DiaryEntry.objects.create(
+                project=self.project, created_by=self.admin, entry_date=date(2024, 2, 1),
+                work_description='Draft work', draft=True,
+            )
+    
+    def read_csv(self, chunks):
+        content = ''.join(chunks)
+        self.assertTrue(content.startswith('\ufeff'))
+        return list(csv.reader(content[1:].splitlines()))
+    
+    @override_settings(DIARY_EXPORT_CHUNK_SIZE=2)
+    def test_entries_export_filters_and_escapes(self):
+        rows = self.read_csv(DiaryExportService.stream_csv(
+            DiaryExportService.rows('entries', Project.objects.all(), {'start_date': '2024-01-02'})
+        ))
+        
+        self.assertEqual(rows[0][:3], ['Entry ID', 'Project', 'Entry date'])
+        self.assertEqual([row[2] for row in rows[1:]], ['2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05'])
+        
+        rows = self.read_csv(DiaryExportService.stream_csv(
+            DiaryExportService.rows('entries', Project.objects.all(), {'date_to': '2024-01-01'})
+        ))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][rows[0].index('Work description')], '\'=HYPERLINK("http://example.com")')
+    
+    def test_line_item_and_cost_exports(self):
+        rows = self.read_csv(DiaryExportService.stream_csv(
+            DiaryExportService.rows('labor', Project.objects.all(), {'project': str(self.project.id)})
+        ))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(Decimal(rows[1][rows[0].index('Cost')]), Decimal('160'))
+        
+        rows = self.read_csv(DiaryExportService.stream_csv(
+            DiaryExportService.rows('costs', Project.objects.all(), {})
+        ))
+        self.assertEqual(rows[1][:4], ['Export Project', '2024-01', '5', '800.00'])
+        self.assertEqual(len(rows), 2)
+    
+    def test_output_is_streamed_in_blocks(self):
+        with mock.patch.object(DiaryExportService, 'BUFFER_SIZE', 100):
+            chunks = list(DiaryExportService.stream_csv(
+                DiaryExportService.rows('labor', Project.objects.all(), {})
+            ))
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(len(self.read_csv(chunks)), 6)
+    
+    def test_export_views(self):
+        self.client.force_login(self.admin)
+        
+        response = self.client.get(reverse('site_diary:admin_export_diary', args=['delays']))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="diary-delays-', response['Content-Disposition'])
+        self.assertEqual(len(self.read_csv([b''.join(response.streaming_content).decode()])), 1)
+        
+        response = self.client.get(reverse('site_diary:export_diary', args=['labor']), {'end_date': '2024-01-02'})
+        self.assertEqual(len(self.read_csv([b''.join(response.streaming_content).decode()])), 3)
+        
+        response = self.client.get(reverse('site_diary:export_diary', args=['passwords']))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(
+    DIARY_PDF_WORKERS=2,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pdf-tests'}},
+)
+class DiaryPdfServiceTestCase(TestCase):
+    """Test cases for cached server-side diary PDFs"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='pdf_admin', password='testpass123')
+        self.project = Project.objects.create(
+            name='PDF Project',
+            client_name='PDF Client',
+            project_manager=self.admin,
+            location='PDF Location',
+            start_date=date(2024, 1, 1),
+            expected_end_date=date(2024, 12, 31),
+            budget=Decimal('100000.00'),
+            status='active'
+        )
+        self.entries = [
+            DiaryEntry.objects.create(
+                project=self.project, created_by=self.admin, entry_date=date(2024, 3, day),
+                work_description=f'Day {day} <b>work</b> & cleanup',
+            )
+            for day in range(1, 4)
+        ]
+        self.labor = LaborEntry.objects.create(
+            diary_entry=self.entries[0], labor_type='skilled', trade_description='Masons',
+            workers_count=2, hours_worked=Decimal('8.00'), hourly_rate=Decimal('10.00')
+        )
+    
+    def page_count(self, pdf):
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        return len(PdfReader(BytesIO(pdf)).pages)
+    
+    def test_repeat_downloads_served_from_cache(self):
+        entry = DiaryEntry.objects.get(pk=self.entries[0].pk)
+        pdf = DiaryPdfService.get_pdf(entry)
+        self.assertEqual(self.page_count(pdf), 1)
+        
+        with mock.patch.object(pdf_service, 'render_document') as render:
+            self.assertEqual(DiaryPdfService.get_pdf(entry), pdf)
+        render.assert_not_called()
+    
+    def test_child_row_change_invalidates(self):
+        entry = DiaryEntry.objects.get(pk=self.entries[0].pk)
+        key = DiaryPdfService.cache_key(entry, DiaryPdfService.document(entry))
+        
+        # A line item edit doesn't touch the entry's updated_at
+        LaborEntry.objects.filter(pk=self.labor.pk).update(workers_count=5)
+        entry = DiaryEntry.objects.get(pk=entry.pk)
+        self.assertNotEqual(DiaryPdfService.cache_key(entry, DiaryPdfService.document(entry)), key)
+    
+    def test_combined_pdf_reuses_cached_entries(self):
+        DiaryPdfService.get_pdf(DiaryEntry.objects.get(pk=self.entries[1].pk))
+        
+        with mock.patch.object(pdf_service, 'render_document', wraps=pdf_service.render_document) as render, \
+                override_settings(DIARY_PDF_WORKERS=1):
+            pdf = DiaryPdfService.get_combined_pdf(DiaryEntry.objects.order_by('entry_date'))
+        self.assertEqual(render.call_count, 2)
+        self.assertEqual(self.page_count(pdf), 3)
+        
+        with mock.patch.object(pdf_service, 'render_document') as render:
+            self.assertEqual(self.page_count(DiaryPdfService.get_combined_pdf(DiaryEntry.objects.all())), 3)
+        render.assert_not_called()
+    
+    def test_combined_pdf_rendered_in_process_pool(self):
+        pdf = DiaryPdfService.get_combined_pdf(DiaryEntry.objects.order_by('entry_date'))
+        self.assertEqual(self.page_count(pdf), 3)
+        self.assertIsNotNone(pdf_service._pool)
+    
+    def test_pdf_views(self):
+        self.client.force_login(self.admin)
+        
+        response = self.client.get(reverse('site_diary:diary_entry_pdf', args=[self.entries[0].id]))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('inline; filename="diary-20240301-', response['Content-Disposition'])
+        
+        response = self.client.get(reverse('site_diary:admin_print_layout'), {
+            'format': 'pdf', 'date_from': '2024-03-02',
+        })
+        self.assertIn('attachment;', response['Content-Disposition'])
+        self.assertEqual(self.page_count(response.content), 2)
+        
+        with override_settings(DIARY_PDF_MAX_ENTRIES=2):
+            response = self.client.get(reverse('site_diary:admin_print_layout'), {'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+        
+        for params in ({'format': 'pdf', 'entry_id': 'abc'}, {'entry_id': '1 OR 1=1'}):
+            response = self.client.get(reverse('site_diary:admin_print_layout'), params)
+            self.assertEqual(response.status_code, 404)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'scope-tests'}},
+)
+class ProjectScopeServiceTestCase(TestCase):
+    """Test cases for the cached per-user project scope"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.manager = User.objects.create_user(username='scope_manager', password='testpass123')
+        self.engineer = User.objects.create_user(username='scope_engineer', password='testpass123')
+        self.projects = [
+            Project.objects.create(
+                name=f'Scope Project {index}',
+                client_name='Scope Client',
+                project_manager=self.manager,
+                location='Scope Location',
+                start_date=date(2024, 1, 1),
+                expected_end_date=date(2024, 12, 31),
+                budget=Decimal('100000.00'),
+                status=status
+            )
+            for index, status in enumerate(['active', 'pending_approval'])
+        ]
+    
+    def test_scope_cached_and_filtered_by_status(self):
+        expected = {project.id for project in self.projects}
+        self.assertEqual(ProjectScopeService.project_ids(self.manager), expected)
+        
+        with self.assertNumQueries(0):
+            self.assertTrue(ProjectScopeService.can_access(self.manager, self.projects[1].id))
+            self.assertFalse(ProjectScopeService.can_access(self.manager, 0))
+        with self.assertNumQueries(1):
+            self.assertEqual(list(ProjectScopeService.user_projects(self.manager)), [self.projects[0]])
+    
+    def test_assignment_changes_invalidate(self):
+        from admin_side.models import ProjectAssignment
+        self.assertFalse(ProjectScopeService.can_access(self.engineer, self.projects[0].id))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment = ProjectAssignment.objects.create(
+                project=self.projects[0], user=self.engineer, role='engineer', assigned_by=self.manager
+            )
+        self.assertTrue(ProjectScopeService.can_access(self.engineer, self.projects[0].id))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.is_active = False
+            assignment.save()
+        self.assertFalse(ProjectScopeService.can_access(self.engineer, self.projects[0].id))
+    
+    def test_manager_and_architect_changes_invalidate(self):
+        project = self.projects[0]
+        ProjectScopeService.project_ids(self.manager)
+        ProjectScopeService.project_ids(self.engineer)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            project.project_manager = self.engineer
+            project.save()
+        self.assertEqual(ProjectScopeService.project_ids(self.manager), {self.projects[1].id})
+        self.assertEqual(ProjectScopeService.project_ids(self.engineer), {project.id})
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            project.architect = self.manager
+            project.save()
+        self.assertIn(project.id, ProjectScopeService.project_ids(self.manager))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            project.delete()
+        self.assertEqual(ProjectScopeService.project_ids(self.engineer), set())
+    
+    @override_settings(PROJECT_SCOPE_CACHE_TIMEOUT=5)
+    def test_change_from_another_process_seen_after_timeout(self):
+        """A reassignment whose invalidation reached another process's cache only"""
+        project = self.projects[0]
+        self.assertTrue(ProjectScopeService.can_access(self.manager, project.id))
+        Project.objects.filter(pk=project.pk).update(project_manager=self.engineer)
+        
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=time.time() + 6):
+            self.assertFalse(ProjectScopeService.can_access(self.manager, project.id))
@@ -16,6 +16,7 @@ urlpatterns = [
     path('logs/', views.diary_logs, name='diary_logs'),
     path('revision/<int:entry_id>/', views.revision_diary, name='revision_diary'),
     path('reports/', views.reports, name='reports'),
+    path('export/<str:dataset>/', views.export_diary, name='export_diary'),
     path('settings/', views.settings, name='settings'),
     path('logout/', views.site_manager_logout, name='site_manager_logout'),
     path('sitedraft/', views.sitedraft, name='sitedraft'),
@@ -46,6 +47,7 @@ urlpatterns = [
     path('admin/print-layout/', views.admin_print_layout, name='admin_print_layout'),
 
     path('admin/reports/', views.adminreports, name='adminreports'),
+    path('admin/export/<str:dataset>/', views.admin_export_diary, name='admin_export_diary'),
     
     # External app views (keeping for compatibility)
     path('chatbot/', views.chatbot, name='chatbot'),
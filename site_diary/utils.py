@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from .models import Project, DiaryEntry
+from .services.cost_service import ProjectCostService
 
 def get_user_projects(user):
     """Get projects accessible by a user"""
@@ -15,6 +16,9 @@ def get_project_statistics(project):
     """Get comprehensive statistics for a project"""
     diary_entries = project.diary_entries.all()
     
+    # Costs and delays are aggregated in the database
+    costs = ProjectCostService.get_project_cost(project)
+    
     stats = {
         'total_entries': diary_entries.count(),
         'approved_entries': diary_entries.filter(approved=True).count(),
@@ -22,37 +26,19 @@ def get_project_statistics(project):
         'avg_progress': diary_entries.aggregate(
             avg=models.Avg('progress_percentage')
         )['avg'] or 0,
-        'total_labor_cost': 0,
-        'total_material_cost': 0,
-        'total_equipment_cost': 0,
-        'total_delay_hours': 0,
+        'total_labor_cost': costs['labor_cost'],
+        'total_material_cost': costs['material_cost'],
+        'total_equipment_cost': costs['equipment_cost'],
+        'total_delay_hours': costs['delay_hours'],
         'weather_breakdown': {},
     }
     
-    # Calculate costs and delays
-    for entry in diary_entries:
-        # Labor costs
-        for labor in entry.labor_entries.all():
-            stats['total_labor_cost'] += labor.total_cost
-        
-        # Material costs
-        for material in entry.material_entries.all():
-            stats['total_material_cost'] += material.total_cost
-        
-        # Equipment costs
-        for equipment in entry.equipment_entries.all():
-            stats['total_equipment_cost'] += equipment.total_rental_cost
-        
-        # Delay hours
-        for delay in entry.delay_entries.all():
-            stats['total_delay_hours'] += delay.duration_hours
-        
-        # Weather breakdown
-        if entry.weather_condition:
-            if entry.weather_condition in stats['weather_breakdown']:
-                stats['weather_breakdown'][entry.weather_condition] += 1
-            else:
-                stats['weather_breakdown'][entry.weather_condition] = 1
+    # Weather breakdown
+    weather_counts = diary_entries.exclude(weather_condition='').order_by().values(
+        'weather_condition'
+    ).annotate(count=models.Count('id'))
+    for row in weather_counts:
+        stats['weather_breakdown'][row['weather_condition']] = row['count']
     
     stats['total_project_cost'] = (
         stats['total_labor_cost'] + 
@@ -2,8 +2,9 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
-from django.db.models import Q, Sum, Avg, Count, Max, Min
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, Http404
+from django.db import transaction
+from django.db.models import Q, Sum
 from django.core.paginator import Paginator
 from django.utils import timezone
 from datetime import timedelta
@@ -15,6 +16,16 @@ from .models import (
     Project, DiaryEntry, LaborEntry, MaterialEntry, 
     EquipmentEntry, DelayEntry, VisitorEntry, DiaryPhoto, SubcontractorCompany, Milestone, SubcontractorEntry
 )
+from .services.cost_service import ProjectCostService
+from .services.snapshot_service import ProjectSnapshotService
+from .services.latest_entry_service import LatestEntryService
+from .services.diary_service import DiaryWriteService
+from .services.photo_upload_service import PhotoUploadService
+from .services.weather_service import WeatherService, WeatherNotFound, WeatherUnavailable
+from .services.monthly_stats_service import MonthlyStatsService
+from .services.export_service import DiaryExportService
+from .services.pdf_service import DiaryPdfService
+from .services.project_scope_service import ProjectScopeService
 from .forms import (
     ProjectForm, DiaryEntryForm, LaborEntryFormSet, MaterialEntryFormSet,
     EquipmentEntryFormSet, DelayEntryFormSet, VisitorEntryFormSet, 
@@ -24,10 +35,8 @@ from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.http import require_http_methods
 from django.core.exceptions import ValidationError
 from django.utils.html import escape
-import requests
 import logging
 
-OPENWEATHERMAP_API_KEY = "0c461dd2b831a59146501773674950cd"
 logger = logging.getLogger(__name__)
 
 # Create your views here.
@@ -39,20 +48,8 @@ def diary(request):
     # Initialize draft_data to prevent UnboundLocalError
     draft_data = None
     
-    # Get user's assigned projects - include direct assignments and ProjectAssignment assignments
-    from admin_side.models import ProjectAssignment
-    
-    # Get projects through assignments or direct assignment
-    assigned_project_ids = ProjectAssignment.objects.filter(
-        user=request.user, is_active=True
-    ).values_list('project_id', flat=True)
-    
-    user_projects = Project.objects.filter(
-        Q(id__in=assigned_project_ids) | 
-        Q(project_manager=request.user) | 
-        Q(architect=request.user),
-        status__in=['planning', 'active', 'on_hold', 'completed']
-    )
+    # Get user's projects through assignments or direct assignment
+    user_projects = ProjectScopeService.user_projects(request.user)
     
     if request.method == 'POST':
         save_as_draft = request.POST.get('save_as_draft') == '1'
@@ -84,6 +81,15 @@ def diary(request):
         if not delay_formset.is_valid():
             logger.warning(f"Delay formset validation failed for user {request.user.id}: {delay_formset.errors}")
         
+        # Validate the labor, material, equipment, delay and subcontractor payloads before writing anything
+        try:
+            diary_payload = DiaryWriteService.parse_payload(request.POST)
+            payload_errors = []
+        except ValidationError as e:
+            diary_payload = None
+            payload_errors = e.messages
+            logger.warning(f"Diary payload validation failed for user {request.user.id}: {payload_errors}")
+        
         # Check if editing existing draft with proper validation
         edit_draft_id = request.POST.get('edit_draft_id') or request.GET.get('edit')
         editing_draft = None
@@ -147,6 +153,15 @@ def diary(request):
                 messages.error(request, error_msg)
                 return redirect('site_diary:diary')
             
+            if payload_errors:
+                error_msg = 'Please fix the following errors: ' + '; '.join(payload_errors)
+                
+                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                    return JsonResponse({'success': False, 'message': error_msg}, status=400)
+                
+                messages.error(request, error_msg)
+                return redirect('site_diary:diary')
+            
             # Check if draft already exists for this project and date (avoid duplicates)
             existing_draft = DiaryEntry.objects.filter(
                 project=project,
@@ -164,172 +179,57 @@ def diary(request):
                 except Milestone.DoesNotExist:
                     pass
             
-            if existing_draft:
-                # Update existing draft with all POST data
-                existing_draft.milestone = milestone
-                existing_draft.work_description = request.POST.get('work_description', '')
-                existing_draft.progress_percentage = request.POST.get('progress_percentage', 0) or 0
-                existing_draft.weather_condition = request.POST.get('weather_condition', '')
-                existing_draft.temperature_high = request.POST.get('temperature_high') or None
-                existing_draft.temperature_low = request.POST.get('temperature_low') or None
-                existing_draft.humidity = request.POST.get('humidity') or None
-                existing_draft.wind_speed = request.POST.get('wind_speed') or None
-                existing_draft.quality_issues = request.POST.get('quality_issues', '')
-                existing_draft.safety_incidents = request.POST.get('safety_incidents', '')
-                existing_draft.general_notes = request.POST.get('general_notes', '')
-                existing_draft.photos_taken = request.POST.get('photos_taken') == 'on'
-                existing_draft.save()
-                diary_entry = existing_draft
-                logger.info(f"Updated existing draft {diary_entry.id} for user {request.user.id}")
-            else:
-                # Create new draft with all POST data
-                diary_entry = DiaryEntry.objects.create(
-                    project=project,
-                    entry_date=entry_date,
-                    created_by=request.user,
-                    draft=True,
-                    milestone=milestone,
-                    work_description=request.POST.get('work_description', ''),
-                    progress_percentage=request.POST.get('progress_percentage', 0) or 0,
-                    weather_condition=request.POST.get('weather_condition', ''),
-                    temperature_high=request.POST.get('temperature_high') or None,
-                    temperature_low=request.POST.get('temperature_low') or None,
-                    humidity=request.POST.get('humidity') or None,
-                    wind_speed=request.POST.get('wind_speed') or None,
-                    quality_issues=request.POST.get('quality_issues', ''),
-                    safety_incidents=request.POST.get('safety_incidents', ''),
-                    general_notes=request.POST.get('general_notes', ''),
-                    photos_taken=request.POST.get('photos_taken') == 'on'
-                )
-                logger.info(f"Created new draft {diary_entry.id} for user {request.user.id}")
-            
-            # Save labor, materials, equipment, and delays data for drafts
-            # Handle dynamic worker types
-            from .models import WorkerType
-            worker_types = WorkerType.objects.filter(is_active=True)
-            
-            # Clear existing labor entries for this draft (except overtime)
-            LaborEntry.objects.filter(diary_entry=diary_entry).exclude(labor_type='overtime').delete()
-            
-            # Process each worker type dynamically
-            for worker_type in worker_types:
-                worker_slug = worker_type.name.lower().replace(' ', '-')
-                count_field = f"{worker_slug}Count"
-                rate_field = f"{worker_slug}Rate"
-                
-                worker_count = request.POST.get(count_field, 0)
-                worker_rate = request.POST.get(rate_field, 0)
-                
-                if int(worker_count or 0) > 0:
-                    LaborEntry.objects.create(
-                        diary_entry=diary_entry,
-                        labor_type=worker_slug,
-                        trade_description=worker_type.name,
-                        workers_count=worker_count,
-                        hours_worked=8,
-                        overtime_hours=0,
-                        hourly_rate=worker_rate or worker_type.default_daily_rate or 0
-                    )
-            
-            # Handle JSON data from frontend
-            materials_json = request.POST.get('materials_json')
-            if materials_json:
-                MaterialEntry.objects.filter(diary_entry=diary_entry).delete()
-                materials_data = json.loads(materials_json)
-                for material_data in materials_data:
-                    MaterialEntry.objects.create(
-                        diary_entry=diary_entry,
-                        material_name=material_data['name'],
-                        quantity_delivered=material_data['quantity'],
-                        unit=material_data['unit'],
-                        unit_cost=material_data['cost'] / material_data['quantity'] if material_data['quantity'] > 0 else 0,
-                        supplier=material_data.get('supplier', ''),
-                        delivery_time=material_data.get('delivery_time')
-                    )
-            
-            equipment_json = request.POST.get('equipment_json')
-            if equipment_json:
-                EquipmentEntry.objects.filter(diary_entry=diary_entry).delete()
-                equipment_data = json.loads(equipment_json)
-                for equip_data in equipment_data:
-                    EquipmentEntry.objects.create(
-                        diary_entry=diary_entry,
-                        equipment_name=equip_data['name'],
-                        equipment_type=equip_data['name'],
-                        hours_operated=equip_data['hours'],
-                        rental_cost_per_hour=equip_data['cost'] / equip_data['hours'] if equip_data['hours'] > 0 else 0,
-                        operator_name=equip_data.get('operator', ''),
-                        fuel_consumption=equip_data.get('fuel', 0)
-                    )
-            
-            delays_json = request.POST.get('delays_json')
-            if delays_json:
-                DelayEntry.objects.filter(diary_entry=diary_entry).delete()
-                delays_data = json.loads(delays_json)
-                for delay_data in delays_data:
-                    DelayEntry.objects.create(
-                        diary_entry=diary_entry,
-                        category=delay_data['type'],
-                        description=delay_data['description'],
-                        start_time=delay_data.get('start_time') if delay_data.get('start_time') else None,
-                        end_time=delay_data.get('end_time') if delay_data.get('end_time') else None,
-                        duration_hours=delay_data.get('duration', 0),
-                        impact_level=delay_data['impact'],
-                        mitigation_actions=delay_data.get('solution', ''),
-                        affected_activities='General work activities'
-                    )
-            
-            # Handle overtime JSON data
-            overtime_json = request.POST.get('overtime_json')
-            if overtime_json:
-                # Clear existing overtime entries for this draft
-                LaborEntry.objects.filter(diary_entry=diary_entry, labor_type='overtime').delete()
-                overtime_data = json.loads(overtime_json)
-                for overtime_entry in overtime_data:
-                    LaborEntry.objects.create(
-                        diary_entry=diary_entry,
-                        labor_type='overtime',
-                        trade_description=f"{overtime_entry['personnel']} {overtime_entry['role']} personnel",
-                        workers_count=overtime_entry['personnel'],
-                        hours_worked=overtime_entry['hours'],
-                        overtime_hours=overtime_entry['hours'],
-                        hourly_rate=overtime_entry['rate']
-                    )
-            
-            # Handle subcontractor JSON data
-            subcontractor_json = request.POST.get('subcontractor_json')
-            print(f"DEBUG: Draft save - subcontractor_json: {subcontractor_json}")
-            if subcontractor_json:
-                SubcontractorEntry.objects.filter(diary_entry=diary_entry).delete()
-                subcontractor_data = json.loads(subcontractor_json)
-                print(f"DEBUG: Draft save - parsed subcontractor_data: {subcontractor_data}")
-                for sub_data in subcontractor_data:
-                    created_sub = SubcontractorEntry.objects.create(
-                        diary_entry=diary_entry,
-                        company_name=sub_data['name'],
-                        work_description=sub_data['work'],
-                        daily_cost=sub_data.get('cost', 0)
+            with transaction.atomic():
+                if existing_draft:
+                    # Update existing draft with all POST data
+                    existing_draft.milestone = milestone
+                    existing_draft.work_description = request.POST.get('work_description', '')
+                    existing_draft.progress_percentage = request.POST.get('progress_percentage', 0) or 0
+                    existing_draft.weather_condition = request.POST.get('weather_condition', '')
+                    existing_draft.temperature_high = request.POST.get('temperature_high') or None
+                    existing_draft.temperature_low = request.POST.get('temperature_low') or None
+                    existing_draft.humidity = request.POST.get('humidity') or None
+                    existing_draft.wind_speed = request.POST.get('wind_speed') or None
+                    existing_draft.quality_issues = request.POST.get('quality_issues', '')
+                    existing_draft.safety_incidents = request.POST.get('safety_incidents', '')
+                    existing_draft.general_notes = request.POST.get('general_notes', '')
+                    existing_draft.photos_taken = request.POST.get('photos_taken') == 'on'
+                    existing_draft.supervisor_signature = request.POST.get('signature_data') or existing_draft.supervisor_signature
+                    existing_draft.save()
+                    diary_entry = existing_draft
+                    logger.info(f"Updated existing draft {diary_entry.id} for user {request.user.id}")
+                else:
+                    # Create new draft with all POST data
+                    diary_entry = DiaryEntry.objects.create(
+                        project=project,
+                        entry_date=entry_date,
+                        created_by=request.user,
+                        draft=True,
+                        milestone=milestone,
+                        work_description=request.POST.get('work_description', ''),
+                        progress_percentage=request.POST.get('progress_percentage', 0) or 0,
+                        weather_condition=request.POST.get('weather_condition', ''),
+                        temperature_high=request.POST.get('temperature_high') or None,
+                        temperature_low=request.POST.get('temperature_low') or None,
+                        humidity=request.POST.get('humidity') or None,
+                        wind_speed=request.POST.get('wind_speed') or None,
+                        quality_issues=request.POST.get('quality_issues', ''),
+                        safety_incidents=request.POST.get('safety_incidents', ''),
+                        general_notes=request.POST.get('general_notes', ''),
+                        photos_taken=request.POST.get('photos_taken') == 'on',
+                        supervisor_signature=request.POST.get('signature_data') or ''
                     )
-                    print(f"DEBUG: Draft save - created subcontractor: {created_sub.company_name} - {created_sub.work_description} (₱{created_sub.daily_cost})")
-            else:
-                print(f"DEBUG: Draft save - no subcontractor_json found in POST data")
-            
-            # Handle signature data
-            signature_data = request.POST.get('signature_data')
-            if signature_data:
-                diary_entry.supervisor_signature = signature_data
-                diary_entry.save()
+                    logger.info(f"Created new draft {diary_entry.id} for user {request.user.id}")
+                
+                # Save labor, materials, equipment, delays, overtime and subcontractors
+                DiaryWriteService.apply_payload(diary_entry, diary_payload)
             
-            # Handle photo uploads for drafts
+            # Spool photo uploads for drafts; they are pushed to storage in the background
             for key, file in request.FILES.items():
                 if key.startswith('diary_photo_'):
                     photo_id = key.replace('diary_photo_', '')
                     description = request.POST.get(f'photo_description_{photo_id}', '')
-                    DiaryPhoto.objects.create(
-                        diary_entry=diary_entry,
-                        photo=file,
-                        caption=description
-                    )
+                    PhotoUploadService.enqueue(diary_entry, file, caption=description)
             
             logger.info(f"Draft saved successfully with ID: {diary_entry.id}")
             
@@ -341,139 +241,24 @@ def diary(request):
             return redirect('site_diary:sitedraft')
         
         # Full validation for final submission
-        elif diary_form.is_valid() and material_formset.is_valid() and equipment_formset.is_valid() and labor_formset.is_valid():
-            # Debug: Log all POST data
-            print(f"DEBUG: Final submission - POST data keys: {list(request.POST.keys())}")
-            print(f"DEBUG: Final submission - subcontractor_json: {request.POST.get('subcontractor_json')}")
-            for key, value in request.POST.items():
-                if 'subcontractor' in key.lower():
-                    print(f"DEBUG: Final submission - {key} = {value}")
-            
-            # Save diary entry
-            diary_entry = diary_form.save(commit=False)
-            diary_entry.created_by = request.user
-            diary_entry.draft = False
-            diary_entry.save()
-            print(f"DEBUG: Final submission - Diary entry saved with ID: {diary_entry.id}")
-            
-            # Handle JSON data from frontend
-            materials_json = request.POST.get('materials_json')
-            if materials_json:
-                materials_data = json.loads(materials_json)
-                for material_data in materials_data:
-                    MaterialEntry.objects.create(
-                        diary_entry=diary_entry,
-                        material_name=material_data['name'],
-                        quantity_delivered=material_data['quantity'],
-                        unit=material_data['unit'],
-                        unit_cost=material_data['cost'] / material_data['quantity'] if material_data['quantity'] > 0 else 0,
-                        supplier=material_data.get('supplier', ''),
-                        delivery_time=material_data.get('delivery_time')
-                    )
-            
-            equipment_json = request.POST.get('equipment_json')
-            if equipment_json:
-                equipment_data = json.loads(equipment_json)
-                for equip_data in equipment_data:
-                    EquipmentEntry.objects.create(
-                        diary_entry=diary_entry,
-                        equipment_name=equip_data['name'],
-                        equipment_type=equip_data['name'],
-                        hours_operated=equip_data['hours'],
-                        rental_cost_per_hour=equip_data['cost'] / equip_data['hours'] if equip_data['hours'] > 0 else 0,
-                        operator_name=equip_data.get('operator', ''),
-                        fuel_consumption=equip_data.get('fuel', 0)
-                    )
-            
-            # Handle delays data
-            delays_json = request.POST.get('delays_json')
-            if delays_json:
-                delays_data = json.loads(delays_json)
-                for delay_data in delays_data:
-                    DelayEntry.objects.create(
-                        diary_entry=diary_entry,
-                        category=delay_data['type'],
-                        description=delay_data['description'],
-                        start_time=delay_data.get('start_time') if delay_data.get('start_time') else None,
-                        end_time=delay_data.get('end_time') if delay_data.get('end_time') else None,
-                        duration_hours=delay_data.get('duration', 0),
-                        impact_level=delay_data['impact'],
-                        mitigation_actions=delay_data.get('solution', ''),
-                        affected_activities='General work activities'
-                    )
-            
-            # Handle overtime JSON data
-            overtime_json = request.POST.get('overtime_json')
-            if overtime_json:
-                overtime_data = json.loads(overtime_json)
-                for overtime_entry in overtime_data:
-                    LaborEntry.objects.create(
-                        diary_entry=diary_entry,
-                        labor_type='overtime',
-                        trade_description=f"{overtime_entry['personnel']} {overtime_entry['role']} personnel",
-                        workers_count=overtime_entry['personnel'],
-                        hours_worked=overtime_entry['hours'],
-                        overtime_hours=overtime_entry['hours'],
-                        hourly_rate=overtime_entry['rate']
-                    )
-            
-            # Handle subcontractor JSON data
-            subcontractor_json = request.POST.get('subcontractor_json')
-            print(f"DEBUG: Main diary - subcontractor_json: {subcontractor_json}")
-            if subcontractor_json:
-                subcontractor_data = json.loads(subcontractor_json)
-                print(f"DEBUG: Main diary - parsed subcontractor_data: {subcontractor_data}")
-                for sub_data in subcontractor_data:
-                    created_sub = SubcontractorEntry.objects.create(
-                        diary_entry=diary_entry,
-                        company_name=sub_data['name'],
-                        work_description=sub_data['work'],
-                        daily_cost=sub_data.get('cost', 0)
-                    )
-                    print(f"DEBUG: Main diary - created subcontractor: {created_sub.company_name} - {created_sub.work_description} (₱{created_sub.daily_cost})")
-            else:
-                print(f"DEBUG: Main diary - no subcontractor_json found in POST data")
-                print(f"DEBUG: Main diary - POST keys: {list(request.POST.keys())}")
-            
-            # Handle signature data
-            signature_data = request.POST.get('signature_data')
-            if signature_data:
-                diary_entry.supervisor_signature = signature_data
+        elif diary_payload is not None and diary_form.is_valid() and material_formset.is_valid() and equipment_formset.is_valid() and labor_formset.is_valid():
+            with transaction.atomic():
+                # Save diary entry
+                diary_entry = diary_form.save(commit=False)
+                diary_entry.created_by = request.user
+                diary_entry.draft = False
+                diary_entry.supervisor_signature = request.POST.get('signature_data') or ''
+                diary_entry.save()
+                
+                # Save labor, materials, equipment, delays, overtime and subcontractors
+                DiaryWriteService.apply_payload(diary_entry, diary_payload)
             
-            # Handle photo uploads for final submission
+            # Spool photo uploads for final submission; they are pushed to storage in the background
             for key, file in request.FILES.items():
                 if key.startswith('diary_photo_'):
                     photo_id = key.replace('diary_photo_', '')
                     description = request.POST.get(f'photo_description_{photo_id}', '')
-                    DiaryPhoto.objects.create(
-                        diary_entry=diary_entry,
-                        photo=file,
-                        caption=description
-                    )
-            
-            # Handle dynamic worker types
-            from .models import WorkerType
-            worker_types = WorkerType.objects.filter(is_active=True)
-            
-            # Process each worker type dynamically
-            for worker_type in worker_types:
-                worker_slug = worker_type.name.lower().replace(' ', '-')
-                count_field = f"{worker_slug}Count"
-                rate_field = f"{worker_slug}Rate"
-                
-                worker_count = request.POST.get(count_field, 0)
-                worker_rate = request.POST.get(rate_field, 0)
-                
-                if int(worker_count or 0) > 0:
-                    LaborEntry.objects.create(
-                        diary_entry=diary_entry,
-                        labor_type=worker_slug,
-                        trade_description=worker_type.name,
-                        workers_count=worker_count,
-                        hours_worked=8,
-                        overtime_hours=0,
-                        hourly_rate=worker_rate or worker_type.default_daily_rate or 0
-                    )
+                    PhotoUploadService.enqueue(diary_entry, file, caption=description)
             
             # Process formsets
             material_formset.instance = diary_entry
@@ -523,7 +308,7 @@ def diary(request):
             logger.warning(f"Form validation failed for user {request.user.id}")
             
             # Collect specific error messages
-            error_messages = []
+            error_messages = list(payload_errors)
             if diary_form.errors:
                 for field, errors in diary_form.errors.items():
                     if field == '__all__':
@@ -678,18 +463,10 @@ def diary(request):
     
     # Get project data for budget calculations
     project_data = []
-    for project in user_projects:
-        # Calculate existing costs for this project
-        project_entries = DiaryEntry.objects.filter(project=project)
-        labor_entries = LaborEntry.objects.filter(diary_entry__in=project_entries)
-        material_entries = MaterialEntry.objects.filter(diary_entry__in=project_entries)
-        equipment_entries = EquipmentEntry.objects.filter(diary_entry__in=project_entries)
-        
-        total_spent = (
-            sum(labor.total_cost for labor in labor_entries) +
-            sum(material.total_cost for material in material_entries) +
-            sum(equipment.total_rental_cost for equipment in equipment_entries)
-        )
+    # A recent recorded reading lets the form prefill without calling the weather API
+    latest_weather = WeatherService.recent_readings(user_projects)
+    for project in ProjectCostService.annotate_costs(user_projects):
+        total_spent = project.labor_cost + project.material_cost + project.equipment_cost
         
         project_data.append({
             'id': project.id,
@@ -699,6 +476,19 @@ def diary(request):
             'spent': float(total_spent),
             'remaining': float(project.budget) - float(total_spent) if project.budget else -float(total_spent)
         })
+        reading = latest_weather.get(project.id)
+        if reading:
+            project_data[-1]['weather'] = {
+                'temperature': reading.temperature,
+                'temperature_high': reading.temperature_high,
+                'temperature_low': reading.temperature_low,
+                'humidity': reading.humidity,
+                'wind_speed': reading.wind_speed,
+                'description': escape(reading.description),
+                'condition': escape(reading.condition),
+                'icon': escape(reading.icon),
+                'fetched_at': reading.observed_at.isoformat(),
+            }
     
     # Get active subcontractor companies for dropdown
     subcontractor_companies = SubcontractorCompany.objects.filter(is_active=True).order_by('name')
@@ -738,67 +528,31 @@ def dashboard(request):
     success_modal_data = request.session.pop('show_success_modal', None)
     approval_modal_data = success_modal_data  # For template compatibility
     # Get user's projects (including rejected for visibility)
-    if request.user.is_staff:
-        projects = Project.objects.filter(status__in=['planning', 'active', 'on_hold', 'completed', 'rejected'])
-    else:
-        # Get projects through assignments or direct assignment
-        from admin_side.models import ProjectAssignment
-        assigned_project_ids = ProjectAssignment.objects.filter(
-            user=request.user, is_active=True
-        ).values_list('project_id', flat=True)
-        
-        projects = Project.objects.filter(
-            Q(id__in=assigned_project_ids) | 
-            Q(project_manager=request.user) | 
-            Q(architect=request.user),
-            status__in=['planning', 'active', 'on_hold', 'completed', 'rejected']
-        )
+    projects = ProjectScopeService.visible_projects(
+        request.user, statuses=['planning', 'active', 'on_hold', 'completed', 'rejected']
+    )
     
     # Enhanced project data with progress and analytics
     project_data = []
     
+    # Running totals, latest progress and milestone come from one snapshot row per project
+    snapshots = ProjectSnapshotService.get_snapshots(projects)
     for project in projects:
-        # Get latest non-draft diary entry for progress
-        latest_entry = DiaryEntry.objects.filter(project=project, draft=False).order_by('-entry_date').first()
-        
-        # Calculate project analytics
-        project_entries = DiaryEntry.objects.filter(project=project, draft=False)
-        labor_entries = LaborEntry.objects.filter(diary_entry__in=project_entries)
-        material_entries = MaterialEntry.objects.filter(diary_entry__in=project_entries)
-        equipment_entries = EquipmentEntry.objects.filter(diary_entry__in=project_entries)
-        delay_entries = DelayEntry.objects.filter(diary_entry__in=project_entries)
+        snapshot = snapshots[project.id]
+        current_milestone = snapshot.latest_milestone
         
         # Calculate milestone-based progress
-        if latest_entry and latest_entry.milestone and latest_entry.progress_percentage is not None:
-            # Use milestone + percentage completion of that milestone
-            milestone_progress = float(latest_entry.progress_percentage)
-            current_milestone = latest_entry.milestone
-            print(f"DEBUG: Project {project.name} - Milestone: {current_milestone.name}, Completion: {milestone_progress}%")
-            progress = milestone_progress
-        elif latest_entry and latest_entry.progress_percentage is not None:
-            # Fallback to direct progress percentage
-            progress = float(latest_entry.progress_percentage)
-            current_milestone = None
-            print(f"DEBUG: Project {project.name} - Direct progress: {progress}%")
+        if snapshot.latest_progress is not None:
+            progress = float(snapshot.latest_progress)
         else:
             # Default progress calculation
-            progress = float(project.get_progress_percentage())
-            current_milestone = None
-            print(f"DEBUG: Project {project.name} - Default progress: {progress}%")
+            progress = float(snapshot.get_progress_percentage())
         
         # Budget calculations with revision impact analysis
-        total_labor_cost = sum(float(labor.total_cost) for labor in labor_entries if labor.total_cost)
-        total_material_cost = sum(float(material.total_cost) for material in material_entries if material.total_cost)
-        total_equipment_cost = sum(float(equipment.total_rental_cost) for equipment in equipment_entries if equipment.total_rental_cost)
-        subcontractor_entries = SubcontractorEntry.objects.filter(diary_entry__in=project_entries)
-        delay_cost_entries = DelayEntry.objects.filter(diary_entry__in=project_entries)
-        total_subcontractor_cost = sum(float(sub.daily_cost) for sub in subcontractor_entries if sub.daily_cost)
-        total_delay_cost = sum(float(delay.cost_impact) for delay in delay_cost_entries if delay.cost_impact)
-        total_spent = total_labor_cost + total_material_cost + total_equipment_cost + total_subcontractor_cost + total_delay_cost
+        total_spent = float(snapshot.total_cost)
         
         # Calculate revision impacts
-        revision_entries = project_entries.filter(status='needs_revision')
-        revision_count = revision_entries.count()
+        revision_count = snapshot.revision_count
         
         # Estimate revision cost impact based on project complexity and revision count (PHP)
         base_revision_cost = 100000  # Base cost per revision ₱100,000
@@ -849,7 +603,7 @@ def dashboard(request):
             phase_name = "Finishing"
         
         # Calculate schedule status based on actual delays
-        delay_count = delay_entries.count()
+        delay_count = snapshot.delay_count
         if delay_count == 0:
             schedule_status = 'On Track'
         elif delay_count < 3:
@@ -863,8 +617,8 @@ def dashboard(request):
         current_milestone_order = None
         
         # Find current milestone order
-        if latest_entry and latest_entry.milestone:
-            current_milestone_order = latest_entry.milestone.order
+        if current_milestone:
+            current_milestone_order = current_milestone.order
         
         for i, milestone in enumerate(milestones):
             milestone.threshold = (i + 1) * 25  # 25%, 50%, 75%, 100%
@@ -879,7 +633,7 @@ def dashboard(request):
                     # Current milestone in progress
                     milestone.is_completed = False
                     milestone.is_current = True
-                    milestone.completion_percentage = float(latest_entry.progress_percentage) if latest_entry.progress_percentage else 0
+                    milestone.completion_percentage = float(snapshot.latest_progress) if snapshot.latest_progress else 0
                 else:
                     # Future milestones not started
                     milestone.is_completed = False
@@ -894,14 +648,14 @@ def dashboard(request):
             project_milestones.append(milestone)
         
         # Get current milestone info
-        current_milestone_id = latest_entry.milestone.id if latest_entry and latest_entry.milestone else None
-        current_milestone_name = latest_entry.milestone.name if latest_entry and latest_entry.milestone else 'Not Set'
+        current_milestone_id = current_milestone.id if current_milestone else None
+        current_milestone_name = current_milestone.name if current_milestone else 'Not Set'
         
         # Add calculated fields directly to project object
         project.progress = progress
         project.current_phase = f"Phase {min(int(progress/25) + 1, 4)} - {phase_name}"
         project.current_milestone = current_milestone_name
-        project.milestone_completion = float(latest_entry.progress_percentage) if latest_entry and latest_entry.progress_percentage else 0
+        project.milestone_completion = float(snapshot.latest_progress) if snapshot.latest_progress else 0
         project.budget_used = budget_used_percentage
         project.schedule_status = schedule_status
         project.milestones = project_milestones
@@ -962,20 +716,9 @@ def diary_logs(request):
     
     project = get_object_or_404(Project, id=project_id)
     
-    if not request.user.is_staff:
-        from admin_side.models import ProjectAssignment
-        assigned_project_ids = ProjectAssignment.objects.filter(
-            user=request.user, is_active=True
-        ).values_list('project_id', flat=True)
-        
-        user_projects = Project.objects.filter(
-            Q(id__in=assigned_project_ids) | 
-            Q(project_manager=request.user) | 
-            Q(architect=request.user)
-        )
-        if project not in user_projects:
-            messages.error(request, 'Access denied.')
-            return redirect('site_diary:dashboard')
+    if not ProjectScopeService.can_access(request.user, project.id):
+        messages.error(request, 'Access denied.')
+        return redirect('site_diary:dashboard')
     
     entries = DiaryEntry.objects.filter(project=project, draft=False).select_related(
         'created_by', 'milestone'
@@ -995,7 +738,12 @@ def diary_logs(request):
 @require_site_manager_role
 @require_http_methods(["GET"])
 def weather_api(request):
-    """Weather API endpoint for fetching weather data"""
+    """Weather API endpoint for fetching weather data.
+    
+    Lookups go through WeatherService, which caches readings per location and
+    coalesces concurrent requests. Pass `project` to record the reading in that
+    project's weather history.
+    """
     location = request.GET.get('location', '').strip()
     
     # Validate location input
@@ -1005,44 +753,32 @@ def weather_api(request):
     # Sanitize location input to prevent injection
     location = escape(location)
     
+    project = None
+    if request.GET.get('project'):
+        project = ProjectScopeService.user_projects(request.user, statuses=None).filter(
+            id=request.GET['project'] if request.GET['project'].isdigit() else None
+        ).first()
+    
     try:
-        from django.conf import settings
-        
-        # Use OpenWeatherMap API
-        api_key = getattr(settings, 'WEATHER_API_KEY', OPENWEATHERMAP_API_KEY)
-        api_url = "https://api.openweathermap.org/data/2.5/weather"
-        params = {
-            'q': location,
-            'appid': api_key,
-            'units': 'metric'
+        weather = WeatherService.get_weather(location, project=project)
+        weather_data = {
+            'temperature': weather['temperature'],
+            'temperature_high': weather['temperature_high'],
+            'temperature_low': weather['temperature_low'],
+            'humidity': weather['humidity'],
+            'wind_speed': weather['wind_speed'],
+            'description': escape(weather['description']),
+            'condition': escape(weather['condition']),
+            'icon': escape(weather['icon']),
+            'location': location,
+            'fetched_at': weather['fetched_at'].isoformat(),
+            'stale': weather['stale'],
         }
-        
-        response = requests.get(api_url, params=params, timeout=10)
-                
-        if response.status_code == 200:
-            data = response.json()
-            
-            # Validate API response structure
-            if not all(key in data for key in ['main', 'weather', 'wind']):
-                return JsonResponse({'error': 'Invalid weather data received'}, status=500)
-            
-            weather_data = {
-                'temperature': round(float(data['main']['temp'])),
-                'temperature_high': round(float(data['main']['temp_max'])),
-                'temperature_low': round(float(data['main']['temp_min'])),
-                'humidity': int(data['main']['humidity']),
-                'wind_speed': round(float(data['wind']['speed']) * 3.6),  # Convert m/s to km/h
-                'description': escape(data['weather'][0]['description']),
-                'condition': escape(data['weather'][0]['main']),
-                'icon': escape(data['weather'][0]['icon']),
-                'location': location
-            }
-            return JsonResponse(weather_data)
-        else:
-            logger.warning(f"Weather API failed for location {location}: {response.status_code}")
-            return JsonResponse({'error': 'Weather data not found'}, status=404)
-                    
-    except requests.RequestException as e:
+        return JsonResponse(weather_data)
+    except WeatherNotFound:
+        logger.warning(f"Weather API found no data for location {location}")
+        return JsonResponse({'error': 'Weather data not found'}, status=404)
+    except WeatherUnavailable as e:
         logger.error(f"Weather API request failed: {str(e)}")
         # Fallback to mock data if API fails
         weather_data = {
@@ -1085,39 +821,40 @@ def print_preview(request, project_id):
         messages.error(request, 'Invalid project ID.')
         return redirect('site_diary:dashboard')
 
+def _pdf_response(pdf, filename, attachment=False):
+    """Serve rendered PDF bytes, inline unless asked to download"""
+    response = HttpResponse(pdf, content_type='application/pdf')
+    disposition = 'attachment' if attachment else 'inline'
+    response['Content-Disposition'] = f'{disposition}; filename="{filename}"'
+    return response
+
 @require_site_manager_role
 def diary_entry_pdf(request, entry_id):
-    """Generate PDF for specific diary entry using printlayout template"""
+    """Download a diary entry as PDF (or its print layout with ?format=html)"""
     try:
         entry_id = int(entry_id)
         diary_entry = get_object_or_404(DiaryEntry, id=entry_id)
         
         # Verify user has access to this entry's project
-        if not request.user.is_staff:
-            from admin_side.models import ProjectAssignment
-            assigned_project_ids = ProjectAssignment.objects.filter(
-                user=request.user, is_active=True
-            ).values_list('project_id', flat=True)
-            
-            user_projects = Project.objects.filter(
-                Q(id__in=assigned_project_ids) | 
-                Q(project_manager=request.user) | 
-                Q(architect=request.user)
-            )
-            if diary_entry.project not in user_projects:
-                messages.error(request, 'Access denied.')
-                return redirect('site_diary:history')
+        if not ProjectScopeService.can_access(request.user, diary_entry.project_id):
+            messages.error(request, 'Access denied.')
+            return redirect('site_diary:history')
         
         # Get the project
         project = diary_entry.project
         
-        # Render the printlayout template with all necessary data
-        context = {
-            'project': project,
-            'diary_entry': diary_entry,
-        }
-        
-        return render(request, 'site_diary/printlayout.html', context)
+        if request.GET.get('format') == 'html':
+            # Render the printlayout template with all necessary data
+            context = {
+                'project': project,
+                'diary_entry': diary_entry,
+            }
+            return render(request, 'site_diary/printlayout.html', context)
+
+        return _pdf_response(
+            DiaryPdfService.get_pdf(diary_entry),
+            f"diary-{diary_entry.entry_date:%Y%m%d}-{diary_entry.id}.pdf"
+        )
         
     except (ValueError, TypeError):
         messages.error(request, 'Invalid entry ID.')
@@ -1215,7 +952,7 @@ def adminhistory(request):
 @require_admin_role
 def adminreports(request):
     """Admin reports view with comprehensive analytics and dynamic data - shows ALL projects"""
-    from django.db.models import Sum, Avg, Count, Max, Min
+    from django.db.models import Sum
     from decimal import Decimal
     import json
     from django.core.serializers.json import DjangoJSONEncoder
@@ -1250,31 +987,25 @@ def adminreports(request):
     if selected_client:
         projects = projects.filter(client_name__icontains=selected_client)
     
-    # Get diary entries for the filtered projects
-    entries = DiaryEntry.objects.filter(project__in=projects, draft=False)
-    if start_date:
-        entries = entries.filter(entry_date__gte=start_date)
-    if end_date:
-        entries = entries.filter(entry_date__lte=end_date)
+    # Report figures for finalized entries come from the monthly statistics table
+    period_stats = MonthlyStatsService.collect(
+        projects, start_date=start_date, end_date=end_date, include_drafts=False
+    )
     
     # Overall summary statistics for ALL projects
     total_projects = Project.objects.count()
-    total_entries = entries.count()
-    total_delays = DelayEntry.objects.filter(diary_entry__in=entries).count()
+    total_entries = period_stats.totals('entry').get('count', 0)
+    total_delays = period_stats.totals('delay').get('count', 0)
     active_projects = Project.objects.filter(status='active').count()
     
     # Budget analysis across ALL projects
     total_budget = Project.objects.aggregate(total=Sum('budget'))['total'] or 0
     
     # Calculate total spent across ALL projects
-    labor_entries = LaborEntry.objects.filter(diary_entry__in=entries)
-    material_entries = MaterialEntry.objects.filter(diary_entry__in=entries)
-    equipment_entries = EquipmentEntry.objects.filter(diary_entry__in=entries)
-    
-    total_labor_cost = sum(labor.total_cost for labor in labor_entries)
-    total_material_cost = sum(material.total_cost for material in material_entries)
-    total_equipment_cost = sum(equipment.total_rental_cost for equipment in equipment_entries)
-    total_spent = total_labor_cost + total_material_cost + total_equipment_cost
+    period_costs = ProjectCostService.sum_costs(
+        period_stats.project_costs(projects.values_list('id', flat=True))
+    )
+    total_spent = period_costs['resource_cost']
     
     budget_usage_percentage = (float(total_spent) / float(total_budget) * 100) if total_budget > 0 else 0
     
@@ -1282,24 +1013,21 @@ def adminreports(request):
     project_stats = []
     
     try:
-        for project in projects.order_by('-created_at'):
-            project_entries = DiaryEntry.objects.filter(project=project, draft=False)
+        stat_projects = LatestEntryService.attach_latest_entries(projects.order_by('-created_at'))
+        lifetime_stats = MonthlyStatsService.collect(projects, include_drafts=False)
+        lifetime_costs = lifetime_stats.project_costs([project.id for project in stat_projects])
+        entry_counts = lifetime_stats.rollup('project_id', group='entry')
+        
+        for project in stat_projects:
+            counts = entry_counts.get(project.id, {})
+            costs = lifetime_costs[project.id]
             
             # Calculate project costs
-            project_labor = LaborEntry.objects.filter(diary_entry__in=project_entries)
-            project_materials = MaterialEntry.objects.filter(diary_entry__in=project_entries)
-            project_equipment = EquipmentEntry.objects.filter(diary_entry__in=project_entries)
-            project_delays = DelayEntry.objects.filter(diary_entry__in=project_entries)
-            
-            project_total_cost = (
-                sum(labor.total_cost for labor in project_labor) +
-                sum(material.total_cost for material in project_materials) +
-                sum(equipment.total_rental_cost for equipment in project_equipment)
-            )
+            project_total_cost = costs['resource_cost']
             
             # Determine status based on delays and progress
-            delay_count = project_delays.count()
-            latest_entry = project_entries.order_by('-entry_date').first()
+            delay_count = costs['delay_count']
+            latest_entry = project.latest_entry
             progress = float(latest_entry.progress_percentage) if latest_entry and latest_entry.progress_percentage else 0
             
             if progress >= 100:
@@ -1309,14 +1037,11 @@ def adminreports(request):
             else:
                 status = 'In Progress'
             
-            # Count approved entries (status='complete')
-            approved_entries = project_entries.filter(status='complete').count()
-            
             # Use a simple dictionary with explicit structure
             project_stat = {
                 'project': project,
-                'entries_count': project_entries.count(),
-                'approved_entries': approved_entries,
+                'entries_count': counts.get('count', 0),
+                'approved_entries': counts.get('approved', 0),
                 'total_delays': delay_count,
                 'total_cost': project_total_cost,
                 'status': status,
@@ -1329,62 +1054,66 @@ def adminreports(request):
         project_stats = []
     
     # Labor distribution analysis
-    labor_stats = LaborEntry.objects.filter(
-        diary_entry__in=entries
-    ).values('labor_type').annotate(
-        total_workers=Sum('workers_count'),
-        total_hours=Sum('hours_worked'),
-        total_cost=Sum('hourly_rate'),
-        entry_count=Count('id')
-    ).order_by('-total_hours')
+    labor_stats = [
+        {
+            'labor_type': row['labor_type'],
+            'total_workers': row.get('workers'),
+            'total_hours': row.get('hours'),
+            'total_cost': row.get('hourly_rate_sum'),
+            'entry_count': row['count'],
+        }
+        for row in period_stats.breakdown('labor', 'labor_type', order_by='hours')
+    ]
     
     # Material analysis
-    material_stats = MaterialEntry.objects.filter(
-        diary_entry__in=entries
-    ).values('material_name').annotate(
-        total_delivered=Sum('quantity_delivered'),
-        total_cost=Sum('unit_cost'),
-        entry_count=Count('id')
-    ).order_by('-total_delivered')[:10]
+    material_stats = [
+        {
+            'material_name': row['material_name'],
+            'total_delivered': row.get('delivered'),
+            'total_cost': row.get('unit_cost_sum'),
+            'entry_count': row['count'],
+        }
+        for row in period_stats.breakdown('material', 'material_name', order_by='delivered', limit=10)
+    ]
     
     # Delay analysis
-    delay_stats = DelayEntry.objects.filter(
-        diary_entry__in=entries
-    ).values('category').annotate(
-        count=Count('id'),
-        total_hours=Sum('duration_hours'),
-        avg_impact=Avg('cost_impact')
-    ).order_by('-total_hours')
+    delay_stats = [
+        {
+            'category': row['category'],
+            'count': row['count'],
+            'total_hours': row.get('hours'),
+            'avg_impact': row.get('avg_cost_impact'),
+        }
+        for row in period_stats.breakdown('delay', 'category', order_by='hours')
+    ]
     
     # Weather analysis
-    weather_stats = entries.exclude(weather_condition='').values('weather_condition').annotate(
-        count=Count('id'),
-        avg_temp_high=Avg('temperature_high'),
-        avg_temp_low=Avg('temperature_low')
-    ).order_by('-count')
+    weather_stats = [
+        {
+            'weather_condition': row['weather_condition'],
+            'count': row['count'],
+            'avg_temp_high': row.get('avg_temperature_high'),
+            'avg_temp_low': row.get('avg_temperature_low'),
+        }
+        for row in period_stats.breakdown('weather', 'weather_condition', order_by='count')
+    ]
     
     # Equipment utilization
-    equipment_stats = EquipmentEntry.objects.filter(
-        diary_entry__in=entries
-    ).values('equipment_type').annotate(
-        total_hours=Sum('hours_operated'),
-        total_cost=Sum('rental_cost_per_hour'),
-        utilization_days=Count('diary_entry__entry_date', distinct=True)
-    ).order_by('-total_hours')
+    equipment_stats = [
+        {
+            'equipment_type': row['equipment_type'],
+            'total_hours': row.get('hours'),
+            'total_cost': row.get('rental_rate_sum'),
+            'utilization_days': row.get('days', 0),
+        }
+        for row in period_stats.breakdown('equipment', 'equipment_type', order_by='hours')
+    ]
     
     # Budget forecast analysis
     budget_forecast_data = []
-    for project in Project.objects.filter(budget__gt=0)[:5]:  # Top 5 projects by budget
-        project_entries = DiaryEntry.objects.filter(project=project, draft=False)
-        project_labor = LaborEntry.objects.filter(diary_entry__in=project_entries)
-        project_materials = MaterialEntry.objects.filter(diary_entry__in=project_entries)
-        project_equipment = EquipmentEntry.objects.filter(diary_entry__in=project_entries)
-        
-        actual_cost = (
-            sum(labor.total_cost for labor in project_labor) +
-            sum(material.total_cost for material in project_materials) +
-            sum(equipment.total_rental_cost for equipment in project_equipment)
-        )
+    forecast_projects = ProjectCostService.annotate_costs(Project.objects.filter(budget__gt=0), include_drafts=False)
+    for project in forecast_projects[:5]:  # Top 5 projects by budget
+        actual_cost = project.labor_cost + project.material_cost + project.equipment_cost
         
         budget_forecast_data.append({
             'project_name': project.name,
@@ -1685,21 +1414,7 @@ def newproject(request):
 def project_list(request):
     """List approved projects with filtering and search capabilities"""
     # Get user's approved projects only
-    if request.user.is_staff:
-        projects = Project.objects.filter(status__in=['planning', 'active', 'on_hold', 'completed'])
-    else:
-        # Get projects through assignments or direct assignment
-        from admin_side.models import ProjectAssignment
-        assigned_project_ids = ProjectAssignment.objects.filter(
-            user=request.user, is_active=True
-        ).values_list('project_id', flat=True)
-        
-        projects = Project.objects.filter(
-            Q(id__in=assigned_project_ids) | 
-            Q(project_manager=request.user) | 
-            Q(architect=request.user),
-            status__in=['planning', 'active', 'on_hold', 'completed']
-        )
+    projects = ProjectScopeService.visible_projects(request.user)
     
     # Apply filters
     search_form = ProjectSearchForm(request.GET)
@@ -1717,6 +1432,7 @@ def project_list(request):
     paginator = Paginator(projects, 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    page_obj.object_list = LatestEntryService.attach_latest_entries(page_obj.object_list, include_drafts=True)
     
     context = {
         'page_obj': page_obj,
@@ -1764,133 +1480,22 @@ def revision_diary(request, entry_id):
     entry = get_object_or_404(DiaryEntry, id=entry_id)
     
     # Verify user has access to this entry's project
-    if not request.user.is_staff:
-        from admin_side.models import ProjectAssignment
-        assigned_project_ids = ProjectAssignment.objects.filter(
-            user=request.user, is_active=True
-        ).values_list('project_id', flat=True)
-        
-        user_projects = Project.objects.filter(
-            Q(id__in=assigned_project_ids) | 
-            Q(project_manager=request.user) | 
-            Q(architect=request.user)
-        )
-        if entry.project not in user_projects:
-            messages.error(request, 'Access denied.')
-            return redirect('site_diary:history')
+    if not ProjectScopeService.can_access(request.user, entry.project_id):
+        messages.error(request, 'Access denied.')
+        return redirect('site_diary:history')
     
     if request.method == 'POST':
         # Handle revision form submission
         from .models_revision import RevisionRequest
         
         try:
-            # Handle dynamic worker types data
-            from .models import WorkerType
-            worker_types = WorkerType.objects.filter(is_active=True)
-            
-            # Clear existing labor entries for this entry (except overtime)
-            LaborEntry.objects.filter(diary_entry=entry).exclude(labor_type='overtime').delete()
-            
-            # Process each worker type dynamically
-            for worker_type in worker_types:
-                worker_slug = worker_type.name.lower().replace(' ', '-')
-                count_field = f"{worker_slug}Count"
-                rate_field = f"{worker_slug}Rate"
-                
-                worker_count = request.POST.get(count_field, 0)
-                worker_rate = request.POST.get(rate_field, 0)
-                
-                if int(worker_count or 0) > 0:
-                    LaborEntry.objects.create(
-                        diary_entry=entry,
-                        labor_type=worker_slug,
-                        trade_description=worker_type.name,
-                        workers_count=worker_count,
-                        hours_worked=8,
-                        overtime_hours=0,
-                        hourly_rate=worker_rate or worker_type.default_daily_rate or 0
-                    )
-            
-            # Handle materials JSON data
-            materials_json = request.POST.get('materials_json')
-            if materials_json:
-                MaterialEntry.objects.filter(diary_entry=entry).delete()
-                materials_data = json.loads(materials_json)
-                for material_data in materials_data:
-                    MaterialEntry.objects.create(
-                        diary_entry=entry,
-                        material_name=material_data['name'],
-                        quantity_delivered=material_data['quantity'],
-                        unit=material_data['unit'],
-                        unit_cost=material_data['cost'] / material_data['quantity'] if material_data['quantity'] > 0 else 0,
-                        supplier='',
-                        delivery_time=None
-                    )
-            
-            # Handle equipment JSON data
-            equipment_json = request.POST.get('equipment_json')
-            if equipment_json:
-                EquipmentEntry.objects.filter(diary_entry=entry).delete()
-                equipment_data = json.loads(equipment_json)
-                for equip_data in equipment_data:
-                    EquipmentEntry.objects.create(
-                        diary_entry=entry,
-                        equipment_name=equip_data['name'],
-                        equipment_type=equip_data['name'],
-                        hours_operated=equip_data['hours'],
-                        rental_cost_per_hour=equip_data['cost'] / equip_data['hours'] if equip_data['hours'] > 0 else 0,
-                        operator_name='',
-                        fuel_consumption=0
-                    )
-            
-            # Handle overtime JSON data if provided
-            overtime_json = request.POST.get('overtime_json')
-            if overtime_json:
-                # Clear existing overtime entries for this entry
-                LaborEntry.objects.filter(diary_entry=entry, labor_type='overtime').delete()
-                overtime_data = json.loads(overtime_json)
-                for overtime_entry in overtime_data:
-                    LaborEntry.objects.create(
-                        diary_entry=entry,
-                        labor_type='overtime',
-                        trade_description=f"{overtime_entry['personnel']} {overtime_entry['role']} personnel",
-                        workers_count=overtime_entry['personnel'],
-                        hours_worked=overtime_entry['hours'],
-                        overtime_hours=overtime_entry['hours'],
-                        hourly_rate=overtime_entry['rate']
-                    )
-            
-            # Handle delays JSON data
-            delays_json = request.POST.get('delays_json')
-            if delays_json:
-                DelayEntry.objects.filter(diary_entry=entry).delete()
-                delays_data = json.loads(delays_json)
-                for delay_data in delays_data:
-                    DelayEntry.objects.create(
-                        diary_entry=entry,
-                        category=delay_data['type'],
-                        description=delay_data['description'],
-                        start_time=None,
-                        end_time=None,
-                        duration_hours=delay_data.get('duration', 0),
-                        impact_level=delay_data['impact'],
-                        mitigation_actions='',
-                        affected_activities='General work activities'
-                    )
-            
-            # Handle subcontractor JSON data if provided
-            subcontractor_json = request.POST.get('subcontractor_json')
-            if subcontractor_json:
-                SubcontractorEntry.objects.filter(diary_entry=entry).delete()
-                subcontractor_data = json.loads(subcontractor_json)
-                for sub_data in subcontractor_data:
-                    SubcontractorEntry.objects.create(
-                        diary_entry=entry,
-                        company_name=sub_data['name'],
-                        work_description=sub_data['work'],
-                        daily_cost=sub_data.get('cost', 0)
-                    )
-            
+            # Validate the revised labor, material, equipment, delay and subcontractor data up front
+            diary_payload = DiaryWriteService.parse_payload(request.POST)
+        except ValidationError as e:
+            messages.error(request, 'Error submitting revision request: ' + '; '.join(e.messages))
+            return redirect('site_diary:revision_diary', entry_id=entry.id)
+        
+        try:
             # Update diary entry fields if provided
             if request.POST.get('revised_work_description'):
                 entry.work_description = request.POST.get('revised_work_description')
@@ -1903,7 +1508,9 @@ def revision_diary(request, entry_id):
             if request.POST.get('revised_general_notes'):
                 entry.general_notes = request.POST.get('revised_general_notes')
             
-            entry.save()
+            with transaction.atomic():
+                entry.save()
+                DiaryWriteService.apply_payload(entry, diary_payload)
             
             # Create revision request
             revision_request = RevisionRequest.objects.create(
@@ -1997,21 +1604,7 @@ def revision_diary(request, entry_id):
 def history(request):
     """View diary entry history with search and filtering"""
     # Get user's approved projects
-    if request.user.is_staff:
-        projects = Project.objects.filter(status__in=['planning', 'active', 'on_hold', 'completed'])
-    else:
-        # Get projects through assignments or direct assignment
-        from admin_side.models import ProjectAssignment
-        assigned_project_ids = ProjectAssignment.objects.filter(
-            user=request.user, is_active=True
-        ).values_list('project_id', flat=True)
-        
-        projects = Project.objects.filter(
-            Q(id__in=assigned_project_ids) | 
-            Q(project_manager=request.user) | 
-            Q(architect=request.user),
-            status__in=['planning', 'active', 'on_hold', 'completed']
-        )
+    projects = ProjectScopeService.visible_projects(request.user)
     
     # Get diary entries with comprehensive prefetch for all related data (exclude drafts)
     entries = DiaryEntry.objects.filter(project__in=projects, draft=False).select_related(
@@ -2021,28 +1614,38 @@ def history(request):
         'delay_entries', 'visitor_entries', 'subcontractor_entries', 'photos'
     )
     
-    # Add budget impact data to projects
-    for project in projects:
-        # Calculate revision impacts
-        project_entries = DiaryEntry.objects.filter(project=project)
-        revision_count = project_entries.filter(status='needs_revision').count()
+    # Apply search filters
+    search_form = DiarySearchForm(request.GET)
+    if search_form.is_valid():
+        if search_form.cleaned_data['project']:
+            entries = entries.filter(project=search_form.cleaned_data['project'])
+        if search_form.cleaned_data['start_date']:
+            entries = entries.filter(entry_date__gte=search_form.cleaned_data['start_date'])
+        if search_form.cleaned_data['end_date']:
+            entries = entries.filter(entry_date__lte=search_form.cleaned_data['end_date'])
+        if search_form.cleaned_data['weather_condition']:
+            entries = entries.filter(weather_condition=search_form.cleaned_data['weather_condition'])
+        if search_form.cleaned_data['created_by']:
+            entries = entries.filter(created_by=search_form.cleaned_data['created_by'])
+    
+    # Pagination
+    paginator = Paginator(entries.order_by('-entry_date'), 10)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+    
+    # Add budget impact data to the projects shown on this page
+    snapshots = ProjectSnapshotService.get_snapshots({entry.project_id for entry in page_obj})
+    
+    for entry in page_obj:
+        project = entry.project
+        snapshot = snapshots[project.id]
+        revision_count = snapshot.revision_count
+        total_spent = snapshot.resource_cost
         
         # Calculate budget impact
         base_revision_cost = 100000  # ₱100,000 per revision
         complexity_multiplier = 1.0
         
-        # Get total spent for complexity calculation  
-        from .models import LaborEntry, MaterialEntry, EquipmentEntry
-        labor_entries = LaborEntry.objects.filter(diary_entry__in=project_entries)
-        material_entries = MaterialEntry.objects.filter(diary_entry__in=project_entries)
-        equipment_entries = EquipmentEntry.objects.filter(diary_entry__in=project_entries)
-        
-        total_spent = (
-            sum(labor.total_cost for labor in labor_entries) +
-            sum(material.total_cost for material in material_entries) +
-            sum(equipment.total_rental_cost for equipment in equipment_entries)
-        )
-        
         if total_spent > 5000000:  # Large project ₱5M+
             complexity_multiplier = 1.5
         elif total_spent > 2500000:  # Medium project ₱2.5M+
@@ -2069,54 +1672,35 @@ def history(request):
         project.budget_health = budget_health
         project.total_spent = total_spent
     
-    # Prefetch diary entries for projects
-    projects = projects.prefetch_related('diary_entries')
-    
-    # Apply search filters
-    search_form = DiarySearchForm(request.GET)
-    if search_form.is_valid():
-        if search_form.cleaned_data['project']:
-            entries = entries.filter(project=search_form.cleaned_data['project'])
-        if search_form.cleaned_data['start_date']:
-            entries = entries.filter(entry_date__gte=search_form.cleaned_data['start_date'])
-        if search_form.cleaned_data['end_date']:
-            entries = entries.filter(entry_date__lte=search_form.cleaned_data['end_date'])
-        if search_form.cleaned_data['weather_condition']:
-            entries = entries.filter(weather_condition=search_form.cleaned_data['weather_condition'])
-        if search_form.cleaned_data['created_by']:
-            entries = entries.filter(created_by=search_form.cleaned_data['created_by'])
-    
-    # Pagination
-    paginator = Paginator(entries.order_by('-entry_date'), 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
     context = {
         'page_obj': page_obj,
         'search_form': search_form,
     }
     return render(request, 'site_diary/history.html', context)
 
+def _export_response(request, projects, dataset):
+    """Stream one export dataset for the given projects as a CSV download"""
+    if dataset not in DiaryExportService.DATASETS:
+        raise Http404("Unknown export")
+    
+    rows = DiaryExportService.rows(dataset, projects, request.GET)
+    response = StreamingHttpResponse(DiaryExportService.stream_csv(rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{DiaryExportService.filename(dataset)}"'
+    return response
+
+@login_required
+@require_site_manager_role
+def export_diary(request, dataset):
+    """CSV export of diary entries, line items or monthly costs for the user's projects"""
+    projects = ProjectScopeService.visible_projects(request.user)
+    return _export_response(request, projects, dataset)
+
 @login_required
 @require_site_manager_role
 def reports(request):
     """Generate comprehensive reports and analytics with database data"""
     # Get user's approved projects
-    if request.user.is_staff:
-        projects = Project.objects.filter(status__in=['planning', 'active', 'on_hold', 'completed'])
-    else:
-        # Get projects through assignments or direct assignment
-        from admin_side.models import ProjectAssignment
-        assigned_project_ids = ProjectAssignment.objects.filter(
-            user=request.user, is_active=True
-        ).values_list('project_id', flat=True)
-        
-        projects = Project.objects.filter(
-            Q(id__in=assigned_project_ids) | 
-            Q(project_manager=request.user) | 
-            Q(architect=request.user),
-            status__in=['planning', 'active', 'on_hold', 'completed']
-        )
+    projects = ProjectScopeService.visible_projects(request.user)
     
     # Date filtering
     start_date = request.GET.get('start_date')
@@ -2131,135 +1715,134 @@ def reports(request):
         except (ValueError, TypeError):
             pass
     
-    # Get diary entries for the period
-    entries = DiaryEntry.objects.filter(project__in=projects)
-    if start_date:
-        entries = entries.filter(entry_date__gte=start_date)
-    if end_date:
-        entries = entries.filter(entry_date__lte=end_date)
+    # Report figures are read from the monthly statistics table; only the
+    # partial months at the edges of the date range touch the diary tables
+    stats = MonthlyStatsService.collect(projects, start_date=start_date, end_date=end_date)
+    project_costs = stats.project_costs([project.id for project in projects])
+    entry_totals = stats.rollup('project_id', group='entry')
+    visitor_totals = stats.rollup('project_id', group='visitor')
     
     # Project statistics with comprehensive data from database
     project_stats = []
     for project in projects:
-        project_entries = entries.filter(project=project)
-        
-        # Get all related data for this project from database
-        labor_entries = LaborEntry.objects.filter(diary_entry__in=project_entries)
-        material_entries = MaterialEntry.objects.filter(diary_entry__in=project_entries)
-        equipment_entries = EquipmentEntry.objects.filter(diary_entry__in=project_entries)
-        delay_entries = DelayEntry.objects.filter(diary_entry__in=project_entries)
-        visitor_entries = VisitorEntry.objects.filter(diary_entry__in=project_entries)
-        
-        # Calculate costs from database
-        total_labor_cost = sum(labor.total_cost for labor in labor_entries)
-        total_material_cost = sum(material.total_cost for material in material_entries)
-        total_equipment_cost = sum(equipment.total_rental_cost for equipment in equipment_entries)
-        total_delay_impact = delay_entries.aggregate(total=Sum('cost_impact'))['total'] or 0
-        
-        # Progress tracking from database
-        progress_data = project_entries.aggregate(
-            avg_progress=Avg('progress_percentage'),
-            max_progress=Max('progress_percentage'),
-            min_progress=Min('progress_percentage')
-        )
+        totals = entry_totals.get(project.id, {})
         
-        # Safety and quality metrics from database
-        safety_incidents = project_entries.exclude(safety_incidents='').count()
-        quality_issues = project_entries.exclude(quality_issues='').count()
+        # Costs for the selected period
+        costs = project_costs[project.id]
+        total_labor_cost = costs['labor_cost']
+        total_material_cost = costs['material_cost']
+        total_equipment_cost = costs['equipment_cost']
+        total_delay_impact = costs['delay_cost']
         
         project_stats.append({
             'project': project,
-            'entries_count': project_entries.count(),
-            'total_delays': delay_entries.count(),
-            'total_delay_hours': delay_entries.aggregate(total=Sum('duration_hours'))['total'] or 0,
+            'entries_count': totals.get('count', 0),
+            'total_delays': costs['delay_count'],
+            'total_delay_hours': costs['delay_hours'],
             'total_labor_cost': total_labor_cost,
             'total_material_cost': total_material_cost,
             'total_equipment_cost': total_equipment_cost,
             'total_project_cost': total_labor_cost + total_material_cost + total_equipment_cost,
             'total_delay_impact': total_delay_impact,
-            'avg_progress': progress_data['avg_progress'] or 0,
-            'max_progress': progress_data['max_progress'] or 0,
-            'min_progress': progress_data['min_progress'] or 0,
-            'approved_entries': project_entries.filter(status='complete').count(),
-            'pending_entries': project_entries.filter(status='needs_revision').count(),
-            'safety_incidents': safety_incidents,
-            'quality_issues': quality_issues,
-            'visitor_count': visitor_entries.count(),
-            'photos_count': project_entries.filter(photos_taken=True).count(),
+            'avg_progress': totals.get('avg_progress') or 0,
+            'max_progress': totals.get('progress_max') or 0,
+            'min_progress': totals.get('progress_min') or 0,
+            'approved_entries': totals.get('approved', 0),
+            'pending_entries': totals.get('needs_revision', 0),
+            'safety_incidents': totals.get('safety_incidents', 0),
+            'quality_issues': totals.get('quality_issues', 0),
+            'visitor_count': visitor_totals.get(project.id, {}).get('count', 0),
+            'photos_count': totals.get('photos', 0),
         })
     
-    # Delay analysis by category from database
-    delay_categories = DelayEntry.objects.filter(
-        diary_entry__in=entries
-    ).values('category').annotate(
-        count=Count('id'),
-        total_hours=Sum('duration_hours'),
-        avg_impact=Avg('cost_impact'),
-        total_cost_impact=Sum('cost_impact')
-    ).order_by('-total_hours')
-    
-    # Weather analysis from database
-    weather_stats = entries.exclude(weather_condition='').values('weather_condition').annotate(
-        count=Count('id'),
-        avg_temp_high=Avg('temperature_high'),
-        avg_temp_low=Avg('temperature_low'),
-        avg_humidity=Avg('humidity'),
-        avg_wind_speed=Avg('wind_speed')
-    ).order_by('-count')
-    
-    # Labor analysis from database
-    labor_stats = LaborEntry.objects.filter(
-        diary_entry__in=entries
-    ).values('labor_type').annotate(
-        total_workers=Sum('workers_count'),
-        total_hours=Sum('hours_worked'),
-        total_overtime=Sum('overtime_hours'),
-        avg_hourly_rate=Avg('hourly_rate'),
-        entry_count=Count('id')
-    ).order_by('-total_hours')
-    
-    # Material analysis from database
-    material_stats = MaterialEntry.objects.filter(
-        diary_entry__in=entries
-    ).values('material_name').annotate(
-        total_delivered=Sum('quantity_delivered'),
-        total_used=Sum('quantity_used'),
-        avg_unit_cost=Avg('unit_cost'),
-        total_entries=Count('id')
-    ).order_by('-total_delivered')[:15]  # Top 15 materials
-    
-    # Equipment utilization from database
-    equipment_stats = EquipmentEntry.objects.filter(
-        diary_entry__in=entries
-    ).values('equipment_type').annotate(
-        total_hours=Sum('hours_operated'),
-        avg_hourly_rate=Avg('rental_cost_per_hour'),
-        total_fuel=Sum('fuel_consumption'),
-        utilization_days=Count('diary_entry__entry_date', distinct=True),
-        breakdown_count=Count('id', filter=Q(status='breakdown'))
-    ).order_by('-total_hours')
-    
-    # Monthly progress tracking from database
-    monthly_progress = entries.extra(
-        select={'month': "DATE_TRUNC('month', entry_date)"}
-    ).values('month').annotate(
-        avg_progress=Avg('progress_percentage'),
-        entry_count=Count('id'),
-        total_delays=Count('delay_entries'),
-        avg_temp=Avg('temperature_high')
-    ).order_by('month')
-    
-    # Overall summary from database
+    # Delay analysis by category
+    delay_categories = [
+        {
+            'category': row['category'],
+            'count': row['count'],
+            'total_hours': row.get('hours'),
+            'avg_impact': row.get('avg_cost_impact'),
+            'total_cost_impact': row.get('cost_impact_sum'),
+        }
+        for row in stats.breakdown('delay', 'category', order_by='hours')
+    ]
+    
+    # Weather analysis
+    weather_stats = [
+        {
+            'weather_condition': row['weather_condition'],
+            'count': row['count'],
+            'avg_temp_high': row.get('avg_temperature_high'),
+            'avg_temp_low': row.get('avg_temperature_low'),
+            'avg_humidity': row.get('avg_humidity'),
+            'avg_wind_speed': row.get('avg_wind_speed'),
+        }
+        for row in stats.breakdown('weather', 'weather_condition', order_by='count')
+    ]
+    
+    # Labor analysis
+    labor_stats = [
+        {
+            'labor_type': row['labor_type'],
+            'total_workers': row.get('workers'),
+            'total_hours': row.get('hours'),
+            'total_overtime': row.get('overtime'),
+            'avg_hourly_rate': row.get('avg_hourly_rate'),
+            'entry_count': row['count'],
+        }
+        for row in stats.breakdown('labor', 'labor_type', order_by='hours')
+    ]
+    
+    # Material analysis
+    material_stats = [
+        {
+            'material_name': row['material_name'],
+            'total_delivered': row.get('delivered'),
+            'total_used': row.get('used'),
+            'avg_unit_cost': row.get('avg_unit_cost'),
+            'total_entries': row['count'],
+        }
+        for row in stats.breakdown('material', 'material_name', order_by='delivered', limit=15)  # Top 15 materials
+    ]
+    
+    # Equipment utilization
+    equipment_stats = [
+        {
+            'equipment_type': row['equipment_type'],
+            'total_hours': row.get('hours'),
+            'avg_hourly_rate': row.get('avg_rental_rate'),
+            'total_fuel': row.get('fuel'),
+            'utilization_days': row.get('days', 0),
+            'breakdown_count': row.get('breakdowns', 0),
+        }
+        for row in stats.breakdown('equipment', 'equipment_type', order_by='hours')
+    ]
+    
+    # Monthly progress tracking
+    monthly_delays = stats.rollup('month', group='delay')
+    monthly_progress = [
+        {
+            'month': month,
+            'avg_progress': totals.get('avg_progress'),
+            'entry_count': totals.get('count', 0),
+            'total_delays': monthly_delays.get(month, {}).get('count', 0),
+            'avg_temp': totals.get('avg_temperature_high'),
+        }
+        for month, totals in sorted(stats.rollup('month', group='entry').items())
+    ]
+    
+    # Overall summary
+    entry_summary = stats.totals('entry')
     overall_summary = {
         'total_projects': projects.count(),
-        'total_entries': entries.count(),
-        'total_approved': entries.filter(status='complete').count(),
-        'total_pending': entries.filter(status='needs_revision').count(),
-        'total_labor_entries': LaborEntry.objects.filter(diary_entry__in=entries).count(),
-        'total_material_entries': MaterialEntry.objects.filter(diary_entry__in=entries).count(),
-        'total_equipment_entries': EquipmentEntry.objects.filter(diary_entry__in=entries).count(),
-        'total_delays': DelayEntry.objects.filter(diary_entry__in=entries).count(),
-        'total_visitors': VisitorEntry.objects.filter(diary_entry__in=entries).count(),
+        'total_entries': entry_summary.get('count', 0),
+        'total_approved': entry_summary.get('approved', 0),
+        'total_pending': entry_summary.get('needs_revision', 0),
+        'total_labor_entries': stats.totals('labor').get('count', 0),
+        'total_material_entries': stats.totals('material').get('count', 0),
+        'total_equipment_entries': stats.totals('equipment').get('count', 0),
+        'total_delays': stats.totals('delay').get('count', 0),
+        'total_visitors': stats.totals('visitor').get('count', 0),
         'date_range': {
             'start': start_date,
             'end': end_date,
@@ -2298,17 +1881,18 @@ def reports(request):
         else:
             return data
     
-    # Serialize project stats with progress tracking data
+    # Serialize project stats with progress tracking data, one point per month
+    monthly_project_progress = stats.rollup('project_id', 'month', group='entry')
     serialized_project_stats = []
     for stat in project_stats:
-        # Get all diary entries for this project with progress data
-        project_entries = entries.filter(project=stat['project']).order_by('entry_date')
-        progress_entries = []
-        for entry in project_entries:
-            progress_entries.append({
-                'date': entry.entry_date.strftime('%Y-%m-%d'),
-                'progress': float(entry.progress_percentage) if entry.progress_percentage else 0
-            })
+        progress_entries = [
+            {
+                'date': month.strftime('%Y-%m-%d'),
+                'progress': float(totals['progress_max']) if totals.get('progress_max') else 0
+            }
+            for (project_id, month), totals in sorted(monthly_project_progress.items())
+            if project_id == stat['project'].id
+        ]
         
         serialized_stat = {
             'project': {
@@ -2366,20 +1950,9 @@ def project_detail(request, project_id):
     project = get_object_or_404(Project, id=project_id)
     
     # Verify user has access to this project
-    if not request.user.is_staff:
-        from admin_side.models import ProjectAssignment
-        assigned_project_ids = ProjectAssignment.objects.filter(
-            user=request.user, is_active=True
-        ).values_list('project_id', flat=True)
-        
-        user_projects = Project.objects.filter(
-            Q(id__in=assigned_project_ids) | 
-            Q(project_manager=request.user) | 
-            Q(architect=request.user)
-        )
-        if project not in user_projects:
-            messages.error(request, 'You do not have access to this project.')
-            return redirect('site_diary:dashboard')
+    if not ProjectScopeService.can_access(request.user, project.id):
+        messages.error(request, 'You do not have access to this project.')
+        return redirect('site_diary:dashboard')
     
     # Get user's company name and profile image from SiteManagerProfile
     user_company = "Triple G Design Studio"  # Default company name
@@ -2404,20 +1977,16 @@ def project_detail(request, project_id):
     
     # Get project entries and related data
     project_entries = DiaryEntry.objects.filter(project=project).order_by('-entry_date')
-    labor_entries = LaborEntry.objects.filter(diary_entry__in=project_entries)
-    material_entries = MaterialEntry.objects.filter(diary_entry__in=project_entries)
-    equipment_entries = EquipmentEntry.objects.filter(diary_entry__in=project_entries)
-    delay_entries = DelayEntry.objects.filter(diary_entry__in=project_entries)
+    labor_entries = LaborEntry.objects.filter(diary_entry__project=project)
+    equipment_entries = EquipmentEntry.objects.filter(diary_entry__project=project)
     
     # Calculate project metrics from real data
     latest_entry = project_entries.first()
     progress = float(latest_entry.progress_percentage) if latest_entry else 0
     
     # Budget calculations from real data
-    total_labor_cost = sum(labor.total_cost for labor in labor_entries)
-    total_material_cost = sum(material.total_cost for material in material_entries)
-    total_equipment_cost = sum(equipment.total_rental_cost for equipment in equipment_entries)
-    total_spent = total_labor_cost + total_material_cost + total_equipment_cost
+    project_costs = ProjectCostService.get_project_cost(project)
+    total_spent = project_costs['resource_cost']
     total_budget = float(project.budget) if project.budget else 0
     remaining_budget = max(0, float(total_budget) - float(total_spent))
     
@@ -2427,7 +1996,7 @@ def project_detail(request, project_id):
     # Resource statistics from real data
     total_workers = labor_entries.aggregate(total=Sum('workers_count'))['total'] or 0
     equipment_count = equipment_entries.values('equipment_type').distinct().count()
-    delay_count = delay_entries.count()
+    delay_count = project_costs['delay_count']
     
     # Determine current phase based on progress
     if progress < 25:
@@ -2936,6 +2505,12 @@ def admindiaryreviewer(request):
     
     return render(request, 'admin/admindiaryreviewer.html', context)
 
+@login_required
+@require_admin_role
+def admin_export_diary(request, dataset):
+    """CSV export of diary entries, line items or monthly costs across all projects"""
+    return _export_response(request, Project.objects.all(), dataset)
+
 @login_required
 @require_admin_role
 def diary_entry_detail(request, entry_id):
@@ -2949,16 +2524,7 @@ def diary_entry_detail(request, entry_id):
         ).get(id=entry_id, draft=False)
         
         # Calculate budget information
-        project_entries = DiaryEntry.objects.filter(project=entry.project)
-        labor_entries = LaborEntry.objects.filter(diary_entry__in=project_entries)
-        material_entries = MaterialEntry.objects.filter(diary_entry__in=project_entries)
-        equipment_entries = EquipmentEntry.objects.filter(diary_entry__in=project_entries)
-        
-        total_spent = (
-            sum(labor.total_cost for labor in labor_entries) +
-            sum(material.total_cost for material in material_entries) +
-            sum(equipment.total_rental_cost for equipment in equipment_entries)
-        )
+        total_spent = ProjectCostService.get_project_cost(entry.project)['resource_cost']
         
         # Get subcontractor entries
         subcontractor_entries = SubcontractorEntry.objects.filter(diary_entry=entry)
@@ -3106,9 +2672,30 @@ def send_revision(request):
 @login_required
 @require_admin_role
 def admin_print_layout(request):
-    """Admin print layout view"""
+    """Admin print layout view; ?format=pdf downloads the entries as PDF"""
     entry_id = request.GET.get('entry_id')
-    
+    if entry_id and not entry_id.isdigit():
+        raise Http404('Invalid entry id')
+
+    if request.GET.get('format') == 'pdf':
+        from django.conf import settings
+        if entry_id:
+            entry = get_object_or_404(DiaryEntry, id=entry_id, draft=False)
+            return _pdf_response(
+                DiaryPdfService.get_pdf(entry), f"diary-{entry.entry_date:%Y%m%d}-{entry.id}.pdf"
+            )
+        entries = DiaryExportService.filter_entries(Project.objects.all(), request.GET).order_by('entry_date', 'id')
+        entry_ids = list(entries.values_list('id', flat=True)[:settings.DIARY_PDF_MAX_ENTRIES + 1])
+        if not entry_ids:
+            raise Http404('No diary entries match these filters')
+        if len(entry_ids) > settings.DIARY_PDF_MAX_ENTRIES:
+            return HttpResponse(
+                f'Too many entries for one PDF (at most {settings.DIARY_PDF_MAX_ENTRIES}); narrow the filters.',
+                status=400, content_type='text/plain'
+            )
+        pdf = DiaryPdfService.get_combined_pdf(DiaryEntry.objects.filter(id__in=entry_ids).order_by('entry_date', 'id'))
+        return _pdf_response(pdf, f"diary-entries-{timezone.localdate():%Y%m%d}.pdf", attachment=True)
+
     if entry_id:
         # Single entry print
         try:
@@ -3172,19 +2759,8 @@ def api_project_location(request, project_id):
         project = get_object_or_404(Project, id=project_id)
         
         # Verify user has access to this project
-        if not request.user.is_staff:
-            from admin_side.models import ProjectAssignment
-            assigned_project_ids = ProjectAssignment.objects.filter(
-                user=request.user, is_active=True
-            ).values_list('project_id', flat=True)
-            
-            user_projects = Project.objects.filter(
-                Q(id__in=assigned_project_ids) | 
-                Q(project_manager=request.user) | 
-                Q(architect=request.user)
-            )
-            if project not in user_projects:
-                return JsonResponse({'error': 'Access denied'}, status=403)
+        if not ProjectScopeService.can_access(request.user, project.id):
+            return JsonResponse({'error': 'Access denied'}, status=403)
         
         return JsonResponse({
             'location': escape(project.location or ''),
@@ -3205,19 +2781,8 @@ def api_project_data(request, project_id):
         project = get_object_or_404(Project, id=project_id)
         
         # Verify user has access to this project
-        if not request.user.is_staff:
-            from admin_side.models import ProjectAssignment
-            assigned_project_ids = ProjectAssignment.objects.filter(
-                user=request.user, is_active=True
-            ).values_list('project_id', flat=True)
-            
-            user_projects = Project.objects.filter(
-                Q(id__in=assigned_project_ids) | 
-                Q(project_manager=request.user) | 
-                Q(architect=request.user)
-            )
-            if project not in user_projects:
-                return JsonResponse({'error': 'Access denied'}, status=403)
+        if not ProjectScopeService.can_access(request.user, project.id):
+            return JsonResponse({'error': 'Access denied'}, status=403)
         
         # Get project entries for date range calculation
         project_entries = DiaryEntry.objects.filter(project=project).order_by('entry_date')
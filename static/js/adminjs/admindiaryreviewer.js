@@ -336,43 +336,20 @@ function resetFilters() {
 
 function exportPdf() {
     console.log('exportPdf function called');
-    // Get current filters to pass to print layout
+    // One server-rendered PDF of every entry matching the current filters
     const params = new URLSearchParams(window.location.search);
+    params.delete('page');
+    params.set('format', 'pdf');
     const printUrl = '/diary/admin/print-layout/?' + params.toString();
     console.log('Opening URL:', printUrl);
     window.open(printUrl, '_blank');
 }
 
 function exportCsv() {
-    // Simple CSV export of visible table data
-    const table = document.querySelector('.entries-table');
-    if (!table) return;
-    
-    let csv = [];
-    const rows = table.querySelectorAll('tr');
-    
-    rows.forEach(row => {
-        const cols = row.querySelectorAll('td, th');
-        const rowData = [];
-        cols.forEach(col => {
-            // Skip action column
-            if (!col.querySelector('.table-actions')) {
-                rowData.push('"' + col.textContent.trim().replace(/"/g, '""') + '"');
-            }
-        });
-        if (rowData.length > 0) {
-            csv.push(rowData.join(','));
-        }
-    });
-    
-    const csvContent = csv.join('\n');
-    const blob = new Blob([csvContent], { type: 'text/csv' });
-    const url = window.URL.createObjectURL(blob);
-    const a = document.createElement('a');
-    a.href = url;
-    a.download = 'diary_entries.csv';
-    a.click();
-    window.URL.revokeObjectURL(url);
+    // Every entry matching the current filters, not just the visible page
+    const params = new URLSearchParams(window.location.search);
+    params.delete('page');
+    window.location.href = '/diary/admin/export/entries/?' + params.toString();
 }
 
 function refreshData() {
@@ -380,8 +357,10 @@ function refreshData() {
 }
 
 function printData() {
-    // Get current filters to pass to print layout
+    // One server-rendered PDF of every entry matching the current filters
     const params = new URLSearchParams(window.location.search);
+    params.delete('page');
+    params.set('format', 'pdf');
     const printUrl = '/diary/admin/print-layout/?' + params.toString();
     window.open(printUrl, '_blank');
 }
@@ -844,7 +823,7 @@ function hideLoadingOverlay() {
 }
 
 function exportSingleEntry(entryId) {
-    const printUrl = `/diary/admin/print-layout/?entry_id=${entryId}`;
+    const printUrl = `/diary/admin/print-layout/?entry_id=${entryId}&format=pdf`;
     window.open(printUrl, '_blank');
 }
 
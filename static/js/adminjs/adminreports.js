@@ -449,33 +449,8 @@ function exportToPDF() {
 }
 
 function exportToCSV() {
-    // Get project data from the table
-    const table = document.querySelector('.reports-section table');
-    if (!table) return;
-    
-    let csv = 'Report ID,Project,Date Range,Type,Generated By,Created Date\n';
-    
-    const rows = table.querySelectorAll('tbody tr');
-    rows.forEach(row => {
-        const cells = row.querySelectorAll('td');
-        if (cells.length >= 6) {
-            const rowData = Array.from(cells).slice(0, 6).map(cell => 
-                '"' + cell.textContent.trim().replace(/"/g, '""') + '"'
-            ).join(',');
-            csv += rowData + '\n';
-        }
-    });
-    
-    // Download CSV
-    const blob = new Blob([csv], { type: 'text/csv' });
-    const url = window.URL.createObjectURL(blob);
-    const a = document.createElement('a');
-    a.href = url;
-    a.download = 'admin-reports-' + new Date().toISOString().split('T')[0] + '.csv';
-    document.body.appendChild(a);
-    a.click();
-    document.body.removeChild(a);
-    window.URL.revokeObjectURL(url);
+    // Monthly costs for the current filters, streamed by the server
+    window.location.href = '/diary/admin/export/costs/' + window.location.search;
 }
 
 function generateNewReport() {
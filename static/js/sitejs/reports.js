@@ -603,36 +603,9 @@ function initializeExportFunctions() {
         window.print();
     };
     
-    // Export to CSV function
+    // Export to CSV function: monthly costs for the current filters, streamed by the server
     window.exportToCSV = function() {
-        const table = document.querySelector('table');
-        if (!table) {
-            alert('No data to export');
-            return;
-        }
-        
-        let csv = [];
-        const rows = table.querySelectorAll('tr');
-        
-        for (let i = 0; i < rows.length; i++) {
-            const row = [];
-            const cols = rows[i].querySelectorAll('td, th');
-            
-            for (let j = 0; j < cols.length - 1; j++) { // Skip last column (Actions)
-                let data = cols[j].innerText.replace(/,/g, ';');
-                row.push('"' + data + '"');
-            }
-            csv.push(row.join(','));
-        }
-        
-        const csvFile = new Blob([csv.join('\n')], { type: 'text/csv' });
-        const downloadLink = document.createElement('a');
-        downloadLink.download = 'site_diary_reports.csv';
-        downloadLink.href = window.URL.createObjectURL(csvFile);
-        downloadLink.style.display = 'none';
-        document.body.appendChild(downloadLink);
-        downloadLink.click();
-        document.body.removeChild(downloadLink);
+        window.location.href = '/diary/export/costs/' + window.location.search;
     };
     
     // Print report function
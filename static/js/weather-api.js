@@ -1,6 +1,6 @@
 // Weather API Integration for Site Diary
-const WEATHER_API_KEY = '0c461dd2b831a59146501773674950cd';
-const WEATHER_API_URL = 'https://api.openweathermap.org/data/2.5/weather';
+// Lookups go through the server, which caches readings per location
+const WEATHER_API_URL = '/diary/api/weather/';
 
 document.addEventListener('DOMContentLoaded', function() {
     initializeWeatherSystem();
@@ -68,7 +68,23 @@ function setupEventListeners() {
     });
 }
 
+function getStoredProjectWeather() {
+    // Recent reading recorded for the selected project, rendered into the page
+    const projectSelect = document.getElementById('id_project');
+    if (!projectSelect?.value || !window.projectData) return null;
+    const project = window.projectData.find(p => p.id == projectSelect.value);
+    return project?.weather || null;
+}
+
 function autoFetchWeatherOnLoad() {
+    const storedWeather = getStoredProjectWeather();
+    if (storedWeather) {
+        // Prefill without any network call
+        updateWeatherDisplay(storedWeather);
+        updateFormFields(storedWeather);
+        return;
+    }
+    
     const locationInput = document.getElementById('siteLocation');
     if (locationInput && locationInput.value.trim()) {
         // Automatically fetch weather immediately on page load
@@ -109,10 +125,12 @@ async function fetchWeatherData() {
     
     let weatherData = null;
     let lastError = null;
+    const projectId = document.getElementById('id_project')?.value;
+    const projectParam = projectId ? `&project=${encodeURIComponent(projectId)}` : '';
     
     for (const location of locationVariants) {
         try {
-            const response = await fetch(`${WEATHER_API_URL}?q=${encodeURIComponent(location)}&appid=${WEATHER_API_KEY}&units=metric`);
+            const response = await fetch(`${WEATHER_API_URL}?location=${encodeURIComponent(location)}${projectParam}`);
             
             if (response.ok) {
                 weatherData = await response.json();
@@ -145,11 +163,11 @@ async function fetchWeatherData() {
 }
 
 function updateWeatherDisplay(data) {
-    const temp = Math.round(data.main.temp);
-    const condition = data.weather[0].description;
-    const humidity = data.main.humidity;
-    const windSpeed = Math.round(data.wind.speed * 3.6); // Convert m/s to km/h
-    const iconCode = data.weather[0].icon;
+    const temp = data.temperature;
+    const condition = data.description;
+    const humidity = data.humidity;
+    const windSpeed = data.wind_speed; // Already in km/h
+    const iconCode = data.icon;
     
     // Update morning weather display
     updateWeatherSection('morning', {
@@ -204,14 +222,14 @@ function updateFormFields(data) {
     const windSpeed = document.getElementById('id_wind_speed');
     const weatherCondition = document.getElementById('id_weather_condition');
     
-    if (tempHigh) tempHigh.value = Math.round(data.main.temp_max);
-    if (tempLow) tempLow.value = Math.round(data.main.temp_min);
-    if (humidity) humidity.value = data.main.humidity;
-    if (windSpeed) windSpeed.value = Math.round(data.wind.speed * 3.6);
+    if (tempHigh) tempHigh.value = data.temperature_high;
+    if (tempLow) tempLow.value = data.temperature_low;
+    if (humidity) humidity.value = data.humidity;
+    if (windSpeed) windSpeed.value = data.wind_speed;
     
     // Set weather condition dropdown
     if (weatherCondition) {
-        const condition = mapWeatherCondition(data.weather[0].main);
+        const condition = mapWeatherCondition(data.condition);
         weatherCondition.value = condition;
     }
 }